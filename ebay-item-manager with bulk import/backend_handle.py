@@ -0,0 +1,263 @@
+"""
+ListingLife Backend Handle
+Immutable snapshot of the storage backend plus the locks that keep threaded requests consistent
+
+The server keeps its configuration in module globals, which initialize_storage
+rewrites when the settings page saves a new config and refresh_dropbox_token
+rewrites when a token expires. Request threads and background workers read
+the backend through a BackendHandle instead: a frozen snapshot that is
+replaced as a whole, so a thread sees either the old backend or the new one,
+never a client from one and a folder from the other.
+"""
+import copy
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+
+class BackendHandle:
+    """The clients and locations of the active storage backend; never modified once created"""
+
+    __slots__ = ('mode', 'remote_mode', 'local_path', 'bucket', 'folder',
+                 's3_client', 'dropbox_client', 'generation')
+
+    def __init__(self, mode, remote_mode=None, local_path=None, bucket=None, folder=None,
+                 s3_client=None, dropbox_client=None, generation=0):
+        for name, value in (('mode', mode), ('remote_mode', remote_mode), ('local_path', local_path),
+                            ('bucket', bucket), ('folder', folder), ('s3_client', s3_client),
+                            ('dropbox_client', dropbox_client), ('generation', generation)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("BackendHandle is immutable; publish a new one instead")
+
+    def replace(self, **changes):
+        """A copy with some fields changed and the next generation number"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes, generation=self.generation + 1)
+        return BackendHandle(**fields)
+
+    @property
+    def dropbox_path(self):
+        return (self.folder or '').rstrip('/')
+
+    def __repr__(self):
+        return f"BackendHandle(mode={self.mode!r}, remote_mode={self.remote_mode!r}, generation={self.generation})"
+
+
+class ReadWriteLock:
+    """Many readers or one writer, with waiting writers served before new readers
+
+    Requests hold the read side while they run; reconfiguring the backend takes
+    the write side, so it waits for in-flight requests to finish and holds new
+    ones back until the new backend is in place. The writer may re-enter both
+    sides (initialize_storage connects the backend while holding it).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writer = None
+        self._write_depth = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._write_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def describe(self):
+        with self._cond:
+            return {'readers': self._readers, 'writer_active': self._writer is not None,
+                    'writers_waiting': self._writers_waiting}
+
+
+class KeyLocks:
+    """One lock per storage key, created on demand and dropped when nobody holds or waits for it
+
+    Writes to the same key (save, version bump and history record) run one at
+    a time; writes to different keys, and all reads, proceed in parallel.
+    With worker processes, process_locks (worker_processes.SharedState) extends
+    this to writes made by the other processes.
+    """
+
+    def __init__(self, process_locks=None):
+        self._lock = threading.Lock()
+        self._locks = {}  # key -> [lock, number of threads holding or waiting]
+        self.process_locks = process_locks
+
+    @contextmanager
+    def hold(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            if self.process_locks:
+                with self.process_locks.hold(key):
+                    yield
+            else:
+                yield
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._locks)
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Concurrent loads of the same key share one backend call and decode, each caller getting its own result
+
+    The first caller for a (backend, key) pair loads it; callers arriving
+    while that load runs wait for it and get its value (or exception)
+    instead of downloading and parsing the object again. Nothing is kept once
+    the load returns, so later callers always load afresh. Writes and deletes
+    call forget() when they finish, so a load that starts after a write
+    returned never joins one that started before it.
+
+    Callers modify what they get (merges, sets, compaction rewrites), so when
+    a load was shared every caller, the first one included, gets its own deep
+    copy of the result; a load nobody joined is returned as it is.
+    """
+
+    def __init__(self, on_call=None):
+        self._lock = threading.Lock()
+        self._flights = {}  # (backend, key) -> _Flight
+        self._counts = {}  # backend -> {'fetched': n, 'coalesced': n}
+        # on_call(backend, coalesced) after each call is counted (the server feeds its metrics)
+        self.on_call = on_call
+
+    def do(self, backend, key, load):
+        flight_key = (backend, key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+            else:
+                flight.waiters += 1
+            counts = self._counts.setdefault(backend, {'fetched': 0, 'coalesced': 0})
+            counts['fetched' if leader else 'coalesced'] += 1
+        if self.on_call:
+            self.on_call(backend, not leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+        try:
+            flight.result = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                # forget() may already have let a newer load take the slot
+                if self._flights.get(flight_key) is flight:
+                    del self._flights[flight_key]
+                # No caller can join once the flight is out of the table
+                shared = flight.waiters > 0
+            flight.done.set()
+        # The result itself stays untouched for the waiters to copy
+        return copy.deepcopy(flight.result) if shared else flight.result
+
+    def forget(self, backend, key):
+        """Send loads of key that start from now on to the backend, not to a load already running"""
+        with self._lock:
+            self._flights.pop((backend, key), None)
+
+    def coalesced(self, backend):
+        """Decorator for a load(key) function"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(key):
+                return self.do(backend, key, lambda: func(key))
+            return wrapper
+        return decorator
+
+    def invalidates(self, backend):
+        """Decorator for a function changing a key (its first argument) in the backend"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(key, *args, **kwargs):
+                try:
+                    return func(key, *args, **kwargs)
+                finally:
+                    self.forget(backend, key)
+            return wrapper
+        return decorator
+
+    def describe(self):
+        with self._lock:
+            in_flight = {}
+            for backend, _ in self._flights:
+                in_flight[backend] = in_flight.get(backend, 0) + 1
+            return {backend: dict(counts, in_flight=in_flight.get(backend, 0)) for backend, counts in self._counts.items()}
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ListingLife Storage Benchmark
+Drives the storage server's endpoints with synthetic stores and records a JSON baseline
+
+Usage:
+    python benchmark_storage.py                                   # local, cloud and dropbox fakes, 100..10k items
+    python benchmark_storage.py --sizes 100,100000,1000000 --backends local
+    python benchmark_storage.py --photos --output baseline.json
+    python benchmark_storage.py --compare baseline.json           # exit 1 on p50 regressions
+"""
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import storage_server
+from listing_stats import percentile
+from storage_fakes import FakeS3Client, FakeDropboxClient, fake_dropbox_module
+from synthetic_data import make_listing_document, make_sold_document, DEFAULT_PHOTO_BYTES
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_REPEAT = 5
+DEFAULT_REGRESSION_THRESHOLD = 0.25
+BACKENDS = ('local', 'cloud', 'dropbox')
+STORE_ID = 'store-bench'
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where the resource module is missing (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+def use_backend(backend, data_dir):
+    """Point storage_server at a fresh instance of one backend"""
+    storage_server.STORAGE_MODE = backend
+    storage_server.LOCAL_STORAGE_PATH = data_dir
+    storage_server.version_history = None
+    storage_server.s3_client = None
+    storage_server.dropbox_client = None
+    if backend == 'cloud':
+        storage_server.s3_client = FakeS3Client()
+        storage_server.CLOUD_BUCKET = 'listinglife-bench'
+    elif backend == 'dropbox':
+        storage_server.dropbox = fake_dropbox_module
+        storage_server.dropbox_client = FakeDropboxClient()
+        storage_server.DROPBOX_FOLDER = '/ListingLife'
+    # The backend I/O functions read the clients through the published handle
+    storage_server.publish_backend()
+    for cache in (storage_server.LIFETIME_STATS_CACHE, storage_server.PENDING_INDEX_CACHE, storage_server.IMPORT_INDEX_CACHE):
+        cache.clear()
+
+
+def timed_calls(call, repeat):
+    """Run call() once to warm up, then `repeat` times, returning per-call seconds"""
+    response = call()
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(timings, payload_bytes):
+    """Latency percentiles and throughput for one operation"""
+    ordered = sorted(timings)
+    total = sum(ordered)
+    return {
+        'calls': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'ops_per_sec': round(len(ordered) / total, 2) if total else None,
+        'mb_per_sec': round(payload_bytes * len(ordered) / total / 1e6, 2) if total and payload_bytes else None,
+    }
+
+
+def run_scenario(client, item_count, photos, photo_bytes, repeat):
+    """Benchmark every endpoint for one document size against the active backend"""
+    listing_key = f"EbayListingLife_{STORE_ID}"
+    sold_key = f"SoldItemsTrends_{STORE_ID}"
+    # The browser sends values as JSON strings
+    listing_value = json.dumps(make_listing_document(item_count, photos, photo_bytes))
+    sold_value = json.dumps(make_sold_document(item_count, photos, photo_bytes))
+    listing_bytes = len(listing_value.encode('utf-8'))
+    sold_bytes = len(sold_value.encode('utf-8'))
+
+    results = {'document_bytes': {'listing': listing_bytes, 'sold': sold_bytes}, 'operations': {}}
+    operations = results['operations']
+    operations['set'] = summarize(timed_calls(
+        lambda: client.post('/api/storage/set', json={'key': listing_key, 'value': listing_value}), repeat), listing_bytes)
+    operations['get'] = summarize(timed_calls(
+        lambda: client.post('/api/storage/get', json={'key': listing_key}), repeat), listing_bytes)
+    operations['sync'] = summarize(timed_calls(
+        lambda: client.post('/api/storage/sync', json={'items': {listing_key: listing_value, sold_key: sold_value}}), repeat),
+        listing_bytes + sold_bytes)
+    operations['list_keys'] = summarize(timed_calls(lambda: client.get('/api/storage/keys'), repeat), 0)
+    operations['size'] = summarize(timed_calls(lambda: client.get('/api/storage/size'), repeat), 0)
+    results['peak_rss_bytes'] = peak_rss_bytes()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a line per operation whose p50 got more than `threshold` slower than the baseline"""
+    regressions = []
+    for name, scenario in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for operation, stats in scenario['operations'].items():
+            before = previous['operations'].get(operation, {}).get('p50_ms')
+            if before and stats['p50_ms'] > before * (1 + threshold):
+                regressions.append(f"{name} {operation}: p50 {before}ms -> {stats['p50_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ListingLife storage server')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated item counts per document (up to 1000000)')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='Comma-separated subset of local,cloud,dropbox')
+    parser.add_argument('--photos', action='store_true', help='Also run every size with inline data-URL photos')
+    parser.add_argument('--photo-bytes', type=int, default=DEFAULT_PHOTO_BYTES, help='Size of each inline photo')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed calls per operation (after one warm-up)')
+    parser.add_argument('--output', help='Write the results as a JSON baseline to this file')
+    parser.add_argument('--compare', help='Baseline JSON to compare p50 latencies against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='Allowed p50 slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # Per-request logging would dominate small-document timings
+    logging.getLogger(storage_server.__name__).setLevel(logging.WARNING)
+    client = storage_server.app.test_client()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    backends = [backend for backend in args.backends.split(',') if backend]
+    photo_modes = (False, True) if args.photos else (False,)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'scenarios': {}
+    }
+    for backend in backends:
+        for item_count in sizes:
+            for photos in photo_modes:
+                name = f"{backend}/{item_count}{'/photos' if photos else ''}"
+                data_dir = Path(tempfile.mkdtemp(prefix='listinglife-bench-'))
+                try:
+                    use_backend(backend, data_dir)
+                    scenario = run_scenario(client, item_count, photos, args.photo_bytes, args.repeat)
+                finally:
+                    shutil.rmtree(data_dir, ignore_errors=True)
+                results['scenarios'][name] = scenario
+                operations = '  '.join(
+                    f"{operation} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms"
+                    for operation, stats in scenario['operations'].items()
+                )
+                rss = scenario['peak_rss_bytes']
+                print(f"{name:<28} {operations}  peak_rss={rss // (1024 * 1024) if rss else '?'}MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No p50 regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+ListingLife Client Registry
+Keeps S3 and Dropbox clients (and their HTTP connection pools) alive across config changes
+
+Saving the settings page re-runs initialize_storage. Without this registry that
+built a new boto3 or Dropbox client each time, opening fresh TLS connections
+and re-checking the Dropbox account even when only an unrelated field changed.
+Clients are cached under a digest of the settings they were built from
+(credentials, region, pool size), so the same settings get the same warm client
+back, and a Dropbox account that was checked once is not checked again.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+MAX_POOL_SIZE = 100
+# Old tokens and credentials are dropped after this many newer clients
+MAX_CLIENTS = 8
+
+
+def settings_digest(*parts):
+    """Stable digest of client settings, so secrets are never kept as dictionary keys"""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """Backend clients cached by the settings they were built from
+
+    pool_size is the number of keep-alive connections each client holds open
+    (botocore's max_pool_connections, the Dropbox requests.Session adapter). It
+    should be at least the number of request threads, or requests queue for a
+    connection.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_clients=MAX_CLIENTS):
+        self.pool_size = pool_size
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()  # (kind, digest, pool size) -> entry, least recently used first
+        self._sessions = {}  # pool size -> shared requests.Session for Dropbox calls
+        self.stats = {'created': 0, 'reused': 0, 'evicted': 0, 'discarded': 0}
+
+    def configure(self, pool_size):
+        """Set the pool size for clients built from now on (existing clients keep theirs until evicted)"""
+        self.pool_size = max(1, min(int(pool_size), MAX_POOL_SIZE))
+
+    def _get(self, kind, digest, build):
+        key = (kind, digest, self.pool_size)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry:
+                self._clients.move_to_end(key)
+                entry['uses'] += 1
+                self.stats['reused'] += 1
+                return entry['client']
+        # Built outside the lock: importing an SDK and creating a client can take a while
+        client = build()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry:
+                return entry['client']  # Another thread built the same client meanwhile
+            self._clients[key] = {'client': client, 'verified': False, 'created': time.time(), 'uses': 1}
+            self.stats['created'] += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.stats['evicted'] += 1
+        logger.info(f"Created {kind} client (pool of {self.pool_size} connections)")
+        return client
+
+    def http_session(self, dropbox_module=None):
+        """The requests.Session shared by every Dropbox client and the token refresh call"""
+        with self._lock:
+            session = self._sessions.get(self.pool_size)
+            if session is not None:
+                return session
+        if dropbox_module is not None and hasattr(dropbox_module, 'create_session'):
+            # The SDK's own session pins Dropbox's certificates
+            session = dropbox_module.create_session(max_connections=self.pool_size)
+        else:
+            try:
+                import requests
+                from requests.adapters import HTTPAdapter
+            except ImportError:
+                return None
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        with self._lock:
+            return self._sessions.setdefault(self.pool_size, session)
+
+    def s3_client(self, access_key, secret_key, region):
+        """A boto3 S3 client for these credentials and region"""
+        def build():
+            import boto3
+            from botocore.config import Config
+            return boto3.client('s3',
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region,
+                config=Config(max_pool_connections=self.pool_size, tcp_keepalive=True)
+            )
+        return self._get('s3', settings_digest(access_key, secret_key, region), build)
+
+    def dropbox_client(self, dropbox_module, token):
+        """A Dropbox client for this access token, sharing the registry's HTTP session"""
+        def build():
+            session = self.http_session(dropbox_module)
+            if session is None:
+                return dropbox_module.Dropbox(token)
+            return dropbox_module.Dropbox(token, session=session)
+        return self._get('dropbox', settings_digest(token, id(dropbox_module)), build)
+
+    def _entry(self, client):
+        """The entry of a cached client (caller holds the lock)"""
+        for entry in self._clients.values():
+            if entry['client'] is client:
+                return entry
+        return None
+
+    def is_verified(self, client):
+        """True if the client's credentials were already checked against the service"""
+        with self._lock:
+            entry = self._entry(client)
+            return bool(entry and entry['verified'])
+
+    def mark_verified(self, client):
+        with self._lock:
+            entry = self._entry(client)
+            if entry:
+                entry['verified'] = True
+
+    def discard(self, client):
+        """Forget a client whose credentials were rejected, so the next lookup builds and checks a new one"""
+        with self._lock:
+            for key, entry in list(self._clients.items()):
+                if entry['client'] is client:
+                    del self._clients[key]
+                    self.stats['discarded'] += 1
+
+    def describe(self):
+        """Cached clients (without credentials) and reuse counts, for the health endpoint"""
+        with self._lock:
+            return dict(
+                self.stats,
+                pool_size=self.pool_size,
+                clients=[{'kind': kind, 'pool_size': pool_size, 'verified': entry['verified'], 'uses': entry['uses']}
+                         for (kind, _, pool_size), entry in self._clients.items()]
+            )
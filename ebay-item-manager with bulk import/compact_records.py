@@ -0,0 +1,539 @@
+"""
+ListingLife Compact Records
+Typed struct-of-arrays storage for the listing items, categories and sold items the server keeps in memory
+
+A parsed document holds every item as a dict, with a separate str object for
+each date, id and name, which costs around a kilobyte per item before any
+photo. A RecordTable stores each field of a record shape as one column
+instead: dates as epoch milliseconds in an array('q'), numbers in an
+array('d'), flags as one byte, numeric ids as 64-bit integers, category ids
+interned once in a Symbols table shared by all of a document's tables, and
+free text (names, descriptions, photo URLs) as UTF-8 in one buffer per column
+instead of a str object per value.
+
+Conversion is lossless: rows() rebuilds every record with its original key
+order, and anything a column cannot type exactly (a date in another format, a
+string price, a field the schema does not know, an entry that is not an
+object) is kept aside for that row as it was parsed.
+"""
+import copy
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY_MS = 86400 * 1000
+# Numbers beyond this lose precision as floats, so they stay raw
+MAX_EXACT_INT = 2 ** 53
+
+# Records the server keeps resident by default; a million take 100-150 MB against about 600 MB as dicts
+DEFAULT_MAX_RECORDS = 1_000_000
+# Other machines' writes to the same bucket or Dropbox do not change versions here, so documents are reloaded after this long
+DEFAULT_MAX_AGE = 300
+
+# Per-row codes every column keeps next to its values
+ABSENT, NULL, RAW, VALUE, DAY, MILLIS, SECONDS, INT, FLOAT, FALSE, TRUE = range(11)
+
+
+def encode_date(value):
+    """Return (code, epoch ms) for a 'YYYY-MM-DD' or toISOString() date, or None if it would not render back identically"""
+    if not isinstance(value, str) or len(value) not in (10, 20, 24):
+        return None
+    try:
+        ms = (date.fromisoformat(value[:10]).toordinal() - EPOCH_ORDINAL) * DAY_MS
+        if len(value) == 10:
+            code = DAY
+        else:
+            if value[10] != 'T' or value[-1] != 'Z':
+                return None
+            seconds = (int(value[11:13]) * 60 + int(value[14:16])) * 60 + int(value[17:19])
+            ms += seconds * 1000 + (int(value[20:23]) if len(value) == 24 else 0)
+            code = MILLIS if len(value) == 24 else SECONDS
+    except ValueError:
+        return None
+    return (code, ms) if render_date(code, ms) == value else None
+
+
+def render_date(code, ms):
+    """The date string encode_date() read"""
+    days, rest = divmod(ms, DAY_MS)
+    day = date.fromordinal(days + EPOCH_ORDINAL).isoformat()
+    if code == DAY:
+        return day
+    seconds, millis = divmod(rest, 1000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    if code == SECONDS:
+        return f"{day}T{hour:02d}:{minute:02d}:{second:02d}Z"
+    return f"{day}T{hour:02d}:{minute:02d}:{second:02d}.{millis:03d}Z"
+
+
+class Symbols:
+    """Intern table for repeated strings (category ids); columns store the index"""
+    __slots__ = ('index', 'values')
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Schema:
+    """The typed fields of a record shape, in their usual key order
+
+    A kind is 'text', 'symbol' (interned), 'key' (a numeric string id),
+    'date', 'number', 'flag', or another Schema for a list of nested records.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+
+
+class _Column:
+    """One field of every row: a code per row plus a value where the code needs one"""
+    __slots__ = ('codes', 'values')
+    placeholder = 0
+
+    def __init__(self, table):
+        self.codes = bytearray()
+        self.values = self.new_values()
+
+    def new_values(self):
+        return []
+
+    def add(self, value):
+        """Append a row's value; False when the column cannot hold it and the row keeps it raw"""
+        encoded = (NULL, self.placeholder) if value is None else self.encode(value)
+        if encoded is None:
+            self.skip(RAW)
+            return False
+        self.codes.append(encoded[0])
+        self.values.append(encoded[1])
+        return True
+
+    def skip(self, code):
+        self.codes.append(code)
+        self.values.append(self.placeholder)
+
+    def get(self, row):
+        code = self.codes[row]
+        return None if code == NULL else self.decode(code, self.values[row])
+
+    def nbytes(self):
+        return sys.getsizeof(self.codes) + sys.getsizeof(self.values)
+
+
+class _TextColumn(_Column):
+    """Strings as UTF-8 in one growing buffer, each row's value ending at its offset"""
+    __slots__ = ('data',)
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.data = bytearray()
+
+    def new_values(self):
+        return array('Q')
+
+    def add(self, value):
+        if not isinstance(value, str):
+            self.skip(NULL if value is None else RAW)
+            return value is None
+        # surrogatepass keeps lone surrogates a JSON \u escape can produce
+        self.data += value.encode('utf-8', 'surrogatepass')
+        self.codes.append(VALUE)
+        self.values.append(len(self.data))
+        return True
+
+    def skip(self, code):
+        self.codes.append(code)
+        self.values.append(len(self.data))
+
+    def get(self, row):
+        if self.codes[row] == NULL:
+            return None
+        start = self.values[row - 1] if row else 0
+        return self.data[start:self.values[row]].decode('utf-8', 'surrogatepass')
+
+    def nbytes(self):
+        return super().nbytes() + sys.getsizeof(self.data)
+
+
+class _SymbolColumn(_Column):
+    __slots__ = ('symbols',)
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.symbols = table.symbols
+
+    def new_values(self):
+        return array('I')
+
+    def encode(self, value):
+        return (VALUE, self.symbols.code(value)) if isinstance(value, str) else None
+
+    def decode(self, code, value):
+        return self.symbols.values[value]
+
+
+class _KeyColumn(_Column):
+    """Numeric string ids (Date.now() based) as integers; other ids go in a sparse side table"""
+    __slots__ = ('other',)
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.other = {}
+
+    def new_values(self):
+        return array('q')
+
+    def encode(self, value):
+        if not isinstance(value, str):
+            return None
+        if value.isdigit() and value.isascii() and len(value) < 19 and (value == '0' or value[0] != '0'):
+            return INT, int(value)
+        self.other[len(self.codes)] = value
+        return VALUE, 0
+
+    def get(self, row):
+        code = self.codes[row]
+        if code == INT:
+            return str(self.values[row])
+        return None if code == NULL else self.other[row]
+
+    def nbytes(self):
+        return super().nbytes() + sys.getsizeof(self.other) + sum(sys.getsizeof(value) for value in self.other.values())
+
+
+class _DateColumn(_Column):
+    __slots__ = ()
+
+    def new_values(self):
+        return array('q')
+
+    def encode(self, value):
+        return encode_date(value)
+
+    def decode(self, code, value):
+        return render_date(code, value)
+
+
+class _NumberColumn(_Column):
+    __slots__ = ()
+
+    def new_values(self):
+        return array('d')
+
+    def encode(self, value):
+        kind = type(value)
+        if kind is int and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+            return INT, value
+        if kind is float:
+            return FLOAT, value
+        return None
+
+    def decode(self, code, value):
+        return int(value) if code == INT else value
+
+
+class _FlagColumn(_Column):
+    __slots__ = ()
+
+    def new_values(self):
+        return _NoValues()
+
+    def encode(self, value):
+        if value is True:
+            return TRUE, None
+        if value is False:
+            return FALSE, None
+        return None
+
+    def decode(self, code, value):
+        return code == TRUE
+
+
+class _NoValues:
+    """Flags need only their code"""
+    __slots__ = ()
+
+    def append(self, value):
+        pass
+
+    def __getitem__(self, row):
+        return None
+
+
+class _ChildColumn(_Column):
+    """A list of nested records, as the range of rows it became in the child table"""
+    __slots__ = ('child', 'counts')
+
+    def __init__(self, table, schema):
+        super().__init__(table)
+        self.child = RecordTable(schema, table.symbols)
+        self.counts = array('I')
+
+    def new_values(self):
+        return array('q')
+
+    def add(self, value):
+        if not isinstance(value, list):
+            self.skip(NULL if value is None else RAW)
+            return value is None
+        self.codes.append(VALUE)
+        self.values.append(len(self.child))
+        self.counts.append(len(value))
+        for record in value:
+            self.child.append(record)
+        return True
+
+    def skip(self, code):
+        super().skip(code)
+        self.counts.append(0)
+
+    def get(self, row):
+        code = self.codes[row]
+        if code == NULL:
+            return None
+        start = self.values[row]
+        return [self.child.row(index) for index in range(start, start + self.counts[row])]
+
+    def nbytes(self):
+        return super().nbytes() + sys.getsizeof(self.counts) + self.child.nbytes()
+
+
+_COLUMN_TYPES = {
+    'text': _TextColumn,
+    'symbol': _SymbolColumn,
+    'key': _KeyColumn,
+    'date': _DateColumn,
+    'number': _NumberColumn,
+    'flag': _FlagColumn,
+}
+
+
+class RecordTable:
+    """Rows of one record shape stored column by column (see the module docstring)"""
+
+    def __init__(self, schema, symbols=None):
+        self.schema = schema
+        self.symbols = symbols if symbols is not None else Symbols()
+        self.columns = {}
+        for name, kind in schema.fields:
+            self.columns[name] = _ChildColumn(self, kind) if isinstance(kind, Schema) else _COLUMN_TYPES[kind](self)
+        # Key orders seen, shared by the rows that use them; None marks a row that is not an object
+        self._layouts = [None]
+        self._layout_codes = {}
+        self._unknown_fields = [()]
+        self._row_layouts = array('I')
+        # Row -> {field: value} for what no column could type, or the whole value of a non-object row
+        self._raw = {}
+
+    def __len__(self):
+        return len(self._row_layouts)
+
+    def append(self, record):
+        """Add a parsed JSON value as the next row; returns its row number"""
+        row = len(self._row_layouts)
+        if not isinstance(record, dict):
+            self._row_layouts.append(0)
+            self._raw[row] = copy.deepcopy(record)
+            for column in self.columns.values():
+                column.skip(ABSENT)
+            return row
+
+        layout = tuple(record)
+        code = self._layout_codes.get(layout)
+        if code is None:
+            code = self._layout_codes[layout] = len(self._layouts)
+            self._layouts.append(layout)
+            self._unknown_fields.append(tuple(name for name in layout if name not in self.columns))
+        self._row_layouts.append(code)
+
+        raw = None
+        for name, column in self.columns.items():
+            if name not in record:
+                column.skip(ABSENT)
+            elif not column.add(record[name]):
+                raw = raw or {}
+                raw[name] = copy.deepcopy(record[name])
+        for name in self._unknown_fields[code]:
+            raw = raw or {}
+            raw[name] = copy.deepcopy(record[name])
+        if raw:
+            self._raw[row] = raw
+        return row
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def row(self, row):
+        """The row as the JSON value it was added as (a new object each call)"""
+        layout = self._layouts[self._row_layouts[row]]
+        raw = self._raw.get(row)
+        if layout is None:
+            return copy.deepcopy(raw)
+        record = {}
+        for name in layout:
+            column = self.columns.get(name)
+            if column is None or column.codes[row] == RAW:
+                record[name] = copy.deepcopy(raw[name])
+            else:
+                record[name] = column.get(row)
+        return record
+
+    def rows(self):
+        return [self.row(index) for index in range(len(self))]
+
+    def column(self, name):
+        """A field's column, for reading its codes and typed values directly"""
+        return self.columns[name]
+
+    def record_count(self):
+        """Rows in this table and every nested table"""
+        return len(self) + sum(column.child.record_count() for column in self.columns.values()
+                               if isinstance(column, _ChildColumn))
+
+    def nbytes(self):
+        """Approximate memory held by the table, its nested tables and their values"""
+        size = sys.getsizeof(self._row_layouts) + sys.getsizeof(self._raw)
+        size += sum(column.nbytes() for column in self.columns.values())
+        # Raw values are rare; they are counted at their shallow size
+        size += sum(sys.getsizeof(value) for value in self._raw.values())
+        return size
+
+
+LISTING_CATEGORY = Schema(
+    ('averageDays', 'number'), ('createdAt', 'date'), ('updatedAt', 'date'),
+    ('description', 'text'), ('id', 'symbol'), ('name', 'text'),
+)
+LISTING_ITEM = Schema(
+    ('categoryId', 'symbol'), ('createdAt', 'date'), ('dateAdded', 'date'), ('description', 'text'),
+    ('duration', 'number'), ('id', 'key'), ('name', 'text'), ('note', 'text'), ('photo', 'text'),
+    ('endedDate', 'date'), ('manuallyEnded', 'flag'), ('soldDate', 'date'), ('soldPrice', 'number'),
+)
+SOLD_ITEM = Schema(
+    ('id', 'text'), ('label', 'text'), ('price', 'number'), ('photo', 'text'),
+    ('createdAt', 'date'), ('updatedAt', 'date'),
+)
+SOLD_SUBCATEGORY = Schema(
+    ('id', 'text'), ('name', 'text'), ('count', 'number'), ('price', 'number'), ('items', SOLD_ITEM),
+    ('createdAt', 'date'), ('updatedAt', 'date'),
+)
+SOLD_CATEGORY = Schema(
+    ('id', 'text'), ('name', 'text'), ('description', 'text'), ('createdAt', 'date'), ('updatedAt', 'date'),
+    ('subcategories', SOLD_SUBCATEGORY),
+)
+SOLD_PERIOD = Schema(
+    ('id', 'text'), ('name', 'text'), ('description', 'text'), ('categories', SOLD_CATEGORY),
+    ('createdAt', 'date'), ('updatedAt', 'date'),
+)
+
+# Document shapes by key prefix (a store's key is the prefix plus '_<store id>')
+DOCUMENT_SCHEMAS = {
+    'EbayListingLife': Schema(('categories', LISTING_CATEGORY), ('items', LISTING_ITEM)),
+    'SoldItemsTrends': Schema(('periods', SOLD_PERIOD), ('currentPeriodId', 'text')),
+}
+
+
+def document_schema(key):
+    """The schema for a storage key's document, or None for keys that are not record documents"""
+    return DOCUMENT_SCHEMAS.get(key.split('_', 1)[0])
+
+
+class CompactDocument:
+    """A whole document as a one-row RecordTable"""
+
+    def __init__(self, schema, document):
+        self.table = RecordTable(schema)
+        self.table.append(document)
+        self.records = self.table.record_count() - 1
+        symbols = self.table.symbols
+        self.size = self.table.nbytes() + sys.getsizeof(symbols.index) + sum(sys.getsizeof(value) for value in symbols.values)
+
+    def to_document(self):
+        return self.table.row(0)
+
+
+class RecordCache:
+    """Compact documents by key and document version, least recently used first out past max_records, each for max_age seconds"""
+
+    def __init__(self, max_records=0, max_age=DEFAULT_MAX_AGE):
+        self.max_records = max_records
+        self.max_age = max_age
+        self._entries = OrderedDict()  # key -> (version, loaded at, compact document)
+        self._records = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_records, max_age=DEFAULT_MAX_AGE):
+        with self._lock:
+            self.max_records = max(0, int(max_records))
+            self.max_age = float(max_age)
+            self._evict()
+
+    def get(self, key, version):
+        """The document cached at this version within max_age (a fresh copy), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or time.time() - entry[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[2].to_document()
+
+    def put(self, key, version, document, loaded=None):
+        """Cache a document loaded at loaded (a time.time() taken before the load; now if None)"""
+        schema = document_schema(key)
+        if schema is None or not self.max_records:
+            return
+        compact = CompactDocument(schema, document)
+        with self._lock:
+            self._discard(key)
+            if compact.records > self.max_records:
+                return
+            self._entries[key] = (version, time.time() if loaded is None else loaded, compact)
+            self._records += compact.records
+            self._evict()
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._records = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._records -= entry[2].records
+
+    def _evict(self):
+        while self._entries and self._records > self.max_records:
+            _, (_, _, compact) = self._entries.popitem(last=False)
+            self._records -= compact.records
+
+    def describe(self):
+        with self._lock:
+            return {
+                'documents': len(self._entries),
+                'records': self._records,
+                'max_records': self.max_records,
+                'max_age_seconds': self.max_age,
+                'bytes': sum(compact.size for _, _, compact in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,86 @@
+"""
+ListingLife Data Export
+Generators that turn stored documents into NDJSON or CSV record streams
+"""
+import csv
+import io
+import json
+import zlib
+
+CSV_COLUMNS = [
+    'type', 'store', 'id', 'name', 'category', 'subcategory', 'period',
+    'dateAdded', 'duration', 'endedDate', 'soldDate', 'price', 'photo', 'note'
+]
+
+# Output is handed to the server in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+
+
+def _dicts(container, field):
+    """The dict elements of container[field], skipping anything else a damaged document holds"""
+    values = container.get(field) if isinstance(container, dict) else None
+    return (value for value in values if isinstance(value, dict)) if isinstance(values, list) else ()
+
+
+def iter_listing_records(store_id, document):
+    """Yield one export record per listing item; the record's own fields win over the item's"""
+    category_names = {category.get('id'): category.get('name') for category in _dicts(document, 'categories')}
+    for item in _dicts(document, 'items'):
+        yield {**item, 'type': 'item', 'store': store_id, 'category': category_names.get(item.get('categoryId'))}
+
+
+def iter_sold_records(store_id, document):
+    """Yield one export record per sold item across all periods; the record's own fields win over the item's"""
+    for period in _dicts(document, 'periods'):
+        for category in _dicts(period, 'categories'):
+            for subcategory in _dicts(category, 'subcategories'):
+                for item in _dicts(subcategory, 'items'):
+                    yield {
+                        **item,
+                        'type': 'sold_item',
+                        'store': store_id,
+                        'period': period.get('name'),
+                        'category': category.get('name'),
+                        'subcategory': subcategory.get('name'),
+                    }
+
+
+def _csv_row(record):
+    """Map a record onto the fixed CSV column order"""
+    row = dict(record)
+    row.setdefault('name', record.get('label'))
+    row.setdefault('price', record.get('soldPrice'))
+    return ['' if row.get(column) is None else row.get(column) for column in CSV_COLUMNS]
+
+
+def encode_records(records, export_format):
+    """Encode records as NDJSON lines or CSV rows, yielding bytes in CHUNK_SIZE pieces"""
+    buffer = io.StringIO()
+    writer = None
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+
+    for record in records:
+        if writer:
+            writer.writerow(_csv_row(record))
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            buffer.write('\n')
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a byte-chunk stream into a single gzip member on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,162 @@
+"""
+ListingLife Document Shards
+Splits a store's listing and sold-items documents into a manifest plus one object per category or sold period
+
+EbayListingLife_<store> ({"categories": [...], "items": [...]}) is stored as one
+shard per category holding the category and its items, plus a shard for items
+whose category is not in the list. SoldItemsTrends_<store> ({"periods": [...]})
+is stored as one shard per period. The manifest, saved under the document's own
+key, lists the shards in order and keeps every other field, so the document is
+rebuilt exactly as it was written.
+
+Shard keys end with a digest of their content. A changed category or period is
+written under a new key and the old one is deleted only after the manifest
+points at the new one, so a reader (or a crash) between the two writes always
+sees a complete document, and unchanged shards are never written again.
+"""
+import hashlib
+import json
+import re
+
+MANIFEST_MARKER = '__listinglife_shards__'
+MANIFEST_VERSION = 1
+SHARD_SEPARATOR = '~'
+SHARDED_DOCUMENTS = ('EbayListingLife', 'SoldItemsTrends')
+# Shard of the items whose categoryId matches no category
+LOOSE_SHARD_ID = '_uncategorized'
+
+
+class ShardError(Exception):
+    pass
+
+
+def is_sharded_key(key):
+    """True for the documents stored as shards (EbayListingLife[_<store>], SoldItemsTrends[_<store>])"""
+    if SHARD_SEPARATOR in key:
+        return False
+    base = key.split('_', 1)[0]
+    return base in SHARDED_DOCUMENTS
+
+
+def is_shard_key(key):
+    return SHARD_SEPARATOR in key
+
+
+def is_manifest(value):
+    return isinstance(value, dict) and value.get(MANIFEST_MARKER) == MANIFEST_VERSION
+
+
+def content_digest(value):
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def make_shard_key(key, shard_id, value):
+    """<document key>~<category or period id>~<content digest>"""
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(shard_id))[:48]
+    return f"{key}{SHARD_SEPARATOR}{safe_id}{SHARD_SEPARATOR}{content_digest(value)[:16]}"
+
+
+def shard_keys(manifest):
+    """Every shard key a manifest refers to"""
+    keys = list(manifest.get('shards', []))
+    if manifest.get('loose'):
+        keys.append(manifest['loose'])
+    return keys
+
+
+def split_document(key, document):
+    """Return (manifest, {shard key: shard value}), or None if the document does not have the expected shape"""
+    if not isinstance(document, dict):
+        return None
+    if key.split('_', 1)[0] == 'EbayListingLife':
+        return _split_listings(key, document)
+    return _split_sold(key, document)
+
+
+def _manifest(kind, document, split_fields):
+    return {
+        MANIFEST_MARKER: MANIFEST_VERSION,
+        'kind': kind,
+        'fields': list(document),
+        'extra': {field: value for field, value in document.items() if field not in split_fields}
+    }
+
+
+def _split_listings(key, document):
+    categories = document.get('categories')
+    items = document.get('items')
+    if not isinstance(categories, list) or not isinstance(items, list):
+        return None
+
+    position_by_id = {}
+    for position, category in enumerate(categories):
+        category_id = category.get('id') if isinstance(category, dict) else None
+        if isinstance(category_id, (str, int)):
+            position_by_id.setdefault(category_id, position)
+
+    loose = len(categories)
+    groups = [[] for _ in range(loose + 1)]
+    # Which group each item came from, run-length encoded, so the original item order survives
+    order = []
+    for item in items:
+        category_id = item.get('categoryId') if isinstance(item, dict) else None
+        group = position_by_id.get(category_id, loose) if isinstance(category_id, (str, int)) else loose
+        groups[group].append(item)
+        if order and order[-1][0] == group:
+            order[-1][1] += 1
+        else:
+            order.append([group, 1])
+
+    shards = {}
+    manifest = _manifest('listings', document, ('categories', 'items'))
+    manifest['shards'] = []
+    for position, category in enumerate(categories):
+        value = {'category': category, 'items': groups[position]}
+        shard_id = category.get('id', position) if isinstance(category, dict) else position
+        shard_key = make_shard_key(key, shard_id, value)
+        shards[shard_key] = value
+        manifest['shards'].append(shard_key)
+    manifest['loose'] = None
+    if groups[loose]:
+        value = {'category': None, 'items': groups[loose]}
+        manifest['loose'] = make_shard_key(key, LOOSE_SHARD_ID, value)
+        shards[manifest['loose']] = value
+    manifest['order'] = order
+    return manifest, shards
+
+
+def _split_sold(key, document):
+    periods = document.get('periods')
+    if not isinstance(periods, list):
+        return None
+    shards = {}
+    manifest = _manifest('sold', document, ('periods',))
+    manifest['shards'] = []
+    for position, period in enumerate(periods):
+        shard_id = period.get('id', position) if isinstance(period, dict) else position
+        shard_key = make_shard_key(key, shard_id, period)
+        shards[shard_key] = period
+        manifest['shards'].append(shard_key)
+    return manifest, shards
+
+
+def assemble_document(key, manifest, shards):
+    """Rebuild the document a manifest describes from {shard key: value}; raises ShardError if a shard is missing"""
+    missing = [shard_key for shard_key in shard_keys(manifest) if shards.get(shard_key) is None]
+    if missing:
+        raise ShardError(f"{key} is missing {len(missing)} shard(s), e.g. {missing[0]}")
+
+    if manifest['kind'] == 'listings':
+        category_shards = [shards[shard_key] for shard_key in manifest['shards']]
+        groups = [iter(shard['items']) for shard in category_shards]
+        groups.append(iter(shards[manifest['loose']]['items'] if manifest.get('loose') else []))
+        try:
+            items = [next(groups[group]) for group, count in manifest['order'] for _ in range(count)]
+        except StopIteration:
+            raise ShardError(f"{key} shards do not match its manifest")
+        parts = {'categories': [shard['category'] for shard in category_shards], 'items': items}
+    else:
+        parts = {'periods': [shards[shard_key] for shard_key in manifest['shards']]}
+
+    return {field: parts[field] if field in parts else manifest['extra'][field] for field in manifest['fields']}
@@ -8,9 +8,63 @@ import sys
 import subprocess
 import os
 import platform
+import json
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# The interpreter found on the last launch, so later launches skip probing and the pip check
+CACHE_FILE = os.path.join(SCRIPT_DIR, '.python_interpreter.json')
+REQUIREMENTS_FILE = os.path.join(SCRIPT_DIR, 'requirements.txt')
+
+# One subprocess per candidate: checks the version and reports the real executable
+PROBE_SCRIPT = (
+    'import sys; '
+    'sys.exit(1) if sys.version_info < (3, 7) else None; '
+    'print(sys.executable); print("Python " + sys.version.split()[0])'
+)
+
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def load_cached_interpreter():
+    """Return (executable, version, dependencies_ok) from the cache, or None if it is stale"""
+    try:
+        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    executable = cached.get('executable')
+    # A reinstalled or upgraded Python changes the executable's mtime
+    if not executable or file_mtime(executable) != cached.get('executable_mtime'):
+        return None
+    dependencies_ok = cached.get('dependencies_ok') and file_mtime(REQUIREMENTS_FILE) == cached.get('requirements_mtime')
+    return executable, cached.get('version'), bool(dependencies_ok)
+
+def save_cached_interpreter(executable, version, dependencies_ok):
+    try:
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'executable': executable,
+                'executable_mtime': file_mtime(executable),
+                'version': version,
+                'dependencies_ok': dependencies_ok,
+                'requirements_mtime': file_mtime(REQUIREMENTS_FILE)
+            }, f, indent=2)
+    except OSError:
+        pass  # Caching is only an optimization
 
 def find_python_command():
-    """Find any available Python 3.x command"""
+    """Find any available Python 3.x command
+
+    Returns the interpreter's full executable path (so a cached result does not
+    depend on PATH) and its version string.
+    """
+    # This launcher is already running on Python 3; use it unless it is too old
+    if sys.version_info >= (3, 7) and sys.executable:
+        return sys.executable, f"Python {sys.version.split()[0]}"
+    
     # List of possible Python commands to try
     python_commands = [
         'python3',
@@ -28,28 +82,15 @@ def find_python_command():
     # Try each command
     for cmd in python_commands:
         try:
-            # Check if command exists and is Python 3.x
             result = subprocess.run(
-                [cmd, '--version'],
+                [cmd, '-c', PROBE_SCRIPT],
                 capture_output=True,
                 text=True,
                 timeout=2
             )
-            if result.returncode == 0:
-                version_output = result.stdout.strip() or result.stderr.strip()
-                # Check if it's Python 3.x
-                if 'Python 3.' in version_output:
-                    # Verify it can import required modules
-                    try:
-                        check_result = subprocess.run(
-                            [cmd, '-c', 'import sys; sys.exit(0 if sys.version_info >= (3, 7) else 1)'],
-                            capture_output=True,
-                            timeout=2
-                        )
-                        if check_result.returncode == 0:
-                            return cmd, version_output
-                    except:
-                        continue
+            lines = result.stdout.strip().splitlines()
+            if result.returncode == 0 and len(lines) == 2:
+                return lines[0], lines[1]
         except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
             continue
     
@@ -57,7 +98,12 @@ def find_python_command():
 
 def main():
     """Main entry point"""
-    python_cmd, version = find_python_command()
+    cached = load_cached_interpreter()
+    if cached:
+        python_cmd, version, dependencies_ok = cached
+    else:
+        python_cmd, version = find_python_command()
+        dependencies_ok = False
     
     if not python_cmd:
         print("=" * 60)
@@ -85,35 +131,39 @@ def main():
     print(f"Version: {version}")
     print()
     
-    # Check if requirements are installed
-    print("Checking dependencies...")
-    try:
-        result = subprocess.run(
-            [python_cmd, '-m', 'pip', 'show', 'flask'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode != 0:
-            print("Installing dependencies...")
-            subprocess.run(
-                [python_cmd, '-m', 'pip', 'install', '--upgrade', 'pip'],
-                check=False
-            )
-            subprocess.run(
-                [python_cmd, '-m', 'pip', 'install', '-r', 'requirements.txt'],
-                check=True
+    # Check if requirements are installed (skipped while the cached check is still valid)
+    if not dependencies_ok:
+        print("Checking dependencies...")
+        try:
+            result = subprocess.run(
+                [python_cmd, '-c', 'import flask, flask_cors'],
+                capture_output=True,
+                timeout=10
             )
-    except subprocess.TimeoutExpired:
-        print("WARNING: Dependency check timed out, continuing anyway...")
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Failed to install dependencies: {e}")
-        print()
-        print("Try running install_requirements.bat (Windows) or install_requirements.sh (Mac/Linux) first")
-        input("Press Enter to exit...")
-        sys.exit(1)
-    except FileNotFoundError:
-        print("WARNING: pip not found, trying to continue anyway...")
+            if result.returncode != 0:
+                print("Installing dependencies...")
+                subprocess.run(
+                    [python_cmd, '-m', 'pip', 'install', '--upgrade', 'pip'],
+                    check=False
+                )
+                subprocess.run(
+                    [python_cmd, '-m', 'pip', 'install', '-r', REQUIREMENTS_FILE],
+                    check=True
+                )
+            dependencies_ok = True
+        except subprocess.TimeoutExpired:
+            print("WARNING: Dependency check timed out, continuing anyway...")
+        except subprocess.CalledProcessError as e:
+            print(f"ERROR: Failed to install dependencies: {e}")
+            print()
+            print("Try running install_requirements.bat (Windows) or install_requirements.sh (Mac/Linux) first")
+            input("Press Enter to exit...")
+            sys.exit(1)
+        except FileNotFoundError:
+            print("WARNING: pip not found, trying to continue anyway...")
+    
+    if not cached or not cached[2]:
+        save_cached_interpreter(python_cmd, version, dependencies_ok)
     
     print()
     print("Starting storage server...")
@@ -122,7 +172,7 @@ def main():
     
     # Run the storage server
     try:
-        subprocess.run([python_cmd, 'storage_server.py'], check=True)
+        subprocess.run([python_cmd, os.path.join(SCRIPT_DIR, 'storage_server.py')], check=True, cwd=SCRIPT_DIR)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except subprocess.CalledProcessError as e:
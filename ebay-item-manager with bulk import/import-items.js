@@ -114,8 +114,13 @@ class ImportItemsManager {
         this.showImportStatus('Processing file...', 'info');
 
         try {
-            const items = await this.parseFile(file);
-            if (items && items.length > 0) {
+            const parsed = await this.parseFile(file);
+            const { items, skippedCount } = await this.removeDuplicateImports(parsed || []);
+            if (skippedCount > 0 && items.length === 0) {
+                this.showImportStatus(`All ${skippedCount} item(s) are already imported or listed`, 'warning');
+                this.importFileInput.value = '';
+                this.importFileName.textContent = '';
+            } else if (items.length > 0) {
                 // Add items to imported list
                 items.forEach(item => {
                     if (!item.id) {
@@ -129,7 +134,8 @@ class ImportItemsManager {
                 this.importedItems.push(...items);
                 this.saveImportedItems();
                 this.renderImportedItems();
-                this.showImportStatus(`Successfully imported ${items.length} item(s)`, 'success');
+                const skippedMsg = skippedCount > 0 ? ` (${skippedCount} duplicate(s) skipped)` : '';
+                this.showImportStatus(`Successfully imported ${items.length} item(s)${skippedMsg}`, 'success');
                 
                 // Clear file input
                 this.importFileInput.value = '';
@@ -143,6 +149,53 @@ class ImportItemsManager {
         }
     }
 
+    async removeDuplicateImports(items) {
+        // The storage server checks the batch against its hash index of imported and listed items for this store
+        if (!window.storageWrapper || !window.storageWrapper.useBackend || !window.storageWrapper.backendAvailable || items.length === 0) {
+            return { items, skippedCount: 0 };
+        }
+
+        try {
+            const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+
+            const response = await fetch(`http://127.0.0.1:5000/api/import/dedupe`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ store: storeId, targets: ['ImportedItems', 'EbayListingLife'], items }),
+                signal: controller.signal
+            });
+
+            clearTimeout(timeoutId);
+
+            if (!response.ok) {
+                return { items, skippedCount: 0 };
+            }
+            const report = await response.json();
+            const skippedIndexes = new Set(report.skipped.map(entry => entry.index));
+            // Rows matching an item still waiting here refresh it instead of duplicating it
+            report.updated.forEach(entry => {
+                const existing = this.importedItems.find(item => item.id === entry.existing_id);
+                if (existing) {
+                    Object.assign(existing, items[entry.index], { id: existing.id, createdAt: existing.createdAt });
+                    skippedIndexes.add(entry.index);
+                }
+            });
+            return {
+                items: items.filter((item, index) => !skippedIndexes.has(index)),
+                skippedCount: skippedIndexes.size
+            };
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Could not check import duplicates on server:', error.message);
+            }
+            return { items, skippedCount: 0 };
+        }
+    }
+
     async parseFile(file) {
         const fileName = file.name.toLowerCase();
         const fileExtension = fileName.split('.').pop();
@@ -0,0 +1,114 @@
+"""
+ListingLife Import Deduplication
+Hash index of normalized item identity used to dedupe bulk imports in O(batch)
+"""
+import hashlib
+import re
+
+# Field names the import parsers and stored documents use for the same facts
+ID_FIELDS = ('ebayItemId', 'itemNumber', 'itemId', 'ebay_item_id')
+TITLE_FIELDS = ('name', 'label', 'title')
+# soldPrice is a sale outcome rather than part of a listing's identity
+PRICE_FIELDS = ('price',)
+DATE_FIELDS = ('dateAdded', 'soldDate', 'date')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _first(item, fields):
+    """Return the first non-empty value among the given fields"""
+    for field in fields:
+        value = item.get(field)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def normalize_title(title):
+    """Case- and whitespace-insensitive form of an item title"""
+    return _WHITESPACE.sub(' ', str(title or '')).strip().lower()
+
+
+def normalize_price(price):
+    """Prices compare at penny precision whether they arrive as numbers or strings"""
+    if price in (None, ''):
+        return ''
+    try:
+        return f"{abs(float(str(price).replace(',', '').lstrip('£$€'))):.2f}"
+    except ValueError:
+        return str(price).strip()
+
+
+def item_identity(item):
+    """Return (identity hash, content hash) for an item or import row
+
+    The identity is the eBay item id when the row carries one, otherwise a
+    hash of the normalized title, price and date. The content hash lets a
+    re-imported row with a known eBay id be told apart as unchanged or updated.
+    """
+    title = normalize_title(_first(item, TITLE_FIELDS))
+    price = normalize_price(_first(item, PRICE_FIELDS))
+    day = str(_first(item, DATE_FIELDS) or '')[:10]
+    signature = f"{title}|{price}|{day}"
+    content_hash = hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+    ebay_id = _first(item, ID_FIELDS)
+    if ebay_id is not None:
+        return f"ebay:{str(ebay_id).strip()}", content_hash
+    return f"sig:{content_hash}", content_hash
+
+
+def document_items(document):
+    """Return the flat item list of a listing, imported or pending document"""
+    if isinstance(document, list):
+        return document
+    if isinstance(document, dict):
+        return document.get('items') or []
+    return []
+
+
+class ImportIdentityIndex:
+    """Identity -> (item id, content hash) for every item already stored under one key"""
+
+    def __init__(self, document):
+        self.identities = {}
+        for item in document_items(document):
+            if isinstance(item, dict):
+                identity, content_hash = item_identity(item)
+                self.identities.setdefault(identity, (item.get('id'), content_hash))
+
+    def lookup(self, identity):
+        """Return (item id, content hash) of the stored item with this identity, or None"""
+        return self.identities.get(identity)
+
+
+def dedupe_rows(rows, indexes):
+    """Classify import rows as new, updated or skipped against one or more indexes
+
+    Rows repeating an identity seen earlier in the same batch are skipped,
+    so a file with internal repeats only adds each item once.
+    """
+    report = {'new': [], 'updated': [], 'skipped': []}
+    seen_in_batch = set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            report['skipped'].append({'index': index, 'reason': 'invalid_row'})
+            continue
+        identity, content_hash = item_identity(row)
+        if identity in seen_in_batch:
+            report['skipped'].append({'index': index, 'reason': 'duplicate_in_batch'})
+            continue
+        seen_in_batch.add(identity)
+
+        existing = None
+        for identity_index in indexes:
+            existing = identity_index.lookup(identity)
+            if existing is not None:
+                break
+        if existing is None:
+            report['new'].append(index)
+        elif existing[1] == content_hash:
+            report['skipped'].append({'index': index, 'existing_id': existing[0], 'reason': 'already_stored'})
+        else:
+            report['updated'].append({'index': index, 'existing_id': existing[0]})
+    return report
@@ -0,0 +1,278 @@
+"""
+ListingLife Listing Statistics
+Computes per-category time-to-sale distributions from EbayListingLife documents
+
+store_partial() reduces one store's listing and sold-items documents to totals
+that add up across stores: counts, revenue, and time-to-sale as a histogram of
+days rather than a list, so percentiles of the merged histogram are exact.
+Partials are plain dicts, cheap to pass between processes and to cache.
+"""
+from collections import Counter
+from datetime import date
+import math
+
+# Below this many sold items a category keeps its hand-entered averageDays
+MIN_SAMPLES_FOR_SUGGESTION = 3
+
+
+def parse_day(value):
+    """Convert a 'YYYY-MM-DD' or ISO timestamp string to a day ordinal (None if invalid)"""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def percentile(sorted_values, fraction):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return float(sorted_values[lower])
+    weight = position - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+def parse_price(value):
+    """A sale price as a float (None if missing or not a number)"""
+    if isinstance(value, str):
+        value = value.strip().lstrip('$').replace(',', '')
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if math.isfinite(price) else None
+
+
+def histogram_percentile(histogram, fraction):
+    """percentile() of the values a {value: count} histogram stands for"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    position = (total - 1) * fraction
+    lower, upper = math.floor(position), math.ceil(position)
+    lower_value = upper_value = None
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if lower_value is None and lower < seen:
+            lower_value = value
+        if upper < seen:
+            upper_value = value
+            break
+    if lower == upper:
+        return float(lower_value)
+    weight = position - lower
+    return lower_value * (1 - weight) + upper_value * weight
+
+
+def extract_columns(document, today=None):
+    """Flatten a listing document's items into per-category columns
+
+    One pass over the items produces, for every category id, the list of
+    time-to-sale samples (in days) plus sold/ended/active counters, so the
+    distribution maths below runs over plain lists instead of item dicts.
+    """
+    today = today or date.today().toordinal()
+    columns = {}
+    for item in (document or {}).get('items') or []:
+        if not isinstance(item, dict):
+            continue
+        category_id = item.get('categoryId')
+        if category_id is None:
+            continue
+        column = columns.get(category_id)
+        if column is None:
+            column = columns[category_id] = {'samples': [], 'sold': 0, 'ended_unsold': 0, 'active': 0, 'revenue': 0.0, 'priced': 0}
+
+        added = parse_day(item.get('dateAdded'))
+        sold_day = parse_day(item.get('soldDate'))
+        is_sold = sold_day is not None or item.get('soldPrice') is not None
+        if is_sold:
+            column['sold'] += 1
+            price = parse_price(item.get('soldPrice'))
+            if price is not None:
+                column['revenue'] += price
+                column['priced'] += 1
+            if sold_day is None:
+                sold_day = parse_day(item.get('endedDate'))
+            if added is not None and sold_day is not None and sold_day >= added:
+                column['samples'].append(sold_day - added)
+            continue
+
+        ended = item.get('manuallyEnded') or parse_day(item.get('endedDate')) is not None
+        if not ended and added is not None:
+            duration = item.get('duration') or 30
+            try:
+                ended = added + int(duration) <= today
+            except (TypeError, ValueError):
+                ended = False
+        if ended:
+            column['ended_unsold'] += 1
+        else:
+            column['active'] += 1
+    return columns
+
+
+def summarize_column(column, average_days=None):
+    """Reduce one category column to its distribution summary"""
+    samples = sorted(column['samples'])
+    finished = column['sold'] + column['ended_unsold']
+    median = percentile(samples, 0.5)
+    suggested_days = None
+    if len(samples) >= MIN_SAMPLES_FOR_SUGGESTION:
+        suggested_days = max(1, math.ceil(median))
+    return {
+        'listed': finished + column['active'],
+        'sold': column['sold'],
+        'ended_unsold': column['ended_unsold'],
+        'active': column['active'],
+        'sell_through_rate': round(column['sold'] / finished, 4) if finished else None,
+        'time_to_sale': {
+            'samples': len(samples),
+            'median': median,
+            'p25': percentile(samples, 0.25),
+            'p75': percentile(samples, 0.75),
+            'mean': round(sum(samples) / len(samples), 2) if samples else None,
+        },
+        'average_days': average_days,
+        'suggested_days': suggested_days,
+    }
+
+
+def compute_lifetime_stats(document, today=None):
+    """Compute per-category lifetime stats for one EbayListingLife document"""
+    document = document or {}
+    columns = extract_columns(document, today)
+    empty_column = {'samples': [], 'sold': 0, 'ended_unsold': 0, 'active': 0}
+    categories = {}
+    for category in document.get('categories') or []:
+        if not isinstance(category, dict) or category.get('id') is None:
+            continue
+        summary = summarize_column(columns.get(category['id'], empty_column), category.get('averageDays'))
+        summary['name'] = category.get('name')
+        categories[category['id']] = summary
+    # Items whose category was deleted are still counted so totals stay honest
+    orphaned = [column for category_id, column in columns.items() if category_id not in categories]
+    totals = {'sold': 0, 'ended_unsold': 0, 'active': 0, 'samples': []}
+    for column in columns.values():
+        totals['sold'] += column['sold']
+        totals['ended_unsold'] += column['ended_unsold']
+        totals['active'] += column['active']
+        totals['samples'].extend(column['samples'])
+    return {
+        'categories': categories,
+        'orphaned_categories': len(orphaned),
+        'overall': summarize_column(totals),
+    }
+
+
+def sold_totals(document):
+    """Items sold and money made per period of a SoldItemsTrends document, counted as the sold page does
+
+    A subcategory with items counts them and adds up their prices; one without
+    items counts its count times its price.
+    """
+    periods = {}
+    for period in (document or {}).get('periods') or []:
+        if not isinstance(period, dict):
+            continue
+        sold, made = 0, 0.0
+        for category in period.get('categories') or []:
+            for subcategory in (category.get('subcategories') or []) if isinstance(category, dict) else []:
+                if not isinstance(subcategory, dict):
+                    continue
+                items = [item for item in subcategory.get('items') or [] if isinstance(item, dict)]
+                if items:
+                    sold += len(items)
+                    made += sum(price for price in map(parse_price, (item.get('price') for item in items)) if price is not None)
+                    continue
+                count = subcategory.get('count')
+                count = count if isinstance(count, int) and not isinstance(count, bool) else 0
+                sold += count
+                price = parse_price(subcategory.get('price'))
+                if price is not None:
+                    made += count * price
+        name = str(period.get('name') or period.get('id') or 'Unnamed')
+        totals = periods.setdefault(name, {'sold': 0, 'revenue': 0.0})
+        totals['sold'] += sold
+        totals['revenue'] += made
+    return periods
+
+
+def empty_partial():
+    return {
+        'stores': 0, 'categories': 0, 'sold': 0, 'ended_unsold': 0, 'active': 0,
+        'time_to_sale': Counter(), 'listing_revenue': 0.0, 'priced_sales': 0, 'periods': {},
+    }
+
+
+def store_partial(listing_document, sold_document, today=None):
+    """Reduce one store's EbayListingLife and SoldItemsTrends documents to a partial for merge_partials()"""
+    partial = empty_partial()
+    partial['stores'] = 1
+    partial['categories'] = sum(1 for category in (listing_document or {}).get('categories') or [] if isinstance(category, dict))
+    for column in extract_columns(listing_document, today).values():
+        partial['sold'] += column['sold']
+        partial['ended_unsold'] += column['ended_unsold']
+        partial['active'] += column['active']
+        partial['listing_revenue'] += column['revenue']
+        partial['priced_sales'] += column['priced']
+        partial['time_to_sale'].update(column['samples'])
+    partial['periods'] = sold_totals(sold_document)
+    return partial
+
+
+def merge_partials(partials):
+    """Add store partials together"""
+    merged = empty_partial()
+    for partial in partials:
+        for field in ('stores', 'categories', 'sold', 'ended_unsold', 'active', 'listing_revenue', 'priced_sales'):
+            merged[field] += partial[field]
+        merged['time_to_sale'].update(partial['time_to_sale'])
+        for name, totals in partial['periods'].items():
+            period = merged['periods'].setdefault(name, {'sold': 0, 'revenue': 0.0})
+            period['sold'] += totals['sold']
+            period['revenue'] += totals['revenue']
+    return merged
+
+
+def summarize_partial(partial):
+    """The report for a partial of one store or of several merged"""
+    finished = partial['sold'] + partial['ended_unsold']
+    histogram = partial['time_to_sale']
+    samples = sum(histogram.values())
+    periods = {name: {'sold': totals['sold'], 'revenue': round(totals['revenue'], 2)}
+               for name, totals in partial['periods'].items()}
+    recorded_revenue = sum(totals['revenue'] for totals in partial['periods'].values())
+    recorded_sold = sum(totals['sold'] for totals in partial['periods'].values())
+    return {
+        'stores': partial['stores'],
+        'categories': partial['categories'],
+        'listed': finished + partial['active'],
+        'sold': partial['sold'],
+        'ended_unsold': partial['ended_unsold'],
+        'active': partial['active'],
+        'sell_through_rate': round(partial['sold'] / finished, 4) if finished else None,
+        'time_to_sale': {
+            'samples': samples,
+            'median': histogram_percentile(histogram, 0.5),
+            'p25': histogram_percentile(histogram, 0.25),
+            'p75': histogram_percentile(histogram, 0.75),
+            'mean': round(sum(days * count for days, count in histogram.items()) / samples, 2) if samples else None,
+        },
+        'revenue': {
+            # soldPrice on tracked listings, and the sold-items log (which also holds sales never tracked as listings)
+            'listings': round(partial['listing_revenue'], 2),
+            'listings_priced': partial['priced_sales'],
+            'average_sale_price': round(partial['listing_revenue'] / partial['priced_sales'], 2) if partial['priced_sales'] else None,
+            'recorded': round(recorded_revenue, 2),
+            'recorded_sold': recorded_sold,
+        },
+        'periods': periods,
+    }
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+ListingLife Load Generator
+Replays the browser's storage traffic from many simulated tabs against a running storage server
+
+Each tab follows storage-wrapper.js: a health check and the page's initial
+loads, the delayed first sync (a /get per key, then one /sync of the keys the
+server did not have), health checks every 30 seconds, and a full-document
+/set after every edit from the listings, sold-trends and pending pages.
+
+The generator writes to keys named after `loadtest-*` stores and removes them
+afterwards (unless --keep-data), but it still talks to the server's real
+storage backend, so point it at a test instance when using cloud or Dropbox.
+
+Usage:
+    python load_generator.py --clients 8 --duration 60
+    python load_generator.py --steps 1,2,4,8,16,32 --duration 20 --items 5000 --think-time 0.5
+"""
+import argparse
+import copy
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from synthetic_data import make_listing_document, make_sold_document, DEFAULT_PHOTO_BYTES
+from listing_stats import percentile
+
+DEFAULT_URL = 'http://127.0.0.1:5000'
+HEALTH_INTERVAL = 30.0       # storage-wrapper.js startHealthCheck()
+INITIAL_SYNC_DELAY = 2.0     # storage-wrapper.js delays the first sync by 2 seconds
+REQUEST_TIMEOUT = 30.0
+# Which page produced an edit, by how often each one saves in normal use
+SAVE_MIX = (('EbayListingLife', 0.6), ('SoldItemsTrends', 0.3), ('PendingItems', 0.1))
+NOTE_MARKER = '__LOADTEST_NOTE__'
+# A step whose throughput grows by less than this over the previous one is saturated
+SATURATION_GAIN = 0.05
+
+
+class Recorder:
+    """Latency samples and error counts per request type, shared by all tabs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, operation, seconds, ok):
+        with self._lock:
+            if ok:
+                self.samples.setdefault(operation, []).append(seconds)
+            else:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def report(self, elapsed):
+        """Per-operation and overall throughput and latency percentiles"""
+        with self._lock:
+            operations = {}
+            all_samples = []
+            for operation in sorted(set(self.samples) | set(self.errors)):
+                ordered = sorted(self.samples.get(operation, []))
+                all_samples.extend(ordered)
+                operations[operation] = {
+                    'requests': len(ordered),
+                    'errors': self.errors.get(operation, 0),
+                    'p50_ms': round(percentile(ordered, 0.5) * 1000, 2) if ordered else None,
+                    'p95_ms': round(percentile(ordered, 0.95) * 1000, 2) if ordered else None,
+                    'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+                    'max_ms': round(ordered[-1] * 1000, 2) if ordered else None,
+                }
+            all_samples.sort()
+            return {
+                'requests': len(all_samples),
+                'errors': sum(self.errors.values()),
+                'throughput_rps': round(len(all_samples) / elapsed, 2) if elapsed else None,
+                'p50_ms': round(percentile(all_samples, 0.5) * 1000, 2) if all_samples else None,
+                'p99_ms': round(percentile(all_samples, 0.99) * 1000, 2) if all_samples else None,
+                'operations': operations,
+            }
+
+
+class StoreDocuments:
+    """Pre-encoded documents of one synthetic store
+
+    Saves send the whole document, as the browser does. Encoding a large
+    document for every request would make the generator the bottleneck, so
+    each document is encoded once around a marker and every save only
+    substitutes a fresh note into the pre-encoded halves.
+    """
+
+    def __init__(self, store_id, item_count, photos, photo_bytes, seed):
+        self.store_id = store_id
+        listing = make_listing_document(item_count, photos, photo_bytes, seed=seed)
+        sold = make_sold_document(item_count, photos, photo_bytes, seed=seed + 1)
+        pending = copy.deepcopy(listing['items'][:max(1, item_count // 10)])
+        for document_items in (listing['items'], pending):
+            document_items[0]['note'] = NOTE_MARKER
+        sold_items = next(sub['items'] for period in sold['periods'] for category in period['categories']
+                          for sub in category['subcategories'] if sub['items'])
+        sold_items[0]['label'] = NOTE_MARKER
+
+        self.bodies = {}
+        for prefix, document in (('EbayListingLife', listing), ('SoldItemsTrends', sold), ('PendingItems', pending)):
+            key = f"{prefix}_{store_id}"
+            body = json.dumps({'key': key, 'value': document}, separators=(',', ':')).encode('utf-8')
+            self.bodies[prefix] = (key, body.split(NOTE_MARKER.encode('utf-8'), 1))
+
+    def keys(self):
+        return [key for key, _ in self.bodies.values()]
+
+    def set_body(self, prefix, note):
+        key, (head, tail) = self.bodies[prefix]
+        return key, head + note.encode('utf-8') + tail
+
+    def value(self, prefix):
+        """The document as the JSON string localStorage holds, for /sync"""
+        key, body = self.set_body(prefix, 'initial')
+        return key, json.dumps(json.loads(body)['value'], separators=(',', ':'))
+
+
+class SimulatedTab(threading.Thread):
+    """One browser tab running storage-wrapper.js against the server"""
+
+    def __init__(self, index, base_url, store, recorder, stop_event, think_time, time_scale, seed):
+        super().__init__(daemon=True, name=f"tab-{index}")
+        self.index = index
+        self.url = urlparse(base_url)
+        self.store = store
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self.think_time = think_time
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.connection = None
+        self.saves = 0
+
+    def _connect(self):
+        self.connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=REQUEST_TIMEOUT)
+
+    def request(self, operation, method, path, body=None):
+        """Send one request on the tab's keep-alive connection, recording its latency"""
+        if self.connection is None:
+            self._connect()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        if isinstance(body, dict):
+            body = json.dumps(body).encode('utf-8')
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            payload, ok = None, False
+        self.recorder.record(operation, time.perf_counter() - started, ok)
+        return payload if ok else None
+
+    def wait(self, seconds):
+        """Sleep in simulated time; returns False once the run is over"""
+        return not self.stop_event.wait(seconds * self.time_scale)
+
+    def initial_load(self):
+        """Page load: health check, then the app reads its store list and documents"""
+        self.request('health', 'GET', '/api/health')
+        for key in ('ListingLifeStores', 'ListingLifeCurrentStore', f"EbayListingLife_{self.store.store_id}"):
+            self.request('get', 'POST', '/api/storage/get', {'key': key})
+
+    def initial_sync(self):
+        """syncToBackend(): check every key, then sync the ones the server lacks"""
+        missing = {}
+        for prefix, _ in SAVE_MIX:
+            key, value = self.store.value(prefix)
+            payload = self.request('get', 'POST', '/api/storage/get', {'key': key})
+            if payload is not None and json.loads(payload).get('value') in (None, '', {}, []):
+                missing[key] = value
+        if missing:
+            self.request('sync', 'POST', '/api/storage/sync', {'items': missing})
+
+    def save(self):
+        """An edit on one of the pages: the whole document is re-sent"""
+        prefix = self.rng.choices([prefix for prefix, _ in SAVE_MIX], [weight for _, weight in SAVE_MIX])[0]
+        self.saves += 1
+        _, body = self.store.set_body(prefix, f"tab {self.index} edit {self.saves}")
+        self.request('set', 'POST', '/api/storage/set', body)
+
+    def run(self):
+        self.initial_load()
+        if not self.wait(INITIAL_SYNC_DELAY):
+            return
+        self.initial_sync()
+        next_health = time.monotonic() + HEALTH_INTERVAL * self.time_scale
+        while not self.stop_event.is_set():
+            # Exponential think time between edits, like a person working through a list
+            if not self.wait(self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0):
+                break
+            if time.monotonic() >= next_health:
+                self.request('health', 'GET', '/api/health')
+                next_health += HEALTH_INTERVAL * self.time_scale
+            self.save()
+        if self.connection:
+            self.connection.close()
+
+
+def run_step(args, clients, stores):
+    """Run `clients` tabs for the configured duration and return the report"""
+    recorder = Recorder()
+    stop_event = threading.Event()
+    tabs = [
+        SimulatedTab(index, args.url, stores[index % len(stores)], recorder, stop_event,
+                     args.think_time, args.time_scale, seed=args.seed + index)
+        for index in range(clients)
+    ]
+    started = time.perf_counter()
+    for tab in tabs:
+        tab.start()
+        if args.ramp_up:
+            time.sleep(args.ramp_up / clients)
+    time.sleep(max(0.0, args.duration - (time.perf_counter() - started)))
+    stop_event.set()
+    for tab in tabs:
+        tab.join(REQUEST_TIMEOUT)
+    report = recorder.report(time.perf_counter() - started)
+    report['clients'] = clients
+    return report
+
+
+def cleanup(args, stores):
+    """Remove every key the run created"""
+    url = urlparse(args.url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=REQUEST_TIMEOUT)
+    for store in stores:
+        for key in store.keys():
+            connection.request('POST', '/api/storage/remove', body=json.dumps({'key': key}),
+                               headers={'Content-Type': 'application/json'})
+            connection.getresponse().read()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay browser storage traffic against a running ListingLife storage server')
+    parser.add_argument('--url', default=DEFAULT_URL, help='Storage server base URL')
+    parser.add_argument('--clients', type=int, default=4, help='Simulated browser tabs')
+    parser.add_argument('--steps', help='Comma-separated client counts to run one after another (overrides --clients)')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds per run (or per step)')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds over which tabs are started')
+    parser.add_argument('--stores', type=int, default=2, help='Synthetic stores shared among the tabs')
+    parser.add_argument('--items', type=int, default=1000, help='Items per document')
+    parser.add_argument('--photos', action='store_true', help='Inline data-URL photos in every item')
+    parser.add_argument('--photo-bytes', type=int, default=DEFAULT_PHOTO_BYTES, help='Size of each inline photo')
+    parser.add_argument('--think-time', type=float, default=2.0, help='Mean seconds between edits per tab (0 = back to back)')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='Multiplier for think times, the sync delay and the health-check interval')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the reports as JSON to this file')
+    parser.add_argument('--keep-data', action='store_true', help='Leave the loadtest-* keys on the server')
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    try:
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=5)
+        connection.request('GET', '/api/health')
+        health = json.loads(connection.getresponse().read())
+        connection.close()
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print(f"❌ Storage server not reachable at {args.url}: {e}")
+        sys.exit(1)
+    print(f"Server at {args.url} is {health.get('status')} (storage mode: {health.get('storage_mode')})")
+
+    stores = [
+        StoreDocuments(f"loadtest-{index}", args.items, args.photos, args.photo_bytes, seed=args.seed + index * 10)
+        for index in range(max(1, args.stores))
+    ]
+    steps = [int(step) for step in args.steps.split(',')] if args.steps else [args.clients]
+
+    reports = []
+    try:
+        for clients in steps:
+            report = run_step(args, clients, stores)
+            reports.append(report)
+            print(f"{clients:>4} tabs  {report['throughput_rps']:>8} req/s  p50={report['p50_ms']}ms  "
+                  f"p99={report['p99_ms']}ms  errors={report['errors']}")
+            for operation, stats in report['operations'].items():
+                print(f"          {operation:<7} n={stats['requests']:<6} p50={stats['p50_ms']}ms  "
+                      f"p99={stats['p99_ms']}ms  max={stats['max_ms']}ms  errors={stats['errors']}")
+    finally:
+        if not args.keep_data:
+            cleanup(args, stores)
+
+    saturated = None
+    for previous, current in zip(reports, reports[1:]):
+        if (current['throughput_rps'] or 0) < (previous['throughput_rps'] or 0) * (1 + SATURATION_GAIN):
+            saturated = previous
+            break
+    if len(reports) > 1:
+        if saturated:
+            print(f"Saturation: ~{saturated['throughput_rps']} req/s at {saturated['clients']} tabs "
+                  f"(p99 {saturated['p99_ms']}ms); more tabs only add latency")
+        else:
+            print("Throughput was still growing at the last step; try more tabs")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'items': args.items, 'photos': args.photos,
+                       'think_time': args.think_time, 'steps': reports}, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
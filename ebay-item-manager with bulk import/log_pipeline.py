@@ -0,0 +1,129 @@
+"""
+ListingLife Log Pipeline
+Queue-based logging: request threads enqueue records, one background thread formats and writes them
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+
+DEFAULT_FORMAT = '%(levelname)s:%(name)s:%(message)s'
+
+# Standard LogRecord attributes; anything else on a record came from `extra=` and goes into JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread
+
+    The stock QueueHandler formats every record on the calling thread so it
+    can be pickled; these records never leave the process, so the request
+    thread only pays for creating the record and putting it on the queue.
+    Log arguments should therefore be values that are not mutated afterwards
+    (keys, sizes, counts), which is all the server passes.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keep 1 in N records per logger category; warnings and errors are always kept
+
+    `rates` maps a logger name to N. A record matches the most specific
+    configured name it falls under, so {"storage_server.io": 20} samples
+    the per-key save/load lines without touching anything else.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {name: int(rate) for name, rate in (rates or {}).items() if int(rate) > 1}
+        self._counters = {name: itertools.count() for name in self.rates}
+        self._resolved = {}
+
+    def _category(self, name):
+        category = self._resolved.get(name, False)
+        if category is False:
+            category = None
+            for configured in sorted(self.rates, key=len, reverse=True):
+                if name == configured or name.startswith(configured + '.'):
+                    category = configured
+                    break
+            self._resolved[name] = category
+        return category
+
+    def filter(self, record):
+        if not self.rates or record.levelno >= logging.WARNING:
+            return True
+        category = self._category(record.name)
+        if category is None:
+            return True
+        # itertools.count is atomic under the GIL, so no lock is needed
+        return next(self._counters[category]) % self.rates[category] == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message and any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=logging.INFO, json_output=False, sampling=None, stream=None):
+    """Route all logging through a queue to a background writer; safe to call again to reconfigure
+
+    Replaces whatever handlers the root logger had (including basicConfig's
+    stderr handler), so nothing writes to the console on a request thread.
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_output else logging.Formatter(DEFAULT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = DeferredQueueHandler(log_queue)
+    if sampling:
+        _queue_handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener:
+        _listener.stop()
+        _listener = None
+    if _queue_handler:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+ListingLife Storage Migration
+Copies every key between the local folder, S3 and Dropbox using the settings in storage_config.json
+
+Usage:
+    python migrate_storage.py --from dropbox --to local
+    python migrate_storage.py --from local --to cloud --workers 8
+    python migrate_storage.py --from dropbox --to cloud --restart      # ignore the previous run's checkpoint
+
+An interrupted migration resumes from its checkpoint when run again with the
+same --from/--to. The same migration can be started on a running server with
+POST /api/migrate {"source": ..., "target": ...}.
+"""
+import argparse
+import sys
+
+import storage_server
+from storage_migration import DEFAULT_WORKERS
+
+PROGRESS_INTERVAL = 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Copy ListingLife data from one storage backend to another')
+    parser.add_argument('--from', dest='source', required=True, choices=storage_server.MIGRATION_BACKENDS)
+    parser.add_argument('--to', dest='target', required=True, choices=storage_server.MIGRATION_BACKENDS)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Keys copied in parallel')
+    parser.add_argument('--no-verify', action='store_true', help='Skip reading each key back from the target')
+    parser.add_argument('--restart', action='store_true', help='Copy every key again instead of resuming')
+    args = parser.parse_args()
+
+    # Reads storage_config.json for the local path, S3 bucket and Dropbox folder and credentials
+    storage_server.initialize_storage()
+    try:
+        job = storage_server.create_migration(args.source, args.target, workers=args.workers, verify=not args.no_verify)
+    except (ValueError, ImportError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    if args.restart:
+        job.reset()
+
+    job.start()
+    while not job.wait(PROGRESS_INTERVAL):
+        status = job.describe()
+        print(f"{status['copied'] + status['resumed']}/{status['total']} keys, {status['failed']} failed, "
+              f"{status['bytes'] / 1e6:.1f}MB")
+
+    status = job.describe()
+    print(f"Migration {status['state']}: {status['copied']} copied ({status['compressed_copies']} without re-encoding), "
+          f"{status['resumed']} already done, {status['failed']} failed in {status.get('elapsed_seconds')}s")
+    for key, error in status['failures'].items():
+        print(f"  {key}: {error}")
+    if status['state'] != 'completed':
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ class PendingItemsManager {
     constructor() {
         this.pendingItems = [];
         this.currentMovingItem = null;
+        this.moveSuggestions = {}; // Suggested sold subcategory per pending item id
         this.periods = [];
         this.currentPeriodId = null;
         
@@ -41,6 +42,7 @@ class PendingItemsManager {
         this.setupEventListeners();
         this.renderPendingItems();
         this.setupNavigation();
+        this.loadMoveSuggestions(); // Non-blocking
     }
 
     setupNavigation() {
@@ -215,14 +217,8 @@ class PendingItemsManager {
                 const controller = new AbortController();
                 const timeoutId = setTimeout(() => controller.abort(), 5000);
                 
-                const response = await fetch(`http://127.0.0.1:5000/api/storage/get`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ key: storageKey }),
-                    signal: controller.signal
-                });
+                // Served from the store's /api/bootstrap response when it holds the key
+                const response = await window.storageWrapper.getFromBackend(storageKey, controller.signal);
                 
                 clearTimeout(timeoutId);
                 
@@ -313,8 +309,11 @@ class PendingItemsManager {
         this.showImportStatus('Processing file...', 'info');
 
         try {
-            const items = await this.parseFile(file);
-            if (items && items.length > 0) {
+            const parsedItems = await this.parseFile(file);
+            const { items, skippedCount } = await this.removeDuplicateImports(parsedItems || []);
+            if (items.length === 0 && skippedCount > 0) {
+                this.showImportStatus(`All ${skippedCount} item(s) in this file are already pending.`, 'warning');
+            } else if (items && items.length > 0) {
                 // Add items to pending list
                 items.forEach(item => {
                     if (!item.id) {
@@ -328,7 +327,8 @@ class PendingItemsManager {
                 this.pendingItems.push(...items);
                 this.savePendingItems();
                 this.renderPendingItems();
-                this.showImportStatus(`Successfully imported ${items.length} item(s)`, 'success');
+                const skippedMsg = skippedCount > 0 ? ` (${skippedCount} duplicate(s) skipped)` : '';
+                this.showImportStatus(`Successfully imported ${items.length} item(s)${skippedMsg}`, 'success');
                 
                 // Clear file input
                 this.importFileInput.value = '';
@@ -342,6 +342,53 @@ class PendingItemsManager {
         }
     }
 
+    async removeDuplicateImports(items) {
+        // The storage server checks the batch against its hash index of pending items for this store
+        if (!window.storageWrapper || !window.storageWrapper.useBackend || !window.storageWrapper.backendAvailable || items.length === 0) {
+            return { items, skippedCount: 0 };
+        }
+
+        try {
+            const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+
+            const response = await fetch(`http://127.0.0.1:5000/api/import/dedupe`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ store: storeId, targets: ['PendingItems'], items }),
+                signal: controller.signal
+            });
+
+            clearTimeout(timeoutId);
+
+            if (!response.ok) {
+                return { items, skippedCount: 0 };
+            }
+            const report = await response.json();
+            const skippedIndexes = new Set(report.skipped.map(entry => entry.index));
+            // Rows whose eBay item number is already pending refresh that item instead of duplicating it
+            report.updated.forEach(entry => {
+                const existing = this.pendingItems.find(item => item.id === entry.existing_id);
+                if (existing) {
+                    Object.assign(existing, items[entry.index], { id: existing.id, createdAt: existing.createdAt });
+                    skippedIndexes.add(entry.index);
+                }
+            });
+            return {
+                items: items.filter((item, index) => !skippedIndexes.has(index)),
+                skippedCount: skippedIndexes.size
+            };
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Could not check import duplicates on server:', error.message);
+            }
+            return { items, skippedCount: 0 };
+        }
+    }
+
     async parseFile(file) {
         const fileName = file.name.toLowerCase();
         const fileExtension = fileName.split('.').pop();
@@ -412,6 +459,8 @@ class PendingItemsManager {
                         'gross transaction', 'grosstransaction', 'gross_transaction'
                     ]);
                     const refundIndex = this.findColumnIndex(cleanedHeaders, ['refund', 'refunds', 'refund amount', 'refundamount']);
+                    // Optional: lets re-imports of an overlapping export be recognised as duplicates
+                    const itemNumberIndex = this.findColumnIndex(cleanedHeaders, ['item number', 'itemnumber', 'item_number', 'item id', 'itemid', 'item_id']);
 
                     if (titleIndex === -1 || priceIndex === -1) {
                         // Provide helpful error message with found columns
@@ -567,11 +616,14 @@ class PendingItemsManager {
                                 }
                             }
 
+                            const ebayItemId = itemNumberIndex >= 0 ? (cleanedValues[itemNumberIndex] || '').trim() : '';
+
                             items.push({
                                 label: title,
                                 price: displayPrice, // Use absolute value for display
                                 photo: imageUrl || null,
-                                note: notes || null
+                                note: notes || null,
+                                ...(ebayItemId ? { ebayItemId } : {})
                             });
                         } catch (rowError) {
                             skippedRows++;
@@ -969,9 +1021,67 @@ class PendingItemsManager {
 
         this.currentMovingItem = item;
         this.updateMoveModalPeriods();
+        this.applyMoveSuggestion(item);
         this.movePendingItemModal.style.display = 'block';
     }
 
+    async loadMoveSuggestions() {
+        // Ask the storage server for the best matching subcategories for every pending item at once
+        if (!window.storageWrapper || !window.storageWrapper.useBackend || this.pendingItems.length === 0) {
+            return;
+        }
+
+        try {
+            const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+
+            const response = await fetch(`http://127.0.0.1:5000/api/pending/suggest`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    store: storeId,
+                    items: this.pendingItems.map(item => ({ id: item.id, label: item.label })),
+                    top_k: 1
+                }),
+                signal: controller.signal
+            });
+
+            clearTimeout(timeoutId);
+
+            if (response.ok) {
+                const result = await response.json();
+                this.moveSuggestions = result.suggestions || {};
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Could not load move suggestions:', error.message);
+            }
+        }
+    }
+
+    applyMoveSuggestion(item) {
+        const suggestion = (this.moveSuggestions[item.id] || [])[0];
+        if (!suggestion || !this.movePendingPeriod || !this.movePendingCategory || !this.movePendingSubcategory) {
+            return;
+        }
+
+        // Only pre-select targets that still exist in the loaded periods
+        const period = this.periods.find(p => p.id === suggestion.period_id);
+        const category = period ? (period.categories || []).find(c => c.id === suggestion.category_id) : null;
+        if (!category) return;
+
+        this.movePendingPeriod.value = suggestion.period_id;
+        this.handleMovePeriodChange();
+        this.movePendingCategory.value = suggestion.category_id;
+        this.handleMoveCategoryChange();
+        if ((category.subcategories || []).some(sub => sub.id === suggestion.subcategory_id)) {
+            this.movePendingSubcategory.value = suggestion.subcategory_id;
+        }
+    }
+
     updateMoveModalPeriods() {
         if (!this.movePendingPeriod) return;
         this.movePendingPeriod.innerHTML = '<option value="">Select a period...</option>';
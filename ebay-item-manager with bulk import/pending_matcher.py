@@ -0,0 +1,159 @@
+"""
+ListingLife Pending Item Matcher
+Suggests sold subcategories for pending items using a token index with n-gram fuzzy lookup
+"""
+from collections import Counter, defaultdict
+import heapq
+import math
+import re
+
+NGRAM_SIZE = 3
+# Subcategory and category names describe a bucket better than any single sold label
+NAME_WEIGHT = 3.0
+CATEGORY_WEIGHT = 1.5
+LABEL_WEIGHT = 1.0
+MIN_SUGGESTION_SCORE = 0.15
+# Unknown words are matched to known words sharing at least this much of their n-grams
+MIN_FUZZY_SIMILARITY = 0.5
+MAX_FUZZY_EXPANSIONS = 2
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase a piece of text and split it into word tokens"""
+    if not text:
+        return []
+    return _NON_WORD.sub(' ', str(text).lower()).split()
+
+
+def char_ngrams(token):
+    """Return the set of padded character n-grams of one token"""
+    padded = f" {token} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))}
+
+
+def _dicts(container, field):
+    """The dict elements of container[field], skipping anything else a legacy or damaged document holds"""
+    values = container.get(field) if isinstance(container, dict) else None
+    return (value for value in values if isinstance(value, dict)) if isinstance(values, list) else ()
+
+
+class SubcategoryIndex:
+    """Inverted index over sold subcategories, built once per SoldItemsTrends version
+
+    Each subcategory becomes a TF-IDF vector over the words of its own name,
+    its parent category name and the labels of items already sold in it.
+    Words a pending label uses that never appear in the index (typos, plurals,
+    abbreviations) are resolved to known words through a character n-gram index
+    over the vocabulary, and those resolutions are memoized across the batch.
+    Scoring only touches the postings of a label's own words, so a batch costs
+    O(batch x words) rather than O(batch x subcategories x items).
+    """
+
+    def __init__(self, document, period_id=None):
+        self.entries = []
+        self.postings = defaultdict(list)
+        self.idf = {}
+        self.vocabulary_ngrams = defaultdict(list)
+        self.vocabulary_ngram_counts = {}
+        self._fuzzy_cache = {}
+
+        raw_vectors = []
+        for period in _dicts(document, 'periods'):
+            if period_id and period.get('id') != period_id:
+                continue
+            for category in _dicts(period, 'categories'):
+                category_tokens = tokenize(category.get('name'))
+                for subcategory in _dicts(category, 'subcategories'):
+                    vector = Counter()
+                    for token in tokenize(subcategory.get('name')):
+                        vector[token] += NAME_WEIGHT
+                    for token in category_tokens:
+                        vector[token] += CATEGORY_WEIGHT
+                    for item in _dicts(subcategory, 'items'):
+                        for token in tokenize(item.get('label')):
+                            vector[token] += LABEL_WEIGHT
+                    if not vector:
+                        continue
+                    self.entries.append({
+                        'period_id': period.get('id'),
+                        'category_id': category.get('id'),
+                        'category_name': category.get('name'),
+                        'subcategory_id': subcategory.get('id'),
+                        'subcategory_name': subcategory.get('name'),
+                    })
+                    raw_vectors.append(vector)
+
+        document_count = len(raw_vectors)
+        frequency = Counter()
+        for vector in raw_vectors:
+            frequency.update(vector.keys())
+        self.idf = {token: math.log((1 + document_count) / (1 + df)) + 1 for token, df in frequency.items()}
+
+        for entry_index, vector in enumerate(raw_vectors):
+            weighted = {token: (1 + math.log(count)) * self.idf[token] for token, count in vector.items()}
+            norm = math.sqrt(sum(weight * weight for weight in weighted.values())) or 1.0
+            for token, weight in weighted.items():
+                self.postings[token].append((entry_index, weight / norm))
+
+        for token in self.idf:
+            ngrams = char_ngrams(token)
+            self.vocabulary_ngram_counts[token] = len(ngrams)
+            for ngram in ngrams:
+                self.vocabulary_ngrams[ngram].append(token)
+
+    def resolve_token(self, token):
+        """Map a label word to (known word, similarity) pairs"""
+        if token in self.idf:
+            return [(token, 1.0)]
+        cached = self._fuzzy_cache.get(token)
+        if cached is not None:
+            return cached
+
+        ngrams = char_ngrams(token)
+        overlap = Counter()
+        for ngram in ngrams:
+            overlap.update(self.vocabulary_ngrams.get(ngram, ()))
+        candidates = []
+        for known, shared in overlap.items():
+            # Dice coefficient over n-gram sets
+            similarity = 2 * shared / (len(ngrams) + self.vocabulary_ngram_counts[known])
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                candidates.append((known, similarity))
+        resolved = heapq.nlargest(MAX_FUZZY_EXPANSIONS, candidates, key=lambda pair: pair[1])
+        self._fuzzy_cache[token] = resolved
+        return resolved
+
+    def suggest(self, label, top_k=3):
+        """Return the top_k best matching subcategories for one label"""
+        weighted = defaultdict(float)
+        for token, count in Counter(tokenize(label)).items():
+            for known, similarity in self.resolve_token(token):
+                weighted[known] += (1 + math.log(count)) * self.idf[known] * similarity
+        if not weighted:
+            return []
+        norm = math.sqrt(sum(weight * weight for weight in weighted.values()))
+
+        scores = {}
+        get_score = scores.get
+        for token, weight in weighted.items():
+            query_weight = weight / norm
+            for entry_index, entry_weight in self.postings[token]:
+                scores[entry_index] = get_score(entry_index, 0.0) + query_weight * entry_weight
+
+        best = heapq.nlargest(top_k, scores, key=get_score)
+        return [
+            dict(self.entries[entry_index], score=round(scores[entry_index], 4))
+            for entry_index in best
+            if scores[entry_index] >= MIN_SUGGESTION_SCORE
+        ]
+
+    def suggest_batch(self, items, top_k=3):
+        """Suggest subcategories for many pending items, keyed by item id"""
+        suggestions = {}
+        for item in items:
+            if not isinstance(item, dict) or item.get('id') is None:
+                continue
+            suggestions[item['id']] = self.suggest(item.get('label') or item.get('name'), top_k)
+        return suggestions
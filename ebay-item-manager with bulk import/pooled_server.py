@@ -0,0 +1,149 @@
+"""
+ListingLife Pooled Server
+HTTP server that handles requests on a fixed-size thread pool, optionally in several worker processes
+
+Flask's app.run starts a new thread for every connection, without limit. This
+server accepts connections on the main thread and hands them to a pool of
+`threads` workers; connections beyond that wait in the pool's queue instead of
+each getting a thread, so a burst of browser tabs cannot exhaust the machine.
+
+With workers > 1 the parent process binds the socket and forks that many
+children, each running its own pool on the shared socket; the parent only
+restarts children that die and stops them all on Ctrl+C or SIGTERM.
+"""
+import logging
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, select_address_family, get_sockaddr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THREADS = 8
+MAX_THREADS = 64
+# A worker that keeps crashing is restarted at most this often
+RESTART_DELAY = 1.0
+LISTEN_BACKLOG = 128
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug's WSGI server with requests dispatched to a ThreadPoolExecutor"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=DEFAULT_THREADS, **kwargs):
+        super().__init__(host, port, app, **kwargs)
+        self.threads = max(1, min(int(threads), MAX_THREADS))
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle_request, request, client_address)
+
+    def _handle_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # Also called from the base __init__ (to close its placeholder socket when given an fd), before the pool exists
+        pool = getattr(self, '_pool', None)
+        if pool:
+            pool.shutdown(wait=False)
+
+
+def serve(app, host='127.0.0.1', port=5000, threads=DEFAULT_THREADS, workers=1,
+          on_worker_start=None, on_worker_exit=None):
+    """Serve app until interrupted
+
+    With workers > 1 (POSIX only), on_worker_start(index) runs in each forked
+    process before it accepts connections and on_worker_exit() as it stops.
+    """
+    if workers <= 1:
+        server = PooledWSGIServer(host, port, app, threads=threads)
+        logger.info(f"Serving on http://{host}:{port} with {server.threads} worker threads")
+        server.serve_forever()
+        return
+    _serve_workers(app, host, port, threads, workers, on_worker_start, on_worker_exit)
+
+
+def _raise_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def _listen(host, port):
+    family = select_address_family(host, port)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(get_sockaddr(host, int(port), family))
+    listener.listen(LISTEN_BACKLOG)
+    # Every worker wakes for a new connection and only one accept() wins; the others must not block in it
+    listener.setblocking(False)
+    return listener
+
+
+def _run_worker(app, host, port, threads, listener, index, on_worker_start, on_worker_exit):
+    """Body of a forked worker; never returns into the parent's code"""
+    code = 0
+    try:
+        signal.signal(signal.SIGTERM, _raise_exit)
+        if on_worker_start:
+            on_worker_start(index)
+        server = PooledWSGIServer(host, port, app, threads=threads, fd=listener.fileno())
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    except Exception:
+        logger.exception(f"Worker {index} crashed")
+        code = 1
+    finally:
+        try:
+            if on_worker_exit:
+                on_worker_exit()
+        finally:
+            os._exit(code)
+
+
+def _serve_workers(app, host, port, threads, workers, on_worker_start, on_worker_exit):
+    listener = _listen(host, port)
+    children = {}  # pid -> worker index
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, host, port, threads, listener, index, on_worker_start, on_worker_exit)
+        children[pid] = index
+
+    signal.signal(signal.SIGTERM, _raise_exit)
+    logger.info(f"Serving on http://{host}:{port} with {workers} worker processes of {threads} threads")
+    try:
+        for index in range(workers):
+            spawn(index)
+        while children:
+            pid, status = os.wait()
+            index = children.pop(pid, None)
+            if index is None or status == 0:
+                continue  # Workers exit cleanly only when told to stop
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting it")
+            time.sleep(RESTART_DELAY)
+            spawn(index)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        listener.close()
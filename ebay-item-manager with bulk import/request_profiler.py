@@ -0,0 +1,121 @@
+"""
+ListingLife Request Profiler
+Opt-in cProfile/tracemalloc capture of sampled requests, saved as pstats files
+"""
+from collections import deque
+import cProfile
+import io
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_HEADER = 'X-ListingLife-Profile'
+TOP_FUNCTIONS = 15
+DEFAULT_KEEP_PROFILES = 50
+
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class ProfileSession:
+    """One request being profiled"""
+
+    def __init__(self, memory):
+        self.started = time.perf_counter()
+        self.memory = memory
+        self.profile = cProfile.Profile()
+        if memory:
+            tracemalloc.start()
+        self.profile.enable()
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the results
+
+    Nothing is profiled unless the profiler is enabled. Then requests are
+    profiled when they carry the profile header, and otherwise at
+    `sample_rate`; the header is ignored while disabled, so clients cannot
+    switch profiling on by themselves. Only one request is profiled at
+    a time, since the interpreter allows a single active profiler; requests
+    arriving meanwhile simply run unprofiled. Each profile is written as a
+    .pstats file (open it with `python -m pstats` or snakeviz) and summarized
+    in memory with its top cumulative functions.
+    """
+
+    def __init__(self, output_dir, enabled=False, sample_rate=0.0, memory=False, keep=DEFAULT_KEEP_PROFILES):
+        self.output_dir = Path(output_dir)
+        self.enabled = enabled
+        self.sample_rate = max(0.0, min(float(sample_rate), 1.0))
+        self.memory = memory
+        self.keep = max(1, keep)
+        self.summaries = deque(maxlen=self.keep)
+        self._active = threading.Lock()
+
+    def start(self, forced=False):
+        """Begin profiling the current request if it is selected, returning the session or None"""
+        if not self.enabled or not (forced or random.random() < self.sample_rate):
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        try:
+            return ProfileSession(self.memory)
+        except Exception:
+            self._active.release()
+            raise
+
+    def finish(self, session, method, route, status):
+        """Stop a session, write its pstats file and return its summary"""
+        try:
+            session.profile.disable()
+            elapsed = time.perf_counter() - session.started
+            memory = None
+            if session.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().statistics('lineno')[:5]
+                tracemalloc.stop()
+                memory = {
+                    'current_bytes': current,
+                    'peak_bytes': peak,
+                    'top_allocations': [{'location': str(stat.traceback), 'bytes': stat.size} for stat in top]
+                }
+        finally:
+            self._active.release()
+
+        stamp = datetime.now()
+        name = _UNSAFE_FILENAME.sub('_', f"{stamp.strftime('%Y%m%d-%H%M%S-%f')}-{method}-{route.strip('/')}") + '.pstats'
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        session.profile.dump_stats(str(self.output_dir / name))
+
+        stats = pstats.Stats(session.profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda entry: entry[1][3], reverse=True)[:TOP_FUNCTIONS]
+        summary = {
+            'file': name,
+            'timestamp': stamp.isoformat(),
+            'method': method,
+            'route': route,
+            'status': status,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'top_cumulative': [
+                {
+                    'function': f"{filename}:{line}({function})",
+                    'calls': calls,
+                    'total_ms': round(total * 1000, 3),
+                    'cumulative_ms': round(cumulative * 1000, 3)
+                }
+                for (filename, line, function), (_, calls, total, cumulative, _) in rows
+            ],
+            'memory': memory
+        }
+        self.summaries.appendleft(summary)
+        self._evict_files()
+        return summary
+
+    def _evict_files(self):
+        """Keep only the newest `keep` pstats files on disk"""
+        files = sorted(self.output_dir.glob('*.pstats'))
+        for old_file in files[:-self.keep]:
+            old_file.unlink(missing_ok=True)
@@ -12,6 +12,7 @@ class EbayListingLife {
         this.sidebarMode = 'recent'; // 'recent' or 'ending'
         this.lastSuggestedEndDate = null;
         this.endDateManuallyModified = false;
+        this.lifetimeStats = null; // Per-category time-to-sale stats from the storage server
         this.listingConfirmModal = null;
         this.listingConfirmTitleEl = null;
         this.listingConfirmMessageEl = null;
@@ -109,6 +110,7 @@ class EbayListingLife {
             this.updateCategorySelect();
             this.updateUrgentItems();
             this.handleInitialView();
+            this.loadLifetimeStats(); // Non-blocking: suggestions fall back to averageDays until loaded
             console.log('EbayListingLife initialized successfully');
         };
         
@@ -682,7 +684,10 @@ class EbayListingLife {
         }
 
         const category = this.categories.find(cat => cat.id === categoryId);
-        const averageDays = category ? parseInt(category.averageDays, 10) : NaN;
+        // Prefer the observed median time-to-sale over the hand-entered average
+        const stats = this.lifetimeStats ? this.lifetimeStats[categoryId] : null;
+        const observedDays = stats && stats.suggested_days ? stats.suggested_days : null;
+        const averageDays = observedDays || (category ? parseInt(category.averageDays, 10) : NaN);
 
         if (!category || !Number.isFinite(averageDays) || averageDays <= 0) {
             this.resetEndDateSuggestion();
@@ -699,7 +704,9 @@ class EbayListingLife {
         suggestionEl.classList.add('visible');
         suggestionEl.innerHTML = `
             Suggested end date: <strong>${this.formatDate(suggestedDate)}</strong>
-            <br><span style="font-weight: 500;">Based on the ${averageDays}-day average for this category.</span>
+            <br><span style="font-weight: 500;">${observedDays
+                ? `Based on the ${averageDays}-day median time to sale of ${stats.sold} sold items in this category.`
+                : `Based on the ${averageDays}-day average for this category.`}</span>
         `;
 
         if (forceApply || (applyIfUnmodified && !this.endDateManuallyModified)) {
@@ -725,6 +732,43 @@ class EbayListingLife {
         return date.toISOString().split('T')[0];
     }
 
+    async loadLifetimeStats() {
+        // Time-to-sale stats are computed by the storage server from real sold data
+        if (!window.storageWrapper || !window.storageWrapper.useBackend) {
+            return;
+        }
+        // The server keeps stats per store; without a store manager the page reads the unsuffixed key it has none for
+        const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+        if (!storeId) {
+            this.lifetimeStats = null;
+            return;
+        }
+
+        try {
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+
+            const response = await fetch(`http://127.0.0.1:5000/api/stats/lifetime?store=${encodeURIComponent(storeId)}`, {
+                method: 'GET',
+                cache: 'no-cache',
+                signal: controller.signal
+            });
+
+            clearTimeout(timeoutId);
+
+            if (response.ok) {
+                const result = await response.json();
+                const storeStats = result.stores ? result.stores[storeId] : null;
+                this.lifetimeStats = storeStats ? storeStats.categories : null;
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Could not load lifetime stats:', error.message);
+            }
+            this.lifetimeStats = null;
+        }
+    }
+
     resetEndDateSuggestion() {
         const suggestionEl = document.getElementById('endDateSuggestion');
         const endDateInput = document.getElementById('itemEndDate');
@@ -3335,14 +3379,8 @@ class EbayListingLife {
                 const controller = new AbortController();
                 const timeoutId = setTimeout(() => controller.abort(), 5000); // 5 second timeout
                 
-                const response = await fetch(`http://127.0.0.1:5000/api/storage/get`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ key: storageKey }),
-                    signal: controller.signal
-                });
+                // Served from the store's /api/bootstrap response when it holds the key
+                const response = await window.storageWrapper.getFromBackend(storageKey, controller.signal);
                 
                 clearTimeout(timeoutId);
                 
@@ -3757,6 +3795,9 @@ class EbayListingLife {
                     const imageIndex = this.findColumnIndex(headers, ['image', 'image url', 'url', 'photo', 'picture', 'image link', 'imageurl', 'photourl', 'imagelink', 'image_url', 'photo_url', 'image-link', 'photo-link', 'img', 'img url', 'imgurl']);
                     const descriptionIndex = this.findColumnIndex(headers, ['description', 'desc', 'details']);
                     const noteIndex = this.findColumnIndex(headers, ['note', 'notes', 'comment', 'comments']);
+                    // Optional: let re-imports of an overlapping export be recognised as duplicates or updates
+                    const itemNumberIndex = this.findColumnIndex(headers, ['item number', 'itemnumber', 'item_number', 'item id', 'itemid', 'item_id']);
+                    const priceIndex = this.findColumnIndex(headers, ['price', 'start price', 'current price', 'item price']);
 
                     if (nameIndex === -1 || categoryIndex === -1 || dateAddedIndex === -1 || endDateIndex === -1) {
                         reject(new Error('CSV must contain columns for: Name, Category, Date Added, and End Date. Image URL, Description, and Note are optional.'));
@@ -3776,6 +3817,8 @@ class EbayListingLife {
                         let imageUrl = imageIndex >= 0 ? (values[imageIndex]?.trim() || '') : '';
                         const description = descriptionIndex >= 0 ? (values[descriptionIndex]?.trim() || '') : '';
                         const note = noteIndex >= 0 ? (values[noteIndex]?.trim() || '') : '';
+                        const ebayItemId = itemNumberIndex >= 0 ? (values[itemNumberIndex]?.trim() || '') : '';
+                        const price = priceIndex >= 0 ? (values[priceIndex]?.trim() || '') : '';
 
                         if (!name || !categoryName || !dateAddedStr || !endDateStr) continue;
 
@@ -3797,7 +3840,9 @@ class EbayListingLife {
                             endDate: endDateStr,
                             photo: imageUrl || null,
                             description: description || '',
-                            note: note || ''
+                            note: note || '',
+                            ...(ebayItemId ? { ebayItemId } : {}),
+                            ...(price ? { price } : {})
                         });
                     }
 
@@ -3831,6 +3876,8 @@ class EbayListingLife {
                             let imageUrl = this.findValueInRow(row, ['image', 'image url', 'url', 'photo', 'picture', 'image link', 'imageurl', 'photourl', 'imagelink', 'image_url', 'photo_url', 'image-link', 'photo-link', 'img', 'img url', 'imgurl']);
                             const description = this.findValueInRow(row, ['description', 'desc', 'details']);
                             const note = this.findValueInRow(row, ['note', 'notes', 'comment', 'comments']);
+                            const ebayItemId = this.findValueInRow(row, ['item number', 'itemnumber', 'item_number', 'item id', 'itemid', 'item_id']);
+                            const price = this.findValueInRow(row, ['price', 'start price', 'current price', 'item price']);
 
                             if (!name || !categoryName || !dateAddedStr || !endDateStr) return;
 
@@ -3852,7 +3899,9 @@ class EbayListingLife {
                                 endDate: String(endDateStr).trim(),
                                 photo: imageUrl || null,
                                 description: description ? String(description).trim() : '',
-                                note: note ? String(note).trim() : ''
+                                note: note ? String(note).trim() : '',
+                                ...(ebayItemId ? { ebayItemId: String(ebayItemId).trim() } : {}),
+                                ...(price !== null && price !== '' ? { price: String(price).trim() } : {})
                             });
                         });
 
@@ -3912,12 +3961,67 @@ class EbayListingLife {
         return null;
     }
 
+    async checkImportDuplicates(rows, targets) {
+        // The storage server keeps a hash index of stored items per store; null means check locally
+        if (!window.storageWrapper || !window.storageWrapper.useBackend || !window.storageWrapper.backendAvailable) {
+            return null;
+        }
+
+        try {
+            const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+
+            const response = await fetch(`http://127.0.0.1:5000/api/import/dedupe`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ store: storeId, targets, items: rows }),
+                signal: controller.signal
+            });
+
+            clearTimeout(timeoutId);
+
+            if (!response.ok) return null;
+            return await response.json();
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.warn('Could not check import duplicates on server:', error.message);
+            }
+            return null;
+        }
+    }
+
     async processImportedItems(importedItems) {
         let successCount = 0;
         let errorCount = 0;
+        let skippedCount = 0;
+        let updatedCount = 0;
         const errors = [];
 
-        for (const itemData of importedItems) {
+        // The server matches rows on eBay item number, or on title, price and date added
+        const dedupeReport = await this.checkImportDuplicates(
+            importedItems.map(itemData => ({
+                name: itemData.name,
+                categoryName: itemData.categoryName,
+                dateAdded: itemData.dateAdded,
+                ...(itemData.ebayItemId ? { ebayItemId: itemData.ebayItemId } : {}),
+                ...(itemData.price ? { price: itemData.price } : {})
+            })),
+            ['EbayListingLife']
+        );
+        const skippedIndexes = new Set(dedupeReport ? dedupeReport.skipped.map(entry => entry.index) : []);
+        // Rows whose eBay item number is already listed with other details refresh that listing
+        const updatedIds = new Map(dedupeReport ? dedupeReport.updated.map(entry => [entry.index, entry.existing_id]) : []);
+
+        for (const [index, itemData] of importedItems.entries()) {
+            if (skippedIndexes.has(index)) {
+                console.log(`Skipping duplicate item: ${itemData.name} in category ${itemData.categoryName}`);
+                skippedCount++;
+                continue;
+            }
+
             try {
                 // Find or create category
                 let category = this.categories.find(c => c.name.toLowerCase().trim() === itemData.categoryName.toLowerCase().trim());
@@ -3954,11 +4058,24 @@ class EbayListingLife {
                     dateAdded: itemData.dateAdded,
                     duration: duration,
                     photo: itemData.photo || null,
+                    ...(itemData.ebayItemId ? { ebayItemId: itemData.ebayItemId } : {}),
+                    ...(itemData.price ? { price: itemData.price } : {}),
                     createdAt: timestamp,
                     updatedAt: timestamp
                 };
 
-                // Check for duplicates
+                const existingItem = updatedIds.has(index) && this.items.find(item => item.id === updatedIds.get(index));
+                if (existingItem) {
+                    Object.assign(existingItem, newItem, {
+                        id: existingItem.id,
+                        photo: newItem.photo || existingItem.photo || null,
+                        createdAt: existingItem.createdAt
+                    });
+                    updatedCount++;
+                    continue;
+                }
+
+                // Check for duplicates (besides the server's check, which does not look at category or ended listings)
                 const duplicateItem = this.items.find(item =>
                     item.categoryId === category.id &&
                     !this.isItemEnded(item) &&
@@ -3969,6 +4086,7 @@ class EbayListingLife {
                 if (duplicateItem) {
                     // Skip duplicates silently or log them
                     console.log(`Skipping duplicate item: ${itemData.name} in category ${itemData.categoryName}`);
+                    skippedCount++;
                     continue;
                 }
 
@@ -3987,7 +4105,9 @@ class EbayListingLife {
             if (errorCount > 0) {
                 this.showImportItemsStatus(`Imported ${successCount} item(s), ${errorCount} error(s). Errors: ${errors.join('; ')}`, 'warning');
             } else {
-                this.showImportItemsStatus(`Successfully imported ${successCount} item(s)`, 'success');
+                const updatedMsg = updatedCount > 0 ? `, updated ${updatedCount}` : '';
+                const skippedMsg = skippedCount > 0 ? `, skipped ${skippedCount} duplicate(s)` : '';
+                this.showImportItemsStatus(`Successfully imported ${successCount} item(s)${updatedMsg}${skippedMsg}`, 'success');
             }
             
             // Invalidate cache after bulk import
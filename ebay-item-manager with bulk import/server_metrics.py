@@ -0,0 +1,182 @@
+"""
+ListingLife Server Metrics
+In-process counters, gauges and histograms rendered in the Prometheus text format
+"""
+from bisect import bisect_left
+from functools import wraps
+import threading
+import time
+
+# Seconds; covers local disk reads through slow Dropbox uploads of large stores
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    """Render a label tuple (plus an optional extra pair such as le) as {a="b",...}"""
+    pairs = list(labels)
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    """Render a sample value, writing whole floats without a decimal part"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    """Thread-safe store of named metrics, each split into series by label values
+
+    Metrics are declared once with describe() and updated through inc(),
+    set_gauge() and observe(). Label sets are stored as sorted tuples so
+    the same labels given in any order land in the same series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}       # name -> (type, help, buckets)
+        self._values = {}     # name -> {labels: float} for counters and gauges
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+
+    def describe(self, name, metric_type, help_text, buckets=LATENCY_BUCKETS):
+        """Declare a metric; type is counter, gauge or histogram"""
+        self._meta[name] = (metric_type, help_text, tuple(buckets))
+        if metric_type == 'histogram':
+            self._histograms.setdefault(name, {})
+        else:
+            self._values.setdefault(name, {})
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter or gauge"""
+        series = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[series] = values.get(series, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to an absolute value"""
+        series = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[name][series] = value
+
+    def observe(self, name, value, **labels):
+        """Record one sample in a histogram"""
+        series = tuple(sorted(labels.items()))
+        buckets = self._meta[name][2]
+        position = bisect_left(buckets, value)
+        with self._lock:
+            state = self._histograms[name].get(series)
+            if state is None:
+                state = self._histograms[name][series] = [0] * (len(buckets) + 2)
+            if position < len(buckets):
+                state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def timed(self, name, **labels):
+        """Decorator observing a function's duration, with outcome="error" when it raises"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                outcome = 'error'
+                try:
+                    result = func(*args, **kwargs)
+                    outcome = 'ok'
+                    return result
+                finally:
+                    self.observe(name, time.perf_counter() - started, outcome=outcome, **labels)
+            return wrapper
+        return decorator
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge series (0 if never touched)"""
+        with self._lock:
+            return self._values.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self):
+        """Every series' current values as JSON-compatible lists, for render() in another process"""
+        with self._lock:
+            return {
+                'values': {name: [[list(map(list, series)), value] for series, value in values.items()]
+                           for name, values in self._values.items()},
+                'histograms': {name: [[list(map(list, series)), list(state)] for series, state in states.items()]
+                               for name, states in self._histograms.items()},
+            }
+
+    def render(self, workers=None):
+        """Return every metric in the Prometheus text exposition format
+
+        workers maps worker ids to snapshot() results, including this
+        process's own; each worker's series are then rendered with a worker label.
+        """
+        if workers is None:
+            with self._lock:
+                values = {name: dict(series) for name, series in self._values.items()}
+                histograms = {name: {labels: list(state) for labels, state in series.items()}
+                              for name, series in self._histograms.items()}
+        else:
+            values, histograms = {}, {}
+            for worker, snapshot in workers.items():
+                for merged, kind in ((values, 'values'), (histograms, 'histograms')):
+                    for name, series in snapshot.get(kind, {}).items():
+                        for labels, value in series:
+                            labels = tuple(sorted([tuple(pair) for pair in labels] + [('worker', str(worker))]))
+                            merged.setdefault(name, {})[labels] = value
+        lines = []
+        for name, (metric_type, help_text, buckets) in sorted(self._meta.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type != 'histogram':
+                for series, value in sorted(values.get(name, {}).items()):
+                    lines.append(f'{name}{_format_labels(series)} {_format_value(value)}')
+                continue
+            for series, state in sorted(histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, count in zip(buckets, state):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(series, ("le", _format_value(float(bound))))} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(series, ("le", "+Inf"))} {state[-1]}')
+                lines.append(f'{name}_sum{_format_labels(series)} {_format_value(float(state[-2]))}')
+                lines.append(f'{name}_count{_format_labels(series)} {state[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('listinglife_http_request_duration_seconds', 'histogram',
+                 'Time spent handling HTTP requests, by route, method and status')
+metrics.describe('listinglife_http_requests_in_flight', 'gauge',
+                 'HTTP requests currently being handled')
+metrics.describe('listinglife_http_request_bytes_total', 'counter',
+                 'Request body bytes received, by route')
+metrics.describe('listinglife_http_response_bytes_total', 'counter',
+                 'Response body bytes sent (non-streamed responses only), by route')
+metrics.describe('listinglife_backend_duration_seconds', 'histogram',
+                 'Time spent in storage backend calls, by backend, operation and outcome')
+metrics.describe('listinglife_backend_bytes_total', 'counter',
+                 'Bytes written to (out) and read from (in) storage backends, as JSON and as stored after compression')
+metrics.describe('listinglife_backend_retries_total', 'counter',
+                 'Storage backend calls retried after a temporary error or token refresh')
+metrics.describe('listinglife_token_refreshes_total', 'counter',
+                 'Dropbox access token refresh attempts, by result')
+metrics.describe('listinglife_backend_reads_total', 'counter',
+                 'Storage backend loads, by backend and result (fetched, or coalesced into a concurrent load of the same key)')
+metrics.describe('listinglife_cache_requests_total', 'counter',
+                 'Lookups in derived-data caches, by cache and result (hit or miss)')
+metrics.describe('listinglife_outbox_writes_total', 'counter',
+                 'Outbox activity, by backend and result (queued, superseded, sent or failed)')
+metrics.describe('listinglife_outbox_depth', 'gauge',
+                 'Keys waiting in the outbox to be written to the backend')
+metrics.describe('listinglife_outbox_oldest_age_seconds', 'gauge',
+                 'Age of the oldest write waiting in the outbox')
@@ -0,0 +1,345 @@
+"""
+ListingLife Simulated Backend
+Disk-backed Dropbox and S3 clients that add WAN latency, bandwidth limits and injected faults
+
+The `simulated` storage mode plugs these in place of the real SDK clients, so
+save_to_dropbox/load_from_dropbox/refresh_dropbox_token (or the S3 paths) run
+unchanged against errors shaped like the ones the dropbox and boto3 SDKs raise.
+Configure it with a `simulation` block in storage_config.json, for example:
+
+    "storage_mode": "simulated",
+    "simulation": {
+        "backend": "dropbox",
+        "latency": {"distribution": "lognormal", "median_ms": 150, "sigma": 0.6},
+        "upload_kbps": 2000,
+        "download_kbps": 8000,
+        "rate_limit_rate": 0.02,
+        "server_error_rate": 0.01,
+        "expired_token_rate": 0.0,
+        "token_lifetime_seconds": 600,
+        "seed": 42
+    }
+"""
+import math
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from storage_fakes import (
+    FileMetadata, RateLimitError, InternalServerError, fake_dropbox_module,
+    path_not_found_error, expired_token_error, etag, content_hash
+)
+
+
+class _ClientErrorShape(Exception):
+    """Same constructor, attributes and message as botocore.exceptions.ClientError"""
+
+    def __init__(self, error_response, operation_name):
+        error = error_response.get('Error', {})
+        super().__init__(
+            f"An error occurred ({error.get('Code', 'Unknown')}) when calling the "
+            f"{operation_name} operation: {error.get('Message', 'Unknown')}"
+        )
+        self.response = error_response
+        self.operation_name = operation_name
+
+
+def client_error_class():
+    """botocore's ClientError when installed (imported only once S3 is simulated), else a lookalike"""
+    try:
+        from botocore.exceptions import ClientError
+        return ClientError
+    except ImportError:
+        return _ClientErrorShape
+
+
+SIMULATED_BACKENDS = ('dropbox', 'cloud')
+DEFAULT_LATENCY = {'distribution': 'lognormal', 'median_ms': 120, 'sigma': 0.5}
+SIMULATED_BUCKET = 'listinglife-simulated'
+
+
+class LatencyModel:
+    """Samples per-call latency and adds transfer time for a bandwidth cap"""
+
+    def __init__(self, latency, upload_kbps, download_kbps, rng):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.upload_bytes_per_sec = upload_kbps * 1024 if upload_kbps else None
+        self.download_bytes_per_sec = download_kbps * 1024 if download_kbps else None
+        self.rng = rng
+
+    def sample(self):
+        """Round-trip latency in seconds drawn from the configured distribution"""
+        settings = self.latency
+        distribution = settings.get('distribution', 'lognormal')
+        if distribution == 'fixed':
+            milliseconds = settings.get('ms', 0)
+        elif distribution == 'uniform':
+            milliseconds = self.rng.uniform(settings.get('min_ms', 0), settings.get('max_ms', 0))
+        elif distribution == 'normal':
+            milliseconds = self.rng.gauss(settings.get('mean_ms', 0), settings.get('stddev_ms', 0))
+        elif distribution == 'lognormal':
+            milliseconds = self.rng.lognormvariate(math.log(max(settings.get('median_ms', 1), 1e-3)), settings.get('sigma', 0.5))
+        else:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        return max(0.0, milliseconds) / 1000
+
+    def transfer_time(self, size, upload):
+        rate = self.upload_bytes_per_sec if upload else self.download_bytes_per_sec
+        return size / rate if rate else 0.0
+
+
+class NetworkSimulator:
+    """Shared latency, fault and token state for the simulated clients"""
+
+    def __init__(self, config, root):
+        config = config or {}
+        self.config = config
+        self.backend = config.get('backend', 'dropbox')
+        if self.backend not in SIMULATED_BACKENDS:
+            raise ValueError(f"Simulated backend must be one of {SIMULATED_BACKENDS}, not {self.backend!r}")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.rng = random.Random(config.get('seed'))
+        self.latency = LatencyModel(config.get('latency'), config.get('upload_kbps'), config.get('download_kbps'), self.rng)
+        self.rate_limit_rate = float(config.get('rate_limit_rate', 0.0))
+        self.server_error_rate = float(config.get('server_error_rate', 0.0))
+        self.expired_token_rate = float(config.get('expired_token_rate', 0.0))
+        self.token_lifetime = config.get('token_lifetime_seconds')
+        self.bucket = config.get('bucket', SIMULATED_BUCKET)
+        self._lock = threading.Lock()
+        self._token_serial = 0
+        self._token_issued = {}
+        self.stats = {'calls': 0, 'rate_limited': 0, 'server_errors': 0, 'expired_tokens': 0, 'token_refreshes': 0}
+
+    def issue_token(self):
+        """Hand out a new access token, as the OAuth refresh endpoint would"""
+        with self._lock:
+            self._token_serial += 1
+            token = f"sim.{self._token_serial}"
+            self._token_issued[token] = time.monotonic()
+            return token
+
+    def refresh_access_token(self):
+        with self._lock:
+            self.stats['token_refreshes'] += 1
+        return self.issue_token()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def call(self, token, size=0, upload=False):
+        """Sleep for one call's latency and transfer time, then maybe raise an injected fault
+
+        Returns the kind of fault to raise ('rate_limit', 'server_error',
+        'expired_token') or None; the client turns it into its SDK's exception.
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            roll = self.rng.random()
+            delay = self.latency.sample() + self.latency.transfer_time(size, upload)
+            issued = self._token_issued.get(token)
+        time.sleep(delay)
+
+        if token is not None:
+            expired = issued is None or (self.token_lifetime is not None and time.monotonic() - issued > self.token_lifetime)
+            if expired or roll < self.expired_token_rate:
+                self._count('expired_tokens')
+                return 'expired_token'
+            roll -= self.expired_token_rate
+        if roll < self.rate_limit_rate:
+            self._count('rate_limited')
+            return 'rate_limit'
+        roll -= self.rate_limit_rate
+        if roll < self.server_error_rate:
+            self._count('server_errors')
+            return 'server_error'
+        return None
+
+    def dropbox_module(self):
+        """A stand-in for the dropbox module whose Dropbox(token) builds simulated clients"""
+        return SimpleNamespace(
+            files=fake_dropbox_module.files,
+            exceptions=fake_dropbox_module.exceptions,
+            Dropbox=lambda token: SimulatedDropboxClient(self, token)
+        )
+
+    def s3_client(self):
+        return SimulatedS3Client(self)
+
+    def describe(self):
+        """Settings and injected-fault counts, for the health endpoint"""
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'latency': self.latency.latency,
+                'upload_kbps': self.latency.upload_bytes_per_sec / 1024 if self.latency.upload_bytes_per_sec else None,
+                'download_kbps': self.latency.download_bytes_per_sec / 1024 if self.latency.download_bytes_per_sec else None,
+                'rate_limit_rate': self.rate_limit_rate,
+                'server_error_rate': self.server_error_rate,
+                'expired_token_rate': self.expired_token_rate,
+                'token_lifetime_seconds': self.token_lifetime,
+                'stats': dict(self.stats)
+            }
+
+
+class SimulatedDropboxClient:
+    """dropbox.Dropbox lookalike storing files under the simulator's root folder"""
+
+    PAGE_SIZE = 500
+
+    def __init__(self, simulator, token):
+        self.simulator = simulator
+        self.token = token
+        self._cursors = {}
+
+    def _raise_fault(self, fault):
+        request_id = f"sim-{self.simulator.stats['calls']}"
+        if fault == 'expired_token':
+            raise expired_token_error(request_id)
+        if fault == 'rate_limit':
+            raise RateLimitError(request_id, backoff=1.0)
+        if fault == 'server_error':
+            raise InternalServerError(request_id, 503, 'Service Unavailable')
+
+    def _local_path(self, path):
+        # Names keep their case, as Dropbox listings report them; the server always uses one spelling per key
+        return self.simulator.root / path.strip('/')
+
+    def users_get_current_account(self):
+        self._raise_fault(self.simulator.call(self.token))
+        return SimpleNamespace(email='simulated@example.com', name=SimpleNamespace(display_name='Simulated Account'))
+
+    def files_upload(self, data, path, mode=None):
+        self._raise_fault(self.simulator.call(self.token, len(data), upload=True))
+        local_path = self._local_path(path)
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = local_path.with_name(local_path.name + '.tmp')
+        temp_path.write_bytes(data)
+        temp_path.replace(local_path)
+        return FileMetadata(local_path.name, path, len(data), content_hash(data))
+
+    def files_delete(self, path):
+        self._raise_fault(self.simulator.call(self.token))
+        local_path = self._local_path(path)
+        if not local_path.exists():
+            raise path_not_found_error()
+        content = local_path.read_bytes()
+        local_path.unlink()
+        return FileMetadata(local_path.name, path, len(content), content_hash(content))
+
+    def files_download(self, path):
+        local_path = self._local_path(path)
+        size = local_path.stat().st_size if local_path.exists() else 0
+        self._raise_fault(self.simulator.call(self.token, size))
+        if not local_path.exists():
+            raise path_not_found_error()
+        content = local_path.read_bytes()
+        return FileMetadata(local_path.name, path, len(content), content_hash(content)), SimpleNamespace(content=content, status_code=200)
+
+    def files_list_folder(self, path):
+        self._raise_fault(self.simulator.call(self.token))
+        folder = self._local_path(path)
+        if not folder.is_dir():
+            raise path_not_found_error()
+        entries = [
+            FileMetadata(child.name, f"{path.rstrip('/')}/{child.name}", child.stat().st_size, content_hash(child.read_bytes()))
+            for child in sorted(folder.iterdir())
+            if child.is_file() and not child.name.endswith('.tmp')
+        ]
+        return self._page(entries)
+
+    def files_list_folder_continue(self, cursor):
+        self._raise_fault(self.simulator.call(self.token))
+        return self._page(self._cursors.pop(cursor))
+
+    def _page(self, entries):
+        page, rest = entries[:self.PAGE_SIZE], entries[self.PAGE_SIZE:]
+        cursor = None
+        if rest:
+            cursor = f"cursor-{id(rest)}"
+            self._cursors[cursor] = rest
+        return SimpleNamespace(entries=page, has_more=bool(rest), cursor=cursor)
+
+
+class SimulatedS3Client:
+    """boto3 S3 client lookalike storing objects under the simulator's root folder
+
+    Faults surface as botocore ClientErrors with the codes S3 uses: SlowDown
+    (503) for throttling, ServiceUnavailable (503) and ExpiredToken (400).
+    """
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.client_error = client_error_class()
+
+        class NoSuchKey(self.client_error):
+            pass
+
+        self.exceptions = SimpleNamespace(NoSuchKey=NoSuchKey, ClientError=self.client_error)
+
+    def _raise_fault(self, fault, operation):
+        codes = {
+            'rate_limit': ('SlowDown', 'Please reduce your request rate.', 503),
+            'server_error': ('ServiceUnavailable', 'Service is unable to handle request.', 503),
+            'expired_token': ('ExpiredToken', 'The provided token has expired.', 400),
+        }
+        if fault in codes:
+            code, message, status = codes[fault]
+            raise self.client_error({'Error': {'Code': code, 'Message': message},
+                               'ResponseMetadata': {'HTTPStatusCode': status}}, operation)
+
+    def _roll(self, operation, size=0, upload=False):
+        fault = self.simulator.call(None, size, upload)
+        # S3 credentials do not expire mid-session here; map the token fault rate onto ExpiredToken directly
+        if fault is None and self.simulator.rng.random() < self.simulator.expired_token_rate:
+            fault = 'expired_token'
+        self._raise_fault(fault, operation)
+
+    def _local_path(self, bucket, key):
+        return self.simulator.root / bucket / key
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._roll('PutObject', len(Body), upload=True)
+        local_path = self._local_path(Bucket, Key)
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = local_path.with_name(local_path.name + '.tmp')
+        temp_path.write_bytes(Body)
+        temp_path.replace(local_path)
+        return {'ETag': etag(Body)}
+
+    def get_object(self, Bucket, Key):
+        local_path = self._local_path(Bucket, Key)
+        self._roll('GetObject', local_path.stat().st_size if local_path.exists() else 0)
+        if not local_path.exists():
+            raise self.exceptions.NoSuchKey({'Error': {'Code': 'NoSuchKey', 'Message': 'The specified key does not exist.'},
+                                             'ResponseMetadata': {'HTTPStatusCode': 404}}, 'GetObject')
+        body = local_path.read_bytes()
+        return {'Body': SimpleNamespace(read=lambda: body), 'ContentLength': len(body)}
+
+    def delete_object(self, Bucket, Key):
+        self._roll('DeleteObject')
+        local_path = self._local_path(Bucket, Key)
+        if local_path.exists():
+            local_path.unlink()
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None):
+        """At most MaxKeys objects per call, after the key ContinuationToken names, as S3 pages listings"""
+        self._roll('ListObjectsV2')
+        bucket_root = self.simulator.root / Bucket
+        contents = []
+        if bucket_root.is_dir():
+            for child in sorted(bucket_root.rglob('*')):
+                key = child.relative_to(bucket_root).as_posix()
+                if child.is_file() and key.startswith(Prefix) and not key.endswith('.tmp'):
+                    if ContinuationToken is None or key > ContinuationToken:
+                        contents.append({'Key': key, 'Size': child.stat().st_size, 'ETag': etag(child.read_bytes())})
+        contents.sort(key=lambda obj: obj['Key'])
+        page = contents[:MaxKeys]
+        response = {'Contents': page, 'KeyCount': len(page), 'IsTruncated': len(contents) > MaxKeys}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]['Key']
+        return response
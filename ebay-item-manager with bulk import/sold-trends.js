@@ -1566,14 +1566,8 @@ class SoldItemsTrends {
                 const controller = new AbortController();
                 const timeoutId = setTimeout(() => controller.abort(), 5000);
                 
-                const response = await fetch(`http://127.0.0.1:5000/api/storage/get`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ key: storageKey }),
-                    signal: controller.signal
-                });
+                // Served from the store's /api/bootstrap response when it holds the key
+                const response = await window.storageWrapper.getFromBackend(storageKey, controller.signal);
                 
                 clearTimeout(timeoutId);
                 
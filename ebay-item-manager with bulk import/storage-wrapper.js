@@ -15,6 +15,7 @@ class StorageWrapper {
         this.pendingRequests = new Set(); // Track pending requests to prevent duplicates
         this.requestQueue = []; // Queue for rate limiting
         this.processingQueue = false;
+        this.bootstrapRequests = new Map(); // storeId -> promise of its /api/bootstrap response
         this.checkBackendAvailability();
     }
 
@@ -479,6 +480,59 @@ class StorageWrapper {
         }, 30000); // Check every 30 seconds
     }
 
+    // Every key of a store in one gzipped response, requested once per page load
+    // (null when it fails, is aborted through signal or takes over 5 seconds: the keys are then read one by one)
+    loadBootstrap(storeId, signal) {
+        if (!this.bootstrapRequests.has(storeId)) {
+            const url = `${this.backendUrl.replace('/storage', '/bootstrap')}/${encodeURIComponent(storeId)}`;
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 5000);
+            if (signal) {
+                if (signal.aborted) controller.abort();
+                signal.addEventListener('abort', () => controller.abort(), { once: true });
+            }
+            const request = fetch(url, { cache: 'no-cache', signal: controller.signal })
+                .then(response => response.ok ? response.json() : null)
+                .catch(() => null)
+                .finally(() => clearTimeout(timeoutId));
+            this.bootstrapRequests.set(storeId, request);
+        }
+        return this.bootstrapRequests.get(storeId);
+    }
+
+    // Drop-in for a POST to /api/storage/get: answered from the current store's bootstrap when it holds the key
+    async getFromBackend(key, signal) {
+        const storeId = window.storeManager ? window.storeManager.getCurrentStoreId() : null;
+        if (storeId) {
+            const bootstrap = await this.loadBootstrap(storeId, signal);
+            if (bootstrap && bootstrap.values && Object.prototype.hasOwnProperty.call(bootstrap.values, key)) {
+                // Used once, so a later read of the key sees saves made since the page loaded
+                const value = bootstrap.values[key];
+                delete bootstrap.values[key];
+                return new Response(JSON.stringify({ value }), {
+                    status: 200,
+                    headers: { 'Content-Type': 'application/json' }
+                });
+            }
+        }
+        return fetch(`${this.backendUrl}/get`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ key }),
+            signal
+        });
+    }
+
+    // Lets the server start loading a store the page is about to reload into
+    prefetchStore(storeId) {
+        if (!this.useBackend) return;
+        const url = `${this.backendUrl.replace('/storage', '/bootstrap')}/${encodeURIComponent(storeId)}/prefetch`;
+        // keepalive: the request must outlive the page that sends it
+        fetch(url, { method: 'POST', keepalive: true }).catch(() => {});
+    }
+
     /**
      * Force sync to backend, overriding existing data
      * Use this if you need to correct mistakes or overwrite backend data with localStorage data
@@ -0,0 +1,485 @@
+"""
+ListingLife Storage Compactor
+Scheduled background pass that removes dead data from the active backend and reports the bytes reclaimed
+
+Dead data builds up where no page load ever looks at it:
+- keys of deleted stores (ImportedItems_<store> and the other store-scoped
+  keys) when the browser's removals did not all reach the backend
+- shards no manifest refers to any more (see document_shards.py), left
+  behind when deleting a replaced shard failed
+- legacy uncompressed <key>.json copies beside the <key>.json.gz that is read
+  instead, and keys stored only in that legacy form
+- listing items whose categoryId matches no category (what script.js
+  cleanupOrphanedItems would otherwise leave to every page load)
+- sold-trends items the sold page discards as invalid
+
+The pass lists the backend once and then works through the keys in sorted
+batches, pausing between batches so requests keep most of the backend. After
+every batch the position and running totals are saved, so a restart resumes
+the pass instead of starting it over. Each change is made under the key's
+lock: documents are re-read there before they are rewritten, and a store's
+keys are deleted only if ListingLifeStores, re-read under the lock, still
+does not list it.
+
+A store's keys outlive it for MISSING_PASSES passes: a store only counts as
+deleted once it was missing from ListingLifeStores in that many passes, so a
+store list saved by a browser that had not loaded every store yet, or the old
+ids migrateStoreIdsIfNeeded keeps data under, do not cost anyone their data.
+Orphaned listing items are found on a read without the lock; the document is
+then re-read from the backend under the lock and rewritten only if its
+categories are still the ones the items were checked against.
+
+By default the scheduled job only reports: scheduled passes are dry runs that
+remove nothing unless the server opts in with apply_scheduled. Passes asked
+for through request_run() apply their changes unless they are dry runs.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from document_shards import SHARD_SEPARATOR, is_manifest, is_shard_key, shard_keys
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_HOURS = 24.0
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_BATCH_PAUSE = 1.0
+# The first scheduled pass after startup waits this long, so it never competes with the initial sync
+STARTUP_DELAY = 300.0
+MAX_ERRORS_KEPT = 20
+# Passes a store must be missing from ListingLifeStores in before its keys are deleted
+MISSING_PASSES = 2
+
+# Keys the store manager removes when a store is deleted (<name>_<store id>), plus PendingItems
+STORE_SCOPED_KEYS = ('EbayListingLife', 'SoldItemsTrends', 'ListingLifeSettings', 'eBayItemManager', 'ImportedItems', 'PendingItems')
+
+ACTIONS = ('stale_store_keys', 'orphaned_shards', 'legacy_copies', 'compressed', 'orphaned_listings', 'invalid_sold_items')
+
+
+def store_scope(key):
+    """(key name, store id) for a store-scoped key, else None"""
+    name, _, store_id = key.partition('_')
+    if name in STORE_SCOPED_KEYS and store_id and SHARD_SEPARATOR not in store_id:
+        return name, store_id
+    return None
+
+
+def listing_category_ids(document):
+    """Ids of a listing document's categories, or None if it has none (or is not a listing document)"""
+    if not isinstance(document, dict) or not isinstance(document.get('categories'), list):
+        return None
+    return frozenset(category.get('id') for category in document['categories'] if isinstance(category, dict)) or None
+
+
+def drop_orphaned_listings(document):
+    """Copy of a listing document without items whose categoryId matches no category; returns (document, removed)
+
+    A document with no categories at all is left alone: that is more likely a
+    damaged save than a store whose every category was deleted.
+    """
+    category_ids = listing_category_ids(document)
+    items = document.get('items') if category_ids else None
+    if not isinstance(items, list):
+        return document, 0
+    kept = [item for item in items
+            if not isinstance(item, dict) or item.get('categoryId') is None or item.get('categoryId') in category_ids]
+    if len(kept) == len(items):
+        return document, 0
+    return dict(document, items=kept), len(items) - len(kept)
+
+
+def _sold_item_is_valid(item):
+    """What sold-trends.js normalizeSubcategoryItem keeps: an object whose Number(price) is finite and not negative"""
+    if not isinstance(item, dict):
+        return False
+    price = item.get('price')
+    if price is None or isinstance(price, bool):
+        return True  # Number(null) and Number(false) are 0
+    if isinstance(price, str):
+        price = price.strip() or 0
+    try:
+        price = float(price)
+    except (TypeError, ValueError):
+        return False
+    return price >= 0 and price != float('inf')
+
+
+def drop_invalid_sold_items(document):
+    """Copy of a sold-trends document without subcategory items the sold page discards; returns (document, removed)"""
+    if not isinstance(document, dict) or not isinstance(document.get('periods'), list):
+        return document, 0
+    removed = 0
+
+    def clean_subcategory(subcategory):
+        nonlocal removed
+        items = subcategory.get('items') if isinstance(subcategory, dict) else None
+        if not isinstance(items, list):
+            return subcategory
+        kept = [item for item in items if _sold_item_is_valid(item)]
+        if len(kept) == len(items):
+            return subcategory
+        removed += len(items) - len(kept)
+        return dict(subcategory, items=kept)
+
+    def clean_category(category):
+        if not isinstance(category, dict) or not isinstance(category.get('subcategories'), list):
+            return category
+        return dict(category, subcategories=[clean_subcategory(sub) for sub in category['subcategories']])
+
+    def clean_period(period):
+        if not isinstance(period, dict) or not isinstance(period.get('categories'), list):
+            return period
+        return dict(period, categories=[clean_category(category) for category in period['categories']])
+
+    cleaned = dict(document, periods=[clean_period(period) for period in document['periods']])
+    return (cleaned, removed) if removed else (document, 0)
+
+
+class StorageCompactor:
+    """Runs compaction passes on a schedule (or on request) over one backend
+
+    The server passes the backend as callables, so this module does not depend
+    on which one is configured:
+
+        list_objects() -> {key: {'size': bytes of the copy reads use, 'legacy': bytes of a legacy uncompressed copy}}
+            ('size' is 0 for a key stored only in legacy form)
+        store_ids() -> ids in ListingLifeStores read from the backend (not a cache), or None if they cannot be read
+        load_object(key) -> the stored object (a sharded document's manifest)
+        load_document(key) -> the document, read from the backend (not a cache)
+        save_document(key, value) -> stored bytes, estimated; delete_key(key) removes a key and its shards
+        delete_object(key) removes one stored object; delete_legacy(key) removes a key's legacy copy
+        compress(key) -> stored bytes after rewriting a legacy-only key compressed
+        hold(key) -> context manager serializing with writes to the key
+        stored_size(value) -> bytes the value takes when stored
+        blocked() -> reason the backend must not be compacted now (None when it may)
+    """
+
+    def __init__(self, state_dir, backend, list_objects, store_ids, load_object, load_document, save_document,
+                 delete_key, delete_object, delete_legacy, compress, hold, stored_size, blocked,
+                 interval_hours=DEFAULT_INTERVAL_HOURS, batch_size=DEFAULT_BATCH_SIZE, batch_pause=DEFAULT_BATCH_PAUSE,
+                 apply_scheduled=False):
+        self.state_dir = state_dir
+        self.state_file = state_dir / 'state.json'
+        self.backend = backend
+        self.list_objects = list_objects
+        self.store_ids = store_ids
+        self.load_object = load_object
+        self.load_document = load_document
+        self.save_document = save_document
+        self.delete_key = delete_key
+        self.delete_object = delete_object
+        self.delete_legacy = delete_legacy
+        self.compress = compress
+        self.hold = hold
+        self.stored_size = stored_size
+        self.blocked = blocked
+        self.interval = max(0.0, float(interval_hours)) * 3600
+        self.batch_size = max(1, int(batch_size))
+        self.batch_pause = max(0.0, float(batch_pause))
+        # Scheduled passes only report unless this is set; passes asked for through request_run() say themselves
+        self.apply_scheduled = bool(apply_scheduled)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self._requested = None  # {'dry_run': bool} of a pass asked for through request_run()
+        self._next_run = time.time() + STARTUP_DELAY
+        self.running = False
+        # The pass in progress (or the last one), saved after every batch
+        self.report = None
+        self.last_report = None
+        # Store id -> passes in a row it was missing from ListingLifeStores while its keys were still stored
+        self.missing_stores = {}
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read compaction state {self.state_file}, starting fresh: {e}")
+            return
+        if state.get('backend') != self.backend:
+            return
+        self.last_report = state.get('last_report')
+        self.missing_stores = state.get('missing_stores') or {}
+        unfinished = state.get('report')
+        if unfinished and unfinished.get('state') == 'running':
+            # Interrupted by a restart; resumed once the startup delay has passed
+            self.report = unfinished
+            self._requested = {'dry_run': unfinished.get('dry_run', False), 'resume': True}
+        elif self.last_report and self.last_report.get('finished_at') and self.interval:
+            self._next_run = max(self._next_run, self.last_report['finished_at'] + self.interval)
+
+    def _save_state(self):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        temp_file = self.state_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'backend': self.backend, 'report': self.report, 'last_report': self.last_report,
+                       'missing_stores': self.missing_stores}, f, separators=(',', ':'))
+        temp_file.replace(self.state_file)
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='compaction', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop after the key being compacted; an unfinished pass resumes on the next start"""
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def request_run(self, dry_run=False):
+        """Start a pass now (dry_run reports what would be reclaimed without changing anything); False if one is running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._requested = {'dry_run': bool(dry_run)}
+            self._next_run = 0.0
+            self._wake.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopping:
+                    due = self._requested is not None or self.interval > 0
+                    delay = self._next_run - time.time()
+                    if due and delay <= 0:
+                        break
+                    self._wake.wait(delay if due else None)
+                if self._stopping:
+                    return
+                request = self._requested or {'dry_run': not self.apply_scheduled}
+            reason = self.blocked()
+            if reason:
+                logger.info(f"🧹 Compaction postponed: {reason}")
+                with self._lock:
+                    self._next_run = time.time() + min(STARTUP_DELAY, self.interval or STARTUP_DELAY)
+                continue
+            with self._lock:
+                self._requested = None
+            self.run(dry_run=request['dry_run'], resume=request.get('resume', False))
+            with self._lock:
+                if self._requested is None:
+                    self._next_run = time.time() + self.interval if self.interval else float('inf')
+
+    def run(self, dry_run=False, resume=False):
+        """One compaction pass; returns its report"""
+        with self._lock:
+            self.running = True
+        try:
+            resuming = resume and self.report and self.report.get('state') == 'running'
+            if not resuming:
+                self.report = {
+                    'state': 'running', 'dry_run': dry_run, 'started': datetime.now().isoformat(), 'finished': None,
+                    'finished_at': None, 'cursor': None, 'scanned': 0, 'total': 0, 'reclaimed_bytes': 0,
+                    'actions': {action: 0 for action in ACTIONS}, 'bytes': {action: 0 for action in ACTIONS},
+                    'errors': []
+                }
+            report = self.report
+            started = time.monotonic()
+            objects = self.list_objects()
+            store_ids = self.store_ids()
+            if not resuming:
+                # A resumed pass was counted when it started
+                self._count_missing_stores(objects, store_ids)
+            deleted_stores = {store_id for store_id, passes in self.missing_stores.items() if passes >= MISSING_PASSES}
+            report['missing_stores'] = dict(self.missing_stores)
+            keys = sorted(key for key in objects if report['cursor'] is None or key > report['cursor'])
+            report['total'] = report['scanned'] + len(keys)
+            logger.info(f"🧹 Compacting {self.backend}: {len(keys)} object(s) to scan"
+                        f"{' (dry run)' if report['dry_run'] else ''}")
+
+            shards_of = {}
+            for key in objects:
+                if is_shard_key(key):
+                    shards_of.setdefault(key.split(SHARD_SEPARATOR, 1)[0], []).append(key)
+            # Shards are handled along with their document (or with each other when the document is gone)
+            done = {key for key in objects if is_shard_key(key) and key.split(SHARD_SEPARATOR, 1)[0] in objects}
+            for start in range(0, len(keys), self.batch_size):
+                batch = keys[start:start + self.batch_size]
+                reached = self._compact_batch(batch, objects, shards_of, deleted_stores, report, done)
+                if reached:
+                    report['cursor'] = batch[reached - 1]
+                    report['scanned'] += reached
+                self._save_state()
+                if self._stopping:
+                    logger.info(f"🧹 Compaction paused at {report['cursor']}")
+                    return report
+                time.sleep(self.batch_pause)
+
+            report.update(state='completed', finished=datetime.now().isoformat(), finished_at=time.time(),
+                          elapsed_seconds=round(time.monotonic() - started, 2))
+            self.last_report, self.report = report, None
+            self._save_state()
+            logger.info(f"🧹 Compaction of {self.backend} finished: {report['reclaimed_bytes']} bytes "
+                        f"{'reclaimable' if report['dry_run'] else 'reclaimed'}, actions {report['actions']}")
+            return report
+        except Exception as e:
+            logger.error(f"Compaction of {self.backend} failed: {e}")
+            if self.report:
+                self.report.update(state='failed', error=str(e), finished=datetime.now().isoformat(), finished_at=time.time())
+                self.last_report, self.report = self.report, None
+                self._save_state()
+            return self.last_report
+        finally:
+            with self._lock:
+                self.running = False
+
+    def _count_missing_stores(self, objects, store_ids):
+        """Count this pass for every store whose keys are stored but which ListingLifeStores does not list"""
+        if not store_ids:
+            return  # The store list could not be read: this pass tells nothing about which stores are gone
+        missing = set()
+        for key in objects:
+            scope = store_scope(key)
+            if scope and scope[1] not in store_ids:
+                missing.add(scope[1])
+        # A store listed again (or whose keys are gone) starts over
+        self.missing_stores = {store_id: self.missing_stores.get(store_id, 0) + 1 for store_id in sorted(missing)}
+
+    def _record(self, report, action, count, reclaimed):
+        report['actions'][action] += count
+        report['bytes'][action] += reclaimed
+        report['reclaimed_bytes'] += reclaimed
+
+    def _compact_batch(self, batch, objects, shards_of, deleted_stores, report, done):
+        """Compact a batch of keys; returns how many were reached before a stop"""
+        for position, key in enumerate(batch):
+            if self._stopping:
+                return position
+            if key in done:
+                continue
+            try:
+                if is_shard_key(key):
+                    document_key = key.split(SHARD_SEPARATOR, 1)[0]
+                    done.update(shards_of[document_key])
+                    with self.hold(document_key):
+                        self._compact_shards(document_key, shards_of[document_key], objects, report)
+                else:
+                    self._compact_key(key, objects, shards_of.get(key, []), deleted_stores, report)
+            except Exception as e:
+                logger.warning(f"Could not compact {key}: {e}")
+                if len(report['errors']) < MAX_ERRORS_KEPT:
+                    report['errors'].append({'key': key, 'error': str(e)})
+        return len(batch)
+
+    def _object_bytes(self, objects, key):
+        info = objects.get(key) or {}
+        return info.get('size', 0) + info.get('legacy', 0)
+
+    def _compact_shards(self, document_key, shards, objects, report):
+        """Delete the listed shards of document_key that its manifest does not refer to (caller holds its lock)"""
+        manifest = self.load_object(document_key)
+        referenced = set(shard_keys(manifest)) if is_manifest(manifest) else set()
+        for shard_key in shards:
+            if shard_key in referenced:
+                continue
+            if not report['dry_run']:
+                self.delete_object(shard_key)
+            self._record(report, 'orphaned_shards', 1, self._object_bytes(objects, shard_key))
+
+    def _delete_store_key(self, key, store_id, objects, shards, deleted_stores, report):
+        """Delete a key of a deleted store with its shards; False if the store turned out to be listed again"""
+        with self.hold(key):
+            if not report['dry_run']:
+                # Read again now that no write to the key can land: a store added back since the pass began keeps its data
+                listed = self.store_ids()
+                if listed is None or store_id in listed:
+                    deleted_stores.discard(store_id)
+                    with self._lock:
+                        self.missing_stores.pop(store_id, None)
+                    return False
+                self.delete_key(key)
+        self._record(report, 'stale_store_keys', 1, sum(self._object_bytes(objects, k) for k in [key] + shards))
+        return True
+
+    def _compact_key(self, key, objects, shards, deleted_stores, report):
+        scope = store_scope(key)
+        if scope and scope[1] in deleted_stores:
+            if self._delete_store_key(key, scope[1], objects, shards, deleted_stores, report):
+                return
+
+        info = objects[key]
+        if info.get('legacy') and info.get('size'):
+            with self.hold(key):
+                if not report['dry_run']:
+                    self.delete_legacy(key)
+            self._record(report, 'legacy_copies', 1, info['legacy'])
+        elif info.get('legacy'):
+            with self.hold(key):
+                after = self.stored_size(self.load_object(key)) if report['dry_run'] else self.compress(key)
+            self._record(report, 'compressed', 1, max(0, info['legacy'] - after))
+
+        name = scope[0] if scope else key
+        if name == 'EbayListingLife':
+            self._compact_listings(key, shards, objects, report)
+            return
+        if name != 'SoldItemsTrends':
+            if shards:
+                with self.hold(key):
+                    self._compact_shards(key, shards, objects, report)
+            return
+        with self.hold(key):
+            # Before the document is cleaned, whose save deletes the shards it replaces itself
+            self._compact_shards(key, shards, objects, report)
+            document = self.load_document(key)
+            cleaned, removed = drop_invalid_sold_items(document)
+            if not removed:
+                return
+            before = self.stored_size(document)
+            after = self.stored_size(cleaned) if report['dry_run'] else self.save_document(key, cleaned)
+        logger.info(f"🧹 {key}: {'would drop' if report['dry_run'] else 'dropped'} {removed} invalid sold items")
+        self._record(report, 'invalid_sold_items', removed, max(0, before - after))
+
+    def _compact_listings(self, key, shards, objects, report):
+        """Drop the listing items of deleted categories, unless the categories change before the rewrite"""
+        if shards:
+            with self.hold(key):
+                self._compact_shards(key, shards, objects, report)
+        # Checked without the lock, so a long scan does not hold up the key's writes
+        scanned = self.load_document(key)
+        _, removed = drop_orphaned_listings(scanned)
+        if not removed:
+            return
+        with self.hold(key):
+            document = self.load_document(key)
+            if listing_category_ids(document) != listing_category_ids(scanned):
+                logger.info(f"🧹 {key}: categories changed during the pass, orphaned items left for the next one")
+                return
+            cleaned, removed = drop_orphaned_listings(document)
+            if not removed:
+                return
+            before = self.stored_size(document)
+            after = self.stored_size(cleaned) if report['dry_run'] else self.save_document(key, cleaned)
+        logger.info(f"🧹 {key}: {'would drop' if report['dry_run'] else 'dropped'} {removed} orphaned listing items")
+        self._record(report, 'orphaned_listings', removed, max(0, before - after))
+
+    def describe(self):
+        with self._lock:
+            next_run = None
+            if self._requested is not None or self.interval:
+                next_run = datetime.fromtimestamp(max(self._next_run, time.time())).isoformat()
+            return {
+                'backend': self.backend,
+                'running': self.running,
+                'interval_hours': self.interval / 3600,
+                'apply_scheduled': self.apply_scheduled,
+                'missing_stores': dict(self.missing_stores),
+                'next_run': next_run,
+                'current': self.report,
+                'last': self.last_report,
+            }
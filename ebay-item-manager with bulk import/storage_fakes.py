@@ -0,0 +1,238 @@
+"""
+ListingLife Storage Fakes
+In-process stand-ins for the boto3 S3 client and the dropbox SDK, for benchmarks and offline runs
+
+Only the calls and exception shapes storage_server.py uses are provided.
+"""
+import hashlib
+import threading
+from types import SimpleNamespace
+
+
+class FakeS3Client:
+    """Dict-backed S3 client supporting put_object, get_object, delete_object and list_objects_v2"""
+
+    class _NoSuchKey(Exception):
+        pass
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+        self.exceptions = SimpleNamespace(NoSuchKey=self._NoSuchKey)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[(Bucket, Key)] = bytes(Body)
+        return {'ETag': etag(Body)}
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise self._NoSuchKey(f"An error occurred (NoSuchKey) when calling the GetObject operation: {Key}")
+        return {'Body': SimpleNamespace(read=lambda: body), 'ContentLength': len(body)}
+
+    def delete_object(self, Bucket, Key):
+        # S3 reports success whether or not the key existed
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix=''):
+        with self._lock:
+            contents = [
+                {'Key': key, 'Size': len(body), 'ETag': etag(body)}
+                for (bucket, key), body in sorted(self.objects.items())
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        return {'Contents': contents, 'KeyCount': len(contents)}
+
+
+def etag(body):
+    """S3's ETag for a single-part upload: the quoted MD5 of the body"""
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def content_hash(content):
+    """Stands in for Dropbox's content_hash: any digest that changes with the content will do"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class _LookupError:
+    """The `error.get_path()` value of a dropbox path ApiError"""
+
+    def __init__(self, not_found):
+        self._not_found = not_found
+
+    def is_not_found(self):
+        return self._not_found
+
+
+class _DropboxError:
+    """The `error` attribute of dropbox ApiError/AuthError exceptions"""
+
+    def __init__(self, tag, path_not_found=False):
+        self.tag = tag
+        self._path_not_found = path_not_found
+
+    def is_path(self):
+        return self.tag == 'path'
+
+    def get_path(self):
+        return _LookupError(self._path_not_found)
+
+    def is_expired(self):
+        return self.tag == 'expired_access_token'
+
+    def __repr__(self):
+        return f"{self.tag!r}"
+
+
+class ApiError(Exception):
+    """Same constructor and attributes as dropbox.exceptions.ApiError"""
+
+    def __init__(self, request_id, error, user_message_text, user_message_locale):
+        super().__init__(request_id, error, user_message_text, user_message_locale)
+        self.request_id = request_id
+        self.error = error
+        self.user_message_text = user_message_text
+        self.user_message_locale = user_message_locale
+
+    def __str__(self):
+        return f"ApiError({self.request_id!r}, {self.error!r})"
+
+
+class AuthError(Exception):
+    """Same constructor and attributes as dropbox.exceptions.AuthError"""
+
+    def __init__(self, request_id, error):
+        super().__init__(request_id, error)
+        self.request_id = request_id
+        self.error = error
+
+    def __str__(self):
+        return f"AuthError({self.request_id!r}, {self.error!r})"
+
+
+class RateLimitError(Exception):
+    """Same constructor and attributes as dropbox.exceptions.RateLimitError"""
+
+    def __init__(self, request_id, error=None, backoff=None):
+        super().__init__(request_id, error, backoff)
+        self.request_id = request_id
+        self.error = error
+        self.backoff = backoff
+
+    def __str__(self):
+        return f"RateLimitError({self.request_id!r}, 'too_many_requests', backoff={self.backoff})"
+
+
+class InternalServerError(Exception):
+    """Same constructor and attributes as dropbox.exceptions.InternalServerError"""
+
+    def __init__(self, request_id, status_code, body):
+        super().__init__(request_id, status_code, body)
+        self.request_id = request_id
+        self.status_code = status_code
+        self.body = body
+
+    def __str__(self):
+        return f"InternalServerError({self.request_id!r}, {self.status_code}, {self.body!r})"
+
+
+class FileMetadata:
+    """Listing/upload result with the attributes storage_server.py reads"""
+
+    def __init__(self, name, path_display, size, content_hash=None):
+        self.name = name
+        self.path_display = path_display
+        self.path_lower = path_display.lower()
+        self.size = size
+        self.content_hash = content_hash
+
+
+class WriteMode:
+    """Accepts the WriteMode('overwrite') argument of files_upload"""
+
+    def __init__(self, tag, value=None):
+        self._tag = tag
+        self._value = value
+
+
+def path_not_found_error(request_id='fake'):
+    """The ApiError files_download raises for a missing file"""
+    return ApiError(request_id, _DropboxError('path', path_not_found=True), None, None)
+
+
+def expired_token_error(request_id='fake'):
+    """The AuthError raised once an access token has expired"""
+    return AuthError(request_id, _DropboxError('expired_access_token'))
+
+
+# Module-shaped namespace standing in for `import dropbox`
+fake_dropbox_module = SimpleNamespace(
+    files=SimpleNamespace(WriteMode=WriteMode, FileMetadata=FileMetadata),
+    exceptions=SimpleNamespace(
+        ApiError=ApiError,
+        AuthError=AuthError,
+        RateLimitError=RateLimitError,
+        InternalServerError=InternalServerError
+    ),
+)
+
+
+class FakeDropboxClient:
+    """Dict-backed Dropbox client supporting upload, download, delete and paged folder listing"""
+
+    PAGE_SIZE = 500
+
+    def __init__(self):
+        self.files = {}
+        self._lock = threading.Lock()
+        self._cursors = {}
+
+    def users_get_current_account(self):
+        return SimpleNamespace(email='fake@example.com', name=SimpleNamespace(display_name='Fake Account'))
+
+    def files_upload(self, data, path, mode=None):
+        with self._lock:
+            self.files[path.lower()] = (path, bytes(data))
+        return FileMetadata(path.rsplit('/', 1)[-1], path, len(data), content_hash(data))
+
+    def files_delete(self, path):
+        with self._lock:
+            entry = self.files.pop(path.lower(), None)
+        if entry is None:
+            raise path_not_found_error()
+        display_path, content = entry
+        return FileMetadata(display_path.rsplit('/', 1)[-1], display_path, len(content), content_hash(content))
+
+    def files_download(self, path):
+        with self._lock:
+            entry = self.files.get(path.lower())
+        if entry is None:
+            raise path_not_found_error()
+        display_path, content = entry
+        metadata = FileMetadata(display_path.rsplit('/', 1)[-1], display_path, len(content), content_hash(content))
+        return metadata, SimpleNamespace(content=content, status_code=200)
+
+    def files_list_folder(self, path):
+        prefix = path.lower().rstrip('/') + '/'
+        with self._lock:
+            entries = [
+                FileMetadata(display_path.rsplit('/', 1)[-1], display_path, len(content), content_hash(content))
+                for lowered, (display_path, content) in sorted(self.files.items())
+                if lowered.startswith(prefix) and '/' not in lowered[len(prefix):]
+            ]
+        return self._page(entries)
+
+    def files_list_folder_continue(self, cursor):
+        return self._page(self._cursors.pop(cursor))
+
+    def _page(self, entries):
+        page, rest = entries[:self.PAGE_SIZE], entries[self.PAGE_SIZE:]
+        cursor = None
+        if rest:
+            cursor = f"cursor-{id(rest)}"
+            self._cursors[cursor] = rest
+        return SimpleNamespace(entries=page, has_more=bool(rest), cursor=cursor)
@@ -0,0 +1,213 @@
+"""
+ListingLife Storage Migration
+Copies every key from one storage backend to another on a bounded worker pool, resumably
+
+The server (or migrate_storage.py) describes each backend as a MigrationEndpoint
+built from its load_from_*/save_to_* functions. When both ends keep keys as
+.json.gz objects (S3 and Dropbox) the compressed bytes are copied as they are,
+without decompressing and re-encoding. Every copied key is recorded with its
+content hash in a checkpoint file, so an interrupted migration resumes where it
+stopped: a checkpointed key is read from the source again and only skipped if
+its hash is unchanged. With verification on the hash is also checked against a
+read-back of the target.
+
+Nothing here takes the server's key locks, so the target must not be a backend
+a running server is writing to (the server refuses such a migration).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 32
+CHECKPOINT_INTERVAL = 1.0
+
+
+class MigrationError(Exception):
+    pass
+
+
+class MigrationEndpoint:
+    """One side of a migration
+
+    list_keys() returns every key; load(key)/save(key, value) move decoded values.
+    read_compressed(key)/write_compressed(key, data) are given for backends that
+    store .json.gz objects; read_compressed returns None when a key has no
+    compressed copy (legacy uncompressed files), which falls back to load().
+    """
+
+    def __init__(self, name, list_keys, load, save, read_compressed=None, write_compressed=None):
+        self.name = name
+        self.list_keys = list_keys
+        self.load = load
+        self.save = save
+        self.read_compressed = read_compressed
+        self.write_compressed = write_compressed
+
+
+def value_hash(value):
+    """SHA-256 of a value's canonical JSON, equal for equal values whatever their key order"""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class MigrationJob:
+    """Copies all keys from source to target, recording progress in checkpoint_file"""
+
+    def __init__(self, source, target, checkpoint_file, workers=DEFAULT_WORKERS, verify=True, on_copied=None):
+        self.source = source
+        self.target = target
+        self.checkpoint_file = checkpoint_file
+        self.workers = max(1, min(int(workers), MAX_WORKERS))
+        self.verify = verify
+        self.on_copied = on_copied
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_checkpoint = 0.0
+        self.completed = {}
+        self.failed = {}
+        self.status = {
+            'state': 'pending', 'source': source.name, 'target': target.name, 'workers': self.workers,
+            'verify': verify, 'total': 0, 'copied': 0, 'resumed': 0, 'failed': 0,
+            'bytes': 0, 'compressed_copies': 0, 'started': None, 'finished': None, 'error': None
+        }
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return
+        if checkpoint.get('source') != self.source.name or checkpoint.get('target') != self.target.name:
+            raise MigrationError(f"Checkpoint {self.checkpoint_file} belongs to a different migration")
+        self.completed = checkpoint.get('completed', {})
+
+    def _save_checkpoint(self, force=False):
+        """Write progress to disk, at most once per CHECKPOINT_INTERVAL unless forced (caller holds the lock)"""
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint < CHECKPOINT_INTERVAL:
+            return
+        self._last_checkpoint = now
+        self.checkpoint_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.checkpoint_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': self.source.name,
+                'target': self.target.name,
+                'updated': datetime.now().isoformat(),
+                'completed': self.completed,
+                'failed': self.failed
+            }, f, separators=(',', ':'))
+        temp_file.replace(self.checkpoint_file)
+
+    def reset(self):
+        """Forget a previous run's progress so every key is copied again"""
+        if self.checkpoint_file.exists():
+            self.checkpoint_file.unlink()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='storage-migration', daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for a started migration; returns True once it has finished"""
+        if self._thread:
+            self._thread.join(timeout)
+        return not self.running
+
+    def run(self):
+        """Copy every key not already checkpointed at its current hash; returns True if none failed"""
+        self.status.update(state='running', started=datetime.now().isoformat())
+        started = time.monotonic()
+        try:
+            self._load_checkpoint()
+            keys = self.source.list_keys()
+            checkpointed = sum(1 for key in keys if key in self.completed)
+            self.status.update(total=len(keys))
+            logger.info(f"🚚 Migrating {len(keys)} key(s) from {self.source.name} to {self.target.name} "
+                        f"({checkpointed} checkpointed, copied again only if changed; {self.workers} workers)")
+
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='migrate') as pool:
+                futures = {pool.submit(self._copy_key, key, self.completed.get(key)): key for key in keys}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        digest, size, compressed = future.result()
+                    except Exception as e:
+                        with self._lock:
+                            self.failed[key] = str(e)
+                            self.status['failed'] += 1
+                            self._save_checkpoint()
+                        logger.error(f"Error migrating {key}: {e}")
+                        continue
+                    if digest is None:
+                        with self._lock:
+                            self.failed.pop(key, None)
+                            self.status['resumed'] += 1
+                        continue
+                    with self._lock:
+                        self.completed[key] = digest
+                        self.failed.pop(key, None)
+                        self.status['copied'] += 1
+                        self.status['bytes'] += size
+                        self.status['compressed_copies'] += int(compressed)
+                        self._save_checkpoint()
+                    if self.on_copied:
+                        self.on_copied(key)
+
+            with self._lock:
+                self._save_checkpoint(force=True)
+            self.status['state'] = 'completed' if not self.failed else 'completed_with_errors'
+        except Exception as e:
+            self.status.update(state='failed', error=str(e))
+            logger.error(f"Migration from {self.source.name} to {self.target.name} failed: {e}")
+        self.status['finished'] = datetime.now().isoformat()
+        self.status['elapsed_seconds'] = round(time.monotonic() - started, 2)
+        logger.info(f"🚚 Migration {self.status['state']}: {self.status['copied']} copied, "
+                    f"{self.status['failed']} failed in {self.status['elapsed_seconds']}s")
+        return self.status['state'] == 'completed'
+
+    def _copy_key(self, key, checkpointed=None):
+        """Copy one key; returns (content hash, bytes moved, whether compressed bytes were copied as-is)
+
+        The hash is None when the source still hashes to checkpointed, the hash
+        recorded when an earlier run copied it, and nothing was copied.
+        """
+        if self.source.read_compressed and self.target.write_compressed:
+            data = self.source.read_compressed(key)
+            if data is not None:
+                digest = hashlib.sha256(data).hexdigest()
+                if digest == checkpointed:
+                    return None, 0, True
+                self.target.write_compressed(key, data)
+                if self.verify:
+                    copied = self.target.read_compressed(key)
+                    if copied is None or hashlib.sha256(copied).hexdigest() != digest:
+                        raise MigrationError(f"{key} on {self.target.name} does not match the source after copying")
+                return digest, len(data), True
+
+        value = self.source.load(key)
+        if value is None:
+            raise MigrationError(f"{key} could not be read from {self.source.name}")
+        digest = value_hash(value)
+        if digest == checkpointed:
+            return None, 0, False
+        self.target.save(key, value)
+        if self.verify and value_hash(self.target.load(key)) != digest:
+            raise MigrationError(f"{key} on {self.target.name} does not match the source after copying")
+        return digest, len(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')), False
+
+    def describe(self):
+        with self._lock:
+            return dict(self.status, failures=dict(list(self.failed.items())[:20]))
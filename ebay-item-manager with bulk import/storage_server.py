@@ -2,7 +2,7 @@
 ListingLife Storage Server
 Routes data from the browser app to local or cloud storage
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_from_directory
 from flask_cors import CORS
 import json
 import os
@@ -10,14 +10,129 @@ from datetime import datetime
 from pathlib import Path
 import logging
 import gzip
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from listing_stats import compute_lifetime_stats
+from pending_matcher import SubcategoryIndex
+from import_dedupe import ImportIdentityIndex, dedupe_rows
+from data_export import iter_listing_records, iter_sold_records, encode_records, gzip_chunks
+from version_history import VersionHistory, DEFAULT_SNAPSHOT_INTERVAL, DEFAULT_MAX_VERSIONS, DEFAULT_MAX_AGE_DAYS
+from server_metrics import metrics
+from request_profiler import RequestProfiler, PROFILE_HEADER, DEFAULT_KEEP_PROFILES
+from simulated_backend import NetworkSimulator
+from log_pipeline import configure_logging, stop_logging
+from tiered_replicator import TieredReplicator, DEFAULT_PUSH_DELAY, DEFAULT_PULL_INTERVAL
+from write_outbox import WriteOutbox
+from storage_migration import MigrationJob, MigrationEndpoint, DEFAULT_WORKERS as DEFAULT_MIGRATION_WORKERS
+from backend_handle import BackendHandle, ReadWriteLock, KeyLocks, SingleFlight
+from client_registry import ClientRegistry, DEFAULT_POOL_SIZE
+from document_shards import (split_document, assemble_document, shard_keys, is_sharded_key, is_shard_key,
+                             is_manifest, ShardError, SHARD_SEPARATOR)
+from pooled_server import serve, DEFAULT_THREADS as DEFAULT_SERVER_THREADS
+from streaming_ingest import JsonMemberReader, IngestError
+from worker_processes import SharedState, WORKERS_SUPPORTED, MAX_WORKERS, METRICS_PUBLISH_INTERVAL, write_atomically
+from store_analytics import StoreAnalytics, DEFAULT_WORKERS as DEFAULT_STATS_WORKERS
+from compact_records import RecordCache, document_schema, DEFAULT_MAX_RECORDS, DEFAULT_MAX_AGE as DEFAULT_RECORD_MAX_AGE
+from store_bootstrap import (WarmCache, StorePrefetcher, bootstrap_keys, encode_bootstrap, DEFAULT_PREFETCH_STORES,
+                             DEFAULT_CACHE_BYTES as DEFAULT_BOOTSTRAP_CACHE_BYTES, DEFAULT_MAX_AGE as DEFAULT_BOOTSTRAP_MAX_AGE,
+                             DEFAULT_REVALIDATE_AFTER as DEFAULT_BOOTSTRAP_REVALIDATE)
+from storage_compactor import StorageCompactor, DEFAULT_INTERVAL_HOURS as DEFAULT_COMPACTION_HOURS, DEFAULT_BATCH_SIZE as DEFAULT_COMPACTION_BATCH
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (queued to a background writer; reconfigured from the config file in initialize_storage)
+configure_logging()
 logger = logging.getLogger(__name__)
+# Per-key save/load lines, sampled separately via log_sampling {"storage_server.io": N}
+io_logger = logging.getLogger(f"{__name__}.io")
 
 app = Flask(__name__)
 CORS(app)  # Allow requests from browser
 
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and note when it started"""
+    g.metrics_started = time.perf_counter()
+    metrics.inc('listinglife_http_requests_in_flight')
+
+@app.after_request
+def record_request_metrics(response):
+    """Record latency and body sizes per route"""
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('listinglife_http_request_duration_seconds', time.perf_counter() - started,
+                        route=route, method=request.method, status=str(response.status_code))
+        if request.content_length:
+            metrics.inc('listinglife_http_request_bytes_total', request.content_length, route=route)
+        if not response.is_streamed and response.content_length:
+            metrics.inc('listinglife_http_response_bytes_total', response.content_length, route=route)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    """Requests leave the in-flight gauge even when a handler raised"""
+    metrics.inc('listinglife_http_requests_in_flight', -1)
+
+@app.before_request
+def follow_config_changes():
+    """Apply settings another worker process saved since this one last loaded them"""
+    if not shared_state or shared_state.config_generation() == applied_config_generation:
+        return None
+    with config_reload_lock:
+        if shared_state.config_generation() != applied_config_generation:
+            logger.info(f"🔄 Worker {WORKER_INDEX}: configuration saved by another worker, reloading it")
+            initialize_storage(background=True)
+    return None
+
+@app.before_request
+def wait_for_backend():
+    """Hold requests that need the storage backend until it has finished connecting"""
+    if backend_ready.is_set() or request.method == 'OPTIONS' or request.endpoint in BACKEND_INDEPENDENT_ENDPOINTS:
+        return None
+    if not backend_ready.wait(BACKEND_WAIT_SECONDS):
+        return jsonify({'error': 'Storage backend is still connecting', 'backend': BACKEND_STATE}), 503
+    return None
+
+@app.before_request
+def hold_backend():
+    """Keep the backend from being reconfigured while this request uses it"""
+    if request.method == 'OPTIONS' or request.endpoint in UNLOCKED_ENDPOINTS:
+        return None
+    backend_lock.acquire_read()
+    g.holds_backend = True
+    return None
+
+@app.teardown_request
+def release_backend(error=None):
+    """Let a waiting reconfiguration proceed once the request (or its streamed body) is done"""
+    if g.pop('holds_backend', False):
+        backend_lock.release_read()
+
+@app.before_request
+def start_request_profile():
+    """Profile the request if it was sampled, or asked for it while profiling is enabled"""
+    if request_profiler.enabled:
+        g.profile_session = request_profiler.start(PROFILE_HEADER in request.headers)
+
+@app.after_request
+def finish_request_profile(response):
+    """Save the request's profile and tell the caller where it went"""
+    session = g.pop('profile_session', None)
+    if session:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        summary = request_profiler.finish(session, request.method, route, response.status_code)
+        response.headers[PROFILE_HEADER + '-File'] = summary['file']
+        logger.info(f"Profiled {request.method} {route}: {summary['elapsed_ms']}ms -> {summary['file']}")
+    return response
+
+@app.teardown_request
+def abandon_request_profile(error=None):
+    """A request that raised before after_request still releases the profiler"""
+    session = g.pop('profile_session', None)
+    if session:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_profiler.finish(session, request.method, route, 500)
+
 # Global storage variables
 STORAGE_MODE = 'local'
 LOCAL_STORAGE_PATH = Path('./listinglife_data')
@@ -31,6 +146,105 @@ s3_client = None
 dropbox_client = None
 dropbox = None
 
+# Immutable snapshot of the globals above, replaced as a whole by publish_backend(). The backend
+# I/O functions read it because the outbox, replicator and migration threads call them without
+# holding backend_lock; request handlers hold the lock, so the globals cannot change under them
+backend = BackendHandle('local')
+# Read side held by every storage request, write side by initialize_storage and backend connects
+backend_lock = ReadWriteLock()
+# Writes to one key (save, version bump, history) run one at a time
+key_locks = KeyLocks()
+# Concurrent loads of one key (several tabs opening at once) share one download and parse
+backend_reads = SingleFlight(
+    on_call=lambda name, coalesced: metrics.inc('listinglife_backend_reads_total', backend=name,
+                                                result='coalesced' if coalesced else 'fetched')
+)
+# Only one thread refreshes an expired Dropbox token; the others reuse its new client
+token_refresh_lock = threading.Lock()
+versions_lock = threading.Lock()
+
+# Request threads of the pooled server (server_threads in the config)
+SERVER_THREADS = DEFAULT_SERVER_THREADS
+
+# Worker processes (server_workers in the config, read at startup); shared_state links them when there are several
+SERVER_WORKERS = 1
+WORKER_INDEX = None
+shared_state = None
+# Config generation (see worker_processes.py) this process last loaded
+applied_config_generation = 0
+config_reload_lock = threading.Lock()
+
+# S3/Dropbox clients and their keep-alive connection pools, reused while their settings are unchanged
+client_registry = ClientRegistry()
+
+# Store documents are saved as a manifest plus one object per category / sold period (see document_shards.py)
+SHARD_DOCUMENTS = True
+# Shards of one document are read and written in parallel against S3/Dropbox
+SHARD_IO_WORKERS = 8
+shard_pool = ThreadPoolExecutor(max_workers=SHARD_IO_WORKERS, thread_name_prefix='shards')
+
+# Per-key document versions, bumped on every write so derived caches know when to recompute
+# (kept in shared_state instead when there are worker processes)
+DOCUMENT_VERSIONS = {}
+LIFETIME_STATS_CACHE = {}
+PENDING_INDEX_CACHE = {}
+IMPORT_INDEX_CACHE = {}
+
+# Consolidated stats across stores, reduced per store in worker processes (see store_analytics.py)
+store_analytics = StoreAnalytics()
+
+# Listing and sold documents loaded from S3/Dropbox, held as typed columns (see compact_records.py)
+record_cache = RecordCache(DEFAULT_MAX_RECORDS)
+
+# Gzipped /api/bootstrap bodies, warmed in the background for the stores likely to be opened next (see store_bootstrap.py)
+bootstrap_cache = WarmCache()
+bootstrap_builds = SingleFlight()
+# The cloud/Dropbox listing bootstrap checks compare fingerprints against, shared for bootstrap_cache.revalidate_after seconds
+BOOTSTRAP_LISTING = {'mode': None, 'listed': 0.0, 'objects': {}}
+bootstrap_listing_lock = threading.Lock()
+# A store's keys are loaded together; shard_pool is not used, since each load may itself wait on shards there
+bootstrap_pool = ThreadPoolExecutor(max_workers=len(bootstrap_keys('')), thread_name_prefix='bootstrap')
+prefetcher = None
+
+# Version history of every key (kept on local disk whatever the storage mode)
+version_history = None
+
+# Latency/fault simulator standing in for Dropbox or S3 when STORAGE_MODE is 'simulated'
+network_simulator = None
+
+# In 'tiered' mode requests use the local folder and the replicator copies changes to and from REMOTE_MODE
+REMOTE_MODE = None
+replicator = None
+
+# Crash-safe queue of cloud/Dropbox writes that failed or were deferred during an outage
+outbox = None
+
+# Scheduled removal of dead keys, shards and records from the active backend (see storage_compactor.py)
+compactor = None
+
+# The most recent backend-to-backend migration started through /api/migrate
+migration_job = None
+MIGRATION_BACKENDS = ('local', 'cloud', 'dropbox')
+
+# Readiness of the storage backend, which may still be connecting in the background after startup
+BACKEND_STATE = {'state': 'ready', 'detail': None, 'since': None}
+backend_ready = threading.Event()
+backend_ready.set()
+backend_connect_thread = None
+# Requests that need the backend wait this long for it before getting a 503
+BACKEND_WAIT_SECONDS = 15
+# Endpoints that never touch the storage backend are served while it connects
+BACKEND_INDEPENDENT_ENDPOINTS = {
+    'health', 'get_storage_config', 'set_storage_config', 'test_storage', 'get_metrics',
+    'list_history', 'get_history_value', 'list_profiles', 'download_profile', 'get_migration'
+}
+# Endpoints that run without the backend read lock: they never touch the backend, or (config
+# changes, migrations) take the write lock themselves
+UNLOCKED_ENDPOINTS = BACKEND_INDEPENDENT_ENDPOINTS | {'start_migration'}
+
+# Request profiling is off unless enabled in the config; then PROFILE_HEADER asks for it per request
+request_profiler = RequestProfiler(LOCAL_STORAGE_PATH / '.profiles')
+
 # Get the directory where this script is located
 SCRIPT_DIR = Path(__file__).parent.absolute()
 CONFIG_FILE = SCRIPT_DIR / 'storage_config.json'
@@ -60,18 +274,57 @@ def save_config_file(config):
         logger.error(f"Error saving config file: {e}")
         return False
 
-def initialize_storage():
-    """Initialize storage based on current configuration"""
+def initialize_storage(background=False):
+    """Initialize storage based on current configuration
+    
+    With background=True the backend client is connected on a separate thread.
+    """
+    global applied_config_generation
+    # A connection still being made for the previous configuration finishes first
+    if backend_connect_thread and backend_connect_thread.is_alive():
+        backend_connect_thread.join()
+    if shared_state:
+        # Read before the config file, so a save made while this runs is loaded again
+        applied_config_generation = shared_state.config_generation()
+    # Requests in flight finish on the old backend; new ones wait until the new one is published
+    with backend_lock.write():
+        apply_storage_config(background)
+
+def apply_storage_config(background):
+    """Read the config and switch every backend global to it (caller holds the backend write lock)"""
     global STORAGE_MODE, LOCAL_STORAGE_PATH, CLOUD_BUCKET, DROPBOX_ACCESS_TOKEN, DROPBOX_REFRESH_TOKEN
-    global DROPBOX_APP_KEY, DROPBOX_APP_SECRET, DROPBOX_FOLDER
-    global s3_client, dropbox_client, dropbox
+    global DROPBOX_APP_KEY, DROPBOX_APP_SECRET, DROPBOX_FOLDER, SERVER_THREADS, SHARD_DOCUMENTS
+    global s3_client, dropbox_client, dropbox, version_history, request_profiler, network_simulator
+    global backend_connect_thread, REMOTE_MODE, replicator, outbox, compactor, prefetcher
+    
+    if compactor:
+        compactor.stop()
+        compactor = None
+    if prefetcher:
+        prefetcher.stop()
+        prefetcher = None
+    if replicator:
+        replicator.stop()
+        replicator = None
+    if outbox:
+        outbox.stop()
+        outbox = None
+    if version_history:
+        version_history.close()
+    
+    # Cached derivations belong to the previous backend
+    LIFETIME_STATS_CACHE.clear()
+    PENDING_INDEX_CACHE.clear()
+    IMPORT_INDEX_CACHE.clear()
+    store_analytics.clear()
+    record_cache.clear()
+    bootstrap_cache.clear()
+    BOOTSTRAP_LISTING.update(mode=None, listed=0.0, objects={})
     
     # First, try to load from config file (takes precedence over env vars)
     config = load_config_file()
-    requested_mode = None
     if config:
-        requested_mode = config.get('storage_mode', 'local').lower()
-        STORAGE_MODE = requested_mode
+        STORAGE_MODE = config.get('storage_mode', 'local').lower()
         LOCAL_STORAGE_PATH = Path(config.get('local_storage_path', './listinglife_data'))
         CLOUD_BUCKET = config.get('s3_bucket', None)
         DROPBOX_ACCESS_TOKEN = config.get('dropbox_access_token', None)
@@ -96,37 +349,244 @@ def initialize_storage():
         DROPBOX_FOLDER = os.getenv('DROPBOX_FOLDER', '/ListingLife')
         logger.info(f"Using environment variables for storage config: mode={STORAGE_MODE}")
     
+    # Version history and profiles live next to the local data folder in every mode
+    extra_config = config or {}
+    REMOTE_MODE = None
+    if STORAGE_MODE == 'tiered':
+        REMOTE_MODE = str(extra_config.get('tiered_remote', os.getenv('TIERED_REMOTE', 'dropbox'))).lower()
+        LOCAL_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Tiered storage: local tier at {LOCAL_STORAGE_PATH.absolute()}, replicating to {REMOTE_MODE}")
+    version_history = None
+    if extra_config.get('history_enabled', True):
+        version_history = VersionHistory(
+            LOCAL_STORAGE_PATH / '.history',
+            snapshot_interval=int(extra_config.get('history_snapshot_interval', DEFAULT_SNAPSHOT_INTERVAL)),
+            max_versions=int(extra_config.get('history_max_versions', DEFAULT_MAX_VERSIONS)),
+            max_age_days=int(extra_config.get('history_max_age_days', DEFAULT_MAX_AGE_DAYS)),
+            process_locks=shared_state
+        )
+    
+    request_profiler = RequestProfiler(
+        LOCAL_STORAGE_PATH / '.profiles',
+        enabled=bool(extra_config.get('profiling_enabled', False)),
+        sample_rate=float(extra_config.get('profiling_sample_rate', 0.0)),
+        memory=bool(extra_config.get('profiling_memory', False)),
+        keep=int(extra_config.get('profiling_keep', DEFAULT_KEEP_PROFILES))
+    )
+    
+    SERVER_THREADS = int(extra_config.get('server_threads', os.getenv('SERVER_THREADS', DEFAULT_SERVER_THREADS)))
+    SHARD_DOCUMENTS = bool(extra_config.get('shard_documents', True))
+    store_analytics.configure(extra_config.get('stats_workers', os.getenv('STATS_WORKERS', DEFAULT_STATS_WORKERS)))
+    record_cache.configure(extra_config.get('record_cache_records', DEFAULT_MAX_RECORDS),
+                           extra_config.get('record_cache_seconds', DEFAULT_RECORD_MAX_AGE))
+    bootstrap_cache.configure(
+        float(extra_config.get('bootstrap_cache_mb', DEFAULT_BOOTSTRAP_CACHE_BYTES / (1024 * 1024))) * 1024 * 1024,
+        extra_config.get('bootstrap_cache_seconds', DEFAULT_BOOTSTRAP_MAX_AGE),
+        extra_config.get('bootstrap_revalidate_seconds', DEFAULT_BOOTSTRAP_REVALIDATE)
+    )
+    # Every request thread can have a connection of its own
+    client_registry.configure(extra_config.get('backend_pool_size', os.getenv('BACKEND_POOL_SIZE', max(DEFAULT_POOL_SIZE, SERVER_THREADS))))
+    
+    configure_logging(
+        level=str(extra_config.get('log_level', 'INFO')).upper(),
+        json_output=bool(extra_config.get('log_json', False)),
+        sampling=extra_config.get('log_sampling')
+    )
+    
+    # Started now, but each pass waits until the backend is ready (see compaction_blocked)
+    compactor = create_compactor(extra_config)
+    compactor.start()
+    prefetcher = StorePrefetcher(warm_bootstrap, get_store_ids,
+                                 int(extra_config.get('bootstrap_prefetch_stores', DEFAULT_PREFETCH_STORES)))
+    prefetcher.start()
+    
+    # Simulated mode runs the Dropbox or S3 code paths against local disk (see simulated_backend.py)
+    network_simulator = None
+    if STORAGE_MODE == 'simulated' or REMOTE_MODE == 'simulated':
+        network_simulator = NetworkSimulator(extra_config.get('simulation'), LOCAL_STORAGE_PATH / '.simulated_remote')
+        if REMOTE_MODE:
+            REMOTE_MODE = network_simulator.backend
+        else:
+            STORAGE_MODE = network_simulator.backend
+        if network_simulator.backend == 'cloud':
+            s3_client = network_simulator.s3_client()
+            CLOUD_BUCKET = network_simulator.bucket
+            dropbox_client = None
+        else:
+            dropbox = network_simulator.dropbox_module()
+            DROPBOX_ACCESS_TOKEN = network_simulator.issue_token()
+            # Lets the save/load paths refresh expired tokens through the simulator
+            DROPBOX_REFRESH_TOKEN = DROPBOX_APP_KEY = DROPBOX_APP_SECRET = 'simulated'
+            dropbox_client = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+            s3_client = None
+        logger.info(f"🧪 Simulated {network_simulator.backend} storage at {network_simulator.root.absolute()}")
+        publish_backend()
+        if REMOTE_MODE:
+            replicator = create_replicator(extra_config)
+            replicator.start()
+        else:
+            start_outbox()
+        set_backend_state('ready')
+        return
+    
+    if REMOTE_MODE:
+        # Created before the remote connects so writes made meanwhile are queued for it
+        replicator = create_replicator(extra_config)
+    
+    # SDK imports and credential checks can take seconds; at startup they run in the
+    # background so the server binds at once and requests wait only if they need the backend
+    backend_mode = REMOTE_MODE or STORAGE_MODE
+    set_backend_state('connecting' if backend_mode in ('cloud', 'dropbox') else 'ready')
+    if background and backend_mode in ('cloud', 'dropbox'):
+        backend_connect_thread = threading.Thread(
+            target=connect_storage_backend, args=(backend_mode,),
+            name='backend-connect', daemon=True
+        )
+        backend_connect_thread.start()
+    else:
+        connect_storage_backend(backend_mode)
+
+def publish_backend():
+    """Replace the backend handle with a snapshot of the current globals"""
+    global backend
+    backend = backend.replace(
+        mode=STORAGE_MODE, remote_mode=REMOTE_MODE, local_path=LOCAL_STORAGE_PATH, bucket=CLOUD_BUCKET,
+        folder=DROPBOX_FOLDER, s3_client=s3_client, dropbox_client=dropbox_client
+    )
+
+def set_backend_state(state, detail=None):
+    """Record backend readiness for /api/health and release requests waiting on it"""
+    BACKEND_STATE.update(state=state, detail=detail, since=datetime.now().isoformat())
+    # The local tier of tiered mode serves every request while the remote connects
+    if state == 'connecting' and STORAGE_MODE != 'tiered':
+        backend_ready.clear()
+    else:
+        backend_ready.set()
+
+def create_replicator(config):
+    """Replicator between the local tier and REMOTE_MODE, started once the remote has connected"""
+    return TieredReplicator(
+        LOCAL_STORAGE_PATH / '.replication', REMOTE_MODE,
+        load_local=load_from_local, save_local=save_to_local, delete_local=delete_from_local, list_local=list_local_keys,
+        push=save_to_remote, pull=load_from_remote, delete_remote=delete_from_remote, list_remote=list_remote_objects,
+        on_pulled=apply_pulled_change,
+        push_delay=float(config.get('replication_push_delay_seconds', DEFAULT_PUSH_DELAY)),
+        pull_interval=float(config.get('replication_pull_interval_seconds', DEFAULT_PULL_INTERVAL))
+    )
+
+def create_compactor(config):
+    """Compaction job for the active backend, scheduled by compaction_interval_hours (0: only when requested)"""
+    interval_hours = float(config.get('compaction_interval_hours', DEFAULT_COMPACTION_HOURS))
+    if WORKER_INDEX not in (None, 0):
+        interval_hours = 0  # With worker processes the first one runs the schedule; the others compact only when asked
+    return StorageCompactor(
+        LOCAL_STORAGE_PATH / '.compaction', STORAGE_MODE,
+        list_objects=list_stored_objects, store_ids=live_store_ids, load_object=load_object, load_document=read_document,
+        save_document=save_compacted_document, delete_key=remove_key, delete_object=delete_object,
+        delete_legacy=delete_legacy_copy, compress=compress_legacy_object, hold=key_locks.hold,
+        stored_size=stored_size, blocked=compaction_blocked,
+        interval_hours=interval_hours,
+        batch_size=int(config.get('compaction_batch_size', DEFAULT_COMPACTION_BATCH)),
+        batch_pause=float(config.get('compaction_batch_pause_seconds', 1.0)),
+        apply_scheduled=bool(config.get('compaction_apply_scheduled', False))
+    )
+
+def start_outbox():
+    """Open the outbox of writes queued for STORAGE_MODE (cloud or Dropbox) and start draining it"""
+    global outbox
+    if STORAGE_MODE not in ('cloud', 'dropbox'):
+        return
+    if shared_state:
+        # Each worker would keep its own view of one queue folder and could send a stale value over a newer one
+        logger.info(f"📤 Outbox off with {SERVER_WORKERS} worker processes: failed {STORAGE_MODE} writes return an error")
+        return
+    backend = STORAGE_MODE
+    # One folder per backend, so writes queued for Dropbox are never sent to S3 after a mode change
+    outbox = WriteOutbox(
+        LOCAL_STORAGE_PATH / '.outbox' / backend, backend,
+        send=save_to_cloud if backend == 'cloud' else save_to_dropbox, hold=key_locks.hold,
+        on_change=lambda result: metrics.inc('listinglife_outbox_writes_total', backend=backend, result=result)
+    )
+    outbox.start()
+
+def connect_storage_backend(requested_mode):
+    """Import the SDK for the configured backend, create its client and verify credentials
+    
+    The slow part runs without the backend lock so tiered mode keeps serving its local
+    tier meanwhile; the result is applied under the write lock.
+    """
+    opened_mode = None
+    try:
+        opened_mode = open_storage_backend(requested_mode)
+    except Exception as e:
+        logger.error(f"Error connecting storage backend: {e}")
+    with backend_lock.write():
+        apply_backend_connection(requested_mode, opened_mode)
+
+def apply_backend_connection(requested_mode, opened_mode):
+    """Switch to the backend open_storage_backend managed to open and report its state"""
+    global STORAGE_MODE
+    publish_backend()
+    if STORAGE_MODE == 'tiered':
+        # Only replication depends on the remote; the local tier keeps serving either way
+        if (requested_mode == 'cloud' and s3_client) or (requested_mode == 'dropbox' and dropbox_client):
+            replicator.start()
+            set_backend_state('ready')
+        else:
+            set_backend_state('failed', f"{requested_mode} unavailable, serving the local tier without replication (see server log)")
+        return
+    
+    if opened_mode:
+        STORAGE_MODE = opened_mode
+        publish_backend()
+    start_outbox()
+    if STORAGE_MODE == 'cloud' and s3_client:
+        set_backend_state('ready')
+    elif STORAGE_MODE == 'dropbox' and dropbox_client:
+        set_backend_state('ready')
+    elif STORAGE_MODE == 'local':
+        LOCAL_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+        if requested_mode in ('cloud', 'dropbox'):
+            set_backend_state('fallback_local', f"{requested_mode} unavailable, using local storage (see server log)")
+        else:
+            set_backend_state('ready')
+    else:
+        set_backend_state('failed', f"{STORAGE_MODE} client could not be initialized (see server log)")
+
+def open_storage_backend(requested_mode):
+    """Create the client for a storage mode and return the mode in use, which is 'local' if that failed"""
+    global s3_client, dropbox_client, dropbox
+    mode = requested_mode
+    
     # Initialize storage
-    if STORAGE_MODE == 'local':
+    if mode == 'local':
         LOCAL_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
         logger.info(f"Local storage initialized at: {LOCAL_STORAGE_PATH.absolute()}")
     
     # Initialize S3 client if using cloud (S3)
     s3_client = None
-    if STORAGE_MODE == 'cloud':
+    if mode == 'cloud':
         try:
-            import boto3
             if CLOUD_BUCKET:
-                s3_client = boto3.client('s3',
-                    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                    region_name=os.getenv('AWS_REGION', 'us-east-1')
+                # The same credentials get the same client back, with its connections still open
+                s3_client = client_registry.s3_client(
+                    os.getenv('AWS_ACCESS_KEY_ID'), os.getenv('AWS_SECRET_ACCESS_KEY'), os.getenv('AWS_REGION', 'us-east-1')
                 )
                 logger.info(f"Cloud storage (S3) initialized with bucket: {CLOUD_BUCKET}")
             else:
-                logger.warning("STORAGE_MODE is 'cloud' but S3_BUCKET not set. Falling back to local.")
-                STORAGE_MODE = 'local'
+                logger.warning("Storage mode is 'cloud' but S3_BUCKET not set. Falling back to local.")
+                mode = 'local'
         except ImportError:
             logger.warning("boto3 not installed. Cloud storage unavailable. Falling back to local.")
-            STORAGE_MODE = 'local'
+            mode = 'local'
     
     # Initialize Dropbox client if using Dropbox
     # Only reset if we're switching modes, not if we're reinitializing the same mode
-    if STORAGE_MODE != 'dropbox':
+    if mode != 'dropbox':
         dropbox_client = None
         dropbox = None
     
-    if STORAGE_MODE == 'dropbox':
+    if mode == 'dropbox':
         # Try to import dropbox module - use local variable first to avoid shadowing global
         dropbox_imported = None
         try:
@@ -140,15 +600,15 @@ def initialize_storage():
             else:
                 logger.warning(f"dropbox library not installed: {import_error}. Install with: pip install dropbox")
             logger.warning("Falling back to local storage.")
-            STORAGE_MODE = 'local'
+            mode = 'local'
             dropbox = None
         except Exception as e:
             logger.error(f"Error importing dropbox: {e}")
             logger.warning("Falling back to local storage.")
-            STORAGE_MODE = 'local'
+            mode = 'local'
             dropbox = None
         
-        if dropbox_imported and STORAGE_MODE == 'dropbox':
+        if dropbox_imported and mode == 'dropbox':
             if DROPBOX_ACCESS_TOKEN:
                 logger.info(f"🔐 Attempting Dropbox initialization with token (length: {len(DROPBOX_ACCESS_TOKEN)})")
                 # Check if token is short-lived (starts with 'sl.u.')
@@ -165,11 +625,14 @@ def initialize_storage():
                 
                 try:
                     logger.info("🔌 Creating Dropbox client...")
-                    dropbox_client = dropbox_imported.Dropbox(DROPBOX_ACCESS_TOKEN)
-                    # Test connection with retry for temporary network issues
+                    dropbox_client = client_registry.dropbox_client(dropbox_imported, DROPBOX_ACCESS_TOKEN)
+                    # Test connection with retry for temporary network issues; a client whose
+                    # token was already checked (same token, earlier config save) skips the call
                     max_retries = 3
                     retry_count = 0
-                    connection_success = False
+                    connection_success = client_registry.is_verified(dropbox_client)
+                    if connection_success:
+                        logger.info(f"✅ Reusing verified Dropbox connection. Folder: {DROPBOX_FOLDER}")
                     
                     while retry_count < max_retries and not connection_success:
                         try:
@@ -179,7 +642,7 @@ def initialize_storage():
                             logger.info(f"   Token: {DROPBOX_ACCESS_TOKEN[:20]}... (length: {len(DROPBOX_ACCESS_TOKEN)})")
                             # Update global dropbox module reference
                             dropbox = dropbox_imported
-                            # Success! Keep STORAGE_MODE as 'dropbox' and dropbox_client set
+                            # Success! Keep mode as 'dropbox' and dropbox_client set
                         except (dropbox_imported.exceptions.AuthError, dropbox_imported.exceptions.ApiError) as api_error:
                             # Only retry on network/rate limit errors, not auth errors
                             error_msg = str(api_error)
@@ -207,7 +670,7 @@ def initialize_storage():
                             
                             if is_temporary and retry_count < max_retries - 1:
                                 retry_count += 1
-                                import time
+                                metrics.inc('listinglife_backend_retries_total', backend='dropbox', operation='connect')
                                 time.sleep(1)  # Wait 1 second before retry
                                 continue
                             else:
@@ -215,8 +678,9 @@ def initialize_storage():
                     
                     # If we get here and connection_success is True, Dropbox is working
                     if connection_success:
-                        # Ensure STORAGE_MODE stays as 'dropbox' and update global dropbox module
-                        STORAGE_MODE = 'dropbox'
+                        # Ensure mode stays as 'dropbox' and update global dropbox module
+                        mode = 'dropbox'
+                        client_registry.mark_verified(dropbox_client)
                         dropbox = dropbox_imported  # Update global dropbox module reference
                         logger.info("✅ Dropbox connection verified and active")
                     
@@ -249,7 +713,8 @@ def initialize_storage():
                     # Only fall back to local if not explicitly requested in config
                     # This allows retry without restart
                     if requested_mode != 'dropbox':
-                        STORAGE_MODE = 'local'
+                        mode = 'local'
+                    client_registry.discard(dropbox_client)
                     dropbox_client = None
                     # Keep dropbox module reference for retry
                     # dropbox = None  # Don't clear module, keep it for retry
@@ -274,32 +739,47 @@ def initialize_storage():
                     logger.warning("⚠️  Dropbox initialization failed. Server will use LOCAL storage until Dropbox is fixed.")
                     # Only fall back to local if not explicitly requested in config
                     if requested_mode != 'dropbox':
-                        STORAGE_MODE = 'local'
+                        mode = 'local'
                     dropbox_client = None
                     # Keep dropbox module reference for retry
                     # dropbox = None  # Don't clear module, keep it for retry
             else:
-                logger.error("❌ STORAGE_MODE is 'dropbox' but DROPBOX_ACCESS_TOKEN is not set or empty!")
+                logger.error("❌ Storage mode is 'dropbox' but DROPBOX_ACCESS_TOKEN is not set or empty!")
                 logger.error("   Please add your Dropbox access token in the Settings page.")
                 logger.warning("⚠️  Falling back to local storage.")
-                STORAGE_MODE = 'local'
+                mode = 'local'
                 dropbox = None
+    
+    return mode
 
-# Don't initialize here - wait for main block to load config first
-# initialize_storage() will be called in if __name__ == '__main__' block
+def record_backend_bytes(backend, direction, json_size, stored_size):
+    """Count bytes moved to or from a backend before and after compression"""
+    metrics.inc('listinglife_backend_bytes_total', json_size, backend=backend, direction=direction, stage='json')
+    metrics.inc('listinglife_backend_bytes_total', stored_size, backend=backend, direction=direction, stage='stored')
 
-def save_to_local(key, data):
-    """Save data to local file (compact JSON, no indent to save space)"""
+@backend_reads.invalidates('local')
+@metrics.timed('listinglife_backend_duration_seconds', backend='local', operation='save')
+def save_to_local(key, data, encoded=None):
+    """Save data to local file (compact JSON, no indent to save space)
+    
+    encoded is the value's JSON text as the client sent it; when given it is written as is.
+    """
     try:
         file_path = LOCAL_STORAGE_PATH / f"{key}.json"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
-        logger.info(f"Saved to local: {key}")
+        if encoded is None:
+            encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # Written beside the file and renamed over it, so readers (other threads or worker processes) never see half a file
+        write_atomically(file_path, encoded)
+        written = len(encoded)
+        record_backend_bytes('local', 'out', written, written)
+        io_logger.info("Saved to local: %s", key)
         return True
     except Exception as e:
         logger.error(f"Error saving to local {key}: {e}")
         raise
 
+@backend_reads.coalesced('local')
+@metrics.timed('listinglife_backend_duration_seconds', backend='local', operation='load')
 def load_from_local(key):
     """Load data from local file"""
     try:
@@ -307,79 +787,113 @@ def load_from_local(key):
         if file_path.exists():
             with open(file_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-            logger.info(f"Loaded from local: {key}")
+                size = os.fstat(f.fileno()).st_size
+            record_backend_bytes('local', 'in', size, size)
+            io_logger.info("Loaded from local: %s", key)
             return data
         return None
     except Exception as e:
         logger.error(f"Error loading from local {key}: {e}")
         return None
 
-def save_to_cloud(key, data):
-    """Save data to cloud storage (S3) with compression"""
-    if not s3_client:
+@backend_reads.invalidates('cloud')
+@metrics.timed('listinglife_backend_duration_seconds', backend='cloud', operation='save')
+def save_to_cloud(key, data, encoded=None):
+    """Save data to cloud storage (S3) with compression (encoded: JSON text to store instead of re-encoding data); returns upload_fingerprint()"""
+    handle = backend
+    if not handle.s3_client:
         raise Exception("S3 client not initialized")
     
     try:
         # Use compact JSON and compress to save space
-        json_data = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-        compressed_data = gzip.compress(json_data.encode('utf-8'))
+        json_bytes = encoded if encoded is not None else json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        compressed_data = gzip.compress(json_bytes)
         
-        s3_client.put_object(
-            Bucket=CLOUD_BUCKET,
+        response = handle.s3_client.put_object(
+            Bucket=handle.bucket,
             Key=f"listinglife/{key}.json.gz",
             Body=compressed_data,
             ContentType='application/gzip',
             ContentEncoding='gzip'
         )
-        logger.info(f"Saved to cloud: {key} (compressed)")
-        return True
+        record_backend_bytes('cloud', 'out', len(json_bytes), len(compressed_data))
+        io_logger.info("Saved to cloud: %s (compressed)", key)
+        return upload_fingerprint('cloud', response)
     except Exception as e:
         logger.error(f"Error saving to cloud {key}: {e}")
         raise
 
+@backend_reads.coalesced('cloud')
+@metrics.timed('listinglife_backend_duration_seconds', backend='cloud', operation='load')
 def load_from_cloud(key):
     """Load data from cloud storage (S3) - supports compressed and uncompressed"""
-    if not s3_client:
+    handle = backend
+    if not handle.s3_client:
         raise Exception("S3 client not initialized")
     
     try:
         # Try compressed file first
         try:
-            response = s3_client.get_object(
-                Bucket=CLOUD_BUCKET,
+            response = handle.s3_client.get_object(
+                Bucket=handle.bucket,
                 Key=f"listinglife/{key}.json.gz"
             )
             compressed_data = response['Body'].read()
             decompressed_data = gzip.decompress(compressed_data)
             data = json.loads(decompressed_data.decode('utf-8'))
-            logger.info(f"Loaded from cloud: {key} (compressed)")
+            record_backend_bytes('cloud', 'in', len(decompressed_data), len(compressed_data))
+            io_logger.info("Loaded from cloud: %s (compressed)", key)
             return data
-        except s3_client.exceptions.NoSuchKey:
+        except handle.s3_client.exceptions.NoSuchKey:
             # Try uncompressed for backward compatibility
             try:
-                response = s3_client.get_object(
-                    Bucket=CLOUD_BUCKET,
+                response = handle.s3_client.get_object(
+                    Bucket=handle.bucket,
                     Key=f"listinglife/{key}.json"
                 )
-                data = json.loads(response['Body'].read().decode('utf-8'))
-                logger.info(f"Loaded from cloud: {key} (uncompressed)")
+                raw_data = response['Body'].read()
+                data = json.loads(raw_data.decode('utf-8'))
+                record_backend_bytes('cloud', 'in', len(raw_data), len(raw_data))
+                io_logger.info("Loaded from cloud: %s (uncompressed)", key)
                 return data
-            except s3_client.exceptions.NoSuchKey:
-                logger.info(f"Key not found in cloud: {key}")
+            except handle.s3_client.exceptions.NoSuchKey:
+                io_logger.info("Key not found in cloud: %s", key)
                 return None
     except Exception as e:
         logger.error(f"Error loading from cloud {key}: {e}")
         return None
 
-def refresh_dropbox_token():
-    """Refresh Dropbox access token using refresh token"""
-    global DROPBOX_ACCESS_TOKEN, dropbox_client, dropbox
+def refresh_dropbox_token(stale=None):
+    """Refresh Dropbox access token using refresh token
+    
+    Returns the backend handle holding the new client, or None if the token could
+    not be refreshed. Requests that hit the same expired token at once share one
+    refresh: a caller passing the handle whose token expired gets the current
+    handle straight away if another thread already replaced that client.
+    """
+    with token_refresh_lock:
+        if stale is not None and backend.dropbox_client is not stale.dropbox_client:
+            return backend
+        if not exchange_dropbox_refresh_token():
+            return None
+        return backend
+
+def exchange_dropbox_refresh_token():
+    """Get a new access token from Dropbox and publish a client using it (caller holds token_refresh_lock)"""
+    global DROPBOX_ACCESS_TOKEN, DROPBOX_REFRESH_TOKEN, dropbox_client, dropbox, backend
     
     if not DROPBOX_REFRESH_TOKEN or not DROPBOX_APP_KEY or not DROPBOX_APP_SECRET:
         return False
     
+    if network_simulator:
+        DROPBOX_ACCESS_TOKEN = network_simulator.refresh_access_token()
+        dropbox_client = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+        backend = backend.replace(dropbox_client=dropbox_client)
+        metrics.inc('listinglife_token_refreshes_total', result='success')
+        logger.info("✅ Simulated Dropbox access token refreshed")
+        return True
+    
     try:
-        import requests
         import base64
         
         # OAuth 2.0 token refresh endpoint
@@ -398,7 +912,11 @@ def refresh_dropbox_token():
             'Content-Type': 'application/x-www-form-urlencoded'
         }
         
-        response = requests.post(url, data=data, headers=headers, timeout=10)
+        # The shared session reuses a kept-alive connection instead of a new TLS handshake per refresh
+        session = client_registry.http_session(dropbox)
+        if session is None:
+            raise ImportError("requests library not installed. Install with: pip install requests")
+        response = session.post(url, data=data, headers=headers, timeout=10)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -414,44 +932,52 @@ def refresh_dropbox_token():
                     config['dropbox_refresh_token'] = DROPBOX_REFRESH_TOKEN
                     save_config_file(config)
             
-            # Recreate Dropbox client with new token
-            dropbox_client = dropbox.Dropbox(DROPBOX_ACCESS_TOKEN)
+            # Client for the new token, on the same connection pool
+            dropbox_client = client_registry.dropbox_client(dropbox, DROPBOX_ACCESS_TOKEN)
+            client_registry.mark_verified(dropbox_client)
+            # Swapping the whole handle lets requests still using the old client finish with it
+            backend = backend.replace(dropbox_client=dropbox_client)
+            metrics.inc('listinglife_token_refreshes_total', result='success')
             logger.info("✅ Dropbox access token refreshed successfully")
             return True
         else:
+            metrics.inc('listinglife_token_refreshes_total', result='failure')
             logger.error(f"Failed to refresh Dropbox token: {response.status_code} - {response.text}")
             return False
     except Exception as e:
+        metrics.inc('listinglife_token_refreshes_total', result='failure')
         logger.error(f"Error refreshing Dropbox token: {e}")
         return False
 
-def save_to_dropbox(key, data):
-    """Save data to Dropbox with compression"""
-    global dropbox_client
-    
-    if not dropbox_client or not dropbox:
+@backend_reads.invalidates('dropbox')
+@metrics.timed('listinglife_backend_duration_seconds', backend='dropbox', operation='save')
+def save_to_dropbox(key, data, encoded=None):
+    """Save data to Dropbox with compression (encoded: JSON text to store instead of re-encoding data); returns upload_fingerprint()"""
+    handle = backend
+    if not handle.dropbox_client or not dropbox:
         raise Exception("Dropbox client not initialized")
     
     try:
         # Use compact JSON (no indent) and compress with gzip to save space
-        json_data = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-        compressed_data = gzip.compress(json_data.encode('utf-8'))
+        json_bytes = encoded if encoded is not None else json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        compressed_data = gzip.compress(json_bytes)
         
         # Save as .json.gz to indicate it's compressed
-        file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json.gz"
+        file_path = f"{handle.dropbox_path}/{key}.json.gz"
         
         # Upload compressed data to Dropbox
-        dropbox_client.files_upload(
+        metadata = handle.dropbox_client.files_upload(
             compressed_data,
             file_path,
             mode=dropbox.files.WriteMode('overwrite')
         )
         
-        original_size = len(json_data.encode('utf-8'))
+        original_size = len(json_bytes)
         compressed_size = len(compressed_data)
+        record_backend_bytes('dropbox', 'out', original_size, compressed_size)
         compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-        logger.info(f"Saved to Dropbox: {key} ({compressed_size}B compressed, {compression_ratio:.1f}% reduction)")
-        return True
+        io_logger.info("Saved to Dropbox: %s (%dB compressed, %.1f%% reduction)", key, compressed_size, compression_ratio)
+        return upload_fingerprint('dropbox', metadata)
     except dropbox.exceptions.AuthError as auth_error:
         error_msg = str(auth_error)
         # Only report as expired if we're certain
@@ -462,22 +988,24 @@ def save_to_dropbox(key, data):
         
         if is_expired:
             # Try to refresh token if we have refresh token
-            if DROPBOX_REFRESH_TOKEN and refresh_dropbox_token():
+            refreshed = refresh_dropbox_token(handle) if DROPBOX_REFRESH_TOKEN else None
+            if refreshed:
                 # Retry the save operation with new token
+                handle = refreshed
+                metrics.inc('listinglife_backend_retries_total', backend='dropbox', operation='save')
                 try:
-                    json_data = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-                    compressed_data = gzip.compress(json_data.encode('utf-8'))
-                    file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json.gz"
-                    dropbox_client.files_upload(
+                    file_path = f"{handle.dropbox_path}/{key}.json.gz"
+                    metadata = handle.dropbox_client.files_upload(
                         compressed_data,
                         file_path,
                         mode=dropbox.files.WriteMode('overwrite')
                     )
-                    original_size = len(json_data.encode('utf-8'))
+                    original_size = len(json_bytes)
                     compressed_size = len(compressed_data)
+                    record_backend_bytes('dropbox', 'out', original_size, compressed_size)
                     compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-                    logger.info(f"Saved to Dropbox: {key} ({compressed_size}B compressed, {compression_ratio:.1f}% reduction) [after token refresh]")
-                    return True
+                    io_logger.info("Saved to Dropbox: %s (%dB compressed, %.1f%% reduction) [after token refresh]", key, compressed_size, compression_ratio)
+                    return upload_fingerprint('dropbox', metadata)
                 except Exception as retry_error:
                     raise Exception(f"Token refreshed but save failed: {retry_error}")
             else:
@@ -522,35 +1050,38 @@ def save_to_dropbox(key, data):
             )
         raise
 
+@backend_reads.coalesced('dropbox')
+@metrics.timed('listinglife_backend_duration_seconds', backend='dropbox', operation='load')
 def load_from_dropbox(key):
     """Load data from Dropbox (supports both compressed and uncompressed)"""
-    global dropbox_client
-    
-    if not dropbox_client or not dropbox:
+    handle = backend
+    if not handle.dropbox_client or not dropbox:
         raise Exception("Dropbox client not initialized")
     
     try:
         # Try compressed file first (.json.gz)
-        file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json.gz"
+        file_path = f"{handle.dropbox_path}/{key}.json.gz"
         try:
-            _, response = dropbox_client.files_download(file_path)
+            _, response = handle.dropbox_client.files_download(file_path)
             # Decompress and parse
             decompressed_data = gzip.decompress(response.content)
             data = json.loads(decompressed_data.decode('utf-8'))
-            logger.info(f"Loaded from Dropbox: {key} (compressed)")
+            record_backend_bytes('dropbox', 'in', len(decompressed_data), len(response.content))
+            io_logger.info("Loaded from Dropbox: %s (compressed)", key)
             return data
         except dropbox.exceptions.ApiError as e:
             # If compressed file not found, try uncompressed (.json) for backward compatibility
             if e.error.is_path() and e.error.get_path().is_not_found():
-                file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json"
+                file_path = f"{handle.dropbox_path}/{key}.json"
                 try:
-                    _, response = dropbox_client.files_download(file_path)
+                    _, response = handle.dropbox_client.files_download(file_path)
                     data = json.loads(response.content.decode('utf-8'))
-                    logger.info(f"Loaded from Dropbox: {key} (uncompressed, consider re-saving to compress)")
+                    record_backend_bytes('dropbox', 'in', len(response.content), len(response.content))
+                    io_logger.info("Loaded from Dropbox: %s (uncompressed, consider re-saving to compress)", key)
                     return data
                 except dropbox.exceptions.ApiError as e2:
                     if e2.error.is_path() and e2.error.get_path().is_not_found():
-                        logger.info(f"Key not found in Dropbox: {key}")
+                        io_logger.info("Key not found in Dropbox: %s", key)
                         return None
                     raise
             raise
@@ -561,26 +1092,29 @@ def load_from_dropbox(key):
             (hasattr(auth_error, 'error') and hasattr(auth_error.error, 'is_expired') and auth_error.error.is_expired())
         )
         
-        if is_expired and DROPBOX_REFRESH_TOKEN and refresh_dropbox_token():
+        refreshed = refresh_dropbox_token(handle) if is_expired and DROPBOX_REFRESH_TOKEN else None
+        if refreshed:
             # Retry the load operation with new token
+            handle = refreshed
+            metrics.inc('listinglife_backend_retries_total', backend='dropbox', operation='load')
             try:
-                file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json.gz"
+                file_path = f"{handle.dropbox_path}/{key}.json.gz"
                 try:
-                    _, response = dropbox_client.files_download(file_path)
+                    _, response = handle.dropbox_client.files_download(file_path)
                     decompressed_data = gzip.decompress(response.content)
                     data = json.loads(decompressed_data.decode('utf-8'))
-                    logger.info(f"Loaded from Dropbox: {key} (compressed) [after token refresh]")
+                    io_logger.info("Loaded from Dropbox: %s (compressed) [after token refresh]", key)
                     return data
                 except dropbox.exceptions.ApiError as e:
                     if e.error.is_path() and e.error.get_path().is_not_found():
-                        file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json"
+                        file_path = f"{handle.dropbox_path}/{key}.json"
                         try:
-                            _, response = dropbox_client.files_download(file_path)
+                            _, response = handle.dropbox_client.files_download(file_path)
                             data = json.loads(response.content.decode('utf-8'))
-                            logger.info(f"Loaded from Dropbox: {key} (uncompressed) [after token refresh]")
+                            io_logger.info("Loaded from Dropbox: %s (uncompressed) [after token refresh]", key)
                             return data
                         except dropbox.exceptions.ApiError:
-                            logger.info(f"Key not found in Dropbox: {key}")
+                            io_logger.info("Key not found in Dropbox: %s", key)
                             return None
             except Exception as retry_error:
                 logger.error(f"Error loading from Dropbox {key} after token refresh: {retry_error}")
@@ -590,7 +1124,7 @@ def load_from_dropbox(key):
             return None
     except dropbox.exceptions.ApiError as e:
         if e.error.is_path() and e.error.get_path().is_not_found():
-            logger.info(f"Key not found in Dropbox: {key}")
+            io_logger.info("Key not found in Dropbox: %s", key)
             return None
         logger.error(f"Error loading from Dropbox {key}: {e}")
         return None
@@ -598,44 +1132,585 @@ def load_from_dropbox(key):
         logger.error(f"Error loading from Dropbox {key}: {e}")
         return None
 
+@backend_reads.invalidates('local')
+def delete_from_local(key):
+    """Delete a key's local file if it exists"""
+    file_path = LOCAL_STORAGE_PATH / f"{key}.json"
+    if file_path.exists():
+        file_path.unlink()
+        io_logger.info("Removed from local: %s", key)
+
+def list_local_keys():
+    """Keys stored in the local folder"""
+    return [f.stem for f in LOCAL_STORAGE_PATH.glob('*.json')]
+
+def is_permanent_write_error(error):
+    """Errors that retrying cannot fix, so the write is rejected instead of queued"""
+    error_msg = str(error)
+    return 'permission error' in error_msg or 'files.content.write' in error_msg or 'required scope' in error_msg.lower()
+
+def save_or_queue(key, value, encoded=None):
+    """Save to the cloud/Dropbox backend, or queue the write in the outbox if the backend is failing
+    
+    Returns True if the write reached the backend and False if it was queued.
+    """
+    save = save_to_cloud if STORAGE_MODE == 'cloud' else save_to_dropbox
+    if not outbox:
+        return save(key, value, encoded)
+    if outbox.should_defer(key):
+        outbox.put(key, value)
+        return False
+    try:
+        return save(key, value, encoded)
+    except Exception as e:
+        if is_permanent_write_error(e):
+            raise
+        logger.warning(f"📤 Queueing {key} in the outbox after a failed {STORAGE_MODE} write: {e}")
+        outbox.put(key, value, error=e)
+        return False
+
+def load_or_queued(key):
+    """Load from the cloud/Dropbox backend, preferring a write still waiting in the outbox"""
+    if outbox and outbox.pending(key):
+        try:
+            return outbox.load(key)
+        except FileNotFoundError:
+            pass  # Sent in the meantime
+    return load_from_cloud(key) if STORAGE_MODE == 'cloud' else load_from_dropbox(key)
+
+def save_to_tier(key, value, encoded=None):
+    """Save a key to the local tier of tiered mode and queue it for replication"""
+    return replicator.record_write(key, lambda: save_to_local(key, value, encoded))
+
+def save_to_remote(key, value):
+    """Save a key to the remote backend of tiered mode; returns its upload_fingerprint()"""
+    if REMOTE_MODE == 'cloud':
+        return save_to_cloud(key, value)
+    return save_to_dropbox(key, value)
+
+def load_from_remote(key):
+    """Load a key from the remote backend of tiered mode"""
+    if REMOTE_MODE == 'cloud':
+        return load_from_cloud(key)
+    return load_from_dropbox(key)
+
+def delete_from_remote(key, mode=None):
+    """Delete a key (compressed and legacy uncompressed copies) from a cloud/Dropbox backend, by default the remote of tiered mode"""
+    handle = backend
+    mode = mode or handle.remote_mode
+    for suffix in ('.json.gz', '.json'):
+        if mode == 'cloud':
+            handle.s3_client.delete_object(Bucket=handle.bucket, Key=f"listinglife/{key}{suffix}")
+            continue
+        try:
+            handle.dropbox_client.files_delete(f"{handle.dropbox_path}/{key}{suffix}")
+        except dropbox.exceptions.ApiError as e:
+            if not (e.error.is_path() and e.error.get_path().is_not_found()):
+                raise
+    backend_reads.forget(mode, key)
+    io_logger.info("Removed from %s: %s", mode, key)
+
+def valid_key(key):
+    """Whether a key is safe to name a file or folder with (local files, version history and the outbox use keys as names)"""
+    return isinstance(key, str) and key not in ('.', '..') and not any(char in key for char in '/\\\0')
+
+def stored_key(name):
+    """Split a stored file name ('<key>.json.gz' or legacy '<key>.json') into its key and whether it is compressed"""
+    if name.endswith('.json.gz'):
+        return name[:-len('.json.gz')], True
+    if name.endswith('.json'):
+        return name[:-len('.json')], False
+    return None, False
+
+def upload_fingerprint(mode, result):
+    """The fingerprint iter_remote_files will list for a copy just uploaded (S3 put_object response or Dropbox FileMetadata)
+    
+    True when the backend did not return one, so callers can still test the save for success.
+    """
+    if mode == 'cloud':
+        fingerprint = (result or {}).get('ETag')
+    else:
+        fingerprint = getattr(result, 'content_hash', None) or getattr(result, 'rev', None)
+    return fingerprint or True
+
+def iter_remote_files(mode):
+    """Yield (file name, size, fingerprint) for every file in a cloud/Dropbox backend"""
+    handle = backend
+    if mode == 'cloud':
+        paging = {}
+        while True:
+            response = handle.s3_client.list_objects_v2(Bucket=handle.bucket, Prefix='listinglife/', **paging)
+            for obj in response.get('Contents', []):
+                yield obj['Key'][len('listinglife/'):], obj.get('Size', 0), obj.get('ETag') or f"{obj.get('Size')}:{obj.get('LastModified')}"
+            if not response.get('IsTruncated'):
+                break
+            paging = {'ContinuationToken': response['NextContinuationToken']}
+        return
+    
+    try:
+        result = handle.dropbox_client.files_list_folder(handle.dropbox_path)
+    except dropbox.exceptions.ApiError as e:
+        if e.error.is_path() and e.error.get_path().is_not_found():
+            return  # Folder doesn't exist yet
+        raise
+    while True:
+        for entry in result.entries:
+            if isinstance(entry, dropbox.files.FileMetadata):
+                yield entry.name, entry.size, getattr(entry, 'content_hash', None) or getattr(entry, 'rev', None) or str(entry.size)
+        if not result.has_more:
+            break
+        result = handle.dropbox_client.files_list_folder_continue(result.cursor)
+
+def list_remote_objects(mode=None):
+    """Map every key in a cloud/Dropbox backend (by default the remote of tiered mode) to a fingerprint that changes when it is rewritten"""
+    objects = {}
+    for name, _, fingerprint in iter_remote_files(mode or backend.remote_mode):
+        key, compressed = stored_key(name)
+        # The compressed copy is the one load_from_cloud/load_from_dropbox read first
+        if key and (compressed or key not in objects):
+            objects[key] = fingerprint
+    return objects
+
+def list_stored_objects():
+    """Every key of the active backend with the bytes its compressed and legacy uncompressed copies take"""
+    if STORAGE_MODE in ('local', 'tiered'):
+        return {f.stem: {'size': f.stat().st_size, 'legacy': 0} for f in LOCAL_STORAGE_PATH.glob('*.json')}
+    objects = {}
+    for name, size, _ in iter_remote_files(STORAGE_MODE):
+        key, compressed = stored_key(name)
+        if key:
+            objects.setdefault(key, {'size': 0, 'legacy': 0})['size' if compressed else 'legacy'] = size or 0
+    return objects
+
+def delete_legacy_copy(key):
+    """Delete a key's legacy uncompressed <key>.json from the cloud/Dropbox backend, keeping the .json.gz"""
+    handle = backend
+    if STORAGE_MODE == 'cloud':
+        handle.s3_client.delete_object(Bucket=handle.bucket, Key=f"listinglife/{key}.json")
+    else:
+        try:
+            handle.dropbox_client.files_delete(f"{handle.dropbox_path}/{key}.json")
+        except dropbox.exceptions.ApiError as e:
+            if not (e.error.is_path() and e.error.get_path().is_not_found()):
+                raise
+    backend_reads.forget(STORAGE_MODE, key)
+    io_logger.info("Removed legacy uncompressed copy from %s: %s", STORAGE_MODE, key)
+
+def compress_legacy_object(key):
+    """Rewrite a key stored only as legacy uncompressed JSON as .json.gz; returns the compressed size"""
+    value = load_object(key)
+    if value is None:
+        raise Exception(f"{key} could not be read")
+    compressed_data = gzip.compress(json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    write_compressed_object(STORAGE_MODE, key, compressed_data)
+    delete_legacy_copy(key)
+    return len(compressed_data)
+
+def read_compressed_object(mode, key):
+    """The stored .json.gz bytes of a key in a cloud/Dropbox backend, or None if it has no compressed copy"""
+    handle = backend
+    if mode == 'cloud':
+        try:
+            response = handle.s3_client.get_object(Bucket=handle.bucket, Key=f"listinglife/{key}.json.gz")
+            return response['Body'].read()
+        except handle.s3_client.exceptions.NoSuchKey:
+            return None
+    try:
+        _, response = handle.dropbox_client.files_download(f"{handle.dropbox_path}/{key}.json.gz")
+        return response.content
+    except dropbox.exceptions.ApiError as e:
+        if e.error.is_path() and e.error.get_path().is_not_found():
+            return None
+        raise
+
+def write_compressed_object(mode, key, compressed_data):
+    """Store already-compressed .json.gz bytes for a key in a cloud/Dropbox backend"""
+    handle = backend
+    if mode == 'cloud':
+        handle.s3_client.put_object(
+            Bucket=handle.bucket,
+            Key=f"listinglife/{key}.json.gz",
+            Body=compressed_data,
+            ContentType='application/gzip',
+            ContentEncoding='gzip'
+        )
+    else:
+        handle.dropbox_client.files_upload(
+            compressed_data,
+            f"{handle.dropbox_path}/{key}.json.gz",
+            mode=dropbox.files.WriteMode('overwrite')
+        )
+    backend_reads.forget(mode, key)
+    io_logger.info("Copied to %s: %s (%dB compressed)", mode, key, len(compressed_data))
+
+def migration_endpoint(mode):
+    """Describe a backend to the migration engine in terms of its load/save functions"""
+    if mode == 'local':
+        return MigrationEndpoint('local', list_local_keys, load_from_local, save_to_local)
+    load, save = (load_from_cloud, save_to_cloud) if mode == 'cloud' else (load_from_dropbox, save_to_dropbox)
+    return MigrationEndpoint(
+        mode, lambda: list(list_remote_objects(mode)), load, save,
+        read_compressed=lambda key: read_compressed_object(mode, key),
+        write_compressed=lambda key, data: write_compressed_object(mode, key, data)
+    )
+
+def open_migration_backend(mode):
+    """Create the client for a migration source or target that is not the active backend
+    
+    Credentials come from storage_config.json (or the environment), as for the
+    active backend. Requests keep being served by STORAGE_MODE; the write lock
+    only keeps them from seeing the new client half-installed.
+    """
+    global s3_client, CLOUD_BUCKET, dropbox_client, dropbox
+    config = load_config_file() or {}
+    with backend_lock.write():
+        if mode == 'local':
+            LOCAL_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+        elif mode == 'cloud' and not s3_client:
+            CLOUD_BUCKET = CLOUD_BUCKET or config.get('s3_bucket') or os.getenv('S3_BUCKET')
+            if not CLOUD_BUCKET:
+                raise ValueError("No S3 bucket configured (s3_bucket)")
+            s3_client = client_registry.s3_client(
+                config.get('aws_access_key_id') or os.getenv('AWS_ACCESS_KEY_ID'),
+                config.get('aws_secret_access_key') or os.getenv('AWS_SECRET_ACCESS_KEY'),
+                config.get('aws_region') or os.getenv('AWS_REGION', 'us-east-1')
+            )
+        elif mode == 'dropbox' and not dropbox_client:
+            import dropbox as dropbox_module
+            token = DROPBOX_ACCESS_TOKEN or config.get('dropbox_access_token') or os.getenv('DROPBOX_ACCESS_TOKEN')
+            if not token:
+                raise ValueError("No Dropbox access token configured (dropbox_access_token)")
+            dropbox = dropbox_module
+            dropbox_client = client_registry.dropbox_client(dropbox, token)
+        publish_backend()
+
+def served_backends():
+    """Backends this server writes through save_to_storage (key locks, outbox, replicator)"""
+    if REMOTE_MODE:
+        return {'local', REMOTE_MODE}
+    return {STORAGE_MODE}
+
+def create_migration(source, target, workers=DEFAULT_MIGRATION_WORKERS, verify=True):
+    """Open both backends and return a MigrationJob copying source into target"""
+    for mode in (source, target):
+        if mode not in MIGRATION_BACKENDS:
+            raise ValueError(f"Migration backends must be one of {MIGRATION_BACKENDS}, not {mode!r}")
+        open_migration_backend(mode)
+    if source == target:
+        raise ValueError("Source and target must be different backends")
+    
+    def copied(key):
+        # Derived caches of the active backend must not keep serving the old value
+        if target == STORAGE_MODE or (target == 'local' and STORAGE_MODE == 'tiered'):
+            bump_document_version(key)
+    
+    return MigrationJob(
+        migration_endpoint(source), migration_endpoint(target),
+        LOCAL_STORAGE_PATH / '.migrations' / f"{source}-to-{target}.json",
+        workers=workers, verify=verify, on_copied=copied
+    )
+
+def apply_pulled_change(key, value):
+    """Invalidate caches and record history for a change the replicator pulled into the local tier"""
+    bump_document_version(key)
+    if value is None or is_shard_key(key):
+        return
+    if is_manifest(value):
+        # History keeps whole documents; shards pulled later in the same pass are not here yet
+        try:
+            value = load_sharded(key, value)
+        except ShardError:
+            return
+    record_history(key, value)
+
+def bump_document_version(key):
+    """Mark a key as changed so cached derivations of it are recomputed (in every worker process)"""
+    if shared_state:
+        shared_state.bump(key)
+        return
+    with versions_lock:
+        DOCUMENT_VERSIONS[key] = DOCUMENT_VERSIONS.get(key, 0) + 1
+
+def document_version(key):
+    """Version of a key that cached derivations of it were built from"""
+    if shared_state:
+        return shared_state.generation(key)
+    return DOCUMENT_VERSIONS.get(key, 0)
+
+def remote_copy_fresh(loaded):
+    """Whether a cache entry derived from a document loaded at loaded (time.time()) may still be served
+    
+    Versions only change for writes made through this server, so in
+    cloud/Dropbox mode derived entries age out like the record cache does.
+    """
+    return STORAGE_MODE not in ('cloud', 'dropbox') or time.time() - loaded <= record_cache.max_age
+
+def record_history(key, value):
+    """Queue a saved value for the key's version history (never fails or delays the save itself)"""
+    if not version_history:
+        return
+    try:
+        version_history.record(key, value)
+    except Exception as e:
+        logger.warning(f"Could not record history for {key}: {e}")
+
+def save_to_storage(key, value, encoded=None):
+    """Save a key to whichever storage backend is active, store documents as shards"""
+    if SHARD_DOCUMENTS and is_sharded_key(key):
+        return save_sharded(key, value)
+    return save_object(key, value, encoded)
+
+def load_from_storage(key):
+    """Load a key from whichever storage backend is active, reassembling sharded documents"""
+    value = load_object(key)
+    if is_manifest(value):
+        return load_sharded(key, value)
+    return value
+
+def save_object(key, value, encoded=None):
+    """Save one stored object; returns False if the write was queued in the outbox
+    
+    encoded, if given, is the value's JSON text (UTF-8), stored as it is instead of encoding value again.
+    """
+    if STORAGE_MODE == 'local':
+        return save_to_local(key, value, encoded)
+    elif STORAGE_MODE in ('cloud', 'dropbox'):
+        return save_or_queue(key, value, encoded)
+    elif STORAGE_MODE == 'tiered':
+        return save_to_tier(key, value, encoded)
+    raise Exception(f'Invalid storage mode: {STORAGE_MODE}')
+
+def load_object(key):
+    """Load one stored object as it is (a sharded document comes back as its manifest)"""
+    if STORAGE_MODE == 'local':
+        return load_from_local(key)
+    elif STORAGE_MODE in ('cloud', 'dropbox'):
+        return load_or_queued(key)
+    elif STORAGE_MODE == 'tiered':
+        return load_from_local(key)
+    raise Exception(f'Invalid storage mode: {STORAGE_MODE}')
+
+def delete_object(key):
+    """Delete one stored object from whichever storage backend is active"""
+    if STORAGE_MODE == 'local':
+        delete_from_local(key)
+    elif STORAGE_MODE == 'tiered':
+        replicator.record_delete(key, lambda: delete_from_local(key))
+    else:
+        if outbox:
+            outbox.discard(key)
+        delete_from_remote(key, STORAGE_MODE)
+
+def map_shards(function, keys):
+    """Run function over shard keys, in parallel when each call is a network round trip"""
+    if STORAGE_MODE in ('cloud', 'dropbox') and len(keys) > 1:
+        return list(shard_pool.map(function, keys))
+    return [function(key) for key in keys]
+
+def save_sharded(key, document):
+    """Save a store document as a manifest plus the shards that changed since the last save
+    
+    Shards are written first and replaced ones deleted last, so the stored manifest
+    always points at complete shards. Returns False if any write was queued.
+    """
+    split = split_document(key, document)
+    if split is None:
+        return save_object(key, document)  # Not the usual shape; kept whole
+    manifest, shards = split
+    
+    previous = load_object(key)
+    previous_keys = set(shard_keys(previous)) if is_manifest(previous) else set()
+    dirty = [shard_key for shard_key in shards if shard_key not in previous_keys]
+    results = map_shards(lambda shard_key: save_object(shard_key, shards[shard_key]), dirty)
+    results.append(save_object(key, manifest))
+    
+    for stale in previous_keys - set(shards):
+        try:
+            delete_object(stale)
+        except Exception as e:
+            # Unreferenced, so it only takes up space until a later save or compaction removes it
+            logger.warning(f"Could not delete replaced shard {stale}: {e}")
+    io_logger.info("Saved %s: %d of %d shard(s) changed", key, len(dirty), len(shards))
+    return all(result is not False for result in results)
+
+def load_sharded(key, manifest):
+    """Rebuild a sharded document from its manifest"""
+    for attempt in range(2):
+        keys = shard_keys(manifest)
+        shards = dict(zip(keys, map_shards(load_object, keys)))
+        try:
+            return assemble_document(key, manifest, shards)
+        except ShardError:
+            # A concurrent save may have replaced shards after this manifest was read
+            latest = load_object(key)
+            if attempt or not is_manifest(latest) or latest == manifest:
+                raise
+            manifest = latest
+
+def read_document(key):
+    """Load a key from the backend and parse it if it was stored as a JSON string"""
+    document = load_from_storage(key)
+    if isinstance(document, str):
+        try:
+            document = json.loads(document)
+        except ValueError:
+            return None
+    return document
+
+def load_document(key):
+    """read_document, served from memory for store documents of a remote backend until the key changes here or the copy ages out
+    
+    Another machine's writes to the same bucket or Dropbox are not seen until
+    the copy is record_cache_seconds old, so code that saves what it read uses
+    read_document.
+    """
+    cached = STORAGE_MODE in ('cloud', 'dropbox') and document_schema(key) is not None
+    if not cached:
+        return read_document(key)
+    version = document_version(key)
+    document = record_cache.get(key, version)
+    if document is not None:
+        metrics.inc('listinglife_cache_requests_total', cache='records', result='hit')
+        return document
+    metrics.inc('listinglife_cache_requests_total', cache='records', result='miss')
+    loaded = time.time()
+    document = read_document(key)
+    if document is not None:
+        record_cache.put(key, version, document, loaded)
+    return document
+
+def remove_key(key):
+    """Delete a key, and the shards of a sharded document, from the active backend (caller holds the key's lock)"""
+    stored = load_object(key) if is_sharded_key(key) else None
+    
+    if outbox:
+        # A queued write would otherwise bring the key back
+        outbox.discard(key)
+    
+    # Removes the compressed object and any legacy uncompressed copy in cloud/Dropbox mode
+    delete_object(key)
+    if is_manifest(stored):
+        for shard_key in shard_keys(stored):
+            delete_object(shard_key)
+    
+    bump_document_version(key)
+
+def stored_size(value):
+    """Bytes a value takes in the active backend (compact JSON, gzipped in cloud/Dropbox)"""
+    encoded = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return len(encoded) if STORAGE_MODE in ('local', 'tiered') else len(gzip.compress(encoded))
+
+def save_compacted_document(key, value):
+    """Save a document the compactor cleaned, as a client save would be; returns its stored size"""
+    save_to_storage(key, value)
+    bump_document_version(key)
+    record_history(key, value)
+    return stored_size(value)
+
+def live_store_ids():
+    """Ids of the stores that exist, read from the backend, or None when ListingLifeStores is missing or unreadable (nothing counts as deleted then)"""
+    return set(get_store_ids(fresh=True)) or None
+
+def compaction_blocked():
+    """Why the compactor must wait (None once it may run)"""
+    if BACKEND_STATE['state'] != 'ready':
+        return f"storage backend is {BACKEND_STATE['state']}"
+    if outbox and outbox.keys():
+        return 'writes from an outage are still in the outbox'
+    if migration_job and migration_job.running:
+        return 'a migration is running'
+    return None
+
+def get_store_ids(fresh=False):
+    """Return the ids of all stores listed in ListingLifeStores (fresh: read past the record cache)"""
+    stores = (read_document if fresh else load_document)('ListingLifeStores')
+    if not isinstance(stores, list):
+        return []
+    return [store['id'] for store in stores if isinstance(store, dict) and store.get('id')]
+
+def read_set_body():
+    """Read {"key": ..., "value": ...} off the request stream
+    
+    Returns (key, value, encoded): a string value holding JSON is parsed, and
+    encoded is the value's JSON text as sent, so it can be stored without
+    encoding the value again (None for a plain string).
+    """
+    reader = JsonMemberReader(request.stream)
+    key = spooled = None
+    try:
+        for name in reader.members():
+            if name == 'key':
+                key = reader.read_value()
+            elif name == 'value':
+                if spooled:
+                    spooled.close()  # Repeated member; the last one wins, as with json.loads
+                spooled = reader.spool_value()
+        if spooled is None:
+            return key, None, None
+        value, encoded = spooled.decode()
+        return key, value, encoded
+    finally:
+        if spooled:
+            spooled.close()
+
 @app.route('/api/storage/set', methods=['POST'])
 def set_item():
     """Save data to storage"""
     try:
-        data = request.json
-        key = data.get('key')
-        value = data.get('value')
+        if not request.is_json:
+            return jsonify({'error': 'Expected a JSON body'}), 415
+        try:
+            # Read incrementally, so a large value is spooled to disk instead of parsed along with the whole body
+            key, value, encoded = read_set_body()
+        except ValueError as e:
+            # IngestError, or a value that is not valid JSON
+            return jsonify({'error': f'Invalid JSON body: {e}'}), 400
         
         if not key:
             return jsonify({'error': 'Key is required'}), 400
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
         
-        # Parse value if it's a string (JSON)
-        if isinstance(value, str):
-            try:
-                value = json.loads(value)
-            except:
-                pass  # Keep as string if not valid JSON
-        
-        # Save based on storage mode
-        if STORAGE_MODE == 'local':
-            logger.info(f"💾 Saving to LOCAL storage: {key}")
-            save_to_local(key, value)
-        elif STORAGE_MODE == 'cloud':
-            logger.info(f"☁️ Saving to CLOUD storage: {key}")
-            save_to_cloud(key, value)
-        elif STORAGE_MODE == 'dropbox':
-            if not dropbox_client:
-                logger.error(f"❌ Dropbox client not initialized! Cannot save {key}")
-                logger.error(f"   Current STORAGE_MODE: {STORAGE_MODE}")
-                logger.error(f"   dropbox_client: {dropbox_client}")
-                logger.error(f"   dropbox: {dropbox}")
-                return jsonify({'error': 'Dropbox client not initialized. Check server logs.'}), 500
-            logger.info(f"📦 Saving to DROPBOX storage: {key}")
-            save_to_dropbox(key, value)
-            logger.info(f"✅ Successfully saved {key} to Dropbox")
-        else:
-            return jsonify({'error': f'Invalid storage mode: {STORAGE_MODE}'}), 500
-        
+        # Writes to the same key from other threads wait, so the version bump and history match the save
+        with key_locks.hold(key):
+            # Save based on storage mode
+            queued = False
+            if SHARD_DOCUMENTS and is_sharded_key(key):
+                io_logger.info("🧩 Saving %s to %s storage as shards", key, STORAGE_MODE.upper())
+                queued = not save_sharded(key, value)
+            elif STORAGE_MODE == 'local':
+                io_logger.info("💾 Saving to LOCAL storage: %s", key)
+                save_to_local(key, value, encoded)
+            elif STORAGE_MODE == 'cloud':
+                io_logger.info("☁️ Saving to CLOUD storage: %s", key)
+                queued = not save_or_queue(key, value, encoded)
+            elif STORAGE_MODE == 'dropbox':
+                if not dropbox_client:
+                    # The write is kept in the outbox and sent once Dropbox is configured correctly
+                    logger.error(f"❌ Dropbox client not initialized! Queueing {key}")
+                    logger.error(f"   dropbox_client: {dropbox_client}")
+                    logger.error(f"   dropbox: {dropbox}")
+                io_logger.info("📦 Saving to DROPBOX storage: %s", key)
+                queued = not save_or_queue(key, value, encoded)
+                if not queued:
+                    io_logger.info("✅ Successfully saved %s to Dropbox", key)
+            elif STORAGE_MODE == 'tiered':
+                io_logger.info("💾 Saving to TIERED storage: %s", key)
+                save_to_tier(key, value, encoded)
+            else:
+                return jsonify({'error': f'Invalid storage mode: {STORAGE_MODE}'}), 500
+            
+            bump_document_version(key)
+            record_history(key, value)
+        if key == 'ListingLifeCurrentStore' and isinstance(value, str) and prefetcher:
+            # The page reloads into this store next; its bootstrap is loaded meanwhile
+            prefetcher.switching_to(value)
+        if queued:
+            return jsonify({
+                'success': True,
+                'queued': True,
+                'message': f'Data for key {key} queued; it will be sent to {STORAGE_MODE} when the backend is reachable'
+            })
         return jsonify({'success': True, 'message': f'Data saved for key: {key}'})
     except Exception as e:
         logger.error(f"Error in set_item: {e}")
@@ -650,31 +1725,38 @@ def get_item():
         
         if not key:
             return jsonify({'error': 'Key is required'}), 400
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
         
         # Load based on storage mode
         if STORAGE_MODE == 'local':
-            logger.info(f"📂 Loading from LOCAL storage: {key}")
+            io_logger.info("📂 Loading from LOCAL storage: %s", key)
             result = load_from_local(key)
         elif STORAGE_MODE == 'cloud':
-            logger.info(f"☁️ Loading from CLOUD storage: {key}")
-            result = load_from_cloud(key)
+            io_logger.info("☁️ Loading from CLOUD storage: %s", key)
+            result = load_or_queued(key)
         elif STORAGE_MODE == 'dropbox':
             if not dropbox_client:
                 logger.error(f"❌ Dropbox client not initialized! Cannot load {key}")
                 logger.error(f"   Current STORAGE_MODE: {STORAGE_MODE}")
                 logger.error(f"   dropbox_client: {dropbox_client}")
                 return jsonify({'error': 'Dropbox client not initialized. Check server logs.'}), 500
-            logger.info(f"📦 Loading from DROPBOX storage: {key}")
-            result = load_from_dropbox(key)
+            io_logger.info("📦 Loading from DROPBOX storage: %s", key)
+            result = load_or_queued(key)
             if result:
-                logger.info(f"✅ Successfully loaded {key} from Dropbox")
+                io_logger.info("✅ Successfully loaded %s from Dropbox", key)
             else:
-                logger.info(f"ℹ️ {key} not found in Dropbox")
+                io_logger.info("ℹ️ %s not found in Dropbox", key)
+        elif STORAGE_MODE == 'tiered':
+            io_logger.info("📂 Loading from TIERED storage: %s", key)
+            result = load_from_local(key)
         else:
             return jsonify({'error': f'Invalid storage mode: {STORAGE_MODE}'}), 500
         
         if result is None:
             return jsonify({'value': None})
+        if is_manifest(result):
+            result = load_sharded(key, result)
         
         return jsonify({'value': result})
     except Exception as e:
@@ -690,34 +1772,11 @@ def remove_item():
         
         if not key:
             return jsonify({'error': 'Key is required'}), 400
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
         
-        if STORAGE_MODE == 'local':
-            file_path = LOCAL_STORAGE_PATH / f"{key}.json"
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Removed from local: {key}")
-        elif STORAGE_MODE == 'cloud':
-            try:
-                s3_client.delete_object(
-                    Bucket=CLOUD_BUCKET,
-                    Key=f"listinglife/{key}.json"
-                )
-                logger.info(f"Removed from cloud: {key}")
-            except s3_client.exceptions.NoSuchKey:
-                pass  # Already doesn't exist
-        elif STORAGE_MODE == 'dropbox':
-            try:
-                if not dropbox:
-                    raise Exception("Dropbox module not available")
-                file_path = f"{DROPBOX_FOLDER.rstrip('/')}/{key}.json"
-                dropbox_client.files_delete(file_path)
-                logger.info(f"Removed from Dropbox: {key}")
-            except dropbox.exceptions.ApiError as e:
-                if e.error.is_path() and e.error.get_path().is_not_found():
-                    pass  # Already doesn't exist
-                else:
-                    raise
-        
+        with key_locks.hold(key):
+            remove_key(key)
         return jsonify({'success': True})
     except Exception as e:
         logger.error(f"Error in remove_item: {e}")
@@ -727,39 +1786,21 @@ def remove_item():
 def list_keys():
     """List all storage keys"""
     try:
-        if STORAGE_MODE == 'local':
-            keys = [f.stem for f in LOCAL_STORAGE_PATH.glob('*.json')]
-        elif STORAGE_MODE == 'cloud':
-            response = s3_client.list_objects_v2(
-                Bucket=CLOUD_BUCKET,
-                Prefix='listinglife/'
-            )
-            keys = [obj['Key'].replace('listinglife/', '').replace('.json', '') 
-                   for obj in response.get('Contents', [])]
-        elif STORAGE_MODE == 'dropbox':
-            try:
-                if not dropbox:
-                    raise Exception("Dropbox module not available")
-                folder_path = DROPBOX_FOLDER.rstrip('/')
-                response = dropbox_client.files_list_folder(folder_path)
-                keys = []
-                for entry in response.entries:
-                    if isinstance(entry, dropbox.files.FileMetadata) and entry.name.endswith('.json'):
-                        keys.append(entry.name.replace('.json', ''))
-                # Handle pagination if needed
-                while response.has_more:
-                    response = dropbox_client.files_list_folder_continue(response.cursor)
-                    for entry in response.entries:
-                        if isinstance(entry, dropbox.files.FileMetadata) and entry.name.endswith('.json'):
-                            keys.append(entry.name.replace('.json', ''))
-            except dropbox.exceptions.ApiError as e:
-                if e.error.is_path() and e.error.get_path().is_not_found():
-                    keys = []  # Folder doesn't exist yet
-                else:
-                    raise
+        if STORAGE_MODE in ('local', 'tiered'):
+            keys = list_local_keys()
+        elif STORAGE_MODE in ('cloud', 'dropbox'):
+            # Paginated past S3's 1000 objects per call; a key stored both ways is listed once
+            keys = list(list_remote_objects(STORAGE_MODE))
         else:
             keys = []
         
+        if outbox:
+            # Keys written during an outage exist even though the backend has not seen them yet
+            keys += [key for key in outbox.keys() if key not in keys]
+        
+        # Shards are part of their document's key, not keys of their own
+        keys = [key for key in keys if not is_shard_key(key)]
+        
         return jsonify({'keys': keys})
     except Exception as e:
         logger.error(f"Error in list_keys: {e}")
@@ -771,45 +1812,67 @@ def health():
     return jsonify({
         'status': 'healthy',
         'storage_mode': STORAGE_MODE,
-        'local_path': str(LOCAL_STORAGE_PATH.absolute()) if STORAGE_MODE == 'local' else None,
-        'cloud_bucket': CLOUD_BUCKET if STORAGE_MODE == 'cloud' else None,
-        'dropbox_folder': DROPBOX_FOLDER if STORAGE_MODE == 'dropbox' else None,
+        'local_path': str(LOCAL_STORAGE_PATH.absolute()) if STORAGE_MODE in ('local', 'tiered') else None,
+        'cloud_bucket': CLOUD_BUCKET if 'cloud' in (STORAGE_MODE, REMOTE_MODE) else None,
+        'dropbox_folder': DROPBOX_FOLDER if 'dropbox' in (STORAGE_MODE, REMOTE_MODE) else None,
+        'backend': dict(BACKEND_STATE),
+        'replication': replicator.describe() if replicator else None,
+        'outbox': outbox.describe() if outbox else None,
+        'simulated': network_simulator.describe() if network_simulator else None,
+        'server': {'threads': SERVER_THREADS, 'workers': SERVER_WORKERS, 'worker': WORKER_INDEX, 'pid': os.getpid(),
+                   'backend_generation': backend.generation, 'lock': backend_lock.describe()},
+        'clients': client_registry.describe(),
+        # Loads per backend that went to it (fetched) or shared a concurrent load of the same key (coalesced)
+        'reads': backend_reads.describe(),
+        'records': record_cache.describe(),
+        'bootstrap': dict(bootstrap_cache.describe(), prefetch=prefetcher.describe() if prefetcher else None),
         'timestamp': datetime.now().isoformat()
     })
 
 @app.route('/api/storage/sync', methods=['POST'])
 def sync_data():
-    """Sync all data from localStorage (called on initial connection)"""
+    """Sync all data from localStorage (called on initial connection)
+    
+    The body is read one item at a time, so memory is bounded by the largest
+    item rather than the whole localStorage, and each item's JSON text is
+    stored as sent instead of being parsed and encoded again.
+    """
     try:
-        data = request.json
-        items = data.get('items', {})
+        if not request.is_json:
+            return jsonify({'error': 'Expected a JSON body'}), 415
+        reader = JsonMemberReader(request.stream)
         
         synced = 0
-        for key, value in items.items():
-            try:
-                # Parse value if it's a string
-                if isinstance(value, str):
-                    try:
-                        value = json.loads(value)
-                    except:
-                        pass
-                
-                if STORAGE_MODE == 'local':
-                    save_to_local(key, value)
-                elif STORAGE_MODE == 'cloud':
-                    save_to_cloud(key, value)
-                elif STORAGE_MODE == 'dropbox':
-                    save_to_dropbox(key, value)
-                synced += 1
-            except Exception as e:
-                error_msg = str(e)
-                # Provide helpful message for Dropbox permission errors
-                if 'files.content.write' in error_msg or 'required scope' in error_msg.lower():
-                    logger.error(f"Error syncing {key}: Dropbox permission error - 'files.content.write' scope required")
-                else:
-                    logger.error(f"Error syncing {key}: {e}")
+        for name in reader.members():
+            if name != 'items':
+                continue
+            for key in reader.members():
+                try:
+                    with reader.spool_value() as spooled:
+                        value, encoded = spooled.decode()
+                    if not valid_key(key):
+                        raise ValueError(f"Invalid key: {key}")
+                    
+                    with key_locks.hold(key):
+                        save_to_storage(key, value, encoded)
+                        bump_document_version(key)
+                        record_history(key, value)
+                    synced += 1
+                except IngestError:
+                    raise  # The rest of the body cannot be read
+                except Exception as e:
+                    error_msg = str(e)
+                    # Provide helpful message for Dropbox permission errors
+                    if 'files.content.write' in error_msg or 'required scope' in error_msg.lower():
+                        logger.error(f"Error syncing {key}: Dropbox permission error - 'files.content.write' scope required")
+                    else:
+                        logger.error(f"Error syncing {key}: {e}")
         
         return jsonify({'success': True, 'synced': synced})
+    except IngestError as e:
+        # Items before the malformed part were already saved
+        logger.error(f"Error in sync_data: {e}")
+        return jsonify({'error': f'Invalid JSON body: {e}', 'synced': synced}), 400
     except Exception as e:
         logger.error(f"Error in sync_data: {e}")
         return jsonify({'error': str(e)}), 500
@@ -851,8 +1914,13 @@ def set_storage_config():
         config = request.json
         requested_mode = config.get('storage_mode', 'local').lower()
         logger.info(f"📝 Saving storage configuration: mode={requested_mode}")
+        if shared_state and requested_mode == 'tiered':
+            return jsonify({'error': 'Tiered mode replicates from a single process. Set "server_workers": 1 in storage_config.json and restart the server first.'}), 400
         
         if save_config_file(config):
+            if shared_state:
+                # The other worker processes reload it before their next request
+                shared_state.bump_config()
             # Re-initialize storage with new config (initialize_storage now reads from config file)
             logger.info("🔄 Re-initializing storage with new configuration...")
             initialize_storage()
@@ -876,6 +1944,11 @@ def set_storage_config():
                         'message': error_msg,
                         'storage_mode': STORAGE_MODE  # Return actual mode
                     })
+            elif requested_mode == 'tiered':
+                return jsonify({
+                    'success': True,
+                    'message': f'Configuration saved. Tiered storage active: local reads and writes, replicating to {REMOTE_MODE} in the background (see /api/health). No restart needed.'
+                })
             elif STORAGE_MODE == 'cloud':
                 if s3_client:
                     return jsonify({
@@ -937,9 +2010,15 @@ def test_storage():
                     }), 400
             
             try:
-                test_client = dropbox.Dropbox(token)
+                # A client that passes is kept, so saving these settings afterwards reuses it
+                test_client = client_registry.dropbox_client(dropbox, token)
                 # Test connection
-                test_client.users_get_current_account()
+                try:
+                    test_client.users_get_current_account()
+                except Exception:
+                    client_registry.discard(test_client)
+                    raise
+                client_registry.mark_verified(test_client)
                 
                 # Test write permission by attempting to upload a small test file
                 try:
@@ -1016,12 +2095,7 @@ def test_storage():
                 return jsonify({'error': 'All AWS credentials are required'}), 400
             
             try:
-                import boto3
-                test_client = boto3.client('s3',
-                    aws_access_key_id=access_key,
-                    aws_secret_access_key=secret_key,
-                    region_name=region
-                )
+                test_client = client_registry.s3_client(access_key, secret_key, region)
                 # Test connection
                 test_client.head_bucket(Bucket=bucket)
                 return jsonify({'success': True, 'message': f'AWS S3 connection successful. Bucket: {bucket}'})
@@ -1042,7 +2116,7 @@ def get_storage_size():
         file_count = 0
         file_sizes = {}
         
-        if STORAGE_MODE == 'local':
+        if STORAGE_MODE in ('local', 'tiered'):
             if LOCAL_STORAGE_PATH.exists():
                 for file_path in LOCAL_STORAGE_PATH.glob('*.json'):
                     size = file_path.stat().st_size
@@ -1050,32 +2124,15 @@ def get_storage_size():
                     file_count += 1
                     file_sizes[file_path.name] = size
         
-        elif STORAGE_MODE == 'dropbox' and dropbox_client:
+        elif STORAGE_MODE in ('cloud', 'dropbox'):
             try:
-                # List all files in Dropbox folder
-                folder_path = DROPBOX_FOLDER.rstrip('/')
-                result = dropbox_client.files_list_folder(folder_path)
-                
-                while True:
-                    for entry in result.entries:
-                        if isinstance(entry, dropbox.files.FileMetadata):
-                            # Check if it's a compressed file
-                            if entry.name.endswith('.json.gz'):
-                                file_count += 1
-                                size = entry.size
-                                total_size += size
-                                file_sizes[entry.name] = size
-                            elif entry.name.endswith('.json'):
-                                file_count += 1
-                                size = entry.size
-                                total_size += size
-                                file_sizes[entry.name] = size
-                    
-                    if not result.has_more:
-                        break
-                    result = dropbox_client.files_list_folder_continue(result.cursor)
+                for name, size, _ in iter_remote_files(STORAGE_MODE):
+                    if stored_key(name)[0]:
+                        total_size += size or 0
+                        file_count += 1
+                        file_sizes[name] = size or 0
             except Exception as e:
-                logger.warning(f"Could not list Dropbox files: {e}")
+                logger.warning(f"Could not list {STORAGE_MODE} files: {e}")
         
         # Format sizes
         def format_size(bytes_size):
@@ -1106,6 +2163,496 @@ def get_storage_size():
         logger.error(f"Error in get_storage_size: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/lifetime', methods=['GET'])
+def get_lifetime_stats():
+    """Per-category time-to-sale statistics computed from real listing data"""
+    try:
+        store_id = request.args.get('store')
+        store_ids = [store_id] if store_id else get_store_ids()
+        today = datetime.now().date().toordinal()
+        
+        stores = {}
+        for sid in store_ids:
+            key = f"EbayListingLife_{sid}"
+            # Active/expired classification depends on the date, so it is part of the cache key
+            cache_key = (document_version(key), today)
+            cached = LIFETIME_STATS_CACHE.get(key)
+            if cached and cached[0] == cache_key and remote_copy_fresh(cached[2]):
+                metrics.inc('listinglife_cache_requests_total', cache='lifetime_stats', result='hit')
+                stats = cached[1]
+            else:
+                metrics.inc('listinglife_cache_requests_total', cache='lifetime_stats', result='miss')
+                loaded = time.time()
+                stats = compute_lifetime_stats(load_document(key), today)
+                LIFETIME_STATS_CACHE[key] = (cache_key, stats, loaded)
+            stores[sid] = dict(stats, version=cache_key[0])
+        
+        return jsonify({'stores': stores, 'timestamp': datetime.now().isoformat()})
+    except Exception as e:
+        logger.error(f"Error in get_lifetime_stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def remote_connection():
+    """Settings a stats worker opens its own client to the cloud/Dropbox backend with (see store_analytics.remote_client)"""
+    handle = backend
+    connection = {}
+    if network_simulator:
+        connection['simulation'] = [network_simulator.config, str(network_simulator.root)]
+    if STORAGE_MODE == 'cloud':
+        return dict(connection, bucket=handle.bucket, access_key=os.getenv('AWS_ACCESS_KEY_ID'),
+                    secret_key=os.getenv('AWS_SECRET_ACCESS_KEY'), region=os.getenv('AWS_REGION', 'us-east-1'))
+    return dict(connection, folder=handle.dropbox_path, token=DROPBOX_ACCESS_TOKEN)
+
+def store_document_sources(store_id):
+    """Where a stats worker gets a store's listing and sold documents (see store_analytics.load_source)"""
+    keys = (f"EbayListingLife_{store_id}", f"SoldItemsTrends_{store_id}")
+    # The worker reads or downloads the documents itself instead of receiving them pickled
+    if STORAGE_MODE in ('local', 'tiered'):
+        return tuple(('local', str(LOCAL_STORAGE_PATH), key) for key in keys)
+    connection = remote_connection()
+    # A write still in the outbox has not reached the backend, so that document is sent along
+    return tuple(('value', load_or_queued(key)) if outbox and outbox.pending(key) else (STORAGE_MODE, connection, key)
+                 for key in keys)
+
+@app.route('/api/stats/all-stores', methods=['GET'])
+def get_all_store_stats():
+    """Counts, revenue, sell-through and time-to-sale for every store and for all stores together"""
+    try:
+        today = datetime.now().date().toordinal()
+        stores = {}
+        for sid in get_store_ids():
+            version = (document_version(f"EbayListingLife_{sid}"), document_version(f"SoldItemsTrends_{sid}"))
+            stores[sid] = (version, lambda sid=sid: store_document_sources(sid))
+        
+        report = store_analytics.report(stores, today, fresh=remote_copy_fresh)
+        recomputed = len(report['recomputed'])
+        metrics.inc('listinglife_cache_requests_total', len(stores) - recomputed, cache='store_stats', result='hit')
+        metrics.inc('listinglife_cache_requests_total', recomputed, cache='store_stats', result='miss')
+        return jsonify(dict(report, timestamp=datetime.now().isoformat()))
+    except Exception as e:
+        logger.error(f"Error in get_all_store_stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def bootstrap_fingerprints(keys):
+    """In cloud/Dropbox mode, the fingerprint the backend lists for each key (None in other modes)
+    
+    Other machines writing to the same bucket or Dropbox do not bump versions
+    here, so in those modes a cached body is only good while the backend still
+    holds the copies it was built from. One listing answers that for every key
+    of every store, and is reused for bootstrap_cache.revalidate_after seconds
+    so checks and prefetches made together do not each list the backend.
+    """
+    if STORAGE_MODE not in ('cloud', 'dropbox'):
+        return None
+    with bootstrap_listing_lock:
+        listing = BOOTSTRAP_LISTING
+        if listing['mode'] != STORAGE_MODE or time.time() - listing['listed'] > bootstrap_cache.revalidate_after:
+            # Listed under the lock: callers arriving meanwhile wait for this listing instead of starting their own
+            listing.update(mode=STORAGE_MODE, listed=time.time(), objects=list_remote_objects(STORAGE_MODE))
+        stored = listing['objects']
+    return [stored.get(key) for key in keys]
+
+def bootstrap_check(keys):
+    """The fingerprints callable WarmCache.get/fresh take: None outside cloud/Dropbox mode, where versions say it all"""
+    if STORAGE_MODE not in ('cloud', 'dropbox'):
+        return None
+    return lambda: bootstrap_fingerprints(keys)
+
+def build_bootstrap(store_id):
+    """Load every bootstrap key of a store and cache the gzipped body; returns the body"""
+    keys = bootstrap_keys(store_id)
+    # Read before loading, so a save made meanwhile leaves the entry stale rather than wrong
+    versions = [document_version(key) for key in keys]
+    fingerprints = bootstrap_fingerprints(keys)
+    built = time.time()
+    values = dict(zip(keys, bootstrap_pool.map(load_from_storage, keys)))
+    body = encode_bootstrap(store_id, values, [document_version(key) for key in keys])
+    bootstrap_cache.put(store_id, versions, fingerprints, body, built)
+    return body
+
+def bootstrap_body(store_id):
+    """Return (gzipped body, 'hit' or 'miss'); concurrent misses for one store share a single build"""
+    keys = bootstrap_keys(store_id)
+    body = bootstrap_cache.get(store_id, [document_version(key) for key in keys], bootstrap_check(keys))
+    if body is not None:
+        return body, 'hit'
+    return bootstrap_builds.do('bootstrap', store_id, lambda: build_bootstrap(store_id)), 'miss'
+
+def warm_bootstrap(store_id):
+    """Prefetcher task: build a store's bootstrap unless a fresh one is cached; False if nothing was built"""
+    if BACKEND_STATE['state'] != 'ready':
+        return False
+    keys = bootstrap_keys(store_id)
+    if bootstrap_cache.fresh(store_id, [document_version(key) for key in keys], bootstrap_check(keys)):
+        return False
+    bootstrap_builds.do('bootstrap', store_id, lambda: build_bootstrap(store_id))
+    return True
+
+@app.route('/api/bootstrap/<store_id>', methods=['GET'])
+def get_store_bootstrap(store_id):
+    """Every key a page loads for one store, in one gzipped response"""
+    try:
+        if SHARD_SEPARATOR in store_id:
+            return jsonify({'error': 'Invalid store id'}), 400
+        
+        body, result = bootstrap_body(store_id)
+        metrics.inc('listinglife_cache_requests_total', cache='bootstrap', result=result)
+        if prefetcher:
+            prefetcher.opened(store_id)
+        
+        if 'gzip' not in request.accept_encodings:
+            return Response(gzip.decompress(body), mimetype='application/json', headers={'Vary': 'Accept-Encoding'})
+        return Response(body, mimetype='application/json', headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+    except Exception as e:
+        logger.error(f"Error in get_store_bootstrap: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/bootstrap/<store_id>/prefetch', methods=['POST'])
+def prefetch_store_bootstrap(store_id):
+    """Start loading a store's bootstrap in the background (sent as the page switches to it)"""
+    if SHARD_SEPARATOR in store_id:
+        return jsonify({'error': 'Invalid store id'}), 400
+    if prefetcher:
+        prefetcher.switching_to(store_id)
+    return jsonify({'success': True, 'prefetch': prefetcher.describe() if prefetcher else None}), 202
+
+@app.route('/api/pending/suggest', methods=['POST'])
+def suggest_pending_targets():
+    """Suggest sold subcategories for a batch of pending items"""
+    try:
+        data = request.json or {}
+        store_id = data.get('store')
+        items = data.get('items') or []
+        top_k = max(1, min(int(data.get('top_k', 3)), 20))
+        
+        key = f"SoldItemsTrends_{store_id}" if store_id else 'SoldItemsTrends'
+        started = datetime.now()
+        
+        version = document_version(key)
+        period_id = data.get('period_id')
+        cached = PENDING_INDEX_CACHE.get(key)
+        if cached and cached[0] == (version, period_id) and remote_copy_fresh(cached[2]):
+            metrics.inc('listinglife_cache_requests_total', cache='pending_index', result='hit')
+            index = cached[1]
+        else:
+            metrics.inc('listinglife_cache_requests_total', cache='pending_index', result='miss')
+            loaded = time.time()
+            document = load_document(key)
+            # Without an explicit period, match against the period currently in use
+            # Legacy documents may be a bare list; they index no subcategories and suggest nothing
+            if not isinstance(document, dict):
+                document = {}
+            effective_period = period_id or document.get('currentPeriodId')
+            index = SubcategoryIndex(document, effective_period)
+            PENDING_INDEX_CACHE[key] = ((version, period_id), index, loaded)
+        
+        suggestions = index.suggest_batch(items, top_k)
+        elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+        logger.info(f"Suggested targets for {len(suggestions)} pending items in {elapsed_ms:.1f}ms")
+        return jsonify({
+            'suggestions': suggestions,
+            'subcategories_indexed': len(index.entries),
+            'elapsed_ms': round(elapsed_ms, 1)
+        })
+    except Exception as e:
+        logger.error(f"Error in suggest_pending_targets: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Documents an import can land in; rows are checked against every target given
+IMPORT_TARGETS = ('EbayListingLife', 'ImportedItems', 'PendingItems')
+
+def get_import_index(key):
+    """Return the identity index for a key, rebuilding it only when the key has changed (or its remote copy aged out)"""
+    version = document_version(key)
+    cached = IMPORT_INDEX_CACHE.get(key)
+    if cached and cached[0] == version and remote_copy_fresh(cached[2]):
+        metrics.inc('listinglife_cache_requests_total', cache='import_index', result='hit')
+        return cached[1]
+    metrics.inc('listinglife_cache_requests_total', cache='import_index', result='miss')
+    loaded = time.time()
+    index = ImportIdentityIndex(load_document(key))
+    IMPORT_INDEX_CACHE[key] = (version, index, loaded)
+    return index
+
+@app.route('/api/import/dedupe', methods=['POST'])
+def dedupe_import():
+    """Classify a batch of import rows as new, updated or already stored"""
+    try:
+        data = request.json or {}
+        store_id = data.get('store')
+        rows = data.get('items') or []
+        targets = data.get('targets') or [data.get('target', 'EbayListingLife')]
+        
+        invalid = [target for target in targets if target not in IMPORT_TARGETS]
+        if invalid:
+            return jsonify({'error': f'Invalid import target: {", ".join(invalid)}'}), 400
+        
+        indexes = [get_import_index(f"{target}_{store_id}" if store_id else target) for target in targets]
+        report = dedupe_rows(rows, indexes)
+        logger.info(f"Import dedupe: {len(report['new'])} new, {len(report['updated'])} updated, {len(report['skipped'])} skipped")
+        return jsonify(dict(report, counts={name: len(entries) for name, entries in report.items()}))
+    except Exception as e:
+        logger.error(f"Error in dedupe_import: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """Stream listing and sold items as NDJSON or CSV, loading one document at a time"""
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': f'Invalid export format: {export_format}'}), 400
+        
+        store_param = request.args.get('store', 'all')
+        store_ids = get_store_ids() if store_param == 'all' else [store_param]
+        kinds = request.args.get('kinds', 'items,sold').split(',')
+        use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        
+        # Data saved before stores existed stays under the unsuffixed keys (the page migrating it may keep them as a backup);
+        # like the browser backup in export-data.html, it is exported with the default store
+        documents = [(store_id, f"_{store_id}") for store_id in store_ids]
+        if store_param in ('all', 'default'):
+            documents.append(('default', ''))
+        
+        def records():
+            # Each document is loaded only when the stream reaches it and released before the next
+            for store_id, suffix in documents:
+                if 'items' in kinds:
+                    yield from iter_listing_records(store_id, load_document(f"EbayListingLife{suffix}"))
+                if 'sold' in kinds:
+                    yield from iter_sold_records(store_id, load_document(f"SoldItemsTrends{suffix}"))
+        
+        def logged(chunks):
+            sent = 0
+            try:
+                for chunk in chunks:
+                    sent += len(chunk)
+                    yield chunk
+                logger.info(f"Export finished: {len(store_ids)} store(s), {sent}B sent ({export_format}{', gzip' if use_gzip else ''})")
+            except Exception as e:
+                # Headers are already sent, so the client sees a truncated download
+                logger.error(f"Error streaming export after {sent}B: {e}")
+                raise
+        
+        chunks = encode_records(records(), export_format)
+        if use_gzip:
+            chunks = gzip_chunks(chunks)
+        
+        extension = 'csv' if export_format == 'csv' else 'ndjson'
+        filename = f"listinglife-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{extension}{'.gz' if use_gzip else ''}"
+        mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        if use_gzip:
+            mimetype = 'application/gzip'
+        return Response(
+            stream_with_context(logged(chunks)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    except Exception as e:
+        logger.error(f"Error in export_data: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/<key>', methods=['GET'])
+def list_history(key):
+    """List the recorded versions of a key"""
+    try:
+        if not version_history:
+            return jsonify({'error': 'Version history is disabled'}), 404
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
+        versions = version_history.list_versions(key)
+        return jsonify({
+            'key': key,
+            'versions': versions,
+            'total_size_bytes': sum(entry['size'] for entry in versions)
+        })
+    except Exception as e:
+        logger.error(f"Error in list_history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/<key>/value', methods=['GET'])
+def get_history_value(key):
+    """Materialize a key at ?version=N or at the last version saved before ?at=<ISO timestamp>"""
+    try:
+        if not version_history:
+            return jsonify({'error': 'Version history is disabled'}), 404
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
+        version = request.args.get('version', type=int)
+        version, value = version_history.get_version(key, version=version, at=request.args.get('at'))
+        if version is None:
+            return jsonify({'error': f'No matching version of {key}'}), 404
+        return jsonify({'key': key, 'version': version, 'value': value})
+    except Exception as e:
+        logger.error(f"Error in get_history_value: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/<key>/restore', methods=['POST'])
+def restore_history_version(key):
+    """Make a past version of a key the current value again"""
+    try:
+        if not version_history:
+            return jsonify({'error': 'Version history is disabled'}), 404
+        if not valid_key(key):
+            return jsonify({'error': f'Invalid key: {key}'}), 400
+        data = request.json or {}
+        version, value = version_history.get_version(key, version=data.get('version'), at=data.get('at'))
+        if version is None:
+            return jsonify({'error': f'No matching version of {key}'}), 404
+        
+        with key_locks.hold(key):
+            save_to_storage(key, value)
+            bump_document_version(key)
+            record_history(key, value)
+        logger.info(f"Restored {key} to version {version}")
+        return jsonify({'success': True, 'message': f'Restored {key} to version {version}'})
+    except Exception as e:
+        logger.error(f"Error in restore_history_version: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """List recent request profiles with their top cumulative functions"""
+    try:
+        limit = request.args.get('limit', type=int)
+        summaries = list(request_profiler.summaries)
+        return jsonify({
+            'enabled': request_profiler.enabled,
+            'sample_rate': request_profiler.sample_rate,
+            'memory': request_profiler.memory,
+            'header': PROFILE_HEADER,
+            'profiles': summaries[:limit] if limit else summaries
+        })
+    except Exception as e:
+        logger.error(f"Error in list_profiles: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Download a saved .pstats file"""
+    return send_from_directory(request_profiler.output_dir.absolute(), name, as_attachment=True)
+
+@app.route('/api/admin/compaction', methods=['GET'])
+def get_compaction():
+    """Schedule, progress and bytes reclaimed of the compaction job"""
+    if not compactor:
+        return jsonify({'error': 'Compaction is not set up'}), 503
+    return jsonify(compactor.describe())
+
+@app.route('/api/admin/compaction', methods=['POST'])
+def start_compaction():
+    """Run a compaction pass now ({"dry_run": true} reports what would be reclaimed without changing anything)"""
+    try:
+        if not compactor:
+            return jsonify({'error': 'Compaction is not set up'}), 503
+        data = request.get_json(silent=True) or {}
+        if not compactor.request_run(dry_run=bool(data.get('dry_run', False))):
+            return jsonify({'error': 'A compaction pass is already running', 'compaction': compactor.describe()}), 409
+        return jsonify({'success': True, 'compaction': compactor.describe()}), 202
+    except Exception as e:
+        logger.error(f"Error in start_compaction: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/migrate', methods=['POST'])
+def start_migration():
+    """Copy every key from one backend to another in the background (resumes an interrupted run)"""
+    global migration_job
+    try:
+        data = request.json or {}
+        source = str(data.get('source', '')).lower()
+        target = str(data.get('target', '')).lower()
+        if migration_job and migration_job.running:
+            return jsonify({'error': 'A migration is already running', 'migration': migration_job.describe()}), 409
+        if shared_state:
+            # Its progress would only be visible to the worker that happened to take this request
+            return jsonify({'error': f'The server is running {SERVER_WORKERS} worker processes; run migrate_storage.py instead'}), 409
+        if target in served_backends():
+            # Its writes would bypass the key locks, the outbox and the replicator while requests write the same keys
+            return jsonify({'error': f'This server is serving {target}; stop it and run migrate_storage.py to copy into {target}'}), 409
+        
+        try:
+            job = create_migration(source, target, workers=int(data.get('workers', DEFAULT_MIGRATION_WORKERS)),
+                                   verify=bool(data.get('verify', True)))
+        except (ValueError, ImportError) as e:
+            return jsonify({'error': str(e)}), 400
+        if data.get('restart'):
+            job.reset()
+        migration_job = job
+        migration_job.start()
+        return jsonify({'success': True, 'migration': migration_job.describe()}), 202
+    except Exception as e:
+        logger.error(f"Error in start_migration: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/migrate', methods=['GET'])
+def get_migration():
+    """Progress of the current or last migration"""
+    return jsonify({'migration': migration_job.describe() if migration_job else None})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text-format metrics for requests, backends and caches"""
+    if outbox:
+        queue = outbox.describe()
+        metrics.set_gauge('listinglife_outbox_depth', queue['depth'], backend=outbox.backend)
+        metrics.set_gauge('listinglife_outbox_oldest_age_seconds', queue['oldest_age_seconds'], backend=outbox.backend)
+    if shared_state:
+        # Any worker may answer the scrape, so it reports every worker's last published metrics with a worker label
+        workers = shared_state.worker_metrics()
+        workers[WORKER_INDEX] = metrics.snapshot()
+        return Response(metrics.render(workers), mimetype='text/plain; version=0.0.4')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def publish_worker_metrics():
+    """Write this worker's metrics every METRICS_PUBLISH_INTERVAL seconds for the other workers to report"""
+    while True:
+        try:
+            shared_state.publish_metrics(WORKER_INDEX, metrics.snapshot())
+        except Exception as e:
+            logger.warning(f"Could not publish worker {WORKER_INDEX} metrics: {e}")
+        time.sleep(METRICS_PUBLISH_INTERVAL)
+
+def configured_server_workers(config):
+    """Worker processes to start with (server_workers in the config, a number or "auto"), 1 where they cannot be used"""
+    workers = config.get('server_workers', os.getenv('SERVER_WORKERS', 1))
+    workers = (os.cpu_count() or 1) if str(workers).lower() == 'auto' else int(workers)
+    workers = max(1, min(workers, MAX_WORKERS))
+    if workers == 1:
+        return 1
+    if not WORKERS_SUPPORTED:
+        logger.warning("⚠️  server_workers needs fork() and fcntl, which this platform lacks; serving in one process")
+        return 1
+    if str(config.get('storage_mode', os.getenv('STORAGE_MODE', 'local'))).lower() == 'tiered':
+        logger.warning("⚠️  Tiered mode replicates from a single process; ignoring server_workers")
+        return 1
+    outbox_root = Path(config.get('local_storage_path', os.getenv('LOCAL_STORAGE_PATH', './listinglife_data'))) / '.outbox'
+    if any(outbox_root.glob('*/*.json')):
+        # Worker processes run without the outbox, so its writes are sent by a single process first
+        logger.warning("⚠️  Writes from an earlier outage are still in the outbox; serving in one process until they are sent")
+        return 1
+    return workers
+
+def start_worker(index):
+    """Set up a forked worker process before it accepts connections"""
+    global WORKER_INDEX
+    WORKER_INDEX = index
+    key_locks.process_locks = shared_state
+    # Threads (log writer, backend connection) do not survive fork(), so each worker starts its own
+    initialize_storage(background=True)
+    threading.Thread(target=publish_worker_metrics, name='metrics-publish', daemon=True).start()
+
+def stop_worker():
+    """Stop a worker's stats processes and flush its queued history versions and log lines before it exits"""
+    store_analytics.shutdown()
+    if version_history:
+        version_history.close()
+    try:
+        # Its counters stay in the scrape after it exits
+        shared_state.publish_metrics(WORKER_INDEX, metrics.snapshot())
+    except Exception as e:
+        logger.warning(f"Could not publish worker {WORKER_INDEX} metrics: {e}")
+    stop_logging()
+
 if __name__ == '__main__':
     # Verify Python version compatibility
     import sys
@@ -1117,80 +2664,48 @@ if __name__ == '__main__':
         input("Press Enter to exit...")
         sys.exit(1)
     
-    # Try to load config from file first
-    file_config = load_config_file()
-    if file_config:
-        # Override environment variables with file config
-        requested_mode = file_config.get('storage_mode', 'local')
-        os.environ['STORAGE_MODE'] = requested_mode
-        logger.info(f"Setting storage mode from config: {requested_mode}")
-        
-        if file_config.get('local_storage_path'):
-            os.environ['LOCAL_STORAGE_PATH'] = file_config['local_storage_path']
-        if file_config.get('dropbox_access_token'):
-            token = file_config['dropbox_access_token']
-            os.environ['DROPBOX_ACCESS_TOKEN'] = token
-            logger.info(f"Dropbox token loaded: {token[:20]}... (length: {len(token)})")
-        if file_config.get('dropbox_folder'):
-            os.environ['DROPBOX_FOLDER'] = file_config['dropbox_folder']
-        if file_config.get('s3_bucket'):
-            os.environ['S3_BUCKET'] = file_config['s3_bucket']
-        if file_config.get('aws_access_key_id'):
-            os.environ['AWS_ACCESS_KEY_ID'] = file_config['aws_access_key_id']
-        if file_config.get('aws_secret_access_key'):
-            os.environ['AWS_SECRET_ACCESS_KEY'] = file_config['aws_secret_access_key']
-        if file_config.get('aws_region'):
-            os.environ['AWS_REGION'] = file_config['aws_region']
-        
-        # Re-initialize storage with new config
-        logger.info("=" * 60)
-        logger.info("Initializing storage with config file settings...")
-        logger.info("=" * 60)
-        initialize_storage()
-        logger.info("=" * 60)
-        logger.info(f"✅ Storage initialized: {STORAGE_MODE.upper()}")
-        if STORAGE_MODE == 'dropbox':
-            logger.info(f"   Dropbox folder: {DROPBOX_FOLDER}")
-            logger.info(f"   Dropbox client: {'✅ Connected' if dropbox_client else '❌ Not connected'}")
-        elif STORAGE_MODE == 'local':
-            logger.info(f"   Local path: {LOCAL_STORAGE_PATH.absolute()}")
-        logger.info("=" * 60)
-        
-        # Warn if Dropbox was requested but not initialized
-        if requested_mode == 'dropbox' and STORAGE_MODE != 'dropbox':
-            print("=" * 60)
-            print("⚠️  WARNING: Dropbox was requested but initialization failed!")
-            print("=" * 60)
-            print("The server will use LOCAL storage instead.")
-            print("Check the logs above for error details.")
-            print("=" * 60)
-            print()
+    startup_config = load_config_file() or {}
+    SERVER_WORKERS = configured_server_workers(startup_config)
+    if SERVER_WORKERS > 1:
+        # Created before forking so every worker maps the same counters and locks; each
+        # worker then initializes storage itself (see start_worker)
+        shared_state = SharedState(SERVER_WORKERS)
+        STORAGE_MODE = str(startup_config.get('storage_mode', os.getenv('STORAGE_MODE', 'local'))).lower()
+        SERVER_THREADS = int(startup_config.get('server_threads', os.getenv('SERVER_THREADS', DEFAULT_SERVER_THREADS)))
     else:
-        logger.info("No config file found, using environment variables or defaults")
-        initialize_storage()
+        # initialize_storage() reads the config file (or environment variables) itself; the
+        # backend SDK is imported and verified in the background so the server starts at once
+        initialize_storage(background=True)
     
     print("=" * 60)
     print("ListingLife Storage Server")
     print("=" * 60)
     print(f"Python Version: {sys.version.split()[0]}")
     print(f"Storage Mode: {STORAGE_MODE.upper()}")
-    if STORAGE_MODE == 'local':
+    if SERVER_WORKERS > 1:
+        print(f"Worker Processes: {SERVER_WORKERS} (each connects the storage backend itself)")
+    elif STORAGE_MODE == 'local':
         print(f"Local Storage Path: {LOCAL_STORAGE_PATH.absolute()}")
+    elif STORAGE_MODE == 'tiered':
+        print(f"Local Tier: {LOCAL_STORAGE_PATH.absolute()} (replicating to {REMOTE_MODE})")
     elif STORAGE_MODE == 'cloud':
         print(f"Cloud Bucket (S3): {CLOUD_BUCKET}")
     elif STORAGE_MODE == 'dropbox':
         print(f"Dropbox Folder: {DROPBOX_FOLDER}")
-        if dropbox_client:
-            print("✅ Dropbox connection: ACTIVE")
-        else:
-            print("❌ Dropbox connection: FAILED (check logs above)")
-    print(f"Server running on: http://127.0.0.1:5000")
+    if BACKEND_STATE['state'] == 'connecting':
+        print("⏳ Backend connection: verifying in the background (see /api/health)")
+    if SERVER_WORKERS > 1:
+        print(f"Server running on: http://127.0.0.1:5000 ({SERVER_WORKERS} processes x {SERVER_THREADS} threads)")
+    else:
+        print(f"Server running on: http://127.0.0.1:5000 ({SERVER_THREADS} worker threads)")
     print("=" * 60)
     print("Press Ctrl+C to stop the server")
     print()
     
     try:
-        app.run(host='127.0.0.1', port=5000, debug=False)
+        # A fixed pool of request threads instead of app.run's thread per connection, in each worker process
+        serve(app, host='127.0.0.1', port=5000, threads=SERVER_THREADS, workers=SERVER_WORKERS,
+              on_worker_start=start_worker, on_worker_exit=stop_worker)
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e:
@@ -551,6 +551,10 @@ class StoreManager {
         // Save current store
         this.currentStoreId = storeId;
         this.saveCurrentStore();
+        // The server loads the new store's data while the page reloads
+        if (window.storageWrapper) {
+            window.storageWrapper.prefetchStore(storeId);
+        }
         this.updateStoreDropdown();
 
         // Trigger store change event for other scripts to reload data
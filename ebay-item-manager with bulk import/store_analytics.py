@@ -0,0 +1,227 @@
+"""
+ListingLife Store Analytics
+Consolidated stats for every store, reduced one store per worker process and cached per store version
+
+Reducing a store walks every listing and sold item in pure Python, so on one
+interpreter the report for many stores takes as long as all of them in turn.
+StoreAnalytics sends the stores whose documents changed since the last report
+to a process pool, one store per task, and each worker returns that store's
+partial (see listing_stats.store_partial). The parent caches partials by the
+versions of the two documents they were built from and merges them, so a
+report after one store changed reduces only that store.
+
+Workers load the store's documents themselves, so only where to find them
+and the small partial cross between processes: on local disk they read the
+files, and with S3 or Dropbox they download them over a client of their own,
+opened with the connection settings the parent sends and kept for the
+worker's later tasks.
+"""
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from listing_stats import store_partial, merge_partials, summarize_partial
+from document_shards import is_manifest, shard_keys, assemble_document, ShardError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# Clients this process opened to a cloud/Dropbox backend, by the connection settings they were opened with
+_remote_clients = {}
+
+
+def read_document(key, read):
+    """Load a document the way the server does, reassembling shards; read(key) returns one stored object or None"""
+    document = read(key)
+    for attempt in range(2):
+        if not is_manifest(document):
+            break
+        try:
+            document = assemble_document(key, document, {shard_key: read(shard_key) for shard_key in shard_keys(document)})
+        except ShardError:
+            # The server replaced shards after this manifest was read
+            latest = read(key)
+            if attempt or latest == document:
+                raise
+            document = latest
+    if isinstance(document, str):
+        try:
+            document = json.loads(document)
+        except ValueError:
+            return None
+    return document
+
+
+def read_local_document(folder, key):
+    """Load a document from the local data folder"""
+    def read(name):
+        path = Path(folder) / f"{name}.json"
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    return read_document(key, read)
+
+
+def remote_client(mode, connection):
+    """(client, dropbox module or None) for a cloud/Dropbox connection, opened once per process
+
+    connection holds what the server opened its own client with: bucket,
+    access_key, secret_key and region for S3, folder and token for Dropbox,
+    or simulation ([config, folder] of simulated_backend.NetworkSimulator).
+    """
+    settings = json.dumps([mode, connection], sort_keys=True)
+    if settings not in _remote_clients:
+        if connection.get('simulation'):
+            from simulated_backend import NetworkSimulator
+            simulator = NetworkSimulator(*connection['simulation'])
+            if mode == 'cloud':
+                opened = (simulator.s3_client(), None)
+            else:
+                module = simulator.dropbox_module()
+                opened = (module.Dropbox(simulator.issue_token()), module)
+        elif mode == 'cloud':
+            import boto3
+            opened = (boto3.client('s3', aws_access_key_id=connection.get('access_key'),
+                                   aws_secret_access_key=connection.get('secret_key'),
+                                   region_name=connection.get('region')), None)
+        else:
+            import dropbox
+            opened = (dropbox.Dropbox(connection['token']), dropbox)
+        _remote_clients[settings] = opened
+    return _remote_clients[settings]
+
+
+def read_remote_document(mode, connection, key):
+    """Load a document from a cloud/Dropbox backend, compressed copy first, as the server does"""
+    client, module = remote_client(mode, connection)
+
+    def download(name):
+        if mode == 'cloud':
+            try:
+                return client.get_object(Bucket=connection['bucket'], Key=f"listinglife/{name}")['Body'].read()
+            except client.exceptions.NoSuchKey:
+                return None
+        try:
+            return client.files_download(f"{connection['folder']}/{name}")[1].content
+        except module.exceptions.ApiError as e:
+            if e.error.is_path() and e.error.get_path().is_not_found():
+                return None
+            raise
+
+    def read(name):
+        data = download(f"{name}.json.gz")
+        if data is not None:
+            return json.loads(gzip.decompress(data).decode('utf-8'))
+        data = download(f"{name}.json")
+        return None if data is None else json.loads(data.decode('utf-8'))
+
+    return read_document(key, read)
+
+
+def load_source(source):
+    """A document source is ('local', folder, key), ('cloud' or 'dropbox', connection, key) or ('value', document)"""
+    if source[0] == 'local':
+        return read_local_document(source[1], source[2])
+    if source[0] in ('cloud', 'dropbox'):
+        return read_remote_document(*source)
+    return source[1]
+
+
+def reduce_store(listing_source, sold_source, today):
+    """Worker task: one store's partial"""
+    return store_partial(load_source(listing_source), load_source(sold_source), today)
+
+
+class StoreAnalytics:
+    """Process pool plus the partial cache, shared by every request thread"""
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = max(1, int(workers))
+        self._pool = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def configure(self, workers):
+        """Change the pool size; the running pool is replaced on its next use"""
+        workers = max(1, int(workers))
+        with self._lock:
+            if workers != self.workers:
+                self.workers = workers
+                self._shutdown_pool()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_pool()
+
+    def _shutdown_pool(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned rather than forked: the server process has request threads
+                # holding locks a forked child would inherit held
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def report(self, stores, today, fresh=None):
+        """Summaries per store and merged, for stores = {store id: (version, sources)}
+
+        version identifies the store's documents (equal versions mean unchanged
+        documents) and sources() returns (listing source, sold source) for
+        load_source; it is called only for stores not in the cache. fresh(loaded)
+        may reject a cached partial by the time.time() its documents were loaded.
+        """
+        partials = {}
+        stale = []
+        for store_id, (version, sources) in stores.items():
+            cached = self._cache.get(store_id)
+            if cached and cached[0] == (version, today) and (fresh is None or fresh(cached[2])):
+                partials[store_id] = cached[1]
+            else:
+                stale.append(store_id)
+
+        loaded = time.time()
+        for store_id, partial in self._reduce({store_id: stores[store_id][1]() for store_id in stale}, today).items():
+            self._cache[store_id] = ((stores[store_id][0], today), partial, loaded)
+            partials[store_id] = partial
+        for store_id in set(self._cache) - set(stores):
+            self._cache.pop(store_id, None)  # Deleted stores
+
+        return {
+            'stores': {store_id: dict(summarize_partial(partial), version=list(stores[store_id][0]))
+                       for store_id, partial in partials.items()},
+            'overall': summarize_partial(merge_partials(partials.values())),
+            'recomputed': sorted(stale),
+        }
+
+    def _reduce(self, sources, today):
+        # One store is reduced in this process; shipping it to a worker would only add the round trip
+        if len(sources) < 2 or self.workers < 2:
+            return {store_id: reduce_store(*pair, today) for store_id, pair in sources.items()}
+        try:
+            pool = self._get_pool()
+            futures = {store_id: pool.submit(reduce_store, *pair, today) for store_id, pair in sources.items()}
+            return {store_id: future.result() for store_id, future in futures.items()}
+        except BrokenProcessPool as e:
+            logger.warning(f"Stats worker pool failed ({e}); reducing stores in the server process")
+            with self._lock:
+                self._pool = None
+            return {store_id: reduce_store(*pair, today) for store_id, pair in sources.items()}
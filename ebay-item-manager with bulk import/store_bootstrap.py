@@ -0,0 +1,262 @@
+"""
+ListingLife Store Bootstrap
+Every key a page loads for one store in a single gzipped response, with the stores likely to be opened next warmed in the background
+
+Switching stores reloads the page, and the page then asks for the new store's
+keys one /api/storage/get at a time; against Dropbox each is a WAN download.
+GET /api/bootstrap/<store id> returns all of them in one response. Bodies are
+kept gzipped in a WarmCache bounded by bytes, keyed by the versions here of
+the keys they hold. In cloud/Dropbox mode writes other machines make to the
+same bucket or Dropbox do not bump versions here, so an entry also keeps the
+fingerprints the backend listed for its keys. Those are checked again at most
+once every revalidate_after seconds: a hit within that long of the last check
+is served on versions alone, and a store nothing was saved to since is served
+after one listing instead of a download per key. Entries also expire after
+max_age seconds.
+
+StorePrefetcher fills the cache from a background thread with the stores a
+user is likely to open next: the one a switch is about to reload into, then
+the most recently opened stores and the rest listed in ListingLifeStores.
+"""
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+from storage_compactor import STORE_SCOPED_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Keys every page reads whatever the store
+SHARED_KEYS = ('ListingLifeStores', 'ListingLifeSettings')
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE = 300
+DEFAULT_REVALIDATE_AFTER = 15
+DEFAULT_PREFETCH_STORES = 3
+RECENT_STORES = 8
+
+
+def bootstrap_keys(store_id):
+    """The keys a bootstrap response for a store holds"""
+    return [f"{name}_{store_id}" for name in STORE_SCOPED_KEYS] + list(SHARED_KEYS)
+
+
+def encode_bootstrap(store_id, values, versions):
+    """Gzipped JSON body: each key's value as /api/storage/get would return it"""
+    body = json.dumps({
+        'store': store_id,
+        'values': values,
+        'versions': versions,
+        'built': time.time(),
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(body, compresslevel=6)
+
+
+class WarmCache:
+    """Gzipped bootstrap bodies by store id, least recently used first out past max_bytes
+
+    get() and fresh() take the versions of a store's keys here and, in
+    cloud/Dropbox mode, fingerprints: a callable returning the fingerprints the
+    backend lists for them now, only called once revalidate_after seconds have
+    passed since the entry was built or last checked.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, max_age=DEFAULT_MAX_AGE, revalidate_after=DEFAULT_REVALIDATE_AFTER):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()  # store id -> [versions, fingerprints, built at, checked at, body]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def configure(self, max_bytes, max_age, revalidate_after=DEFAULT_REVALIDATE_AFTER):
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            self.max_age = float(max_age)
+            self.revalidate_after = max(0.0, float(revalidate_after))
+            self._evict()
+
+    def _lookup(self, store_id, versions, fingerprints):
+        """The entry get() would serve, or None; checks fingerprints outside the lock"""
+        with self._lock:
+            entry = self._entries.get(store_id)
+        now = time.time()
+        if entry is None or entry[0] != versions or now - entry[2] > self.max_age:
+            return None
+        if fingerprints is not None and now - entry[3] > self.revalidate_after:
+            with self._lock:
+                self.revalidations += 1
+            if fingerprints() != entry[1]:
+                return None
+            entry[3] = now
+        return entry
+
+    def get(self, store_id, versions, fingerprints=None):
+        """The body built at these versions within max_age (and still at the backend's fingerprints), or None"""
+        entry = self._lookup(store_id, versions, fingerprints)
+        with self._lock:
+            if entry is None or self._entries.get(store_id) is not entry:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(store_id)
+            self.hits += 1
+            return entry[4]
+
+    def fresh(self, store_id, versions, fingerprints=None):
+        """True if get() would hit; does not count as a lookup"""
+        return self._lookup(store_id, versions, fingerprints) is not None
+
+    def put(self, store_id, versions, fingerprints, body, built):
+        """Cache a body built from keys at these versions (and backend fingerprints, None outside cloud/Dropbox mode)"""
+        with self._lock:
+            self._discard(store_id)
+            if len(body) > self.max_bytes:
+                return
+            self._entries[store_id] = [versions, fingerprints, built, built, body]
+            self._bytes += len(body)
+            self._evict()
+
+    def discard(self, store_id):
+        with self._lock:
+            self._discard(store_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _discard(self, store_id):
+        entry = self._entries.pop(store_id, None)
+        if entry:
+            self._bytes -= len(entry[4])
+
+    def _evict(self):
+        while self._entries and self._bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= len(entry[4])
+
+    def describe(self):
+        with self._lock:
+            return {
+                'stores': list(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age,
+                'revalidate_after_seconds': self.revalidate_after,
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+            }
+
+
+class StorePrefetcher:
+    """Background thread warming a WarmCache with the stores likely to be opened next
+
+    warm(store_id) builds and caches one store's body if the cache does not
+    already hold it fresh; store_ids() returns the stores in ListingLifeStores.
+    """
+
+    def __init__(self, warm, store_ids, max_stores=DEFAULT_PREFETCH_STORES):
+        self.warm = warm
+        self.store_ids = store_ids
+        self.max_stores = max_stores
+        self._recent = deque(maxlen=RECENT_STORES)
+        self._queue = deque()
+        self._plan_for = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self.status = {'state': 'stopped', 'prefetched': 0, 'errors': 0, 'last_error': None}
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self.status['state'] = 'idle'
+            self._thread = threading.Thread(target=self._run, name='store-prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        with self._lock:
+            self._stopping = True
+            self._queue.clear()
+            self._plan_for = None
+            self._wake.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+        self.status['state'] = 'stopped'
+
+    def switching_to(self, store_id):
+        """A client is about to reload into this store: warm it ahead of everything queued"""
+        self._enqueue([store_id], first=True)
+
+    def opened(self, store_id):
+        """A page opened this store: remember it and warm the stores likely to come next"""
+        with self._lock:
+            if store_id in self._recent:
+                self._recent.remove(store_id)
+            self._recent.appendleft(store_id)
+            # Planned on the prefetch thread, since reading the store list may be a download
+            self._plan_for = store_id
+            self._wake.notify()
+
+    def upcoming(self, store_id):
+        """The stores to warm after store_id was opened: recently opened ones first, then the rest as listed"""
+        try:
+            listed = self.store_ids()
+        except Exception as e:
+            logger.warning(f"Could not read the store list to prefetch: {e}")
+            listed = []
+        with self._lock:
+            recent = [sid for sid in self._recent if sid in listed or not listed]
+        upcoming = []
+        for candidate in recent + listed:
+            if candidate != store_id and candidate not in upcoming:
+                upcoming.append(candidate)
+        return upcoming[:self.max_stores]
+
+    def _enqueue(self, store_ids, first=False):
+        with self._lock:
+            for store_id in (reversed(store_ids) if first else store_ids):
+                if store_id in self._queue:
+                    self._queue.remove(store_id)
+                if first:
+                    self._queue.appendleft(store_id)
+                else:
+                    self._queue.append(store_id)
+            self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._plan_for and not self._stopping:
+                    self.status['state'] = 'idle'
+                    self._wake.wait()
+                if self._stopping:
+                    return
+                plan_for, self._plan_for = self._plan_for, None
+                store_id = None if plan_for else self._queue.popleft()
+                self.status['state'] = 'planning' if plan_for else 'warming'
+            if plan_for:
+                if self.max_stores:
+                    self._enqueue(self.upcoming(plan_for))
+                continue
+            try:
+                if self.warm(store_id):
+                    self.status['prefetched'] += 1
+            except Exception as e:
+                self.status['errors'] += 1
+                self.status['last_error'] = f"{store_id}: {e}"
+                logger.warning(f"Could not prefetch store {store_id}: {e}")
+
+    def describe(self):
+        with self._lock:
+            return dict(self.status, queued=list(self._queue), recent=list(self._recent), max_stores=self.max_stores)
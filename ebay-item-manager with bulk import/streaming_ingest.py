@@ -0,0 +1,251 @@
+"""
+ListingLife Streaming Ingest
+Reads /set and /sync request bodies one stored value at a time
+
+request.json parses the whole body before the handler sees any of it, so a
+/sync of every localStorage key held the raw body, the parsed body and each
+value re-encoded for saving in memory at once. JsonMemberReader walks the
+body's top-level object straight off the request stream and copies each
+member's raw JSON text into a SpooledValue (in memory up to
+SPOOL_MEMORY_BYTES, a temp file beyond that). The handler then parses and
+saves one key at a time, and the JSON text the client sent is stored as it is
+instead of being decoded and encoded again. Memory grows with the largest
+single value rather than with the whole body.
+"""
+import json
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MEMORY_BYTES = 1024 * 1024
+MAX_NAME_BYTES = 64 * 1024
+
+_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+# The rest of a string's body, up to its closing quote or a backslash split from what it escapes
+_STRING_REST = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+# Text and whole strings inside an object or array, up to the next bracket or an unfinished string
+_NESTED_RUN = re.compile(rb'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+_SCALAR_END = re.compile(rb'[ \t\r\n,}\]]')
+
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+_OPENERS = (ord('{'), ord('['))
+
+
+class IngestError(ValueError):
+    """The body is not the JSON object the endpoint expects"""
+
+
+class SpooledValue:
+    """The raw JSON text of one member's value, held in memory or a temp file"""
+
+    def __init__(self, memory_bytes=SPOOL_MEMORY_BYTES):
+        self.file = tempfile.SpooledTemporaryFile(max_size=memory_bytes)
+        self.kind = None  # 'string', 'object', 'array' or 'scalar'
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def read_bytes(self):
+        self.file.seek(0)
+        return self.file.read()
+
+    def decode(self):
+        """Return (value, encoded), encoded being UTF-8 JSON text of the value that can be stored as it is
+
+        A string holding JSON (how localStorage values arrive) is parsed, and its
+        text is the encoding. A string that is not JSON comes back as the string,
+        with encoded None.
+        """
+        raw = self.read_bytes()
+        if self.kind != 'string':
+            return json.loads(raw), raw
+        text = json.loads(raw)
+        del raw
+        try:
+            return json.loads(text), text.encode('utf-8')
+        except ValueError:
+            return text, None
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Discard:
+    def write(self, data):
+        pass
+
+
+class JsonMemberReader:
+    """Reads the members of a JSON object incrementally from a binary stream
+
+        for name in reader.members():
+            if name == 'items':
+                for key in reader.members(): ...   # a nested object
+            elif name == 'value':
+                value = reader.spool_value()
+            # values not read by the loop body are skipped
+
+    Only the structure (strings, nesting) is checked while reading; a value's
+    contents are validated when it is parsed.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.pos = 0
+        self.bytes_read = 0
+        self._unread_value = False
+
+    def _fill(self):
+        """Read the next chunk, dropping what was consumed; False at the end of the body"""
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.bytes_read += len(chunk)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _offset(self):
+        return self.bytes_read - len(self.buffer) + self.pos
+
+    def _peek(self):
+        """The next byte that is not whitespace, without consuming it (b'' at the end of the body)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos:self.pos + 1]
+            if not self._fill():
+                return b''
+
+    def _expect(self, allowed):
+        char = self._peek()
+        if not char or char not in allowed:
+            found = repr(char.decode('latin-1')) if char else 'end of body'
+            raise IngestError(f"Expected one of {allowed.decode()!r} at byte {self._offset()}, found {found}")
+        self.pos += 1
+        return char
+
+    def members(self):
+        """Yield the names of the object starting at the current position"""
+        self._unread_value = False
+        self._expect(b'{')
+        if self._peek() == b'}':
+            self.pos += 1
+            return
+        while True:
+            if self._peek() != b'"':
+                raise IngestError(f"Expected a member name at byte {self._offset()}")
+            name = self.read_value(MAX_NAME_BYTES)
+            self._expect(b':')
+            self._unread_value = True
+            yield name
+            if self._unread_value:
+                self.skip_value()
+            if self._expect(b',}') == b'}':
+                return
+
+    def spool_value(self, memory_bytes=SPOOL_MEMORY_BYTES):
+        """Copy the next value's raw JSON text into a SpooledValue"""
+        spooled = SpooledValue(memory_bytes)
+        try:
+            spooled.kind = self._copy_value(spooled)
+        except Exception:
+            spooled.close()
+            raise
+        return spooled
+
+    def read_value(self, limit=MAX_NAME_BYTES):
+        """Parse the next value, which must be small (a member name, a key)"""
+        with self.spool_value(limit) as spooled:
+            if spooled.size > limit:
+                raise IngestError(f"Value at byte {self._offset()} is larger than {limit} bytes")
+            try:
+                return json.loads(spooled.read_bytes())
+            except ValueError as e:
+                raise IngestError(f"Invalid JSON before byte {self._offset()}: {e}")
+
+    def skip_value(self):
+        self._copy_value(_Discard())
+
+    def _copy_value(self, out):
+        first = self._peek()
+        if not first:
+            raise IngestError('Body ended where a value was expected')
+        self._unread_value = False
+        if first == b'"':
+            kind = 'string'
+        elif first == b'{':
+            kind = 'object'
+        elif first == b'[':
+            kind = 'array'
+        else:
+            self._copy_scalar(out)
+            return 'scalar'
+        self._copy_nested(out)
+        return kind
+
+    def _copy_scalar(self, out):
+        while True:
+            match = _SCALAR_END.search(self.buffer, self.pos)
+            if match:
+                out.write(self.buffer[self.pos:match.start()])
+                self.pos = match.start()
+                return
+            out.write(self.buffer[self.pos:])
+            self.pos = len(self.buffer)
+            if not self._fill():
+                return
+
+    def _copy_nested(self, out):
+        """Copy a string, object or array, following strings and escapes across chunk boundaries"""
+        # The opening quote or bracket is at self.pos (see _copy_value)
+        in_string = self.buffer[self.pos] == _QUOTE
+        depth = 0 if in_string else 1
+        escaped = finished = False
+        pos = self.pos + 1
+        while True:
+            buffer, end = self.buffer, len(self.buffer)
+            while pos < end and not finished:
+                if escaped:
+                    pos += 1
+                    escaped = False
+                elif in_string:
+                    pos = _STRING_REST.match(buffer, pos).end()
+                    if pos == end:
+                        break
+                    if buffer[pos] == _BACKSLASH:
+                        escaped = True  # The escaped byte is in the next chunk
+                    else:
+                        in_string = False
+                        finished = not depth
+                    pos += 1
+                else:
+                    pos = _NESTED_RUN.match(buffer, pos).end()
+                    if pos == end:
+                        break
+                    char = buffer[pos]
+                    pos += 1
+                    if char == _QUOTE:
+                        in_string = True  # A string that continues past this chunk
+                    elif char in _OPENERS:
+                        depth += 1
+                    else:
+                        depth -= 1
+                        finished = not depth
+            out.write(buffer[self.pos:pos])
+            self.pos = pos
+            if finished:
+                return
+            if not self._fill():
+                raise IngestError('Body ended inside a value')
+            pos = self.pos
@@ -0,0 +1,112 @@
+"""
+ListingLife Synthetic Data
+Generates stores shaped like the files in listinglife_data/, for benchmarks and load tests
+"""
+import base64
+import random
+from datetime import datetime, timedelta
+
+DEFAULT_PHOTO_BYTES = 24 * 1024
+
+WORDS = (
+    'vintage', 'nike', 'air', 'max', 'trainers', 'size', 'uk', 'levis', '501', 'jeans', 'denim',
+    'jacket', 'leather', 'handbag', 'ceramic', 'plate', 'lego', 'star', 'wars', 'set', 'boxed',
+    'sealed', 'ps2', 'game', 'dvd', 'vinyl', 'record', 'lp', 'brass', 'lamp', 'wool', 'scarf',
+)
+
+
+def iso(moment):
+    """Timestamp in the browser's toISOString() format"""
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f"{moment.microsecond // 1000:03d}Z"
+
+
+def fake_photo(rng, photo_bytes):
+    """An inline data-URL photo like the ones the browser stores after a file upload"""
+    return 'data:image/jpeg;base64,' + base64.b64encode(rng.randbytes(photo_bytes * 3 // 4)).decode('ascii')
+
+
+def make_listing_document(item_count, photos=False, photo_bytes=DEFAULT_PHOTO_BYTES, seed=1):
+    """EbayListingLife document shaped like listinglife_data/EbayListingLife_*.json"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    category_count = max(3, min(200, item_count // 250))
+    categories = []
+    for index in range(category_count):
+        created = start + timedelta(minutes=index)
+        categories.append({
+            'averageDays': rng.choice((7, 14, 30, 60)),
+            'createdAt': iso(created),
+            'description': '',
+            'id': str(int(created.timestamp() * 1000)),
+            'name': ' '.join(rng.sample(WORDS, 2)).title()
+        })
+
+    items = []
+    for index in range(item_count):
+        created = start + timedelta(seconds=index * 37)
+        items.append({
+            'categoryId': rng.choice(categories)['id'],
+            'createdAt': iso(created),
+            'dateAdded': created.strftime('%Y-%m-%d'),
+            'description': '',
+            'duration': rng.choice((7, 10, 30)),
+            'id': str(int(created.timestamp() * 1000) + index),
+            'name': ' '.join(rng.sample(WORDS, rng.randint(3, 7))),
+            'note': '',
+            'photo': fake_photo(rng, photo_bytes) if photos else ''
+        })
+    return {'categories': categories, 'items': items}
+
+
+def make_sold_document(item_count, photos=False, photo_bytes=DEFAULT_PHOTO_BYTES, seed=2):
+    """SoldItemsTrends document shaped like listinglife_data/SoldItemsTrends_*.json"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    periods = []
+    for period_index in range(3):
+        periods.append({
+            'id': f"period-bench-{period_index}",
+            'name': str(2023 + period_index),
+            'description': '',
+            'categories': [],
+            'createdAt': iso(start),
+            'updatedAt': iso(start)
+        })
+    subcategories = []
+    for category_index in range(max(2, min(100, item_count // 500))):
+        period = periods[category_index % len(periods)]
+        category = {
+            'id': f"cat-bench-{category_index}",
+            'name': rng.choice(WORDS).title(),
+            'description': '',
+            'createdAt': iso(start),
+            'updatedAt': iso(start),
+            'subcategories': []
+        }
+        for sub_index in range(5):
+            subcategory = {
+                'id': f"sub-bench-{category_index}-{sub_index}",
+                'name': ' '.join(rng.sample(WORDS, 2)),
+                'count': 0,
+                'price': None,
+                'items': [],
+                'createdAt': iso(start),
+                'updatedAt': iso(start)
+            }
+            category['subcategories'].append(subcategory)
+            subcategories.append(subcategory)
+        period['categories'].append(category)
+
+    for index in range(item_count):
+        created = start + timedelta(seconds=index * 53)
+        subcategory = rng.choice(subcategories)
+        subcategory['items'].append({
+            'id': f"item-bench-{index}",
+            'label': ' '.join(rng.sample(WORDS, rng.randint(3, 7))),
+            'price': round(rng.uniform(1, 250), 2),
+            'photo': fake_photo(rng, photo_bytes) if photos else None,
+            'createdAt': iso(created),
+            'updatedAt': iso(created)
+        })
+        subcategory['count'] += 1
+    return {'periods': periods, 'currentPeriodId': periods[-1]['id']}
@@ -0,0 +1,75 @@
+"""
+Shared helpers for the ListingLife server tests
+
+The server modules sit next to this folder rather than in a package, so it
+is put on sys.path here. random_json builds seeded JSON values for the
+round-trip tests, biased towards what trips parsers up: escapes, quotes and
+brackets inside strings, non-ASCII text, deep nesting and empty containers.
+The server fixture runs storage_server in local mode on an empty folder.
+"""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TRICKY_STRINGS = ('', '"', '\\', '\\"', '{', '}', '[', ']', ',', ':', '\n\t', 'é', '日本', '🙂', ' ', 'null', '{"a": 1}')
+
+
+def random_string(rng, max_length=12):
+    parts = []
+    for _ in range(rng.randint(0, max_length)):
+        if rng.random() < 0.3:
+            parts.append(rng.choice(TRICKY_STRINGS))
+        else:
+            parts.append(chr(rng.randint(32, 126)))
+    return ''.join(parts)
+
+
+def random_json(rng, depth=3):
+    """A random JSON value at most depth containers deep"""
+    kinds = ['string', 'int', 'float', 'bool', 'null']
+    if depth > 0:
+        kinds += ['object', 'array'] * 2
+    kind = rng.choice(kinds)
+    if kind == 'string':
+        return random_string(rng)
+    if kind == 'int':
+        return rng.choice([0, -1, rng.randint(-10 ** 6, 10 ** 6), 2 ** 53, -2 ** 63])
+    if kind == 'float':
+        return rng.choice([0.5, -1.25, 1e-7, 3.0e20, rng.uniform(-1e6, 1e6)])
+    if kind == 'bool':
+        return rng.random() < 0.5
+    if kind == 'null':
+        return None
+    if kind == 'object':
+        return {random_string(rng, 6): random_json(rng, depth - 1) for _ in range(rng.randint(0, 4))}
+    return [random_json(rng, depth - 1) for _ in range(rng.randint(0, 4))]
+
+
+@pytest.fixture(params=range(25))
+def rng(request):
+    """A seeded generator; tests taking it run once per seed"""
+    return random.Random(request.param)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """storage_server's Flask test client on an empty local folder; the real storage_config.json is never read"""
+    import storage_server
+
+    monkeypatch.setattr(storage_server, 'CONFIG_FILE', tmp_path / 'storage_config.json')
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    monkeypatch.setattr(storage_server, 'STORAGE_MODE', 'local')
+    monkeypatch.setattr(storage_server, 'LOCAL_STORAGE_PATH', data_dir)
+    monkeypatch.setattr(storage_server, 'version_history', None)
+    storage_server.publish_backend()
+    for cache in (storage_server.LIFETIME_STATS_CACHE, storage_server.PENDING_INDEX_CACHE, storage_server.IMPORT_INDEX_CACHE):
+        cache.clear()
+    storage_server.store_analytics.clear()
+    storage_server.record_cache.clear()
+    storage_server.bootstrap_cache.clear()
+    return storage_server.app.test_client()
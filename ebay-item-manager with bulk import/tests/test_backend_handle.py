@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from backend_handle import BackendHandle, KeyLocks, ReadWriteLock
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+class Holder:
+    """Enters a context manager on its own thread and stays inside until finish()"""
+
+    def __init__(self, context):
+        self.entered = threading.Event()
+        self._release = threading.Event()
+        self._thread = threading.Thread(target=self._hold, args=(context,))
+        self._thread.start()
+
+    def _hold(self, context):
+        with context():
+            self.entered.set()
+            self._release.wait(5)
+
+    def finish(self):
+        self._release.set()
+        self._thread.join(5)
+
+
+def test_handles_are_replaced_never_changed():
+    handle = BackendHandle('dropbox', folder='/ListingLife/')
+    with pytest.raises(AttributeError):
+        handle.folder = '/Other'
+    newer = handle.replace(folder='/Other', dropbox_client='client')
+    assert (handle.folder, handle.dropbox_client, handle.generation) == ('/ListingLife/', None, 0)
+    assert (newer.mode, newer.folder, newer.dropbox_client, newer.generation) == ('dropbox', '/Other', 'client', 1)
+    assert handle.dropbox_path == '/ListingLife'
+    assert BackendHandle('local').dropbox_path == ''
+
+
+def test_readers_share_and_a_writer_waits_for_them():
+    lock = ReadWriteLock()
+    readers = [Holder(lock.read) for _ in range(2)]
+    wait_until(lambda: all(reader.entered.is_set() for reader in readers))
+    assert lock.describe()['readers'] == 2
+
+    writer = Holder(lock.write)
+    wait_until(lambda: lock.describe()['writers_waiting'] == 1)
+    # A waiting writer holds back new readers
+    late_reader = Holder(lock.read)
+    time.sleep(0.02)
+    assert not writer.entered.is_set() and not late_reader.entered.is_set()
+
+    for reader in readers:
+        reader.finish()
+    assert writer.entered.wait(5)
+    assert lock.describe() == {'readers': 0, 'writer_active': True, 'writers_waiting': 0}
+    assert not late_reader.entered.is_set()
+    writer.finish()
+    assert late_reader.entered.wait(5)
+    late_reader.finish()
+
+
+def test_the_writer_reenters_both_sides():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+        assert lock.describe()['writer_active']
+    assert lock.describe() == {'readers': 0, 'writer_active': False, 'writers_waiting': 0}
+
+
+def test_key_locks_serialize_one_key_and_are_dropped_when_free():
+    locks = KeyLocks()
+    first = Holder(lambda: locks.hold('a'))
+    assert first.entered.wait(5)
+    # Another key is not blocked
+    with locks.hold('b'):
+        assert len(locks) == 2
+
+    second = Holder(lambda: locks.hold('a'))
+    time.sleep(0.02)
+    assert not second.entered.is_set()
+    first.finish()
+    assert second.entered.wait(5)
+    assert len(locks) == 1
+    second.finish()
+    assert len(locks) == 0
@@ -0,0 +1,25 @@
+import json
+import sys
+
+import benchmark_storage
+import storage_server
+
+
+def test_benchmark_runs_against_the_fakes(tmp_path, monkeypatch, capsys):
+    # Never read (or save) the real storage_config.json
+    monkeypatch.setattr(storage_server, 'CONFIG_FILE', tmp_path / 'storage_config.json')
+    output = tmp_path / 'baseline.json'
+    monkeypatch.setattr(sys, 'argv', ['benchmark_storage.py', '--sizes', '20', '--repeat', '1', '--output', str(output)])
+    benchmark_storage.main()
+
+    results = json.loads(output.read_text(encoding='utf-8'))
+    assert set(results['scenarios']) == {f"{backend}/20" for backend in benchmark_storage.BACKENDS}
+    for scenario in results['scenarios'].values():
+        assert set(scenario['operations']) == {'set', 'get', 'sync', 'list_keys', 'size'}
+        assert scenario['document_bytes']['listing'] > 0
+
+    # The run just written is its own baseline: comparing against it finds no regression beyond noise
+    monkeypatch.setattr(sys, 'argv', ['benchmark_storage.py', '--sizes', '20', '--repeat', '1', '--backends', 'local',
+                                      '--compare', str(output), '--threshold', '1000'])
+    benchmark_storage.main()
+    assert 'No p50 regressions' in capsys.readouterr().out
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from client_registry import MAX_POOL_SIZE, ClientRegistry
+
+
+def fake_dropbox():
+    """A dropbox module stand-in recording the clients and sessions it builds"""
+    module = SimpleNamespace(clients=[], sessions=[])
+
+    def create_session(max_connections):
+        session = SimpleNamespace(max_connections=max_connections)
+        module.sessions.append(session)
+        return session
+
+    def client(token, session=None):
+        built = SimpleNamespace(token=token, session=session)
+        module.clients.append(built)
+        return built
+
+    module.create_session = create_session
+    module.Dropbox = client
+    return module
+
+
+def test_same_settings_get_the_same_client():
+    registry, dropbox = ClientRegistry(pool_size=4), fake_dropbox()
+    client = registry.dropbox_client(dropbox, 'token-1')
+    assert registry.dropbox_client(dropbox, 'token-1') is client
+    other = registry.dropbox_client(dropbox, 'token-2')
+    assert other is not client
+    # Every client shares one session sized to the pool
+    assert client.session is other.session and client.session.max_connections == 4
+    assert (registry.stats['created'], registry.stats['reused']) == (2, 1)
+
+
+def test_a_new_pool_size_builds_new_clients_and_sessions():
+    registry, dropbox = ClientRegistry(pool_size=4), fake_dropbox()
+    client = registry.dropbox_client(dropbox, 'token')
+    registry.configure(16)
+    resized = registry.dropbox_client(dropbox, 'token')
+    assert resized is not client and resized.session.max_connections == 16
+    registry.configure(0)
+    assert registry.pool_size == 1
+    registry.configure(10 ** 6)
+    assert registry.pool_size == MAX_POOL_SIZE
+
+
+def test_least_recently_used_clients_are_evicted():
+    registry, dropbox = ClientRegistry(max_clients=2), fake_dropbox()
+    first = registry.dropbox_client(dropbox, 'a')
+    registry.dropbox_client(dropbox, 'b')
+    registry.dropbox_client(dropbox, 'a')
+    registry.dropbox_client(dropbox, 'c')
+    assert registry.dropbox_client(dropbox, 'a') is first
+    assert registry.stats['evicted'] == 1
+    assert len(dropbox.clients) == 3
+
+
+def test_verification_is_remembered_until_the_client_is_discarded():
+    registry, dropbox = ClientRegistry(), fake_dropbox()
+    client = registry.dropbox_client(dropbox, 'secret-token')
+    assert not registry.is_verified(client)
+    registry.mark_verified(client)
+    assert registry.is_verified(registry.dropbox_client(dropbox, 'secret-token'))
+    assert 'secret-token' not in repr(registry.describe())
+
+    registry.discard(client)
+    rebuilt = registry.dropbox_client(dropbox, 'secret-token')
+    assert rebuilt is not client and not registry.is_verified(rebuilt)
+    assert registry.describe()['discarded'] == 1
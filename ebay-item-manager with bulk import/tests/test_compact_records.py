@@ -0,0 +1,98 @@
+import json
+import time
+
+import pytest
+
+from compact_records import CompactDocument, RecordCache, document_schema, encode_date, render_date
+from conftest import random_json, random_string
+
+DATES = ('2024-03-01', '2024-03-01T12:30:05Z', '2024-03-01T12:30:05.123Z', '1969-12-31T23:59:59.999Z',
+         '2024-3-1', '2024-03-01T12:30:05+01:00', '2024-02-30', 'yesterday', '')
+
+
+def random_field(rng, kind):
+    """A value for a typed field: usually what the column stores, sometimes something it must keep raw"""
+    if rng.random() < 0.15:
+        return random_json(rng, 1)
+    if kind == 'date':
+        return rng.choice(DATES)
+    if kind == 'number':
+        return rng.choice([0, 7, -3, 12.5, 2 ** 60, '9.99', None])
+    if kind == 'flag':
+        return rng.choice([True, False, None, 1])
+    if kind == 'key':
+        return rng.choice(['123', '0123', '-5', str(2 ** 70), 'abc', 17])
+    return random_string(rng)
+
+
+def random_record(rng, schema, depth=2):
+    record = {}
+    for name, kind in rng.sample(list(schema.fields), rng.randint(0, len(schema.fields))):
+        if not isinstance(kind, str):
+            if rng.random() < 0.1:
+                record[name] = random_json(rng, 1)  # A nested field holding something other than a list
+            else:
+                record[name] = [random_record(rng, kind, depth - 1) for _ in range(rng.randint(0, 3))] if depth else []
+        else:
+            record[name] = random_field(rng, kind)
+    if rng.random() < 0.2:
+        record[random_string(rng, 5) or 'unknown'] = random_json(rng, 1)
+    return record
+
+
+@pytest.mark.parametrize('key', ['EbayListingLife_s', 'SoldItemsTrends_s'])
+def test_documents_round_trip(rng, key):
+    document = random_record(rng, document_schema(key), depth=4)
+    for name, _ in document_schema(key).fields:
+        if isinstance(document.get(name), list) and rng.random() < 0.2:
+            document[name].append(random_json(rng, 1))  # Entries that are not records at all
+    compact = CompactDocument(document_schema(key), document)
+    # Lossless down to key order and int-versus-float
+    assert json.dumps(compact.to_document()) == json.dumps(document)
+
+
+def test_dates_render_back_identically():
+    for value in DATES[:4]:
+        code, ms = encode_date(value)
+        assert render_date(code, ms) == value
+    for value in DATES[4:]:
+        assert encode_date(value) is None
+
+
+def document(count):
+    return {'categories': [{'id': 'c'}], 'items': [{'id': str(i), 'categoryId': 'c'} for i in range(count)]}
+
+
+def test_cache_returns_fresh_copies():
+    cache = RecordCache(max_records=100)
+    cache.put('EbayListingLife_s', 1, document(3))
+    first = cache.get('EbayListingLife_s', 1)
+    first['items'].clear()
+    assert cache.get('EbayListingLife_s', 1) == document(3)
+    assert cache.get('EbayListingLife_s', 2) is None
+
+
+def test_cache_entries_expire():
+    cache = RecordCache(max_records=100, max_age=60)
+    cache.put('EbayListingLife_s', 1, document(1), loaded=time.time() - 61)
+    assert cache.get('EbayListingLife_s', 1) is None
+    cache.put('EbayListingLife_s', 1, document(1))
+    assert cache.get('EbayListingLife_s', 1) == document(1)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RecordCache(max_records=10)
+    cache.put('EbayListingLife_a', 1, document(4))
+    cache.put('EbayListingLife_b', 1, document(4))
+    cache.get('EbayListingLife_a', 1)
+    cache.put('EbayListingLife_c', 1, document(4))
+    assert cache.get('EbayListingLife_b', 1) is None
+    assert cache.get('EbayListingLife_a', 1) is not None
+    cache.configure(0)
+    assert cache.describe()['documents'] == 0
+
+
+def test_cache_skips_other_keys():
+    cache = RecordCache(max_records=100)
+    cache.put('ImportedItems_s', 1, [{'a': 1}])
+    assert cache.get('ImportedItems_s', 1) is None
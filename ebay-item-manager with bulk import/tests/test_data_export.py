@@ -0,0 +1,56 @@
+import csv
+import gzip
+import io
+import json
+
+from data_export import encode_records, iter_listing_records, iter_sold_records
+
+
+def sold_document(item):
+    return {'periods': [{'name': 'Jan', 'categories': [{'name': 'Toys', 'subcategories': [{'name': 'Cars', 'items': [item]}]}]}]}
+
+
+def test_record_fields_win_over_the_item_fields():
+    listing = {'categories': [{'id': 'c1', 'name': 'Lamps'}],
+               'items': [{'id': '1', 'categoryId': 'c1', 'type': 'vintage', 'store': 'Oxfam', 'category': 'x'}]}
+    record, = iter_listing_records('s1', listing)
+    assert (record['type'], record['store'], record['category'], record['id']) == ('item', 's1', 'Lamps', '1')
+
+    record, = iter_sold_records('s1', sold_document({'name': 'Mini', 'type': 'diecast', 'period': 'old'}))
+    assert (record['type'], record['store'], record['period'], record['subcategory']) == ('sold_item', 's1', 'Jan', 'Cars')
+    assert record['name'] == 'Mini'
+
+
+def test_damaged_documents_export_what_they_can():
+    assert list(iter_listing_records('s', [{'id': 1}])) == []
+    assert list(iter_listing_records('s', None)) == []
+    assert list(iter_sold_records('s', [1, 2])) == []
+    damaged = {'periods': ['x', {'categories': None}, {'name': 'p', 'categories': [{'subcategories': [{'items': ['y', {'id': 1}]}]}]}]}
+    assert [record['id'] for record in iter_sold_records('s', damaged)] == [1]
+
+
+def test_csv_rows_follow_the_columns():
+    records = [{'type': 'sold_item', 'store': 's', 'label': 'Mini', 'soldPrice': 4.5, 'note': 'a,"b"'}]
+    rows = list(csv.reader(io.StringIO(b''.join(encode_records(records, 'csv')).decode('utf-8'))))
+    header, row = rows
+    assert dict(zip(header, row))['name'] == 'Mini'
+    assert dict(zip(header, row))['price'] == '4.5'
+    assert dict(zip(header, row))['note'] == 'a,"b"'
+
+
+def test_export_includes_the_unsuffixed_keys_of_the_default_store(server):
+    def save(key, value):
+        assert server.post('/api/storage/set', json={'key': key, 'value': value}).status_code == 200
+
+    save('ListingLifeStores', [{'id': 's1'}])
+    save('EbayListingLife_s1', {'categories': [], 'items': [{'id': 'new'}]})
+    save('EbayListingLife', {'categories': [], 'items': [{'id': 'legacy'}]})
+    save('SoldItemsTrends', sold_document({'id': 'legacy-sold'}))
+
+    response = server.get('/api/export?store=all&gzip=1')
+    records = [json.loads(line) for line in gzip.decompress(response.get_data()).splitlines()]
+    assert [(record['store'], record['id']) for record in records] == [
+        ('s1', 'new'), ('default', 'legacy'), ('default', 'legacy-sold')]
+
+    records = [json.loads(line) for line in server.get('/api/export?store=s1').get_data().splitlines()]
+    assert [record['id'] for record in records] == ['new']
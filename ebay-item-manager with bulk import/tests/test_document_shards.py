@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from conftest import random_json, random_string
+from document_shards import (ShardError, assemble_document, is_manifest, is_shard_key, is_sharded_key, shard_keys,
+                             split_document)
+
+
+def random_listings(rng):
+    category_ids = [rng.choice([f"cat{i}", i, random_string(rng, 4)]) for i in range(rng.randint(0, 5))]
+    categories = [{'id': category_id, 'name': random_string(rng)} for category_id in category_ids]
+    if rng.random() < 0.3:
+        categories.append(random_json(rng, 1))  # Not every entry is a well-formed category
+    candidates = category_ids + ['unknown', None, 42]
+    items = []
+    for i in range(rng.randint(0, 30)):
+        item = {'id': str(i), 'name': random_string(rng)}
+        choice = rng.choice(candidates) if candidates else None
+        if choice is not None:
+            item['categoryId'] = choice
+        items.append(item if rng.random() < 0.95 else random_json(rng, 1))
+    document = {'categories': categories, 'items': items}
+    for _ in range(rng.randint(0, 2)):
+        document[random_string(rng, 5) or 'extra'] = random_json(rng, 2)
+    return document
+
+
+def random_sold(rng):
+    periods = [{'id': f"p{i}", 'name': random_string(rng), 'categories': [random_json(rng, 2)]}
+               for i in range(rng.randint(0, 6))]
+    return {'currentPeriodId': 'p0', 'periods': periods}
+
+
+def round_trip(key, document):
+    manifest, shards = split_document(key, document)
+    assert is_manifest(manifest)
+    assert set(shard_keys(manifest)) == set(shards)
+    assert all(is_shard_key(shard_key) and shard_key.startswith(key) for shard_key in shards)
+    # Shards and manifests are stored as JSON, so rebuild from what a load would return
+    stored = {shard_key: json.loads(json.dumps(value)) for shard_key, value in shards.items()}
+    return assemble_document(key, json.loads(json.dumps(manifest)), stored)
+
+
+def test_listings_round_trip(rng):
+    document = random_listings(rng)
+    rebuilt = round_trip('EbayListingLife_store1', document)
+    # Key order counts too: the document must come back byte for byte
+    assert json.dumps(rebuilt) == json.dumps(document)
+
+
+def test_sold_round_trip(rng):
+    document = random_sold(rng)
+    assert json.dumps(round_trip('SoldItemsTrends_store1', document)) == json.dumps(document)
+
+
+def test_unchanged_shards_keep_their_keys():
+    document = {'categories': [{'id': 'a'}, {'id': 'b'}],
+                'items': [{'id': '1', 'categoryId': 'a'}, {'id': '2', 'categoryId': 'b'}]}
+    before, _ = split_document('EbayListingLife_s', document)
+    document['items'][1]['name'] = 'renamed'
+    after, _ = split_document('EbayListingLife_s', document)
+    assert before['shards'][0] == after['shards'][0]
+    assert before['shards'][1] != after['shards'][1]
+
+
+def test_missing_shard_raises():
+    manifest, shards = split_document('SoldItemsTrends_s', {'periods': [{'id': 'p1'}, {'id': 'p2'}]})
+    shards.pop(manifest['shards'][1])
+    with pytest.raises(ShardError):
+        assemble_document('SoldItemsTrends_s', manifest, shards)
+
+
+def test_unexpected_shapes_are_not_split():
+    assert split_document('EbayListingLife_s', [1, 2]) is None
+    assert split_document('EbayListingLife_s', {'categories': {}, 'items': []}) is None
+    assert split_document('SoldItemsTrends_s', {'periods': 'none'}) is None
+
+
+def test_sharded_keys():
+    assert is_sharded_key('EbayListingLife_store1')
+    assert is_sharded_key('SoldItemsTrends')
+    assert not is_sharded_key('ImportedItems_store1')
+    assert not is_sharded_key('EbayListingLife_store1~cat~0123456789abcdef')
@@ -0,0 +1,51 @@
+from import_dedupe import ImportIdentityIndex, dedupe_rows, item_identity
+
+
+def test_identity_is_the_ebay_id_when_present():
+    identity, content_hash = item_identity({'ebayItemId': ' 1234 ', 'name': 'Lamp', 'price': 5})
+    assert identity == 'ebay:1234'
+    assert item_identity({'itemNumber': 1234, 'label': 'Other', 'price': 9})[0] == identity
+    assert item_identity({'ebayItemId': '1234', 'name': 'lamp', 'price': '5.00'})[1] == content_hash
+
+
+def test_signature_normalizes_title_price_and_day():
+    identity = item_identity({'name': '  Brass   LAMP ', 'price': '£1,200', 'dateAdded': '2024-05-01T10:00:00Z'})[0]
+    assert identity.startswith('sig:')
+    assert item_identity({'label': 'brass lamp', 'price': 1200.0, 'date': '2024-05-01'})[0] == identity
+    assert item_identity({'name': 'brass lamp', 'price': 1200, 'dateAdded': '2024-05-02'})[0] != identity
+    assert item_identity({'name': 'brass lamp', 'price': 1201, 'dateAdded': '2024-05-01'})[0] != identity
+
+
+def test_rows_are_classified_against_every_index():
+    listing = ImportIdentityIndex({'items': [
+        {'id': 'item-1', 'ebayItemId': '111', 'name': 'Lamp', 'price': 5},
+        {'id': 'item-2', 'name': 'Vase', 'price': 3, 'dateAdded': '2024-01-01'},
+    ]})
+    pending = ImportIdentityIndex([{'id': 'pending-1', 'ebayItemId': '222', 'label': 'Chair', 'price': 40}])
+    rows = [
+        {'ebayItemId': '111', 'name': 'Lamp', 'price': '5.00'},    # already stored, unchanged
+        {'ebayItemId': '111', 'name': 'Lamp', 'price': 6},         # repeats the first row's id
+        {'ebayItemId': '222', 'label': 'Chair', 'price': 45},      # stored in the second index, price changed
+        {'name': 'VASE', 'price': '3', 'dateAdded': '2024-01-01'},  # same signature as item-2
+        {'name': 'Vase', 'price': 3, 'dateAdded': '2024-02-01'},   # another day: a new listing
+        'not a row',
+    ]
+    report = dedupe_rows(rows, [listing, pending])
+
+    assert report['new'] == [4]
+    assert report['updated'] == [{'index': 2, 'existing_id': 'pending-1'}]
+    assert report['skipped'] == [
+        {'index': 0, 'existing_id': 'item-1', 'reason': 'already_stored'},
+        {'index': 1, 'reason': 'duplicate_in_batch'},
+        {'index': 3, 'existing_id': 'item-2', 'reason': 'already_stored'},
+        {'index': 5, 'reason': 'invalid_row'},
+    ]
+
+
+def test_first_index_wins_and_first_stored_item_is_kept():
+    first = ImportIdentityIndex({'items': [{'id': 'a', 'ebayItemId': '1', 'name': 'x'},
+                                           {'id': 'b', 'ebayItemId': '1', 'name': 'y'}]})
+    second = ImportIdentityIndex([{'id': 'c', 'ebayItemId': '1', 'name': 'z'}])
+    report = dedupe_rows([{'ebayItemId': '1', 'name': 'z'}], [first, second])
+    assert report['updated'] == [{'index': 0, 'existing_id': 'a'}]
+    assert dedupe_rows([{'name': 'x'}], [ImportIdentityIndex(None)])['new'] == [0]
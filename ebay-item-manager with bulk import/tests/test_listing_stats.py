@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import date
+
+from listing_stats import MIN_SAMPLES_FOR_SUGGESTION, compute_lifetime_stats, histogram_percentile, percentile
+
+TODAY = date(2024, 6, 1).toordinal()
+
+
+def sold(category_id, added, sold_on, price=None):
+    return {'categoryId': category_id, 'dateAdded': added, 'soldDate': sold_on, 'soldPrice': price}
+
+
+def test_time_to_sale_and_sell_through_per_category():
+    document = {
+        'categories': [{'id': 'lamps', 'name': 'Lamps', 'averageDays': 30}, {'id': 'empty', 'averageDays': 10}],
+        'items': [
+            sold('lamps', '2024-01-01', '2024-01-05'),
+            sold('lamps', '2024-01-01', '2024-01-11T09:30:00Z'),
+            sold('lamps', '2024-01-01', '2024-01-21'),
+            {'categoryId': 'lamps', 'dateAdded': '2024-01-01', 'endedDate': '2024-02-01'},   # ended unsold
+            {'categoryId': 'lamps', 'dateAdded': '2024-05-30', 'duration': 30},            # still active
+            {'categoryId': 'lamps', 'dateAdded': '2024-01-01', 'duration': 30},            # expired
+            {'categoryId': 'deleted', 'dateAdded': '2024-01-01', 'soldDate': '2024-01-02'},
+            'not an item',
+        ],
+    }
+    stats = compute_lifetime_stats(document, TODAY)
+    lamps = stats['categories']['lamps']
+
+    assert (lamps['listed'], lamps['sold'], lamps['ended_unsold'], lamps['active']) == (6, 3, 2, 1)
+    assert lamps['sell_through_rate'] == 0.6
+    assert lamps['time_to_sale'] == {'samples': 3, 'median': 10.0, 'p25': 7.0, 'p75': 15.0, 'mean': 11.33}
+    assert (lamps['average_days'], lamps['suggested_days'], lamps['name']) == (30, 10, 'Lamps')
+
+    # Too few sales to replace the hand-entered average
+    assert stats['categories']['empty']['suggested_days'] is None
+    assert stats['categories']['empty']['sell_through_rate'] is None
+    assert stats['orphaned_categories'] == 1
+    assert stats['overall']['sold'] == 4
+
+
+def test_suggestion_needs_enough_samples_and_is_at_least_a_day():
+    items = [sold('c', '2024-01-01', '2024-01-01')] * MIN_SAMPLES_FOR_SUGGESTION
+    stats = compute_lifetime_stats({'categories': [{'id': 'c'}], 'items': items}, TODAY)
+    assert stats['categories']['c']['suggested_days'] == 1
+    stats = compute_lifetime_stats({'categories': [{'id': 'c'}], 'items': items[1:]}, TODAY)
+    assert stats['categories']['c']['suggested_days'] is None
+
+
+def test_histogram_percentiles_match_the_list_ones(rng):
+    values = sorted(rng.randint(0, 60) for _ in range(rng.randint(1, 40)))
+    for fraction in (0, 0.25, 0.5, 0.75, 0.99, 1):
+        assert histogram_percentile(Counter(values), fraction) == percentile(values, fraction)
+
+
+def test_endpoint_caches_per_document_version(server):
+    import storage_server
+
+    def save(value):
+        assert server.post('/api/storage/set', json={'key': 'EbayListingLife_s1', 'value': value}).status_code == 200
+
+    document = {'categories': [{'id': 'c'}], 'items': [sold('c', '2024-01-01', '2024-01-03')] * 3}
+    save(document)
+    first = server.get('/api/stats/lifetime?store=s1').get_json()['stores']['s1']
+    assert first['categories']['c']['suggested_days'] == 2
+    cached = storage_server.LIFETIME_STATS_CACHE['EbayListingLife_s1']
+    assert server.get('/api/stats/lifetime?store=s1').get_json()['stores']['s1'] == first
+    assert storage_server.LIFETIME_STATS_CACHE['EbayListingLife_s1'] is cached
+
+    document['items'] = [sold('c', '2024-01-01', '2024-01-09')] * 3
+    save(document)
+    second = server.get('/api/stats/lifetime?store=s1').get_json()['stores']['s1']
+    assert second['version'] > first['version']
+    assert second['categories']['c']['suggested_days'] == 8
@@ -0,0 +1,73 @@
+import io
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from log_pipeline import DeferredQueueHandler, JsonFormatter, SamplingFilter, configure_logging, stop_logging
+
+
+def record(name, level=logging.INFO, msg='saved %s', args=('key',), **extra):
+    entry = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_logging()
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_sampling_keeps_one_in_n_per_most_specific_category():
+    sampler = SamplingFilter({'server.io': 3, 'server': 2, 'quiet': 1})
+    kept = [sampler.filter(record('server.io.dropbox')) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert [sampler.filter(record('server')) for _ in range(3)] == [True, False, True]
+    assert all(sampler.filter(record('quiet')) for _ in range(3))
+    assert all(sampler.filter(record('serverless')) for _ in range(3))
+    assert all(sampler.filter(record('server.io', logging.WARNING)) for _ in range(3))
+
+
+def test_records_reach_the_queue_unformatted():
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    entry = record('server', msg='saved %s in %dms', args=('key', 5))
+    handler.handle(entry)
+    queued = log_queue.get_nowait()
+    assert queued is entry
+    assert (queued.msg, queued.args) == ('saved %s in %dms', ('key', 5))
+
+
+def test_json_lines_carry_extra_fields_and_exceptions():
+    try:
+        raise ValueError('bad')
+    except ValueError:
+        entry = record('server', logging.ERROR, key='k1', bytes=10)
+        entry.exc_info = sys.exc_info()
+    line = json.loads(JsonFormatter().format(entry))
+    assert (line['message'], line['level'], line['logger']) == ('saved key', 'ERROR', 'server')
+    assert (line['key'], line['bytes']) == ('k1', 10)
+    assert 'ValueError: bad' in line['exception']
+
+
+def test_configured_pipeline_writes_from_the_listener(root_logger):
+    stream = io.StringIO()
+    configure_logging(logging.INFO, json_output=True, sampling={'pipeline_test.io': 2}, stream=stream)
+    assert len(root_logger.handlers) == 1
+    for n in range(4):
+        logging.getLogger('pipeline_test.io').info('loaded %s', n)
+    logging.getLogger('pipeline_test').debug('below the level')
+    logging.getLogger('pipeline_test').warning('kept')
+    stop_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line['message'] for line in lines] == ['loaded 0', 'loaded 2', 'kept']
+    assert root_logger.handlers == []
@@ -0,0 +1,57 @@
+from pending_matcher import SubcategoryIndex
+
+
+def trends(*periods):
+    return {'currentPeriodId': periods[-1]['id'], 'periods': list(periods)}
+
+
+def period(period_id, *categories):
+    return {'id': period_id, 'categories': list(categories)}
+
+
+def category(name, **subcategories):
+    return {'id': name, 'name': name, 'subcategories': [
+        {'id': sub, 'name': sub, 'items': [{'label': label} for label in labels]} for sub, labels in subcategories.items()]}
+
+
+def test_labels_match_by_name_and_by_sold_labels():
+    index = SubcategoryIndex(trends(period('p1',
+        category('Toys', Diecast=['Matchbox Mini', 'Corgi bus'], Dolls=['Barbie']),
+        category('Homeware', Lamps=['Brass lamp', 'Anglepoise']))))
+    assert index.suggest('corgi bus 1960')[0]['subcategory_name'] == 'Diecast'
+    assert index.suggest('brass lamps')[0]['subcategory_name'] == 'Lamps'
+    # Typos resolve through the n-gram index
+    assert index.suggest('barbbie doll')[0]['subcategory_name'] == 'Dolls'
+    assert index.suggest('') == []
+    assert index.suggest('zzzz qqqq') == []
+
+
+def test_period_filter_and_batch_keys():
+    document = trends(period('old', category('Books', Novels=['Dickens'])), period('new', category('Toys', Lego=['Lego set'])))
+    assert len(SubcategoryIndex(document, 'new').entries) == 1
+    index = SubcategoryIndex(document)
+    batch = index.suggest_batch([{'id': 1, 'label': 'lego technic'}, {'id': 2, 'name': 'dickens novel'}, {'label': 'no id'}, 'x'], 1)
+    assert set(batch) == {1, 2}
+    assert batch[1][0]['subcategory_id'] == 'Lego'
+    assert batch[2][0]['period_id'] == 'old'
+
+
+def test_legacy_and_damaged_documents_index_nothing_broken():
+    assert SubcategoryIndex([{'label': 'legacy list'}]).entries == []
+    assert SubcategoryIndex(None).entries == []
+    damaged = {'periods': ['x', {'categories': None}, {'categories': ['y', {'name': 'Toys', 'subcategories': [
+        'z', {'name': 'Cars', 'items': ['w', {'label': 'Mini'}]}]}]}]}
+    assert [entry['subcategory_name'] for entry in SubcategoryIndex(damaged).entries] == ['Cars']
+
+
+def test_endpoint_suggests_nothing_for_a_list_document(server):
+    assert server.post('/api/storage/set', json={'key': 'SoldItemsTrends_s1', 'value': [{'label': 'Mini'}]}).status_code == 200
+    response = server.post('/api/pending/suggest', json={'store': 's1', 'items': [{'id': 'a', 'label': 'Mini'}]})
+    assert response.status_code == 200
+    assert response.get_json()['suggestions'] == {'a': []}
+    assert response.get_json()['subcategories_indexed'] == 0
+
+    document = trends(period('p1', category('Toys', Cars=['Mini Cooper'])))
+    assert server.post('/api/storage/set', json={'key': 'SoldItemsTrends_s1', 'value': document}).status_code == 200
+    response = server.post('/api/pending/suggest', json={'store': 's1', 'items': [{'id': 'a', 'label': 'Mini'}]})
+    assert response.get_json()['suggestions']['a'][0]['subcategory_name'] == 'Cars'
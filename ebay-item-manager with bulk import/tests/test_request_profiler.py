@@ -0,0 +1,66 @@
+import pstats
+
+from request_profiler import PROFILE_HEADER, RequestProfiler
+
+
+def test_disabled_profiler_ignores_the_header_and_sampling(tmp_path):
+    profiler = RequestProfiler(tmp_path, enabled=False, sample_rate=1.0)
+    assert profiler.start(forced=True) is None
+    assert profiler.start() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sampling_and_one_profile_at_a_time(tmp_path):
+    profiler = RequestProfiler(tmp_path, enabled=True, sample_rate=0.0)
+    assert profiler.start() is None
+    session = profiler.start(forced=True)
+    assert session is not None
+    # A second request while one is profiled runs unprofiled
+    assert profiler.start(forced=True) is None
+    profiler.finish(session, 'POST', '/api/storage/set', 200)
+    session = profiler.start(forced=True)
+    assert session is not None
+    profiler.finish(session, 'POST', '/api/storage/set', 200)
+
+    profiler.sample_rate = 1.0
+    profiler.finish(profiler.start(), 'GET', '/', 200)
+    assert len(profiler.summaries) == 3
+    assert RequestProfiler(tmp_path, sample_rate=7).sample_rate == 1.0
+
+
+def test_finish_writes_a_pstats_file_and_summary(tmp_path):
+    profiler = RequestProfiler(tmp_path / 'profiles', enabled=True, memory=True)
+    session = profiler.start(forced=True)
+    sorted(str(n) for n in range(2000))
+    summary = profiler.finish(session, 'GET', '/api/storage/get/<key>', 200)
+
+    assert summary['file'].endswith('-GET-api_storage_get_key_.pstats')
+    assert summary['memory']['peak_bytes'] > 0
+    assert summary['top_cumulative'] and 'function' in summary['top_cumulative'][0]
+    assert profiler.summaries[0] is summary
+    pstats.Stats(str(tmp_path / 'profiles' / summary['file']))
+
+
+def test_only_the_newest_files_are_kept(tmp_path):
+    profiler = RequestProfiler(tmp_path, enabled=True, keep=2)
+    names = [profiler.finish(profiler.start(forced=True), 'GET', f'/r{n}', 200)['file'] for n in range(4)]
+    assert sorted(path.name for path in tmp_path.glob('*.pstats')) == sorted(names[-2:])
+    assert [summary['file'] for summary in profiler.summaries] == names[:1:-1]
+
+
+def test_endpoint_profiles_requests_that_ask(server, tmp_path, monkeypatch):
+    import storage_server
+
+    profiler = RequestProfiler(tmp_path / 'profiles', enabled=True)
+    monkeypatch.setattr(storage_server, 'request_profiler', profiler)
+    assert PROFILE_HEADER + '-File' not in server.get('/api/storage/keys').headers
+    response = server.get('/api/storage/keys', headers={PROFILE_HEADER: '1'})
+    name = response.headers[PROFILE_HEADER + '-File']
+
+    listed = server.get('/api/admin/profiles').get_json()
+    assert [profile['file'] for profile in listed['profiles']] == [name]
+    assert listed['profiles'][0]['route'] == '/api/storage/keys'
+    assert server.get(f'/api/admin/profiles/{name}').status_code == 200
+
+    profiler.enabled = False
+    assert PROFILE_HEADER + '-File' not in server.get('/api/storage/keys', headers={PROFILE_HEADER: '1'}).headers
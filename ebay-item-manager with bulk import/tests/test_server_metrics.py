@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from server_metrics import MetricsRegistry
+from worker_processes import WORKERS_SUPPORTED, SharedState
+
+
+def registry():
+    metrics = MetricsRegistry()
+    metrics.describe('requests_total', 'counter', 'Requests')
+    metrics.describe('latency_seconds', 'histogram', 'Latency', buckets=(0.1, 1.0))
+    return metrics
+
+
+def test_workers_render_with_a_worker_label():
+    first, second = registry(), registry()
+    first.inc('requests_total', 2, route='/a')
+    second.inc('requests_total', 5, route='/a')
+    second.observe('latency_seconds', 0.5, route='/a')
+    # Snapshots travel between processes as JSON
+    workers = {0: first.snapshot(), 1: json.loads(json.dumps(second.snapshot()))}
+    lines = first.render(workers).splitlines()
+
+    assert 'requests_total{route="/a",worker="0"} 2' in lines
+    assert 'requests_total{route="/a",worker="1"} 5' in lines
+    assert 'latency_seconds_bucket{route="/a",worker="1",le="1"} 1' in lines
+    assert 'latency_seconds_count{route="/a",worker="1"} 1' in lines
+    assert 'requests_total{route="/a"} 2' in first.render().splitlines()
+
+
+@pytest.mark.skipif(not WORKERS_SUPPORTED, reason='worker processes need fork() and fcntl')
+def test_published_metrics_are_shared():
+    state = SharedState(2)
+    metrics = registry()
+    metrics.inc('requests_total', route='/a')
+    state.publish_metrics(1, metrics.snapshot())
+    assert state.worker_metrics() == {1: json.loads(json.dumps(metrics.snapshot()))}
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from simulated_backend import LatencyModel, NetworkSimulator, SimulatedDropboxClient
+from storage_fakes import ApiError, AuthError, InternalServerError, RateLimitError
+
+NO_LATENCY = {'distribution': 'fixed', 'ms': 0}
+
+
+def simulator(tmp_path, **config):
+    return NetworkSimulator(dict({'latency': NO_LATENCY, 'seed': 1}, **config), tmp_path / 'sim')
+
+
+def dropbox(sim):
+    return sim.dropbox_module().Dropbox(sim.issue_token())
+
+
+def test_latency_distributions_and_bandwidth():
+    rng = random.Random(3)
+    assert LatencyModel({'distribution': 'fixed', 'ms': 250}, None, None, rng).sample() == 0.25
+    uniform = LatencyModel({'distribution': 'uniform', 'min_ms': 10, 'max_ms': 20}, None, None, rng)
+    assert all(0.01 <= uniform.sample() <= 0.02 for _ in range(50))
+    assert LatencyModel({'distribution': 'normal', 'mean_ms': -50, 'stddev_ms': 0}, None, None, rng).sample() == 0
+    assert LatencyModel({'distribution': 'lognormal'}, None, None, rng).sample() > 0
+    with pytest.raises(ValueError):
+        LatencyModel({'distribution': 'pareto'}, None, None, rng).sample()
+
+    capped = LatencyModel(None, upload_kbps=1, download_kbps=2, rng=rng)
+    assert (capped.transfer_time(2048, upload=True), capped.transfer_time(2048, upload=False)) == (2.0, 1.0)
+    assert LatencyModel(None, None, None, rng).transfer_time(10 ** 9, upload=True) == 0.0
+
+
+def test_dropbox_round_trip_and_missing_files(tmp_path):
+    client = dropbox(simulator(tmp_path))
+    client.files_upload(b'{"a": 1}', '/ListingLife/Key.json')
+    metadata, response = client.files_download('/ListingLife/Key.json')
+    assert (response.content, metadata.size, metadata.path_lower) == (b'{"a": 1}', 8, '/listinglife/key.json')
+    client.files_delete('/ListingLife/Key.json')
+    with pytest.raises(ApiError) as raised:
+        client.files_download('/ListingLife/Key.json')
+    assert raised.value.error.is_path() and raised.value.error.get_path().is_not_found()
+
+
+def test_dropbox_listing_pages(tmp_path, monkeypatch):
+    monkeypatch.setattr(SimulatedDropboxClient, 'PAGE_SIZE', 2)
+    client = dropbox(simulator(tmp_path))
+    for n in range(5):
+        client.files_upload(b'x', f'/ListingLife/k{n}.json')
+    page = client.files_list_folder('/ListingLife')
+    names = [entry.name for entry in page.entries]
+    while page.has_more:
+        page = client.files_list_folder_continue(page.cursor)
+        names += [entry.name for entry in page.entries]
+    assert names == [f'k{n}.json' for n in range(5)]
+
+
+@pytest.mark.parametrize('rate, error', [('rate_limit_rate', RateLimitError), ('server_error_rate', InternalServerError),
+                                         ('expired_token_rate', AuthError)])
+def test_dropbox_faults_use_the_sdk_exceptions(tmp_path, rate, error):
+    sim = simulator(tmp_path, **{rate: 1.0})
+    with pytest.raises(error) as raised:
+        dropbox(sim).files_upload(b'x', '/ListingLife/k.json')
+    if error is InternalServerError:
+        assert raised.value.status_code == 503
+    if error is AuthError:
+        assert raised.value.error.is_expired()
+    assert sum(count for name, count in sim.stats.items() if name != 'calls') == 1
+
+
+def test_tokens_expire_and_refresh(tmp_path):
+    sim = simulator(tmp_path, token_lifetime_seconds=0)
+    with pytest.raises(AuthError):
+        dropbox(sim).users_get_current_account()
+    with pytest.raises(AuthError):
+        sim.dropbox_module().Dropbox('never-issued').users_get_current_account()
+
+    sim.token_lifetime = None
+    assert sim.dropbox_module().Dropbox(sim.refresh_access_token()).users_get_current_account().email
+    assert (sim.stats['token_refreshes'], sim.stats['expired_tokens']) == (1, 2)
+
+
+def test_seeded_faults_repeat(tmp_path):
+    def faults(seed):
+        sim = simulator(tmp_path, seed=seed, rate_limit_rate=0.3, server_error_rate=0.3)
+        return [sim.call(None) for _ in range(40)]
+
+    assert faults(7) == faults(7)
+    assert set(faults(7)) == {None, 'rate_limit', 'server_error'}
+
+
+def test_s3_errors_and_pages(tmp_path):
+    sim = simulator(tmp_path, backend='cloud')
+    client = sim.s3_client()
+    for n in range(5):
+        client.put_object(Bucket=sim.bucket, Key=f'listinglife/k{n}.json', Body=b'x')
+    keys, token = [], None
+    while True:
+        page = client.list_objects_v2(Bucket=sim.bucket, Prefix='listinglife/', MaxKeys=2,
+                                      **({'ContinuationToken': token} if token else {}))
+        keys += [obj['Key'] for obj in page['Contents']]
+        if not page['IsTruncated']:
+            break
+        token = page['NextContinuationToken']
+    assert keys == [f'listinglife/k{n}.json' for n in range(5)]
+    with pytest.raises(client.exceptions.NoSuchKey):
+        client.get_object(Bucket=sim.bucket, Key='listinglife/missing.json')
+
+    sim.rate_limit_rate = 1.0
+    with pytest.raises(client.exceptions.ClientError) as raised:
+        client.get_object(Bucket=sim.bucket, Key='listinglife/k0.json')
+    assert raised.value.response['Error']['Code'] == 'SlowDown'
+    assert raised.value.response['ResponseMetadata']['HTTPStatusCode'] == 503
+
+
+def test_only_known_backends_are_simulated(tmp_path):
+    with pytest.raises(ValueError):
+        NetworkSimulator({'backend': 'ftp'}, tmp_path)
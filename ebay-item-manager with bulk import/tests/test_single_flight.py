@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend_handle import SingleFlight
+
+
+def run_together(flight, callers, load):
+    """Start callers loads of one key while the first is held inside load; returns their results"""
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def held_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return load()
+
+    with ThreadPoolExecutor(callers) as pool:
+        first = pool.submit(flight.do, 'dropbox', 'key', held_load)
+        assert started.wait(5)
+        others = [pool.submit(flight.do, 'dropbox', 'key', held_load) for _ in range(callers - 1)]
+        # Every other caller has joined the flight before the load is let go
+        while flight.describe()['dropbox']['coalesced'] < callers - 1:
+            time.sleep(0.001)
+        release.set()
+        return calls, [future.result() for future in [first] + others]
+
+
+def test_concurrent_loads_share_one_call():
+    flight = SingleFlight()
+    calls, results = run_together(flight, 4, lambda: {'items': [1, 2]})
+    assert len(calls) == 1
+    assert results == [{'items': [1, 2]}] * 4
+    assert flight.describe()['dropbox'] == {'fetched': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_each_caller_gets_its_own_copy():
+    flight = SingleFlight()
+    _, results = run_together(flight, 3, lambda: {'items': [{'id': 1}]})
+    results[0]['items'].append({'id': 2})
+    results[1]['items'][0]['id'] = 'changed'
+    assert results[2] == {'items': [{'id': 1}]}
+    assert len({id(result['items']) for result in results}) == 3
+
+
+def test_a_load_nobody_joined_is_not_copied():
+    value = {'items': []}
+    assert SingleFlight().do('local', 'key', lambda: value) is value
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight()
+
+    def fail():
+        raise ConnectionError('down')
+
+    with pytest.raises(ConnectionError):
+        run_together(flight, 3, fail)
+    assert flight.do('dropbox', 'key', lambda: 'loaded') == 'loaded'
+
+
+def test_loads_after_forget_do_not_join_the_running_one():
+    flight = SingleFlight()
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as pool:
+        old = pool.submit(flight.do, 'cloud', 'key', lambda: release.wait(5) and 'old')
+        while not flight.describe().get('cloud', {}).get('in_flight'):
+            time.sleep(0.001)
+        flight.forget('cloud', 'key')
+        assert flight.do('cloud', 'key', lambda: 'new') == 'new'
+        release.set()
+        assert old.result() == 'old'
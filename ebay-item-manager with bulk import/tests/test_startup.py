@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pytest
+
+import find_python
+
+
+@pytest.fixture
+def connecting(server, monkeypatch):
+    """The server fixture with the backend marked as still connecting"""
+    import storage_server
+
+    monkeypatch.setattr(storage_server, 'BACKEND_STATE', dict(storage_server.BACKEND_STATE))
+    monkeypatch.setattr(storage_server, 'backend_ready', threading.Event())
+    storage_server.set_backend_state('connecting')
+    return server
+
+
+def test_requests_that_need_the_backend_wait_for_it(connecting, monkeypatch):
+    import storage_server
+
+    monkeypatch.setattr(storage_server, 'BACKEND_WAIT_SECONDS', 0.05)
+    response = connecting.post('/api/storage/get', json={'key': 'ListingLifeStores'})
+    assert response.status_code == 503
+    assert response.get_json()['backend']['state'] == 'connecting'
+    # Health never waits, and reports the state
+    health = connecting.get('/api/health')
+    assert health.status_code == 200
+    assert health.get_json()['backend']['state'] == 'connecting'
+
+
+def test_background_connection_releases_waiting_requests(connecting, monkeypatch):
+    import storage_server
+
+    release = threading.Event()
+
+    def open_backend(requested_mode):
+        release.wait(5)
+        return 'local'  # the SDK could not be imported
+
+    monkeypatch.setattr(storage_server, 'open_storage_backend', open_backend)
+    connect = threading.Thread(target=storage_server.connect_storage_backend, args=('dropbox',))
+    connect.start()
+    threading.Timer(0.05, release.set).start()
+    response = connecting.post('/api/storage/get', json={'key': 'ListingLifeStores'})
+    assert release.is_set() and response.status_code == 200
+    connect.join(5)
+    assert storage_server.BACKEND_STATE['state'] == 'fallback_local'
+    assert 'dropbox unavailable' in storage_server.BACKEND_STATE['detail']
+
+
+@pytest.fixture
+def launcher_files(tmp_path, monkeypatch):
+    executable = tmp_path / 'python3'
+    requirements = tmp_path / 'requirements.txt'
+    executable.write_text('')
+    requirements.write_text('flask\n')
+    monkeypatch.setattr(find_python, 'CACHE_FILE', str(tmp_path / '.python_interpreter.json'))
+    monkeypatch.setattr(find_python, 'REQUIREMENTS_FILE', str(requirements))
+    return executable, requirements
+
+
+def test_interpreter_cache_round_trip(launcher_files):
+    executable, _ = launcher_files
+    assert find_python.load_cached_interpreter() is None
+    find_python.save_cached_interpreter(str(executable), 'Python 3.11.4', True)
+    assert find_python.load_cached_interpreter() == (str(executable), 'Python 3.11.4', True)
+
+
+def test_interpreter_cache_goes_stale(launcher_files):
+    executable, requirements = launcher_files
+    find_python.save_cached_interpreter(str(executable), 'Python 3.11.4', True)
+
+    # Changed requirements only repeat the dependency check
+    os.utime(requirements, (1, 1))
+    assert find_python.load_cached_interpreter() == (str(executable), 'Python 3.11.4', False)
+    # A reinstalled interpreter is probed again
+    os.utime(executable, (1, 1))
+    assert find_python.load_cached_interpreter() is None
+    executable.unlink()
+    assert find_python.load_cached_interpreter() is None
@@ -0,0 +1,222 @@
+import json
+import time
+from contextlib import nullcontext
+
+import storage_compactor
+from document_shards import assemble_document, is_manifest, split_document
+from storage_compactor import MISSING_PASSES, StorageCompactor
+
+
+class Backend:
+    """A dict of stored objects with the callables StorageCompactor takes"""
+
+    def __init__(self, stores=('live',)):
+        self.objects = {}
+        self.legacy = {}
+        self.set_stores(stores)
+        self.store_reads = []  # Store lists to return from the next store_ids() calls, before the real one
+        self.document_loads = []  # Called with the key on every load_document(), before it reads
+
+    def set_stores(self, store_ids):
+        self.objects['ListingLifeStores'] = [{'id': store_id} for store_id in store_ids]
+
+    def save(self, key, value):
+        split = split_document(key, value) if key.startswith('EbayListingLife') else None
+        if split:
+            manifest, shards = split
+            self.objects.update(shards)
+            value = manifest
+        self.objects[key] = value
+
+    def load_document(self, key):
+        for loaded in self.document_loads:
+            loaded(key)
+        value = self.objects.get(key)
+        return assemble_document(key, value, self.objects) if is_manifest(value) else value
+
+    def list_objects(self):
+        listing = {key: {'size': len(json.dumps(value)), 'legacy': 0} for key, value in self.objects.items()}
+        for key, value in self.legacy.items():
+            listing.setdefault(key, {'size': 0, 'legacy': 0})['legacy'] = len(json.dumps(value))
+        return listing
+
+    def store_ids(self):
+        if self.store_reads:
+            return self.store_reads.pop(0)
+        stores = self.objects.get('ListingLifeStores')
+        return {store['id'] for store in stores} if stores else None
+
+    def delete_key(self, key):
+        for stored in [stored for stored in self.objects if stored == key or stored.startswith(key + '~')]:
+            del self.objects[stored]
+        self.legacy.pop(key, None)
+
+    def compress(self, key):
+        self.objects[key] = self.legacy.pop(key)
+        return len(json.dumps(self.objects[key]))
+
+    def compactor(self, state_dir, **options):
+        return StorageCompactor(
+            state_dir, 'memory', self.list_objects, self.store_ids,
+            load_object=self.objects.get, load_document=self.load_document,
+            save_document=lambda key, value: self.save(key, value) or len(json.dumps(value)),
+            delete_key=self.delete_key, delete_object=self.objects.pop,
+            delete_legacy=self.legacy.pop, compress=self.compress,
+            hold=lambda key: nullcontext(), stored_size=lambda value: len(json.dumps(value)),
+            blocked=lambda: None, batch_pause=0, batch_size=2, **options
+        )
+
+
+def test_store_keys_are_deleted_after_enough_passes(tmp_path):
+    backend = Backend()
+    backend.objects['ImportedItems_live'] = [1]
+    backend.objects['ImportedItems_gone'] = [2]
+    compactor = backend.compactor(tmp_path)
+
+    for _ in range(MISSING_PASSES - 1):
+        report = compactor.run()
+        assert 'ImportedItems_gone' in backend.objects
+        assert report['actions']['stale_store_keys'] == 0
+    report = compactor.run()
+    assert 'ImportedItems_gone' not in backend.objects
+    assert 'ImportedItems_live' in backend.objects
+    assert report['actions']['stale_store_keys'] == 1
+
+
+def test_missing_counts_survive_a_restart_and_reset_when_listed(tmp_path):
+    backend = Backend()
+    backend.objects['ImportedItems_gone'] = [2]
+    backend.compactor(tmp_path).run()
+    assert backend.compactor(tmp_path).missing_stores == {'gone': 1}
+
+    backend.set_stores(['live', 'gone'])
+    compactor = backend.compactor(tmp_path)
+    compactor.run()
+    assert compactor.missing_stores == {}
+    backend.set_stores(['live'])
+    compactor.run()
+    assert 'ImportedItems_gone' in backend.objects
+
+
+def test_store_listed_again_before_the_delete_keeps_its_keys(tmp_path):
+    backend = Backend()
+    backend.objects['ImportedItems_back'] = [1]
+    compactor = backend.compactor(tmp_path)
+    for _ in range(MISSING_PASSES - 1):
+        compactor.run()
+    # The pass starts from a store list without it, but the read right before the delete lists it again
+    backend.store_reads = [{'live'}, {'live', 'back'}]
+    compactor.run()
+    assert 'ImportedItems_back' in backend.objects
+    assert 'back' not in compactor.missing_stores
+
+
+def test_unreadable_store_list_counts_nothing(tmp_path):
+    backend = Backend()
+    backend.objects['ImportedItems_gone'] = [2]
+    del backend.objects['ListingLifeStores']
+    compactor = backend.compactor(tmp_path)
+    for _ in range(MISSING_PASSES + 1):
+        compactor.run()
+    assert 'ImportedItems_gone' in backend.objects
+    assert compactor.missing_stores == {}
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    backend = Backend()
+    backend.objects['ImportedItems_gone'] = [2]
+    backend.legacy['ImportedItems_live'] = [3]
+    before = (dict(backend.objects), dict(backend.legacy))
+    compactor = backend.compactor(tmp_path)
+    for _ in range(MISSING_PASSES):
+        report = compactor.run(dry_run=True)
+    assert (backend.objects, backend.legacy) == before
+    assert report['actions']['stale_store_keys'] == 1
+    assert report['actions']['compressed'] == 1
+
+
+def test_orphaned_shards_and_legacy_copies(tmp_path):
+    backend = Backend()
+    document = {'categories': [{'id': 'a'}, {'id': 'b'}], 'items': [{'id': '1', 'categoryId': 'a'}]}
+    backend.save('EbayListingLife_live', document)
+    old_shards = set(backend.objects)
+    document['items'].append({'id': '2', 'categoryId': 'b'})
+    backend.save('EbayListingLife_live', document)
+    orphaned = {key for key in old_shards if '~' in key} - set(backend.objects['EbayListingLife_live']['shards'])
+    assert orphaned
+    backend.legacy['ListingLifeStores'] = [{'id': 'live'}]
+    backend.legacy['ImportedItems_live'] = [1]
+
+    report = backend.compactor(tmp_path).run()
+    assert not orphaned & set(backend.objects)
+    assert all(key in backend.objects for key in backend.objects['EbayListingLife_live']['shards'])
+    assert report['actions']['orphaned_shards'] == len(orphaned)
+    assert backend.legacy == {}
+    assert backend.objects['ImportedItems_live'] == [1]
+
+
+def listing_document():
+    return {'categories': [{'id': 'a'}, {'id': 'b'}],
+            'items': [{'id': '1', 'categoryId': 'a'}, {'id': '2', 'categoryId': 'gone'}, {'id': '3'}]}
+
+
+def test_orphaned_listing_items_are_dropped(tmp_path):
+    backend = Backend()
+    backend.save('EbayListingLife_live', listing_document())
+    report = backend.compactor(tmp_path).run()
+    assert backend.load_document('EbayListingLife_live')['items'] == [{'id': '1', 'categoryId': 'a'}, {'id': '3'}]
+    assert report['actions']['orphaned_listings'] == 1
+
+    # Without categories the document is more likely damaged than emptied, so it is left alone
+    backend.save('EbayListingLife_live', {'categories': [], 'items': [{'id': '1', 'categoryId': 'a'}]})
+    assert backend.compactor(tmp_path).run()['actions']['orphaned_listings'] == 0
+    assert backend.load_document('EbayListingLife_live')['items'] == [{'id': '1', 'categoryId': 'a'}]
+
+
+def test_listing_rewrite_skipped_when_categories_change(tmp_path):
+    backend = Backend()
+    backend.save('EbayListingLife_live', listing_document())
+    loads = []
+
+    def add_category(key):
+        # A browser saves the missing category between the scan and the locked re-read
+        loads.append(key)
+        if len(loads) == 2:
+            restored = listing_document()
+            restored['categories'].append({'id': 'gone'})
+            backend.save(key, restored)
+
+    backend.document_loads.append(add_category)
+    report = backend.compactor(tmp_path).run()
+    assert len(loads) == 2
+    assert report['actions']['orphaned_listings'] == 0
+    assert len(backend.load_document('EbayListingLife_live')['items']) == 3
+
+
+def test_invalid_sold_items_are_dropped(tmp_path):
+    backend = Backend()
+    backend.objects['SoldItemsTrends_live'] = {'periods': [{'categories': [{'subcategories': [
+        {'items': [{'price': 5}, {'price': -1}, {'price': 'abc'}, 'not an item', {'price': None}]}
+    ]}]}]}
+    report = backend.compactor(tmp_path).run()
+    items = backend.objects['SoldItemsTrends_live']['periods'][0]['categories'][0]['subcategories'][0]['items']
+    assert items == [{'price': 5}, {'price': None}]
+    assert report['actions']['invalid_sold_items'] == 3
+
+
+def test_scheduled_passes_are_dry_runs_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_compactor, 'STARTUP_DELAY', 0)
+    backend = Backend()
+    backend.legacy['ImportedItems_live'] = [3]
+    compactor = backend.compactor(tmp_path, interval_hours=1)
+    compactor.start()
+    try:
+        deadline = time.time() + 10
+        while not compactor.last_report:
+            assert time.time() < deadline, 'the scheduled pass did not run'
+            time.sleep(0.01)
+    finally:
+        compactor.stop()
+    assert compactor.last_report['dry_run'] is True
+    assert compactor.last_report['actions']['compressed'] == 1
+    assert backend.legacy == {'ImportedItems_live': [3]}
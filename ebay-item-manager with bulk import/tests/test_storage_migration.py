@@ -0,0 +1,49 @@
+import gzip
+import json
+
+from storage_migration import MigrationEndpoint, MigrationJob
+
+
+class Store:
+    """A dict-backed MigrationEndpoint recording the keys written to it"""
+
+    def __init__(self, name, values=None, compressed=False):
+        self.name = name
+        self.values = dict(values or {})
+        self.writes = []
+        self.compressed = compressed
+
+    def save(self, key, value):
+        self.writes.append(key)
+        self.values[key] = value
+
+    def write_compressed(self, key, data):
+        self.save(key, json.loads(gzip.decompress(data)))
+
+    def read_compressed(self, key):
+        return gzip.compress(json.dumps(self.values[key]).encode('utf-8'), mtime=0) if key in self.values else None
+
+    def endpoint(self):
+        extra = {'read_compressed': self.read_compressed, 'write_compressed': self.write_compressed} if self.compressed else {}
+        return MigrationEndpoint(self.name, lambda: list(self.values), self.values.get, self.save, **extra)
+
+
+def migrate(source, target, checkpoint):
+    job = MigrationJob(source.endpoint(), target.endpoint(), checkpoint, workers=2)
+    assert job.run()
+    return job.status
+
+
+def test_resume_copies_only_changed_keys(tmp_path):
+    for compressed in (False, True):
+        source = Store('a', {'k1': [1], 'k2': {'x': 2}, 'k3': 'three'}, compressed)
+        target = Store('b', compressed=compressed)
+        checkpoint = tmp_path / f"{compressed}.json"
+        assert migrate(source, target, checkpoint)['copied'] == 3
+
+        source.values['k2'] = {'x': 'changed'}
+        target.writes.clear()
+        status = migrate(source, target, checkpoint)
+        assert (status['copied'], status['resumed']) == (1, 2)
+        assert target.writes == ['k2']
+        assert target.values == source.values
@@ -0,0 +1,91 @@
+from datetime import date
+
+from store_analytics import StoreAnalytics
+
+TODAY = date(2024, 6, 1).toordinal()
+
+
+def listing(*sold_prices):
+    return {'categories': [{'id': 'c'}], 'items': [
+        {'categoryId': 'c', 'dateAdded': '2024-01-01', 'soldDate': '2024-01-05', 'soldPrice': price} for price in sold_prices]}
+
+
+class Stores:
+    """Store documents with versions, counting how often each store's sources are asked for"""
+
+    def __init__(self, **documents):
+        self.documents = documents
+        self.versions = {store_id: (1, 1) for store_id in documents}
+        self.loads = []
+
+    def change(self, store_id, document):
+        self.documents[store_id] = document
+        self.versions[store_id] = (self.versions[store_id][0] + 1, self.versions[store_id][1])
+
+    def request(self):
+        def sources(store_id):
+            self.loads.append(store_id)
+            return ('value', self.documents[store_id]), ('value', None)
+        return {store_id: (self.versions[store_id], lambda store_id=store_id: sources(store_id)) for store_id in self.documents}
+
+
+def test_only_changed_stores_are_reduced_again():
+    analytics = StoreAnalytics(workers=1)
+    stores = Stores(a=listing(10), b=listing(5, 7))
+    report = analytics.report(stores.request(), TODAY)
+    assert report['recomputed'] == ['a', 'b']
+    assert (report['overall']['sold'], report['overall']['revenue']['listings']) == (3, 22)
+    assert report['stores']['b']['version'] == [1, 1]
+
+    assert analytics.report(stores.request(), TODAY)['recomputed'] == []
+    stores.change('a', listing(10, 20))
+    report = analytics.report(stores.request(), TODAY)
+    assert report['recomputed'] == ['a']
+    assert report['overall']['sold'] == 4
+    assert stores.loads == ['a', 'b', 'a']
+
+
+def test_a_new_day_deleted_stores_and_stale_copies_are_not_served_from_cache():
+    analytics = StoreAnalytics(workers=1)
+    stores = Stores(a=listing(1), b=listing(2))
+    analytics.report(stores.request(), TODAY)
+    assert analytics.report(stores.request(), TODAY + 1)['recomputed'] == ['a', 'b']
+
+    del stores.documents['b']
+    report = analytics.report(stores.request(), TODAY + 1)
+    assert set(report['stores']) == {'a'} and report['overall']['stores'] == 1
+    assert analytics.report(stores.request(), TODAY + 1, fresh=lambda loaded: False)['recomputed'] == ['a']
+
+    analytics.clear()
+    assert analytics.report(stores.request(), TODAY + 1)['recomputed'] == ['a']
+
+
+def test_worker_processes_reduce_the_same_partials(caplog):
+    stores = Stores(a=listing(3), b=listing(4, 5), c=listing())
+    analytics = StoreAnalytics(workers=2)
+    try:
+        pooled = analytics.report(stores.request(), TODAY)
+    finally:
+        analytics.shutdown()
+    # Not the in-process fallback
+    assert 'Stats worker pool failed' not in caplog.text
+    assert pooled == StoreAnalytics(workers=1).report(stores.request(), TODAY)
+
+
+def test_endpoint_recomputes_a_store_after_a_save(server, monkeypatch):
+    import storage_server
+
+    monkeypatch.setattr(storage_server.store_analytics, 'workers', 1)
+
+    def save(key, value):
+        assert server.post('/api/storage/set', json={'key': key, 'value': value}).status_code == 200
+
+    save('ListingLifeStores', [{'id': 's1'}, {'id': 's2'}])
+    save('EbayListingLife_s1', listing(10))
+    save('EbayListingLife_s2', listing(4))
+    assert server.get('/api/stats/all-stores').get_json()['recomputed'] == ['s1', 's2']
+    assert server.get('/api/stats/all-stores').get_json()['recomputed'] == []
+    save('EbayListingLife_s2', listing(4, 6))
+    report = server.get('/api/stats/all-stores').get_json()
+    assert report['recomputed'] == ['s2']
+    assert report['overall']['revenue']['listings'] == 20
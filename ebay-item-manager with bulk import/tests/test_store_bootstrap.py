@@ -0,0 +1,52 @@
+import time
+
+from store_bootstrap import WarmCache
+
+
+def test_versions_decide_without_fingerprints():
+    cache = WarmCache(max_bytes=1000, max_age=60)
+    cache.put('s1', [1, 0], None, b'body', time.time())
+    assert cache.get('s1', [1, 0]) == b'body'
+    assert cache.get('s1', [2, 0]) is None
+    assert cache.get('other', [1, 0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_fingerprints_are_checked_only_after_the_window():
+    cache = WarmCache(max_bytes=1000, max_age=60, revalidate_after=30)
+    listed = []
+
+    def fingerprints(current):
+        return lambda: listed.append(current) or current
+
+    cache.put('s1', [1], ['a'], b'body', time.time())
+    # Within the window a hit never asks the backend, even if it changed
+    assert cache.get('s1', [1], fingerprints(['b'])) == b'body'
+    assert listed == []
+
+    cache.configure(1000, 60, revalidate_after=0)
+    assert cache.get('s1', [1], fingerprints(['a'])) == b'body'
+    assert not cache.fresh('s1', [1], fingerprints(['b']))
+    assert cache.get('s1', [1], fingerprints(['b'])) is None
+    assert listed == [['a'], ['b'], ['b']]
+    assert cache.describe()['revalidations'] == 3
+
+
+def test_a_successful_check_restarts_the_window():
+    cache = WarmCache(max_bytes=1000, max_age=60, revalidate_after=30)
+    cache.put('s1', [1], ['a'], b'body', time.time() - 40)
+    calls = []
+    assert cache.get('s1', [1], lambda: calls.append(1) or ['a']) == b'body'
+    assert cache.get('s1', [1], lambda: calls.append(1) or ['a']) == b'body'
+    assert calls == [1]
+
+
+def test_entries_expire_and_stay_within_max_bytes():
+    cache = WarmCache(max_bytes=10, max_age=60)
+    cache.put('old', [1], None, b'x' * 6, time.time() - 61)
+    assert cache.get('old', [1]) is None
+    cache.put('a', [1], None, b'x' * 6, time.time())
+    cache.put('b', [1], None, b'y' * 6, time.time())
+    assert cache.describe()['stores'] == ['b']
+    cache.put('big', [1], None, b'z' * 11, time.time())
+    assert cache.get('big', [1]) is None
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from conftest import random_json, random_string
+from streaming_ingest import MAX_NAME_BYTES, IngestError, JsonMemberReader
+
+
+def reader_for(value, chunk_size=7, **dumps):
+    # Small chunks put chunk boundaries inside strings, escapes and multi-byte characters
+    body = json.dumps(value, ensure_ascii=False, **dumps).encode('utf-8')
+    return JsonMemberReader(io.BytesIO(body), chunk_size=chunk_size)
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_members_round_trip(rng, indent):
+    document = {random_string(rng, 6): random_json(rng) for _ in range(rng.randint(0, 6))}
+    reader = reader_for(document, chunk_size=rng.randint(1, 16), indent=indent)
+
+    members = {}
+    for name in reader.members():
+        with reader.spool_value() as spooled:
+            members[name] = json.loads(spooled.read_bytes())
+    assert members == document
+
+
+def test_unread_values_are_skipped(rng):
+    document = {f"skip{i}": random_json(rng) for i in range(3)}
+    document['wanted'] = random_json(rng)
+    document['after'] = 1
+    reader = reader_for(document)
+
+    seen = {}
+    for name in reader.members():
+        if name in ('wanted', 'after'):
+            seen[name] = reader.read_value(limit=10 ** 6)
+    assert seen == {'wanted': document['wanted'], 'after': 1}
+
+
+def test_nested_members():
+    reader = reader_for({'items': {'a': '[1, 2]', 'b': '{"x": "y"}'}, 'done': True})
+    values = {}
+    for name in reader.members():
+        if name == 'items':
+            for key in reader.members():
+                with reader.spool_value() as spooled:
+                    values[key] = spooled.decode()
+    assert values == {'a': ([1, 2], b'[1, 2]'), 'b': ({'x': 'y'}, b'{"x": "y"}')}
+
+
+def test_decode_keeps_non_json_strings():
+    reader = reader_for({'value': 'not json {'})
+    for _ in reader.members():
+        with reader.spool_value() as spooled:
+            assert spooled.decode() == ('not json {', None)
+
+
+def test_large_values_spill_to_disk(rng):
+    value = [random_string(rng, 40) for _ in range(2000)]
+    reader = reader_for({'value': value}, chunk_size=4096)
+    for _ in reader.members():
+        with reader.spool_value(memory_bytes=1024) as spooled:
+            assert spooled.size > 1024
+            assert json.loads(spooled.read_bytes()) == value
+
+
+@pytest.mark.parametrize('body', [b'', b'[1]', b'{"a" 1}', b'{"a": [1, 2', b'{"a": "open', b'{1: 2}', b'{"a": 1 "b": 2}'])
+def test_malformed_bodies_raise(body):
+    reader = JsonMemberReader(io.BytesIO(body), chunk_size=3)
+    with pytest.raises(IngestError):
+        for _ in reader.members():
+            reader.skip_value()
+
+
+def test_oversized_names_raise():
+    reader = reader_for({'x' * MAX_NAME_BYTES: 1}, chunk_size=4096)
+    with pytest.raises(IngestError):
+        for _ in reader.members():
+            pass
+    reader = reader_for({'key': 'x' * 100})
+    with pytest.raises(IngestError):
+        for _ in reader.members():
+            reader.read_value(limit=50)
@@ -0,0 +1,115 @@
+import itertools
+
+from tiered_replicator import TieredReplicator
+
+
+class Tiers:
+    """Local and remote key/value stores wired to a replicator; remote fingerprints change on every write"""
+
+    def __init__(self, tmp_path, local=None, remote=None, fingerprint_pushes=True):
+        self.local = dict(local or {})
+        self.serial = itertools.count(1)
+        self.remote = {key: (value, self.fingerprint()) for key, value in (remote or {}).items()}
+        self.pulled = []
+        self.fail_push = False
+        self.fingerprint_pushes = fingerprint_pushes
+        self.tmp_path = tmp_path
+        self.replicator = self.open()
+
+    def fingerprint(self):
+        return f"fp{next(self.serial)}"
+
+    def push(self, key, value):
+        if self.fail_push:
+            raise ConnectionError('remote down')
+        self.remote[key] = (value, self.fingerprint())
+        return self.remote[key][1] if self.fingerprint_pushes else None
+
+    def write_remote(self, key, value):
+        """Another machine writing the key"""
+        self.remote[key] = (value, self.fingerprint())
+
+    def open(self):
+        return TieredReplicator(
+            self.tmp_path / '.replication', 'dropbox',
+            load_local=self.local.get, save_local=self.local.__setitem__,
+            delete_local=lambda key: self.local.pop(key, None), list_local=lambda: list(self.local),
+            push=self.push, pull=lambda key: self.remote.get(key, (None,))[0],
+            delete_remote=lambda key: self.remote.pop(key, None),
+            list_remote=lambda: {key: entry[1] for key, entry in self.remote.items()},
+            on_pulled=lambda key, value: self.pulled.append((key, value))
+        )
+
+    def write(self, key, value):
+        return self.replicator.record_write(key, lambda: self.local.__setitem__(key, value))
+
+    def remote_values(self):
+        return {key: entry[0] for key, entry in self.remote.items()}
+
+
+def test_first_sync_takes_the_shared_remote_copy_and_pushes_local_only_keys(tmp_path):
+    tiers = Tiers(tmp_path, local={'a': 'local a', 'same': 1, 'c': 'only local'}, remote={'a': 'remote a', 'same': 1, 'b': 'remote b'})
+    assert tiers.replicator.run_once()
+    assert tiers.local == {'a': 'remote a', 'same': 1, 'b': 'remote b', 'c': 'only local'}
+    assert tiers.replicator.status['conflicts'] == 1
+    assert sorted(tiers.pulled) == [('a', 'remote a'), ('b', 'remote b')]
+
+    assert tiers.replicator.run_once()
+    assert tiers.remote_values() == tiers.local
+    assert tiers.replicator.describe()['pending_keys'] == 0
+
+
+def test_after_the_first_sync_a_key_changed_on_both_sides_keeps_the_local_version(tmp_path):
+    tiers = Tiers(tmp_path, remote={'k': 'v1'})
+    tiers.replicator.run_once()
+    tiers.write('k', 'local edit')
+    tiers.write_remote('k', 'remote edit')
+
+    tiers.replicator.pull_changes()
+    assert tiers.local['k'] == 'local edit'
+    assert tiers.replicator.status['conflicts'] == 1
+    tiers.replicator.run_once()
+    assert tiers.remote_values() == {'k': 'local edit'}
+    # The pushed fingerprint was adopted, so the next pull does not fetch it back
+    tiers.pulled.clear()
+    tiers.replicator.pull_changes()
+    assert tiers.pulled == []
+
+
+def test_deletes_travel_both_ways(tmp_path):
+    tiers = Tiers(tmp_path, remote={'gone remotely': 1, 'gone locally': 2})
+    tiers.replicator.run_once()
+    del tiers.remote['gone remotely']
+    tiers.replicator.record_delete('gone locally', lambda: tiers.local.pop('gone locally'))
+    tiers.replicator.request_pull()
+    tiers.replicator.run_once()
+    assert tiers.local == {} and tiers.remote == {}
+    assert ('gone remotely', None) in tiers.pulled
+
+
+def test_unfingerprinted_pushes_are_looked_up_in_one_listing(tmp_path):
+    tiers = Tiers(tmp_path, fingerprint_pushes=False)
+    tiers.replicator.run_once()
+    tiers.write('k', 'v')
+    tiers.replicator.push_pending()
+    tiers.pulled.clear()
+    tiers.replicator.pull_changes()
+    assert tiers.pulled == []
+
+
+def test_failed_pushes_back_off_and_survive_a_restart(tmp_path):
+    tiers = Tiers(tmp_path)
+    tiers.replicator.run_once()
+    tiers.fail_push = True
+    tiers.write('k', 'v')
+    assert not tiers.replicator.run_once()
+    status = tiers.replicator.describe()
+    assert (status['state'], status['last_error'], status['pending_keys']) == ('error', 'remote down', 1)
+    assert status['retry_in_seconds'] > 0
+
+    tiers.fail_push = False
+    tiers.replicator = tiers.open()
+    assert tiers.replicator.describe()['pending_keys'] == 1
+    assert tiers.replicator.run_once()
+    assert tiers.remote_values() == {'k': 'v'}
+    assert tiers.replicator.describe()['retry_in_seconds'] is None
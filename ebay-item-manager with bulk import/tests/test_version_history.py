@@ -0,0 +1,157 @@
+import copy
+import json
+
+from conftest import random_json, random_string
+import version_history
+from version_history import VersionHistory, apply_delta, diff
+
+
+def mutate(rng, value, depth=3):
+    """A copy of value with a few random edits, keeping most of it so deltas have something to patch"""
+    value = copy.deepcopy(value)
+    if depth == 0 or rng.random() < 0.1:
+        return random_json(rng, 2)
+    if isinstance(value, dict):
+        for key in list(value):
+            roll = rng.random()
+            if roll < 0.15:
+                del value[key]
+            elif roll < 0.5:
+                value[key] = mutate(rng, value[key], depth - 1)
+        if rng.random() < 0.3:
+            value[random_string(rng, 5)] = random_json(rng, 2)
+        return value
+    if isinstance(value, list):
+        if value and all(isinstance(element, dict) and 'id' in element for element in value):
+            rng.shuffle(value)
+        for position in range(len(value)):
+            if rng.random() < 0.3:
+                value[position] = mutate(rng, value[position], depth - 1)
+        if rng.random() < 0.3:
+            value.append(random_json(rng, 2))
+        return value
+    return random_json(rng, 1)
+
+
+def listing(rng, count=8):
+    # 1 and "1" are different ids, and an id may be any JSON value
+    ids = [1, '1', 2.5, None, {'sku': 'A'}, ['x'], True, 'abc'][:count]
+    return {'items': [{'id': item_id, 'name': random_string(rng)} for item_id in ids], 'meta': random_json(rng, 2)}
+
+
+def replay(old, new):
+    delta = diff(old, new)
+    if delta is None:
+        assert old == new
+        return copy.deepcopy(old)
+    # A stored delta comes back from JSON, as do the versions it is applied to
+    return apply_delta(json.loads(json.dumps(old)), json.loads(json.dumps(delta)))
+
+
+def test_delta_round_trip(rng):
+    old = random_json(rng, 4)
+    for _ in range(5):
+        new = mutate(rng, old)
+        assert replay(old, new) == new
+        old = new
+
+
+def test_id_list_delta_round_trip(rng):
+    old = listing(rng)
+    for _ in range(5):
+        new = mutate(rng, old)
+        assert replay(old, new) == new
+        old = new
+
+
+def test_equal_values_have_no_delta(rng):
+    value = random_json(rng, 4)
+    assert diff(value, copy.deepcopy(value)) is None
+
+
+def test_ids_differing_only_in_type_stay_apart():
+    old = {'items': [{'id': 1, 'v': 'int'}, {'id': '1', 'v': 'str'}]}
+    new = {'items': [{'id': '1', 'v': 'str'}, {'id': 1, 'v': 'changed'}]}
+    delta = diff(old, new)
+    assert list(delta['d']['items']['i']) == ['1']
+    assert apply_delta(copy.deepcopy(old), delta) == new
+
+
+def test_legacy_list_deltas_still_apply():
+    # Written before ids were keyed by their JSON: keys were str(id)
+    base = [{'id': 7, 'v': 1}, {'id': 8, 'v': 2}]
+    delta = {'l': {'7': {'d': {'v': {'v': 5}}}}, 'o': [8, 7]}
+    assert apply_delta(base, delta) == [{'id': 8, 'v': 2}, {'id': 7, 'v': 5}]
+
+
+def test_versions_materialize(tmp_path, rng):
+    history = VersionHistory(tmp_path, snapshot_interval=3)
+    values = [listing(rng)]
+    for _ in range(9):
+        values.append(mutate(rng, values[-1]))
+    for value in values:
+        history.record('EbayListingLife_s', value)
+    history.record('EbayListingLife_s', copy.deepcopy(values[-1]))  # Unchanged, so not a version
+    assert history.flush(timeout=30)
+
+    distinct = [value for previous, value in zip([None] + values, values) if value != previous]
+    versions = [entry['version'] for entry in history.list_versions('EbayListingLife_s')]
+    assert len(versions) == len(distinct)
+    # A fresh instance reads everything from disk, replaying deltas on the snapshots
+    reopened = VersionHistory(tmp_path, snapshot_interval=3)
+    for version, value in zip(versions, distinct):
+        assert history.get_version('EbayListingLife_s', version) == (version, value)
+        assert reopened.get_version('EbayListingLife_s', version) == (version, value)
+    assert reopened.get_version('EbayListingLife_s') == (versions[-1], distinct[-1])
+    history.close()
+    reopened.close()
+
+
+def test_reads_wait_for_queued_versions(tmp_path):
+    history = VersionHistory(tmp_path)
+    for count in range(50):
+        history.record('ImportedItems_s', [{'id': i} for i in range(count + 1)])
+    # No flush: list_versions waits for the key's queue itself
+    assert len(history.list_versions('ImportedItems_s')) == 50
+    history.close()
+
+
+def test_closed_history_drops_records(tmp_path):
+    history = VersionHistory(tmp_path)
+    history.record('ImportedItems_s', [1])
+    history.close()
+    history.record('ImportedItems_s', [2])
+    assert [entry['version'] for entry in history.list_versions('ImportedItems_s')] == [1]
+
+
+def test_latest_versions_kept_in_memory_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(version_history, 'LATEST_KEYS_KEPT', 3)
+    history = VersionHistory(tmp_path)
+    for number in range(5):
+        history.record(f"key{number}", {'n': number})
+    assert history.flush(timeout=30)
+    assert list(history._latest) == ['key2', 'key3', 'key4']
+    # Evicted keys are read back from disk
+    assert history.get_version('key0') == (1, {'n': 0})
+    history.record('key0', {'n': 'next'})
+    assert history.get_version('key0') == (2, {'n': 'next'})
+    history.close()
+
+
+def test_history_endpoints_reject_unsafe_keys(server, tmp_path, monkeypatch):
+    import storage_server
+
+    history = VersionHistory(tmp_path / 'history')
+    monkeypatch.setattr(storage_server, 'version_history', history)
+    history.record('EbayListingLife_s', {'items': []})
+    assert server.get('/api/history/EbayListingLife_s').get_json()['versions'][0]['version'] == 1
+    for key in ('..', '.', 'a\\b', 'a\\..\\..'):
+        assert server.get(f"/api/history/{key}").status_code == 400
+        assert server.get(f"/api/history/{key}/value").status_code == 400
+        assert server.post(f"/api/history/{key}/restore", json={'version': 1}).status_code == 400
+    for route in ('get', 'remove'):
+        assert server.post(f"/api/storage/{route}", json={'key': '..'}).status_code == 400
+    assert server.post('/api/storage/set', json={'key': '../escape', 'value': 1}).status_code == 400
+    assert not (tmp_path / 'escape.json').exists()
+    assert sorted(path.name for path in (tmp_path / 'history').iterdir()) == ['EbayListingLife_s']
+    history.close()
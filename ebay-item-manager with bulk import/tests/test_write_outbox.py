@@ -0,0 +1,94 @@
+import threading
+from contextlib import contextmanager
+
+from write_outbox import WriteOutbox
+
+
+class Backend:
+    """Records what the outbox sends; fail makes the next sends raise"""
+
+    def __init__(self):
+        self.sent = []
+        self.fail = False
+        self.during_send = None
+
+    def send(self, key, value):
+        if self.fail:
+            raise ConnectionError('backend unavailable')
+        if self.during_send:
+            self.during_send(key, value)
+        self.sent.append((key, value))
+
+
+def test_newer_writes_replace_queued_ones(tmp_path):
+    backend = Backend()
+    outbox = WriteOutbox(tmp_path, 'dropbox', backend.send)
+    outbox.put('a', 1)
+    outbox.put('b', 1)
+    outbox.put('a', 2)
+    assert sorted(outbox.keys()) == ['a', 'b']
+    assert outbox.load('a') == 2
+    assert outbox.drain()
+    assert backend.sent == [('a', 2), ('b', 1)]
+    assert outbox.keys() == []
+    assert list(tmp_path.glob('*.json')) == []
+
+
+def test_failed_sends_stay_queued_and_back_off(tmp_path):
+    backend = Backend()
+    outbox = WriteOutbox(tmp_path, 'cloud', backend.send, min_retry_delay=60)
+    outbox.put('a', 1)
+    backend.fail = True
+    assert not outbox.drain()
+    assert outbox.keys() == ['a']
+    # While backing off, writes to other keys are queued instead of waiting on another failure
+    assert outbox.should_defer('other')
+    assert outbox.describe()['state'] == 'backing_off'
+
+
+def test_write_queued_during_a_send_is_not_lost(tmp_path):
+    backend = Backend()
+    outbox = WriteOutbox(tmp_path, 'dropbox', backend.send)
+    outbox.put('a', 1)
+    # A put that does not take the key's lock lands while the older value is being sent
+    backend.during_send = lambda key, value: outbox.put('a', 2) if value == 1 else None
+    assert outbox.drain()
+    assert outbox.keys() == ['a']
+    assert outbox.load('a') == 2
+    assert outbox.drain()
+    assert backend.sent == [('a', 1), ('a', 2)]
+    assert outbox.keys() == []
+
+
+def test_sends_hold_the_key_lock(tmp_path):
+    held = set()
+    lock = threading.Lock()
+
+    @contextmanager
+    def hold(key):
+        with lock:
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+
+    held_during_send = []
+    backend = Backend()
+    backend.during_send = lambda key, value: held_during_send.append(key in held)
+    outbox = WriteOutbox(tmp_path, 'dropbox', backend.send, hold=hold)
+    outbox.put('a', 1)
+    outbox.put('b', 1)
+    assert outbox.drain()
+    assert held_during_send == [True, True]
+
+
+def test_queue_survives_a_restart(tmp_path):
+    WriteOutbox(tmp_path, 'dropbox', Backend().send).put('a', {'x': [1, 2]})
+    (tmp_path / 'b.tmp').write_text('{"torn')
+    backend = Backend()
+    reopened = WriteOutbox(tmp_path, 'dropbox', backend.send)
+    assert reopened.keys() == ['a']
+    assert not (tmp_path / 'b.tmp').exists()
+    assert reopened.drain()
+    assert backend.sent == [('a', {'x': [1, 2]})]
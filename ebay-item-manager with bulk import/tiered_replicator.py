@@ -0,0 +1,328 @@
+"""
+ListingLife Tiered Replicator
+Keeps a remote backend (Dropbox or S3) in step with the local on-disk tier used by `tiered` mode
+
+Request threads only touch local files; they record each write or delete
+here. A background thread pushes those changes to the remote backend and
+periodically lists the remote to pull changes made by other machines. The
+keys still waiting to be pushed are persisted, so writes made while the
+remote was unreachable (or just before a restart) are pushed later.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PUSH_DELAY = 2.0
+DEFAULT_PULL_INTERVAL = 60.0
+MAX_RETRY_DELAY = 300.0
+
+
+class TieredReplicator:
+    """Pushes local-tier changes to a remote backend and pulls remote changes into the local tier
+
+    The local and remote sides are plain callables so the replicator does not
+    depend on which backend is configured:
+
+        load_local(key) / save_local(key, value) / delete_local(key) / list_local()
+        push(key, value) -> the fingerprint list_remote() will show for the upload
+            (anything but a str when the backend did not say; those keys are looked up in one listing)
+        pull(key) / delete_remote(key)
+        list_remote() -> {key: fingerprint}, where the fingerprint changes whenever the key is rewritten
+        on_pulled(key, value) is called after a remote change lands locally (value is None for deletes)
+
+    Conflicts (a key changed on both sides since the last sync) keep the local
+    version, which is pushed over the remote one, and are counted in describe().
+    The first sync of a folder that already holds data is the exception: the
+    remote copy is the one other machines share, so it replaces a local copy
+    that differs, and every key replaced that way is logged and counted as a
+    conflict.
+    """
+
+    def __init__(self, state_dir, remote_name, load_local, save_local, delete_local, list_local,
+                 push, pull, delete_remote, list_remote, on_pulled=None,
+                 push_delay=DEFAULT_PUSH_DELAY, pull_interval=DEFAULT_PULL_INTERVAL):
+        self.state_dir = state_dir
+        self.state_file = state_dir / 'state.json'
+        self.remote_name = remote_name
+        self.load_local = load_local
+        self.save_local = save_local
+        self.delete_local = delete_local
+        self.list_local = list_local
+        self.push = push
+        self.pull = pull
+        self.delete_remote = delete_remote
+        self.list_remote = list_remote
+        self.on_pulled = on_pulled
+        self.push_delay = push_delay
+        self.pull_interval = pull_interval
+
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self._sequence = 0
+        # key -> {'op': 'put'|'delete', 'since': epoch seconds of the oldest unpushed change, 'seq': int}
+        self._pending = {}
+        # key -> remote fingerprint as of the last push or pull
+        self._fingerprints = {}
+        self._seeded = False
+        self._pull_requested = True
+        self._next_pull = 0.0
+        self._retry_delay = 0.0
+        self._last_failure = 0.0
+        self.status = {
+            'state': 'stopped', 'last_push': None, 'last_pull': None, 'last_error': None,
+            'pushed': 0, 'pulled': 0, 'conflicts': 0
+        }
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Replication state unreadable, starting a fresh sync: {e}")
+            return
+        self._fingerprints = state.get('fingerprints', {})
+        self._seeded = bool(state.get('seeded'))
+        for key, entry in state.get('pending', {}).items():
+            self._sequence += 1
+            self._pending[key] = {'op': entry['op'], 'since': entry['since'], 'seq': self._sequence}
+
+    def _save_state(self):
+        """Persist pending keys and fingerprints (caller holds the lock)"""
+        state = {
+            'seeded': self._seeded,
+            'fingerprints': self._fingerprints,
+            'pending': {key: {'op': entry['op'], 'since': entry['since']} for key, entry in self._pending.items()}
+        }
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        temp_file = self.state_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, separators=(',', ':'))
+        temp_file.replace(self.state_file)
+
+    def _mark_pending(self, key, op):
+        self._sequence += 1
+        previous = self._pending.get(key)
+        self._pending[key] = {'op': op, 'since': previous['since'] if previous else time.time(), 'seq': self._sequence}
+        self._save_state()
+        self._wake.notify()
+
+    def record_write(self, key, write):
+        """Run write() against the local tier and queue the key for pushing
+
+        The lock keeps a pull from overwriting the key between the local write
+        and it being marked as pending.
+        """
+        with self._lock:
+            result = write()
+            self._mark_pending(key, 'put')
+            return result
+
+    def record_delete(self, key, delete):
+        with self._lock:
+            result = delete()
+            self._mark_pending(key, 'delete')
+            return result
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self.status['state'] = 'starting'
+            self._thread = threading.Thread(target=self._run, name='tiered-replicator', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the background thread; pending keys stay on disk for the next start"""
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+        self.status['state'] = 'stopped'
+
+    def request_pull(self):
+        """Pull remote changes on the next pass instead of waiting for pull_interval"""
+        with self._lock:
+            self._pull_requested = True
+            self._wake.notify()
+
+    @property
+    def _retry_until(self):
+        return self._last_failure + self._retry_delay
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopping:
+                    now = time.time()
+                    due = self._next_pull if not self._pull_requested else now
+                    if self._pending:
+                        oldest = min(entry['since'] for entry in self._pending.values())
+                        due = min(due, oldest + self.push_delay)
+                    due = max(due, self._retry_until) if self._retry_delay else due
+                    if due <= now:
+                        break
+                    self._wake.wait(due - now)
+                if self._stopping:
+                    return
+            self.run_once()
+
+    def run_once(self):
+        """Push pending changes, then pull if a pull is due; returns False if the remote failed"""
+        try:
+            self.push_pending()
+            if self._pull_requested or time.time() >= self._next_pull:
+                self.pull_changes()
+            self._retry_delay = 0.0
+            self.status['last_error'] = None
+            self.status['state'] = 'idle'
+            return True
+        except Exception as e:
+            # Back off exponentially while the remote is unreachable; local reads and writes carry on
+            self._last_failure = time.time()
+            self._retry_delay = min(max(self._retry_delay * 2, self.push_delay, 1.0), MAX_RETRY_DELAY)
+            self.status.update(state='error', last_error=str(e))
+            logger.warning(f"Replication to {self.remote_name} failed, retrying in {self._retry_delay:.0f}s: {e}")
+            return False
+
+    def push_pending(self):
+        with self._lock:
+            batch = {key: dict(entry) for key, entry in self._pending.items()}
+        if not batch:
+            return
+        self.status['state'] = 'pushing'
+        pushed = []
+        unlisted = []
+        for key, entry in batch.items():
+            fingerprint = None
+            if entry['op'] == 'delete':
+                self.delete_remote(key)
+            else:
+                value = self.load_local(key)
+                if value is None:
+                    # Deleted since: either a queued delete replaced this entry or the file is gone for good
+                    with self._lock:
+                        if self._pending.get(key, {}).get('seq') == entry['seq']:
+                            del self._pending[key]
+                            self._save_state()
+                    continue
+                fingerprint = self.push(key, value)
+            pushed.append(key)
+            with self._lock:
+                current = self._pending.get(key)
+                # A write that arrived during the push stays pending for the next pass
+                if current and current['seq'] == entry['seq']:
+                    del self._pending[key]
+                if entry['op'] == 'delete':
+                    self._fingerprints.pop(key, None)
+                elif isinstance(fingerprint, str):
+                    # Adopted so the next pull does not download what was just pushed back
+                    self._fingerprints[key] = fingerprint
+                else:
+                    unlisted.append(key)
+                self._save_state()
+            self.status['pushed'] += 1
+        if unlisted:
+            listing = self.list_remote()
+            with self._lock:
+                for key in unlisted:
+                    if key in listing:
+                        self._fingerprints[key] = listing[key]
+                self._save_state()
+        self.status['last_push'] = datetime.now().isoformat()
+        logger.info(f"Replicated {len(pushed)} key(s) to {self.remote_name}")
+
+    def pull_changes(self):
+        self.status['state'] = 'pulling'
+        with self._lock:
+            self._pull_requested = False
+        listing = self.list_remote()
+        pulled = 0
+
+        for key, fingerprint in listing.items():
+            if self._fingerprints.get(key) == fingerprint:
+                continue
+            with self._lock:
+                if key in self._pending:
+                    self._count_conflict(key)
+                    continue
+            value = self.pull(key)
+            if value is None:
+                continue  # Vanished or unreadable; the next listing decides
+            with self._lock:
+                if key in self._pending:
+                    self._count_conflict(key)
+                    continue
+                if not self._seeded and key not in self._fingerprints:
+                    local = self.load_local(key)
+                    if local == value:
+                        self._fingerprints[key] = fingerprint
+                        self._save_state()
+                        continue
+                    if local is not None:
+                        self._count_conflict(key, kept=self.remote_name)
+                self.save_local(key, value)
+                self._fingerprints[key] = fingerprint
+                self._save_state()
+            pulled += 1
+            if self.on_pulled:
+                self.on_pulled(key, value)
+
+        # Keys that disappeared from the remote were deleted on another machine
+        for key in [key for key in self._fingerprints if key not in listing]:
+            with self._lock:
+                if key in self._pending:
+                    continue
+                self.delete_local(key)
+                self._fingerprints.pop(key, None)
+                self._save_state()
+            pulled += 1
+            if self.on_pulled:
+                self.on_pulled(key, None)
+
+        if not self._seeded:
+            # Local keys the remote has never seen are pushed on the first sync
+            with self._lock:
+                for key in self.list_local():
+                    if key not in listing and key not in self._pending:
+                        self._mark_pending(key, 'put')
+                self._seeded = True
+                self._save_state()
+
+        self.status['pulled'] += pulled
+        self.status['last_pull'] = datetime.now().isoformat()
+        self._next_pull = time.time() + self.pull_interval
+        if pulled:
+            logger.info(f"Pulled {pulled} change(s) from {self.remote_name}")
+
+    def _count_conflict(self, key, kept=None):
+        self.status['conflicts'] += 1
+        if kept:
+            logger.warning(f"{key} differs locally and on {self.remote_name} at the first sync; "
+                           f"replacing the local copy with the {kept} version")
+        else:
+            logger.warning(f"{key} changed locally and on {self.remote_name}; keeping the local version")
+
+    def describe(self):
+        """Replication state and lag, for the health endpoint"""
+        with self._lock:
+            oldest = min((entry['since'] for entry in self._pending.values()), default=None)
+            pending = len(self._pending)
+        return dict(
+            self.status,
+            remote=self.remote_name,
+            pending_keys=pending,
+            lag_seconds=round(time.time() - oldest, 1) if oldest else 0.0,
+            retry_in_seconds=round(max(0.0, self._retry_until - time.time()), 1) if self._retry_delay else None
+        )
@@ -0,0 +1,333 @@
+"""
+ListingLife Version History
+Keeps past versions of every key as structural deltas against periodic full snapshots
+"""
+import copy
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from backend_handle import KeyLocks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_INTERVAL = 20
+DEFAULT_MAX_VERSIONS = 200
+DEFAULT_MAX_AGE_DAYS = 30
+# Keys whose newest version is kept in memory, least recently recorded first out
+LATEST_KEYS_KEPT = 32
+
+
+def _id_key(element_id):
+    """Delta key of a list element's id: its JSON, so 1 and "1" stay apart and any JSON id can be a key"""
+    return json.dumps(element_id, ensure_ascii=False, separators=(',', ':'))
+
+
+def _is_id_list(value):
+    """Lists of dicts with unique ids (categories, items, periods...) are diffed element-wise"""
+    if not isinstance(value, list) or not value:
+        return False
+    ids = [element.get('id') if isinstance(element, dict) else None for element in value]
+    return None not in ids and len({_id_key(element_id) for element_id in ids}) == len(ids)
+
+
+def diff(old, new):
+    """Return a delta turning old into new, or None if they are equal
+
+    Deltas only mention what changed: {'v': value} replaces a node,
+    {'d': {...}, 'r': [...]} patches and removes dict keys, and
+    {'i': {...}, 'o': [...]} patches id-keyed list elements (keyed by the
+    JSON of their id), carrying the id order only when it changed. An edit to one item therefore produces a
+    delta the size of that item, whatever the size of the document.
+    """
+    if type(old) is not type(new):
+        return {'v': new}
+    if isinstance(new, dict):
+        changed = {}
+        for key, value in new.items():
+            if key not in old:
+                changed[key] = {'v': value}
+            else:
+                child = diff(old[key], value)
+                if child is not None:
+                    changed[key] = child
+        removed = [key for key in old if key not in new]
+        if not changed and not removed:
+            return None
+        delta = {'d': changed}
+        if removed:
+            delta['r'] = removed
+        return delta
+    if isinstance(new, list):
+        if old == new:
+            return None
+        if _is_id_list(old) and _is_id_list(new):
+            old_by_id = {_id_key(element['id']): element for element in old}
+            changed = {}
+            for element in new:
+                element_key = _id_key(element['id'])
+                previous = old_by_id.get(element_key)
+                child = {'v': element} if previous is None else diff(previous, element)
+                if child is not None:
+                    changed[element_key] = child
+            delta = {'i': changed}
+            new_order = [element['id'] for element in new]
+            if new_order != [element['id'] for element in old]:
+                delta['o'] = new_order
+            return delta
+        return {'v': new}
+    return None if old == new else {'v': new}
+
+
+def apply_delta(base, delta):
+    """Apply a delta produced by diff(); base may be modified in place"""
+    if 'v' in delta:
+        return copy.deepcopy(delta['v'])
+    if 'd' in delta:
+        for key in delta.get('r', []):
+            base.pop(key, None)
+        for key, child in delta['d'].items():
+            base[key] = apply_delta(base.get(key), child)
+        return base
+    if 'i' in delta or 'l' in delta:
+        # 'l' deltas were written before ids were keyed by their JSON, and keyed them by str(id)
+        key_of = _id_key if 'i' in delta else str
+        by_id = {key_of(element['id']): element for element in base}
+        for element_key, child in delta.get('i', delta.get('l')).items():
+            by_id[element_key] = apply_delta(by_id.get(element_key), child)
+        order = delta.get('o')
+        if order is None:
+            order = [element['id'] for element in base]
+        return [by_id[key_of(element_id)] for element_id in order]
+    return base
+
+
+class VersionHistory:
+    """On-disk version history for storage keys
+
+    Each key gets a folder holding an index plus gzip-compressed snapshot and
+    delta files. A full snapshot is written every `snapshot_interval` versions
+    (or when a delta would be larger than half the document), so rebuilding
+    any version replays at most that many deltas.
+
+    record() only queues a value: a background thread diffs, compresses and
+    writes it, one key at a time, so saves do not wait for their history.
+    Reads of a key wait until the versions queued for it are written. With
+    worker processes, process_locks (worker_processes.SharedState) keeps two
+    processes from writing one key's history at once.
+    """
+
+    def __init__(self, root, snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL,
+                 max_versions=DEFAULT_MAX_VERSIONS, max_age_days=DEFAULT_MAX_AGE_DAYS, process_locks=None):
+        self.root = Path(root)
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.max_versions = max(1, max_versions)
+        self.max_age_days = max_age_days
+        self._locks = KeyLocks(process_locks)
+        # key -> (version, sha1 of its JSON, its gzipped JSON) of the newest recorded version, for LATEST_KEYS_KEPT keys
+        self._latest = OrderedDict()
+        self._queue = deque()  # (key, value) waiting to be recorded, oldest first
+        self._queued = {}  # key -> number of its values in the queue or being recorded
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def _key_dir(self, key):
+        return self.root / key
+
+    def _hold(self, key):
+        # Named apart from the key itself, so across processes this never waits on the key's save lock
+        return self._locks.hold(f"history/{key}")
+
+    def _read_index(self, key):
+        index_file = self._key_dir(key) / 'index.json'
+        if not index_file.exists():
+            return []
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self, key, index):
+        index_file = self._key_dir(key) / 'index.json'
+        temp_file = index_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        temp_file.replace(index_file)
+
+    def _write_file(self, key, filename, compressed):
+        with open(self._key_dir(key) / filename, 'wb') as f:
+            f.write(compressed)
+        return len(compressed)
+
+    def _write_payload(self, key, filename, payload):
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return self._write_file(key, filename, gzip.compress(data))
+
+    def _read_payload(self, key, filename):
+        with open(self._key_dir(key) / filename, 'rb') as f:
+            return json.loads(gzip.decompress(f.read()).decode('utf-8'))
+
+    def _materialize(self, key, index, version):
+        """Rebuild a version from the nearest snapshot at or before it"""
+        position = next((i for i, entry in enumerate(index) if entry['version'] == version), None)
+        if position is None:
+            return None
+        start = position
+        while index[start]['kind'] != 'snapshot':
+            start -= 1
+        value = self._read_payload(key, index[start]['file'])
+        for entry in index[start + 1:position + 1]:
+            value = apply_delta(value, self._read_payload(key, entry['file']))
+        return value
+
+    def record(self, key, value):
+        """Queue a new version of a key (value must not be modified afterwards); writes that change nothing are skipped"""
+        with self._cond:
+            if self._stopping:
+                return
+            self._queue.append((key, value))
+            self._queued[key] = self._queued.get(key, 0) + 1
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='version-history', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                key, value = self._queue.popleft()
+            try:
+                with self._hold(key):
+                    self._record(key, value)
+            except Exception as e:
+                logger.warning(f"Could not record history for {key}: {e}")
+            finally:
+                with self._cond:
+                    self._queued[key] -= 1
+                    if not self._queued[key]:
+                        del self._queued[key]
+                    self._cond.notify_all()
+
+    def flush(self, key=None, timeout=None):
+        """Wait until the queued versions of a key (or of every key) are written; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not (self._queued.get(key) if key is not None else self._queued), timeout)
+
+    def close(self, timeout=30):
+        """Write what is queued, then stop the recording thread; later record() calls are dropped"""
+        self.flush(timeout=timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _record(self, key, value):
+        """Append a new version of a key (caller holds the key's history lock); returns its version"""
+        self._key_dir(key).mkdir(parents=True, exist_ok=True)
+        index = self._read_index(key)
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+        latest = self._latest.get(key)
+        if latest is not None and (not index or latest[0] != index[-1]['version']):
+            latest = None  # Written by another process, or evicted
+        if latest is not None and latest[1] == digest:
+            return latest[0]
+
+        previous = None
+        if latest is not None:
+            previous = json.loads(gzip.decompress(latest[2]).decode('utf-8'))
+        elif index:
+            previous = self._materialize(key, index, index[-1]['version'])
+        if index and previous == value:
+            # The same value with its keys in another order
+            return index[-1]['version']
+
+        version = index[-1]['version'] + 1 if index else 1
+        timestamp = datetime.now().isoformat()
+        since_snapshot = 0
+        for entry in reversed(index):
+            if entry['kind'] == 'snapshot':
+                break
+            since_snapshot += 1
+
+        delta = None
+        if index and since_snapshot + 1 < self.snapshot_interval:
+            delta = diff(previous, value)
+            if len(json.dumps(delta, separators=(',', ':'))) * 2 > len(data):
+                delta = None  # A rewrite this large is cheaper to store as a snapshot
+
+        compressed = gzip.compress(data)
+        if delta is None:
+            filename = f"{version}.snap.json.gz"
+            size = self._write_file(key, filename, compressed)
+            kind = 'snapshot'
+        else:
+            filename = f"{version}.delta.json.gz"
+            size = self._write_payload(key, filename, delta)
+            kind = 'delta'
+
+        index.append({'version': version, 'timestamp': timestamp, 'kind': kind, 'file': filename, 'size': size})
+        index = self._evict(key, index)
+        self._write_index(key, index)
+        self._latest[key] = (version, digest, compressed)
+        self._latest.move_to_end(key)
+        while len(self._latest) > LATEST_KEYS_KEPT:
+            self._latest.popitem(last=False)
+        return version
+
+    def _evict(self, key, index):
+        """Drop versions beyond the retention limits, rebasing the oldest kept one onto a snapshot"""
+        keep_from = max(0, len(index) - self.max_versions)
+        if self.max_age_days:
+            cutoff = (datetime.now() - timedelta(days=self.max_age_days)).isoformat()
+            # The newest version is always kept, however old it is
+            while keep_from < len(index) - 1 and index[keep_from]['timestamp'] < cutoff:
+                keep_from += 1
+        if keep_from == 0:
+            return index
+
+        first_kept = index[keep_from]
+        if first_kept['kind'] != 'snapshot':
+            value = self._materialize(key, index, first_kept['version'])
+            filename = f"{first_kept['version']}.snap.json.gz"
+            first_kept = dict(first_kept, kind='snapshot', file=filename,
+                              size=self._write_payload(key, filename, value))
+            (self._key_dir(key) / index[keep_from]['file']).unlink(missing_ok=True)
+        for entry in index[:keep_from]:
+            (self._key_dir(key) / entry['file']).unlink(missing_ok=True)
+        return [first_kept] + index[keep_from + 1:]
+
+    def list_versions(self, key):
+        """Return the index entries for a key, oldest first"""
+        self.flush(key)
+        with self._hold(key):
+            return self._read_index(key)
+
+    def get_version(self, key, version=None, at=None):
+        """Materialize a key at a version number or at the latest version not after a timestamp"""
+        self.flush(key)
+        with self._hold(key):
+            index = self._read_index(key)
+            if not index:
+                return None, None
+            if version is None:
+                candidates = [entry for entry in index if at is None or entry['timestamp'] <= at]
+                if not candidates:
+                    return None, None
+                version = candidates[-1]['version']
+            elif not any(entry['version'] == version for entry in index):
+                return None, None
+            latest = self._latest.get(key)
+            if latest and latest[0] == version:
+                return version, json.loads(gzip.decompress(latest[2]).decode('utf-8'))
+            return version, self._materialize(key, index, version)
@@ -0,0 +1,142 @@
+"""
+ListingLife Worker Processes
+State shared by the server's worker processes: change counters in shared memory and per-key file locks
+
+With server_workers > 1 the server forks that many processes that accept
+connections from one listening socket, so JSON encoding and gzip run on every
+core instead of one interpreter. Each process keeps its own caches; they stay
+valid because every write bumps a counter in a memory-mapped file all workers
+share, and a cache entry built at an older count is rebuilt. A separate
+counter tracks config changes, so a worker reloads settings another worker
+saved. Writes to the same key are serialized across processes with fcntl
+record locks on the same file. Each worker also publishes its metrics to a
+shared temp folder, so whichever worker answers a scrape reports them all.
+
+Forking and fcntl are POSIX-only; on Windows the server runs one process.
+"""
+import atexit
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+WORKERS_SUPPORTED = fcntl is not None and hasattr(os, 'fork')
+MAX_WORKERS = 32
+
+# Counter 0 is the config generation; keys hash onto the rest
+COUNTER_SLOTS = 4096
+# Byte ranges locked for keys lie past the counters, in their own space
+KEY_LOCK_SLOTS = 1024
+_COUNTER = struct.Struct('<Q')
+_KEY_LOCK_OFFSET = COUNTER_SLOTS * _COUNTER.size
+# How often each worker writes its metrics for the others to report
+METRICS_PUBLISH_INTERVAL = 5.0
+
+
+def _slot(key, slots):
+    return zlib.crc32(key.encode('utf-8')) % slots
+
+
+class SharedState:
+    """Counters and key locks in an unlinked temp file, inherited by every process forked after it is created
+
+    Two keys can share a counter or a lock slot; that costs an unneeded
+    cache rebuild or a short wait, never a stale read.
+    """
+
+    def __init__(self, worker_count):
+        if not WORKERS_SUPPORTED:
+            raise RuntimeError('Worker processes need fork() and fcntl (not available on this platform)')
+        self.worker_count = worker_count
+        self._file = tempfile.TemporaryFile(prefix='listinglife-workers-')
+        self._file.truncate(COUNTER_SLOTS * _COUNTER.size)
+        self._map = mmap.mmap(self._file.fileno(), COUNTER_SLOTS * _COUNTER.size)
+        # fcntl locks belong to the process, so threads of one process also queue on these
+        self._counter_lock = threading.Lock()
+        self._slot_locks = [threading.Lock() for _ in range(KEY_LOCK_SLOTS)]
+        self.metrics_dir = Path(tempfile.mkdtemp(prefix='listinglife-metrics-'))
+        atexit.register(self._remove_metrics_dir, os.getpid())
+
+    def _remove_metrics_dir(self, owner):
+        # Forked workers inherit this handler; only the process that created the folder removes it
+        if os.getpid() == owner:
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    @contextmanager
+    def _locked(self, offset, length, thread_lock):
+        with thread_lock:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX, length, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._file.fileno(), fcntl.LOCK_UN, length, offset)
+
+    def _read(self, index):
+        return _COUNTER.unpack_from(self._map, index * _COUNTER.size)[0]
+
+    def _increment(self, index):
+        offset = index * _COUNTER.size
+        with self._locked(offset, _COUNTER.size, self._counter_lock):
+            value = _COUNTER.unpack_from(self._map, offset)[0] + 1
+            _COUNTER.pack_into(self._map, offset, value)
+            return value
+
+    def generation(self, key):
+        """Change count of a key, as seen by every worker; reading never blocks"""
+        return self._read(1 + _slot(key, COUNTER_SLOTS - 1))
+
+    def bump(self, key):
+        return self._increment(1 + _slot(key, COUNTER_SLOTS - 1))
+
+    def config_generation(self):
+        return self._read(0)
+
+    def bump_config(self):
+        return self._increment(0)
+
+    def publish_metrics(self, worker, snapshot):
+        """Store a worker's MetricsRegistry.snapshot() for worker_metrics() in any process"""
+        write_atomically(self.metrics_dir / f"worker-{worker}.json", json.dumps(snapshot).encode('utf-8'))
+
+    def worker_metrics(self):
+        """The last snapshot each worker published, by worker index"""
+        snapshots = {}
+        for path in self.metrics_dir.glob('worker-*.json'):
+            try:
+                snapshots[int(path.stem[len('worker-'):])] = json.loads(path.read_bytes())
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    @contextmanager
+    def hold(self, key):
+        """Exclusive across worker processes (and threads) for keys in the same lock slot"""
+        slot = _slot(key, KEY_LOCK_SLOTS)
+        with self._locked(_KEY_LOCK_OFFSET + slot, 1, self._slot_locks[slot]):
+            yield
+
+
+def write_atomically(path, data):
+    """Replace a file with data (bytes) in one rename, so readers in any process see the old file or the new one"""
+    temp_file = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            temp_file.unlink()
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,232 @@
+"""
+ListingLife Write Outbox
+Crash-safe local queue for Dropbox/S3 writes that failed or were deferred during an outage
+
+Each queued key is one file holding the latest value written to it, so a
+newer write to a key replaces (collapses) the older one instead of queueing
+behind it. A background worker sends queued keys to the backend, oldest
+first, and backs off exponentially while the backend keeps failing.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MIN_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 300.0
+
+
+class WriteOutbox:
+    """Queue of pending writes for one backend, stored under `directory`
+
+    send(key, value) performs the real write and raises on failure. Keys in
+    the outbox are also the source of truth for reads until they are sent
+    (see pending()/load()), and later writes to a queued key must go through
+    put() so they cannot be overtaken by the older queued value. hold(key)
+    is the context manager the server's writes to a key hold; a queued write
+    is read, sent and dequeued under it, so it cannot land over a newer save.
+    """
+
+    def __init__(self, directory, backend, send, on_change=None, hold=None,
+                 min_retry_delay=MIN_RETRY_DELAY, max_retry_delay=MAX_RETRY_DELAY):
+        self.directory = directory
+        self.backend = backend
+        self.send = send
+        self.on_change = on_change
+        self.hold = hold or (lambda key: nullcontext())
+        self.min_retry_delay = min_retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+        self._generation = 0
+        # key -> {'queued_at': epoch seconds of the oldest unsent write, 'size': bytes, 'generation': int}
+        self._entries = {}
+        self._failures = 0
+        self._retry_at = 0.0
+        self.status = {'state': 'idle', 'last_error': None, 'last_sent': None, 'queued': 0, 'superseded': 0, 'sent': 0}
+        self._load()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _remove_file(self, key):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        """Pick up entries left by a previous run"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for temp_file in self.directory.glob('*.tmp'):
+            temp_file.unlink()  # A write interrupted before its rename never made it into the queue
+        for entry_file in self.directory.glob('*.json'):
+            try:
+                with open(entry_file, 'r', encoding='utf-8') as f:
+                    queued_at = json.load(f)['queued_at']
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Unreadable outbox entry {entry_file.name}, leaving it in place: {e}")
+                continue
+            self._generation += 1
+            self._entries[entry_file.stem] = {
+                'queued_at': queued_at, 'size': entry_file.stat().st_size, 'generation': self._generation
+            }
+        if self._entries:
+            logger.warning(f"📤 {len(self._entries)} write(s) from a previous run are waiting to be sent to {self.backend}")
+
+    def put(self, key, value, error=None):
+        """Queue the latest value of a key, replacing any older queued value
+
+        Pass the error when the write is queued because a direct attempt just
+        failed; the outbox then backs off, so further writes are queued at once.
+        """
+        with self._lock:
+            previous = self._entries.get(key)
+            queued_at = previous['queued_at'] if previous else time.time()
+            # Write to a temp file, flush it to disk, then rename over the old entry so a crash
+            # leaves either the previous value or the new one, never a torn file
+            entry_file = self._path(key)
+            temp_file = entry_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'queued_at': queued_at, 'value': value}, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(temp_file, entry_file)
+
+            self._generation += 1
+            self._entries[key] = {'queued_at': queued_at, 'size': size, 'generation': self._generation}
+            self.status['superseded' if previous else 'queued'] += 1
+            self._wake.notify()
+        if self.on_change:
+            self.on_change('superseded' if previous else 'queued')
+        if error is not None:
+            self._back_off(error)
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def load(self, key):
+        """The queued value of a key (callers check pending() first)"""
+        with open(self._path(key), 'r', encoding='utf-8') as f:
+            return json.load(f)['value']
+
+    def discard(self, key):
+        """Drop a queued key, e.g. because it was removed"""
+        with self._lock:
+            if self._entries.pop(key, None):
+                self._remove_file(key)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def should_defer(self, key):
+        """True if a write to key must be queued rather than sent directly
+
+        Either the key already has a queued value (which a direct write would
+        race with) or the backend failed recently and is being backed off, in
+        which case queueing avoids making the request wait for another failure.
+        """
+        with self._lock:
+            return key in self._entries or time.time() < self._retry_at
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=f'outbox-{self.backend}', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._stopping and (not self._entries or time.time() < self._retry_at):
+                    self._wake.wait(max(self._retry_at - time.time(), 0.05) if self._entries else None)
+                if self._stopping:
+                    return
+            self.drain()
+
+    def drain(self):
+        """Send queued writes oldest first; stops at the first failure and schedules a retry"""
+        with self._lock:
+            batch = sorted(self._entries, key=lambda key: self._entries[key]['queued_at'])
+        for key in batch:
+            # Under the key's lock no save can queue a newer value or write past this one meanwhile
+            with self.hold(key):
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    continue  # Discarded since the batch was taken
+                try:
+                    value = self.load(key)
+                except FileNotFoundError:
+                    continue
+                self.status['state'] = 'sending'
+                try:
+                    self.send(key, value)
+                except Exception as e:
+                    delay = self._back_off(e)
+                    logger.warning(f"Outbox write of {key} to {self.backend} failed, retrying in {delay:.1f}s: {e}")
+                    return False
+                with self._lock:
+                    current = self._entries.get(key)
+                    # A write queued without the key's lock (none in the server) stays queued
+                    if current and current['generation'] == entry['generation']:
+                        del self._entries[key]
+                        self._remove_file(key)
+                    self._failures = 0
+                    self._retry_at = 0.0
+                    self.status.update(sent=self.status['sent'] + 1, last_sent=datetime.now().isoformat(),
+                                       last_error=None, state='idle')
+            if self.on_change:
+                self.on_change('sent')
+            logger.info(f"📤 Sent queued write {key} to {self.backend}")
+        return True
+
+    def _back_off(self, error):
+        """Schedule the next attempt after a failure; returns the delay in seconds"""
+        with self._lock:
+            self._failures += 1
+            delay = min(self.max_retry_delay, self.min_retry_delay * 2 ** (self._failures - 1))
+            delay *= random.uniform(0.5, 1.0)  # Jitter so several servers do not retry in lockstep
+            # Dropbox rate-limit errors say how long to back off
+            delay = max(delay, getattr(error, 'backoff', None) or 0)
+            self._retry_at = time.time() + delay
+            self.status.update(state='backing_off', last_error=str(error))
+        if self.on_change:
+            self.on_change('failed')
+        return delay
+
+    def describe(self):
+        """Queue depth, age of the oldest entry and retry state, for the health endpoint"""
+        now = time.time()
+        with self._lock:
+            oldest = min((entry['queued_at'] for entry in self._entries.values()), default=None)
+            return dict(
+                self.status,
+                backend=self.backend,
+                depth=len(self._entries),
+                bytes=sum(entry['size'] for entry in self._entries.values()),
+                oldest_age_seconds=round(now - oldest, 1) if oldest else 0.0,
+                retry_in_seconds=round(self._retry_at - now, 1) if self._retry_at > now else None
+            )